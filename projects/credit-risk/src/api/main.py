@@ -12,6 +12,7 @@ Fecha: 2025-11-18
 import os
 import sys
 import json
+import hashlib
 import logging
 from datetime import datetime
 from pathlib import Path
@@ -30,6 +31,13 @@ from scipy import stats
 
 from prometheus_client import Counter, Histogram, Gauge, generate_latest, CONTENT_TYPE_LATEST
 
+try:
+    from monitoring.online_drift import OnlineDriftMonitor, OnlineReference
+    from api.inference_executor import InferenceExecutor, InferenceRejected
+except ImportError:  # uvicorn src.api.main:app
+    from src.monitoring.online_drift import OnlineDriftMonitor, OnlineReference
+    from src.api.inference_executor import InferenceExecutor, InferenceRejected
+
 # Configuración de logging
 logging.basicConfig(
     level=logging.INFO,
@@ -68,6 +76,24 @@ MODEL_LOADED_GAUGE = Gauge(
     "credit_api_model_loaded",
     "Estado de carga del modelo (1=cargado, 0=no cargado)"
 )
+INFERENCE_WAIT = Histogram(
+    "credit_api_inference_queue_wait_seconds",
+    "Tiempo de espera en la cola del pool de inferencia",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+INFERENCE_QUEUE_DEPTH = Gauge(
+    "credit_api_inference_queue_depth",
+    "Trabajos en espera en el pool de inferencia"
+)
+INFERENCE_REJECTED = Counter(
+    "credit_api_inference_rejected_total",
+    "Requests rechazadas por saturación del pool de inferencia",
+    ["status"]
+)
+
+# Pool acotado para feature engineering + predict_proba (fuera del event loop)
+INFERENCE_EXECUTOR = InferenceExecutor.from_env(on_wait=INFERENCE_WAIT.observe)
+INFERENCE_QUEUE_DEPTH.set_function(lambda: INFERENCE_EXECUTOR.queue_depth)
 
 # API Key (opcional, activada si se define API_KEY env)
 API_KEY = os.getenv("API_KEY")
@@ -111,15 +137,23 @@ async def lifespan(app: FastAPI):
 
     if success:
         try:
-            baseline_scores = compute_reference_scores()
-            if baseline_scores is not None:
+            reference_frame = compute_reference_frame()
+            if reference_frame is not None:
+                baseline_scores = model.predict_proba(reference_frame)[:, 1]
                 logger.info("Scores de referencia cargados para PSI/KS")
+                if online_drift is not None:
+                    online_drift.start(
+                        reference_factory=lambda: compute_online_reference(reference_frame, baseline_scores)
+                    )
         except Exception as e:
             logger.warning(f"No se pudieron calcular scores de referencia: {e}")
 
     yield
 
     # Shutdown hooks (si aplica)
+    if online_drift is not None:
+        online_drift.stop()
+    INFERENCE_EXECUTOR.shutdown()
     logger.info("Apagando app (lifespan)")
 
 
@@ -276,12 +310,27 @@ class ScoreDriftRequest(BaseModel):
 model = None
 feature_names = None
 model_metadata = None
+model_digest = None
 baseline_scores = None
 
+# Drift en línea sobre el tráfico de /predict (None si ONLINE_DRIFT_ENABLED=false)
+online_drift = OnlineDriftMonitor.from_env()
+ONLINE_DRIFT_REFERENCE = Path(os.getenv("ONLINE_DRIFT_REFERENCE", MODELS_DIR / "online_drift_reference.npz"))
+PROBABILITY_SERIES = "probability"
+
+
+def file_sha256(path: Path) -> str:
+    """SHA-256 de un archivo leído por bloques (hashlib.file_digest es 3.11+)."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
 
 def load_model():
     """Carga el modelo y sus metadatos."""
-    global model, feature_names, model_metadata
+    global model, feature_names, model_metadata, model_digest
 
     try:
         # Cargar modelo
@@ -290,6 +339,7 @@ def load_model():
             raise FileNotFoundError(f"Modelo no encontrado en {model_path}")
 
         model = joblib.load(model_path)
+        model_digest = file_sha256(model_path)
         logger.info(f"Modelo cargado: {type(model).__name__}")
         MODEL_LOADED_GAUGE.set(1)
 
@@ -320,13 +370,11 @@ def load_model():
         return False
 
 
-def compute_reference_scores():
+def compute_reference_frame() -> Optional[pd.DataFrame]:
     """
-    Genera scores de referencia para monitoreo (PSI/KS) usando el dataset procesado.
+    Features del dataset procesado (sin target, en el orden del modelo) usadas
+    como referencia de monitoreo.
     """
-    if model is None:
-        return None
-
     data_path = BASE_DIR / "data" / "processed" / "credit_data_processed.csv"
     if not data_path.exists():
         logger.warning("Dataset de referencia no encontrado para PSI/KS")
@@ -345,10 +393,65 @@ def compute_reference_scores():
                 df[feat] = 0
         df = df[feature_names]
 
+    return df
+
+
+def compute_reference_scores():
+    """
+    Genera scores de referencia para monitoreo (PSI/KS) usando el dataset procesado.
+    """
+    if model is None:
+        return None
+
+    df = compute_reference_frame()
+    if df is None:
+        return None
+
     scores = model.predict_proba(df)[:, 1]
     return scores
 
 
+def model_artifact_version() -> str:
+    """Versión de metadata y hash del archivo del modelo cargado."""
+    version = model_metadata.get("version", "unknown") if model_metadata else "unknown"
+    return f"{version}+{model_digest[:12]}" if model_digest else version
+
+
+def compute_online_reference(reference_frame: pd.DataFrame, scores: np.ndarray) -> OnlineReference:
+    """
+    Referencia congelada del monitor de drift en línea: features de entrada y
+    probabilidad del modelo. Se reutiliza ONLINE_DRIFT_REFERENCE si coincide
+    con las features actuales y con el modelo cargado (``model_artifact_version``);
+    si no, se construye y se guarda ahí.
+    """
+    names = list(reference_frame.columns) + [PROBABILITY_SERIES]
+    version = model_artifact_version()
+    if ONLINE_DRIFT_REFERENCE.exists():
+        reference = OnlineReference.load(ONLINE_DRIFT_REFERENCE)
+        if reference.matches(names, version):
+            logger.info(f"Referencia de drift en línea cargada: {ONLINE_DRIFT_REFERENCE}")
+            return reference
+        logger.info("Referencia de drift en línea de otras features/modelo; se reconstruye")
+
+    matrix = np.column_stack([reference_frame.to_numpy(dtype=np.float64), scores])
+    reference = OnlineReference.from_matrix(matrix, names, model_version=version)
+    try:
+        reference.save(ONLINE_DRIFT_REFERENCE)
+    except OSError as e:
+        logger.warning(f"No se pudo guardar la referencia de drift en línea: {e}")
+    return reference
+
+
+def observe_online_drift(features: pd.DataFrame, probabilities: np.ndarray) -> None:
+    """Agrega features y probabilidades servidas al monitor (nunca falla la request)."""
+    if online_drift is None:
+        return
+    try:
+        online_drift.observe(np.column_stack([features.to_numpy(dtype=np.float64), probabilities]))
+    except Exception as e:
+        logger.warning(f"Observación de drift en línea omitida: {e}")
+
+
 #
 # Carga temprana del modelo (para que los tests y el arranque tengan modelo listo).
 # Si falla, el evento de startup intentará nuevamente y dejará trazas en los logs.
@@ -463,6 +566,39 @@ def compute_psi(expected: np.ndarray, actual: np.ndarray, n_bins: int = 10) -> f
     return float(psi)
 
 
+def score_application(data: dict):
+    """Features y probabilidad de default de una solicitud."""
+    features = engineer_features(data)
+    return features, model.predict_proba(features)[0, 1]
+
+
+def score_applications(applications: list):
+    """Features y probabilidades de un batch de solicitudes."""
+    batch_features, batch_probabilities = [], []
+    for application in applications:
+        features, probability = score_application(application.model_dump())
+        batch_features.append(features)
+        batch_probabilities.append(probability)
+    return batch_features, batch_probabilities
+
+
+async def run_inference(fn, *args):
+    """
+    Ejecuta ``fn`` en el pool de inferencia. Si está saturado responde 429
+    (cola llena) o 503 (demasiada espera) con Retry-After.
+    """
+    try:
+        return await INFERENCE_EXECUTOR.run(fn, *args)
+    except InferenceRejected as e:
+        INFERENCE_REJECTED.labels(status=str(e.status_code)).inc()
+        logger.warning(f"Inferencia rechazada ({e.status_code}): {e.detail}")
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.detail,
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+
 def require_api_key(request: Request):
     """
     Autenticación opcional via API Key.
@@ -520,12 +656,9 @@ async def predict(application: CreditApplication, _: bool = Depends(require_api_
         raise HTTPException(status_code=503, detail="Modelo no disponible")
 
     try:
-        # Convertir a dict y aplicar feature engineering
-        data = application.model_dump()
-        features = engineer_features(data)
-
-        # Predecir
-        probability = model.predict_proba(features)[0, 1]
+        # Feature engineering + predicción fuera del event loop
+        features, probability = await run_inference(score_application, application.model_dump())
+        observe_online_drift(features, np.array([probability]))
 
         # Clasificar
         prediction = "DEFAULT" if probability >= OPTIMAL_THRESHOLD else "NO_DEFAULT"
@@ -544,6 +677,8 @@ async def predict(application: CreditApplication, _: bool = Depends(require_api_
             model_version=model_metadata.get("version", "1.0.0") if model_metadata else "1.0.0"
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error en predicción: {e}")
         raise HTTPException(status_code=500, detail=f"Error en predicción: {str(e)}")
@@ -564,12 +699,9 @@ async def predict_batch(request: BatchPredictionRequest, _: bool = Depends(requi
 
     try:
         predictions = []
+        batch_features, batch_probabilities = await run_inference(score_applications, request.applications)
 
-        for app in request.applications:
-            data = app.model_dump()
-            features = engineer_features(data)
-
-            probability = model.predict_proba(features)[0, 1]
+        for probability in batch_probabilities:
             prediction = "DEFAULT" if probability >= OPTIMAL_THRESHOLD else "NO_DEFAULT"
             risk_band = get_risk_band(probability)
 
@@ -583,6 +715,8 @@ async def predict_batch(request: BatchPredictionRequest, _: bool = Depends(requi
             ))
 
         PREDICTIONS_TOTAL.labels(mode="batch").inc(len(predictions))
+        if batch_features:
+            observe_online_drift(pd.concat(batch_features), np.asarray(batch_probabilities))
 
         return BatchPredictionResponse(
             predictions=predictions,
@@ -590,6 +724,8 @@ async def predict_batch(request: BatchPredictionRequest, _: bool = Depends(requi
             timestamp=datetime.now().isoformat()
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error en predicción batch: {e}")
         raise HTTPException(status_code=500, detail=f"Error en predicción batch: {str(e)}")
@@ -680,6 +816,17 @@ async def monitor_drift(request: ScoreDriftRequest, _: bool = Depends(require_ap
     }
 
 
+@app.get("/monitoring/drift/online", tags=["Monitoring"])
+async def monitor_drift_online(_: bool = Depends(require_api_key)):
+    """
+    PSI de la ventana deslizante de tráfico (features y probabilidad) contra
+    la referencia congelada, según el último recálculo en segundo plano.
+    """
+    if online_drift is None:
+        return {"status": "disabled"}
+    return online_drift.latest
+
+
 @app.get("/model/info", tags=["Model"])
 async def model_info(_: bool = Depends(require_api_key)):
     """
@@ -25,6 +25,19 @@ import numpy as np
 import pandas as pd
 from scipy import stats
 
+try:
+    from monitoring.drift_kernel import drift_matrix
+    from monitoring.drift_parallel import (
+        SharedColumns, collect_shards, process_executor, resolve_n_jobs,
+        run_per_feature, shard_indices, with_columns
+    )
+except ImportError:  # ejecutado como script: python src/monitoring/drift_monitor.py
+    from drift_kernel import drift_matrix
+    from drift_parallel import (
+        SharedColumns, collect_shards, process_executor, resolve_n_jobs,
+        run_per_feature, shard_indices, with_columns
+    )
+
 # Configuración de logging
 logging.basicConfig(
     level=logging.INFO,
@@ -42,6 +55,34 @@ MONITORING_DIR = REPORTS_DIR / "monitoring"
 MONITORING_DIR.mkdir(parents=True, exist_ok=True)
 
 
+def _feature_csi(expected: np.ndarray, actual: np.ndarray) -> float:
+    """CSI de una sola columna (mismo cálculo que DriftMonitor.calculate_csi)."""
+    return float(drift_matrix(expected[:, None], actual[:, None], bins=10, smoothing='additive', ks=False)['psi'][0])
+
+
+def _csi_shard(reference_spec, production_spec, items: List[Tuple[int, str]]):
+    """
+    Worker: CSI de un shard de features leyendo las columnas de memoria compartida.
+
+    Args:
+        reference_spec: SharedColumns.spec de los datos de referencia
+        production_spec: SharedColumns.spec de los datos de producción
+        items: Lista de (fila en las matrices compartidas, feature)
+
+    Returns:
+        Tuple (CSI, segundos y errores por feature)
+    """
+    def compute(production, reference):
+        return run_per_feature(
+            ((feature, j) for j, feature in items),
+            lambda j: _feature_csi(reference[j], production[j])
+        )
+
+    return with_columns(
+        reference_spec, lambda reference: with_columns(production_spec, compute, reference)
+    )
+
+
 class DriftMonitor:
     """
     Clase para monitorear drift en el modelo de credit scoring.
@@ -57,16 +98,24 @@ class DriftMonitor:
     PSI_THRESHOLD_CRITICAL = 0.25
     KS_DECAY_THRESHOLD = 0.10  # 10% de decaimiento en KS
 
-    def __init__(self, reference_data: pd.DataFrame, reference_scores: np.ndarray):
+    def __init__(
+        self,
+        reference_data: pd.DataFrame,
+        reference_scores: np.ndarray,
+        n_jobs: Optional[int] = 1
+    ):
         """
         Inicializa el monitor con datos de referencia (training/validation).
 
         Args:
             reference_data: DataFrame con features de referencia
             reference_scores: Array con scores de referencia
+            n_jobs: Procesos para el CSI por feature (columnas en memoria
+                compartida); <= 0 usa todos los cores, None lee DRIFT_N_JOBS
         """
         self.reference_data = reference_data
         self.reference_scores = reference_scores
+        self.n_jobs = resolve_n_jobs(n_jobs)
         self.baseline_ks = self._calculate_baseline_ks()
 
         logger.info(f"DriftMonitor inicializado con {len(reference_data)} muestras de referencia")
@@ -249,7 +298,10 @@ class DriftMonitor:
             features_to_monitor: Lista de features a monitorear (todas si None)
 
         Returns:
-            Diccionario con CSI por feature
+            Diccionario con CSI por feature. Las features cuyo cálculo falla
+            se omiten y quedan en ``feature_errors``; ``feature_timings``
+            tiene los segundos por feature cuando se calculan por separado
+            (n_jobs > 1)
         """
         if features_to_monitor is None:
             features_to_monitor = list(self.reference_data.columns)
@@ -260,13 +312,26 @@ class DriftMonitor:
             "features": {}
         }
 
-        for feature in features_to_monitor:
-            if feature in production_data.columns:
-                csi = self.calculate_csi(feature, production_data[feature])
-                results["features"][feature] = {
-                    "csi": round(csi, 4),
-                    "status": self._get_psi_status(csi)
-                }
+        features = [f for f in features_to_monitor if f in production_data.columns]
+        for feature in features:
+            if feature not in self.reference_data.columns:
+                logger.warning(f"Feature {feature} no encontrada en datos de referencia")
+
+        common = [f for f in features if f in self.reference_data.columns]
+        csi_values, feature_timings, feature_errors = {}, {}, {}
+        if common:
+            csi_values, feature_timings, feature_errors = self._calculate_features_csi(common, production_data)
+        for feature, error in feature_errors.items():
+            logger.warning(f"Error calculando CSI de {feature}: {error}")
+
+        for feature in features:
+            if feature in feature_errors:
+                continue
+            csi = float(csi_values.get(feature, 0.0))
+            results["features"][feature] = {
+                "csi": round(csi, 4),
+                "status": self._get_psi_status(csi)
+            }
 
         # Features con drift significativo
         drifted_features = [
@@ -274,9 +339,65 @@ class DriftMonitor:
             if v["status"] in ["WARNING", "CRITICAL"]
         ]
         results["drifted_features"] = drifted_features
+        results["feature_timings"] = {f: round(t, 6) for f, t in feature_timings.items()}
+        results["feature_errors"] = feature_errors
 
         return results
 
+    def _calculate_features_csi(
+        self,
+        features: List[str],
+        production_data: pd.DataFrame
+    ) -> Tuple[Dict[str, float], Dict[str, float], Dict[str, str]]:
+        """
+        CSI de varias features.
+
+        Con n_jobs > 1 las features se reparten entre procesos; si no, una
+        sola llamada matricial (mismo cálculo que calculate_psi: bins por
+        deciles de referencia, +0.0001 en conteos) y, si falla, feature por
+        feature para aislar el error.
+
+        Returns:
+            Tuple (CSI, segundos y errores por feature)
+        """
+        if self.n_jobs > 1 and len(features) > 1:
+            return self._calculate_features_csi_parallel(features, production_data)
+
+        reference = self.reference_data[features].to_numpy(dtype=float, na_value=np.nan)
+        production = production_data[features].to_numpy(dtype=float, na_value=np.nan)
+        try:
+            psi = drift_matrix(reference, production, bins=10, smoothing='additive', ks=False)['psi']
+            return dict(zip(features, psi)), {}, {}
+        except Exception as e:
+            logger.warning(f"CSI matricial falló ({e}); calculando feature por feature")
+            return run_per_feature(
+                ((feature, j) for j, feature in enumerate(features)),
+                lambda j: _feature_csi(reference[:, j], production[:, j])
+            )
+
+    def _calculate_features_csi_parallel(
+        self,
+        features: List[str],
+        production_data: pd.DataFrame
+    ) -> Tuple[Dict[str, float], Dict[str, float], Dict[str, str]]:
+        """CSI por feature en un pool de procesos, columnas en memoria compartida."""
+        csi_values, feature_timings, feature_errors = {}, {}, {}
+        with SharedColumns.from_frame(self.reference_data, features) as reference, \
+                SharedColumns.from_frame(production_data, features) as production, \
+                process_executor(self.n_jobs) as executor:
+            futures = []
+            for idx in shard_indices(len(features), self.n_jobs):
+                items = [(j, features[j]) for j in idx]
+                futures.append((
+                    [features[j] for j in idx],
+                    executor.submit(_csi_shard, reference.spec, production.spec, items)
+                ))
+            for values, timings, errors in collect_shards(futures):
+                csi_values.update(values)
+                feature_timings.update(timings)
+                feature_errors.update(errors)
+        return csi_values, feature_timings, feature_errors
+
     def _get_psi_status(self, psi: float) -> str:
         """Determina el status basado en PSI."""
         if psi < self.PSI_THRESHOLD_WARNING:
@@ -411,7 +532,8 @@ def load_reference_data() -> Tuple[pd.DataFrame, np.ndarray]:
 
 def run_monitoring_check(
     production_data_path: Optional[str] = None,
-    production_labels_path: Optional[str] = None
+    production_labels_path: Optional[str] = None,
+    n_jobs: Optional[int] = None
 ) -> Dict:
     """
     Ejecuta un check de monitoreo.
@@ -419,6 +541,7 @@ def run_monitoring_check(
     Args:
         production_data_path: Ruta a datos de producción (CSV)
         production_labels_path: Ruta a etiquetas de producción (CSV)
+        n_jobs: Procesos para el CSI por feature (None lee DRIFT_N_JOBS)
 
     Returns:
         Reporte de monitoreo
@@ -427,7 +550,7 @@ def run_monitoring_check(
     reference_data, reference_scores = load_reference_data()
 
     # Inicializar monitor
-    monitor = DriftMonitor(reference_data, reference_scores)
+    monitor = DriftMonitor(reference_data, reference_scores, n_jobs=n_jobs)
 
     # Cargar datos de producción (o simular con test data)
     if production_data_path:
@@ -466,6 +589,7 @@ def main():
     parser = argparse.ArgumentParser(description="Credit risk drift monitoring")
     parser.add_argument("--production-data-path", type=str, default=None, help="Ruta CSV de datos actuales")
     parser.add_argument("--production-labels-path", type=str, default=None, help="Ruta CSV de labels actuales")
+    parser.add_argument("--n-jobs", type=int, default=None, help="Procesos para el CSI por feature (-1 = todos los cores)")
     args = parser.parse_args()
 
     print("="*60)
@@ -475,7 +599,8 @@ def main():
     try:
         report = run_monitoring_check(
             production_data_path=args.production_data_path,
-            production_labels_path=args.production_labels_path
+            production_labels_path=args.production_labels_path,
+            n_jobs=args.n_jobs
         )
 
         print(f"\nStatus General: {report['summary']['overall_status']}")
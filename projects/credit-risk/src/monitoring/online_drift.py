@@ -0,0 +1,331 @@
+"""
+Credit Risk Model - Monitor de drift en línea
+
+Proyecto: Credit Risk Scoring - UCI Taiwan Dataset
+Fase DVP-PRO: F8 - Productización
+Autor: Ing. Daniel Varela Pérez
+Email: bedaniele0@gmail.com
+Tel: +52 55 4189 3428
+
+Drift sobre el tráfico de /predict en minutos, sin esperar al job batch de
+drift_monitor.py:
+
+- Referencia congelada (OnlineReference): bordes por deciles de cada
+  feature de entrada y de la probabilidad del modelo, con sus conteos (.npz)
+- Cada request agrega sus filas a histogramas por cubeta de tiempo en un
+  ring buffer (n_buckets x n_series x n_bins): una comparación vectorizada
+  y un bincount, sin guardar filas
+- Un hilo en segundo plano recalcula PSI / JS de la ventana contra la
+  referencia cada ``refresh_seconds``; el endpoint lee el último resultado
+
+Configuración por variables de entorno (ver OnlineDriftMonitor.from_env).
+
+Copia por proyecto: cada proyecto se instala y despliega por separado, sin
+paquete compartido, así que el mismo módulo vive también en
+``demand-forecasting``. Las copias son idénticas salvo PSI_EPSILON y
+PSI_SMOOTHING (cada proyecto usa el suavizado de PSI de su detector batch,
+ver abajo); un cambio aquí se replica en todas.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Sequence, Union
+
+import numpy as np
+
+from .drift_kernel import histogram_counts, js_from_counts, psi_from_counts, quantile_edges, sort_columns
+
+logger = logging.getLogger(__name__)
+
+# Umbrales de PSI (mismos que /monitoring/drift)
+PSI_WARNING = 0.10
+PSI_CRITICAL = 0.25
+
+# Suavizado de PSI: el mismo del detector batch de este proyecto
+# (/monitoring/drift y drift_monitor.py: 1e-6 aditivo). demand-forecasting
+# usa piso de 1e-4, como su DriftDetector.
+PSI_EPSILON = 1e-6
+PSI_SMOOTHING = 'additive'
+
+
+class OnlineReference:
+    """
+    Perfil de referencia congelado: por serie (feature o salida), bordes
+    (-inf, deciles interiores, inf) y conteos por bin. ``model_version``
+    identifica el modelo que generó la serie de salida.
+    """
+
+    def __init__(self,
+                 names: Sequence[str],
+                 edges: np.ndarray,
+                 counts: np.ndarray,
+                 model_version: Optional[str] = None):
+        self.names = list(names)
+        self.model_version = model_version
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.counts = np.asarray(counts, dtype=np.int64)
+        # Bordes interiores: bin = número de bordes <= valor (semántica np.histogram)
+        self.interior = np.ascontiguousarray(self.edges[:, 1:-1])
+
+    @property
+    def n_bins(self) -> int:
+        return self.counts.shape[1]
+
+    @classmethod
+    def from_matrix(cls,
+                    matrix: np.ndarray,
+                    names: Sequence[str],
+                    bins: int = 10,
+                    model_version: Optional[str] = None) -> 'OnlineReference':
+        """
+        Construir la referencia desde una matriz (n_filas x n_series).
+
+        Args:
+            matrix: Valores de referencia (NaN se ignoran por columna)
+            names: Nombre de cada columna
+            bins: Bins por cuantiles de la referencia
+            model_version: Versión del modelo que produjo la columna de salida
+
+        Returns:
+            OnlineReference
+        """
+        sorted_t, n_valid = sort_columns(matrix)
+        edges = quantile_edges(sorted_t, n_valid, bins)
+        return cls(names, edges, histogram_counts(sorted_t, n_valid, edges), model_version)
+
+    def save(self, path: Union[str, Path]) -> Path:
+        """
+        Persistir en .npz de forma atómica (temporal + ``os.replace``): varios
+        workers guardan la misma referencia al arrancar y ninguno debe leer
+        un archivo a medio escribir.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.tmp{os.getpid()}")
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(
+                f,
+                names=np.array(json.dumps(self.names)),
+                model_version=np.array(json.dumps(self.model_version)),
+                edges=self.edges,
+                counts=self.counts,
+            )
+        os.replace(tmp_path, path)
+        logger.info(f"Referencia de drift en línea guardada: {path} ({len(self.names)} series)")
+        return path
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> 'OnlineReference':
+        """Cargar una referencia guardada con ``save`` (sin versión si es anterior)."""
+        with np.load(path) as data:
+            model_version = json.loads(str(data['model_version'])) if 'model_version' in data.files else None
+            return cls(json.loads(str(data['names'])), data['edges'], data['counts'], model_version)
+
+    def matches(self, names: Sequence[str], model_version: Optional[str]) -> bool:
+        """True si la referencia sirve para estas series y este modelo."""
+        return self.names == list(names) and self.model_version == model_version
+
+
+class OnlineDriftMonitor:
+    """
+    Histogramas por ventana deslizante del tráfico de predicción.
+
+    La ventana son ``n_buckets`` cubetas de ``bucket_seconds``; al entrar a
+    una cubeta nueva se reutiliza el slot más viejo del ring buffer.
+    """
+
+    def __init__(self,
+                 bucket_seconds: int = 60,
+                 n_buckets: int = 60,
+                 refresh_seconds: float = 30.0,
+                 min_samples: int = 100,
+                 clock: Callable[[], float] = time.time):
+        """
+        Args:
+            bucket_seconds: Duración de cada cubeta de tiempo
+            n_buckets: Cubetas en la ventana (ventana = bucket_seconds * n_buckets)
+            refresh_seconds: Periodo de recálculo de PSI en segundo plano
+            min_samples: Observaciones mínimas en la ventana para reportar PSI
+            clock: Fuente de tiempo (segundos epoch)
+        """
+        self.bucket_seconds = bucket_seconds
+        self.n_buckets = n_buckets
+        self.refresh_seconds = refresh_seconds
+        self.min_samples = min_samples
+        self.clock = clock
+
+        self.reference: Optional[OnlineReference] = None
+        self.latest: Dict[str, Any] = {'status': 'no_reference'}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._counts = np.zeros((0, 0, 0), dtype=np.int64)
+        self._bucket_ids = np.full(n_buckets, -1, dtype=np.int64)
+
+    @classmethod
+    def from_env(cls) -> Optional['OnlineDriftMonitor']:
+        """
+        Monitor configurado con ONLINE_DRIFT_ENABLED (default true),
+        ONLINE_DRIFT_BUCKET_SECONDS, ONLINE_DRIFT_BUCKETS,
+        ONLINE_DRIFT_REFRESH_SECONDS y ONLINE_DRIFT_MIN_SAMPLES.
+        """
+        if os.getenv("ONLINE_DRIFT_ENABLED", "true").lower() != "true":
+            return None
+        return cls(
+            bucket_seconds=int(os.getenv("ONLINE_DRIFT_BUCKET_SECONDS", "60")),
+            n_buckets=int(os.getenv("ONLINE_DRIFT_BUCKETS", "60")),
+            refresh_seconds=float(os.getenv("ONLINE_DRIFT_REFRESH_SECONDS", "30")),
+            min_samples=int(os.getenv("ONLINE_DRIFT_MIN_SAMPLES", "100")),
+        )
+
+    # ------------------------------------------------------------------
+    # Referencia y ciclo de vida
+    # ------------------------------------------------------------------
+
+    def freeze(self, reference: OnlineReference) -> None:
+        """Fijar la referencia y vaciar la ventana."""
+        with self._lock:
+            self.reference = reference
+            self._counts = np.zeros((self.n_buckets, len(reference.names), reference.n_bins), dtype=np.int64)
+            self._bucket_ids[:] = -1
+        self.latest = {'status': 'insufficient_data'}
+
+    def start(self, reference_factory: Optional[Callable[[], OnlineReference]] = None) -> None:
+        """
+        Arrancar el hilo de recálculo. Si se pasa ``reference_factory``, la
+        referencia se construye en el mismo hilo (sin bloquear el arranque);
+        hasta entonces ``observe`` no acumula nada.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+
+        def run():
+            if reference_factory is not None:
+                try:
+                    self.freeze(reference_factory())
+                except Exception as e:
+                    logger.error(f"No se pudo construir la referencia de drift en línea: {e}")
+                    self.latest = {'status': 'no_reference', 'detail': str(e)}
+                    return
+            while not self._stop.wait(self.refresh_seconds):
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logger.warning(f"Error recalculando drift en línea: {e}")
+
+        self._thread = threading.Thread(target=run, name="online-drift", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Detener el hilo de recálculo."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    # ------------------------------------------------------------------
+    # Ruta caliente
+    # ------------------------------------------------------------------
+
+    def observe(self, values: np.ndarray, now: Optional[float] = None) -> None:
+        """
+        Agregar filas de tráfico (n_filas x n_series, en el orden de
+        ``reference.names``) a la cubeta de tiempo actual.
+        """
+        reference = self.reference
+        if reference is None:
+            return
+        values = np.asarray(values, dtype=np.float64)
+        if values.ndim == 1:
+            values = values[None, :]
+        n_series, n_bins = len(reference.names), reference.n_bins
+        if values.shape[1] != n_series:
+            raise ValueError(f"Expected {n_series} columns for online drift, got {values.shape[1]}")
+
+        bins = (values[:, :, None] >= reference.interior[None, :, :]).sum(axis=2)
+        flat = (bins + np.arange(n_series) * n_bins)[~np.isnan(values)]
+        counts = np.bincount(flat, minlength=n_series * n_bins).reshape(n_series, n_bins)
+
+        bucket = int((self.clock() if now is None else now) // self.bucket_seconds)
+        slot = bucket % self.n_buckets
+        with self._lock:
+            if self._bucket_ids[slot] != bucket:
+                self._counts[slot] = 0
+                self._bucket_ids[slot] = bucket
+            self._counts[slot] += counts
+
+    # ------------------------------------------------------------------
+    # Recálculo
+    # ------------------------------------------------------------------
+
+    def window_counts(self, now: Optional[float] = None) -> np.ndarray:
+        """Conteos (n_series x n_bins) de las cubetas dentro de la ventana."""
+        bucket = int((self.clock() if now is None else now) // self.bucket_seconds)
+        with self._lock:
+            live = (self._bucket_ids > bucket - self.n_buckets) & (self._bucket_ids <= bucket)
+            return self._counts[live].sum(axis=0)
+
+    def refresh(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Recalcular PSI / JS de la ventana contra la referencia y guardar el
+        resultado en ``latest``.
+
+        Returns:
+            Diccionario con status, PSI global (media de las features de
+            entrada), métricas por serie y top features
+        """
+        reference = self.reference
+        if reference is None:
+            return self.latest
+
+        now = self.clock() if now is None else now
+        current = self.window_counts(now)
+        n_current = current.sum(axis=1)
+        enough = n_current >= self.min_samples
+        psi = psi_from_counts(reference.counts, current, PSI_EPSILON, PSI_SMOOTHING)
+        js = js_from_counts(reference.counts, current)
+
+        series = {
+            name: {
+                'psi': round(float(psi[j]), 4) if enough[j] else None,
+                'js_divergence': round(float(js[j]), 4) if enough[j] else None,
+                'n': int(n_current[j]),
+            }
+            for j, name in enumerate(reference.names)
+        }
+        *features, output = reference.names
+        feature_psi = [series[f]['psi'] for f in features if series[f]['psi'] is not None]
+        overall = float(np.mean(feature_psi)) if feature_psi else None
+        worst = max([overall or 0.0, series[output]['psi'] or 0.0])
+
+        if not enough.any():
+            status = 'insufficient_data'
+        elif worst >= PSI_CRITICAL:
+            status = 'critical'
+        elif worst >= PSI_WARNING:
+            status = 'warning'
+        else:
+            status = 'ok'
+
+        top = sorted(
+            ((f, series[f]['psi']) for f in features if series[f]['psi'] is not None),
+            key=lambda item: item[1], reverse=True
+        )[:10]
+        self.latest = {
+            'status': status,
+            'computed_at': datetime.fromtimestamp(now).isoformat(),
+            'window_seconds': self.bucket_seconds * self.n_buckets,
+            'bucket_seconds': self.bucket_seconds,
+            'n_observations': int(n_current.max()) if len(n_current) else 0,
+            'overall_psi': round(overall, 4) if overall is not None else None,
+            'output': {'name': output, **series[output]},
+            'top_features': [{'feature': f, 'psi': value} for f, value in top],
+            'features': {f: series[f] for f in features},
+            'thresholds': {'psi_warning': PSI_WARNING, 'psi_critical': PSI_CRITICAL},
+        }
+        return self.latest
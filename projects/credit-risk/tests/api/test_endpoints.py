@@ -384,3 +384,35 @@ class TestErrorHandling:
             status.HTTP_400_BAD_REQUEST,
             status.HTTP_422_UNPROCESSABLE_CONTENT,
         }
+
+
+class TestInferenceSaturation:
+    """Tests para el pool acotado de inferencia."""
+
+    def test_predict_returns_429_with_retry_after(self, test_client, sample_credit_application, monkeypatch):
+        """Con el pool lleno /predict responde 429 + Retry-After; al liberarse vuelve a predecir."""
+        import numpy as np
+        import api.main as main_module
+        from api.inference_executor import InferenceExecutor
+
+        class _StubModel:
+            def predict_proba(self, X):
+                return np.tile([0.8, 0.2], (len(X), 1))
+
+        executor = InferenceExecutor(max_workers=1, max_queue=0, retry_after_seconds=2)
+        executor._pending = 1  # un trabajo ocupando el único worker
+        monkeypatch.setattr(main_module, "INFERENCE_EXECUTOR", executor)
+        monkeypatch.setattr(main_module, "model", _StubModel())
+
+        response = test_client.post("/predict", json=sample_credit_application)
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert response.headers["Retry-After"] == "2"
+
+        executor._pending = 0
+        response = test_client.post(
+            "/predict/batch", json={"applications": [sample_credit_application] * 3}
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert [p["probability"] for p in response.json()["predictions"]] == [0.2] * 3
+        stats = executor.stats()
+        assert (stats["rejected"], stats["completed"], stats["queue_depth"]) == (1, 1, 0)
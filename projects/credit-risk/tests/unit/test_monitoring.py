@@ -11,12 +11,14 @@ import pytest
 import pandas as pd
 import numpy as np
 import sys
+import multiprocessing
 from pathlib import Path
 from datetime import datetime
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src"))
 
 from monitoring.drift_monitor import DriftMonitor
+from monitoring.online_drift import OnlineDriftMonitor, OnlineReference
 from monitoring.alerts import (
     Alert,
     AlertManager,
@@ -159,6 +161,80 @@ class TestDriftMonitor:
         assert "drifted_features" in result
         assert result["n_samples"] == 50
 
+    def test_monitor_features_matches_per_feature_csi(self):
+        """CSI vectorizado == calculate_csi feature por feature."""
+        rng = np.random.default_rng(0)
+        reference_data = pd.DataFrame({
+            'LIMIT_BAL': rng.gamma(2.0, 50000, 2000),
+            'PAY_0': rng.integers(-2, 9, 2000),
+            'EDUCATION': rng.integers(1, 5, 2000),
+        })
+        monitor = DriftMonitor(reference_data, rng.uniform(0, 1, 2000))
+        production_data = pd.DataFrame({
+            'LIMIT_BAL': rng.gamma(2.5, 50000, 700),
+            'PAY_0': rng.integers(-2, 9, 700),
+            'EDUCATION': rng.integers(1, 3, 700),
+            'extra': rng.normal(size=700),
+        })
+
+        result = monitor.monitor_features(
+            production_data, features_to_monitor=['LIMIT_BAL', 'PAY_0', 'EDUCATION', 'extra']
+        )
+
+        for feature in reference_data.columns:
+            expected = monitor.calculate_csi(feature, production_data[feature])
+            assert result["features"][feature]["csi"] == round(float(expected), 4)
+        assert result["features"]["extra"]["csi"] == 0.0
+        assert "EDUCATION" in result["drifted_features"]
+
+    def test_monitor_features_process_pool(self):
+        """CSI con n_jobs > 1 == CSI matricial, con tiempos por feature."""
+        rng = np.random.default_rng(1)
+        reference_data = pd.DataFrame({
+            'LIMIT_BAL': rng.gamma(2.0, 50000, 3000),
+            'PAY_0': rng.integers(-2, 9, 3000),
+            'BILL_AMT1': rng.normal(50000, 20000, 3000),
+        })
+        production_data = pd.DataFrame({
+            'LIMIT_BAL': rng.gamma(2.5, 50000, 900),
+            'PAY_0': rng.integers(-2, 9, 900),
+            'BILL_AMT1': rng.normal(60000, 20000, 900),
+        })
+        sequential = DriftMonitor(reference_data, rng.uniform(0, 1, 3000))
+        parallel = DriftMonitor(reference_data, rng.uniform(0, 1, 3000), n_jobs=2)
+
+        expected = sequential.monitor_features(production_data)
+        result = parallel.monitor_features(production_data)
+
+        assert result["features"] == expected["features"]
+        assert result["drifted_features"] == expected["drifted_features"]
+        assert set(result["feature_timings"]) == set(reference_data.columns)
+        assert result["feature_errors"] == {}
+
+    @pytest.mark.skipif(multiprocessing.get_start_method() != 'fork',
+                        reason="el parche debe heredarse en los workers")
+    def test_monitor_features_isolates_failing_feature(self, monkeypatch):
+        """Un error en una feature no tumba el resto del reporte."""
+        import monitoring.drift_monitor as drift_monitor_module
+
+        original = drift_monitor_module._feature_csi
+
+        def feature_csi(expected, actual):
+            if np.isnan(actual).all():
+                raise ValueError("columna vacía")
+            return original(expected, actual)
+
+        monkeypatch.setattr(drift_monitor_module, '_feature_csi', feature_csi)
+        rng = np.random.default_rng(2)
+        reference_data = pd.DataFrame({'AGE': rng.integers(21, 70, 500), 'PAY_2': rng.integers(-2, 9, 500)})
+        production_data = pd.DataFrame({'AGE': rng.integers(21, 70, 200), 'PAY_2': np.full(200, np.nan)})
+        monitor = DriftMonitor(reference_data, rng.uniform(0, 1, 500), n_jobs=2)
+
+        result = monitor.monitor_features(production_data)
+
+        assert list(result["features"]) == ['AGE']
+        assert result["feature_errors"] == {'PAY_2': 'ValueError: columna vacía'}
+
     def test_psi_status_classification(self):
         """Test clasificación de status PSI."""
         reference_data = pd.DataFrame({'feat': [1, 2, 3]})
@@ -170,6 +246,85 @@ class TestDriftMonitor:
         assert monitor._get_psi_status(0.30) == "CRITICAL"
 
 
+class TestOnlineDriftMonitor:
+    """Tests para el monitor de drift en línea de la API."""
+
+    @staticmethod
+    def _traffic(rng, n, limit_scale=1.0):
+        return np.column_stack([
+            rng.gamma(2.0, 50000.0 * limit_scale, n),
+            rng.integers(21, 70, n).astype(float),
+            rng.beta(2.0, 8.0, n),
+        ])
+
+    def test_window_psi_matches_histogram(self):
+        """Test conteos por ventana y PSI contra np.histogram."""
+        rng = np.random.default_rng(0)
+        reference = OnlineReference.from_matrix(self._traffic(rng, 5000), ['LIMIT_BAL', 'AGE', 'probability'])
+        monitor = OnlineDriftMonitor(bucket_seconds=60, n_buckets=5, min_samples=100)
+        monitor.freeze(reference)
+
+        traffic = self._traffic(rng, 600, limit_scale=2.0)
+        for chunk in np.array_split(traffic, 6):
+            monitor.observe(chunk, now=120.0)
+        result = monitor.refresh(now=150.0)
+
+        counts = np.histogram(traffic[:, 0], bins=reference.edges[0])[0]
+        np.testing.assert_array_equal(monitor.window_counts(now=150.0)[0], counts)
+        assert result["status"] == "critical"
+        assert result["top_features"][0]["feature"] == "LIMIT_BAL"
+        assert result["features"]["AGE"]["psi"] < 0.10
+        assert monitor.refresh(now=120.0 + 5 * 60)["status"] == "insufficient_data"
+
+    def test_api_online_reference_and_observe(self, tmp_path, monkeypatch):
+        """Test referencia persistida y observación desde la API."""
+        import api.main as api_main
+
+        rng = np.random.default_rng(1)
+        frame = pd.DataFrame(self._traffic(rng, 1000)[:, :2], columns=['LIMIT_BAL', 'AGE'])
+        monitor = OnlineDriftMonitor(min_samples=1)
+        monkeypatch.setattr(api_main, "online_drift", monitor)
+        monkeypatch.setattr(api_main, "ONLINE_DRIFT_REFERENCE", tmp_path / "reference.npz")
+
+        reference = api_main.compute_online_reference(frame, rng.beta(2.0, 8.0, 1000))
+        monitor.freeze(api_main.compute_online_reference(frame, np.zeros(1000)))
+        api_main.observe_online_drift(frame.head(3), np.array([0.1, 0.2, 0.3]))
+        api_main.observe_online_drift(frame.head(1), np.array([0.1, 0.2]))
+
+        assert monitor.reference.names == ['LIMIT_BAL', 'AGE', 'probability']
+        np.testing.assert_array_equal(monitor.reference.edges, reference.edges)
+        assert monitor.refresh()["output"]["n"] == 3
+
+    def test_model_file_digest_reads_in_chunks(self, tmp_path):
+        """Test hash del modelo sin hashlib.file_digest (Python 3.10)."""
+        import hashlib
+
+        import api.main as api_main
+
+        payload = np.random.default_rng(3).bytes(3 << 20)
+        path = tmp_path / "final_model.joblib"
+        path.write_bytes(payload)
+
+        assert api_main.file_sha256(path) == hashlib.sha256(payload).hexdigest()
+
+    def test_api_online_reference_rebuilt_for_new_model(self, tmp_path, monkeypatch):
+        """Test referencia persistida ligada a la versión del modelo."""
+        import api.main as api_main
+
+        rng = np.random.default_rng(2)
+        frame = pd.DataFrame(self._traffic(rng, 1000)[:, :2], columns=['LIMIT_BAL', 'AGE'])
+        monkeypatch.setattr(api_main, "ONLINE_DRIFT_REFERENCE", tmp_path / "reference.npz")
+        monkeypatch.setattr(api_main, "model_digest", "a" * 64)
+
+        first = api_main.compute_online_reference(frame, rng.beta(2.0, 8.0, 1000))
+        monkeypatch.setattr(api_main, "model_digest", "b" * 64)
+        second = api_main.compute_online_reference(frame, rng.beta(8.0, 2.0, 1000))
+
+        assert first.model_version != second.model_version == api_main.model_artifact_version()
+        assert OnlineReference.load(tmp_path / "reference.npz").model_version == second.model_version
+        assert not np.array_equal(first.edges[-1], second.edges[-1])
+
+
 class TestAlerts:
     """Tests para el sistema de alertas."""
 
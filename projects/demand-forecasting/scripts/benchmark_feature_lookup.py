@@ -0,0 +1,123 @@
+"""
+============================================================================
+benchmark_feature_lookup.py - Benchmark de búsqueda de filas para la API
+============================================================================
+Compara la resolución (item_id, store_id, date) del ModelService:
+- Escaneo con máscaras booleanas (ruta original)
+- FeatureIndex con rangos contiguos y searchsorted
+
+sobre una tabla sintética con la forma de M5 (30,490 series x 1,941 días
+para el tamaño completo).
+
+Uso:
+    python scripts/benchmark_feature_lookup.py --n-series 3049 --n-days 1941
+
+Autor: Ing. Daniel Varela Perez
+Email: bedaniele0@gmail.com
+Metodología: DVP-PRO
+============================================================================
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.api.feature_index import FeatureIndex, scan_lookup  # noqa: E402
+
+STORES = ["CA_1", "CA_2", "CA_3", "CA_4", "TX_1", "TX_2", "TX_3", "WI_1", "WI_2", "WI_3"]
+
+
+def make_m5_like_table(n_series: int, n_days: int, seed: int = 42) -> pd.DataFrame:
+    """Genera una base de features sintética (item, tienda, fecha, 1 feature)."""
+    rng = np.random.default_rng(seed)
+    n_items = max(1, n_series // len(STORES))
+    items = np.array([f"FOODS_3_{i:04d}" for i in range(n_items)], dtype=object)
+
+    series_item = np.repeat(items, len(STORES))[:n_series]
+    series_store = np.tile(np.array(STORES, dtype=object), n_items)[:n_series]
+    dates = pd.date_range("2011-01-29", periods=n_days, freq="D")
+
+    df = pd.DataFrame(
+        {
+            "item_id": np.repeat(series_item, n_days),
+            "store_id": np.repeat(series_store, n_days),
+            "date": np.tile(dates.values, len(series_item)),
+            "sales_lag_1": rng.poisson(2, len(series_item) * n_days).astype(np.float32),
+        }
+    )
+    # El parquet procesado no garantiza orden por serie
+    return df.sample(frac=1.0, random_state=seed).reset_index(drop=True)
+
+
+def make_requests(df: pd.DataFrame, n_requests: int, seed: int = 0) -> list:
+    """Requests mixtas: fechas exactas, huecos y fechas futuras."""
+    rng = np.random.default_rng(seed)
+    rows = df.iloc[rng.integers(0, len(df), n_requests)]
+    offsets = rng.choice([0, 0, 0, 30, -4000], size=n_requests)
+    dates = rows["date"] + pd.to_timedelta(offsets, unit="D")
+    return list(zip(rows["item_id"], rows["store_id"], dates))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark FeatureIndex vs escaneo con máscaras")
+    parser.add_argument("--n-series", type=int, default=3049, help="Series (M5 completo: 30490)")
+    parser.add_argument("--n-days", type=int, default=1941, help="Días por serie (M5: 1941)")
+    parser.add_argument("--n-requests", type=int, default=1000, help="Requests con índice")
+    parser.add_argument("--n-scan-requests", type=int, default=20, help="Requests con escaneo")
+    args = parser.parse_args()
+
+    print(f"Generando tabla sintética: {args.n_series:,} series x {args.n_days:,} días")
+    df = make_m5_like_table(args.n_series, args.n_days)
+    print(f"  Filas: {len(df):,}")
+
+    start = time.perf_counter()
+    index = FeatureIndex.from_frame(df)
+    build_s = time.perf_counter() - start
+    print(f"  Construcción del índice: {build_s:.2f}s ({index.n_series:,} series)")
+
+    requests = make_requests(df, args.n_requests)
+
+    # Paridad sobre las requests escaneadas
+    scan_requests = requests[: args.n_scan_requests]
+    for item_id, store_id, date in scan_requests:
+        position, match_type = index.lookup(item_id, store_id, date)
+        ref_row, ref_type = scan_lookup(df, item_id, store_id, date)
+        assert match_type == ref_type, (item_id, store_id, date)
+        assert df.index[position] == ref_row.name, (item_id, store_id, date)
+
+    latencies = []
+    for item_id, store_id, date in scan_requests:
+        t0 = time.perf_counter()
+        scan_lookup(df, item_id, store_id, date)
+        latencies.append(time.perf_counter() - t0)
+    scan_ms = np.array(latencies) * 1000
+
+    latencies = []
+    for item_id, store_id, date in requests:
+        t0 = time.perf_counter()
+        position, _ = index.lookup(item_id, store_id, date)
+        df.iloc[position]
+        latencies.append(time.perf_counter() - t0)
+    index_ms = np.array(latencies) * 1000
+
+    print("\n" + "=" * 70)
+    print(f"{'Ruta':<22}{'requests':>10}{'p50 (ms)':>12}{'p99 (ms)':>12}")
+    print("-" * 70)
+    print(f"{'Máscaras (original)':<22}{len(scan_ms):>10}"
+          f"{np.percentile(scan_ms, 50):>12.3f}{np.percentile(scan_ms, 99):>12.3f}")
+    print(f"{'FeatureIndex':<22}{len(index_ms):>10}"
+          f"{np.percentile(index_ms, 50):>12.3f}{np.percentile(index_ms, 99):>12.3f}")
+    print("-" * 70)
+    print(f"Speedup p50: {np.percentile(scan_ms, 50) / np.percentile(index_ms, 50):,.0f}x")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+============================================================================
+benchmark_feature_store.py - Parquet monolítico vs feature store particionado
+============================================================================
+Escribe una base de features sintética con la forma de M5 como:
+- sales_with_features.parquet (un solo archivo, lectura completa + filtro en pandas)
+- feature store particionado store_id / year_month (src/features/feature_store.py)
+
+y compara el tiempo y las filas leídas para los cortes típicos de la API
+(una tienda, últimos 28 días), monitoring (periodo de referencia) y el
+dashboard (id, sales de validación).
+
+Uso:
+    python scripts/benchmark_feature_store.py --n-items 3049 --n-stores 10 --n-days 730
+
+Autor: Ing. Daniel Varela Perez
+Email: bedaniele0@gmail.com
+Metodología: DVP-PRO
+============================================================================
+"""
+
+import argparse
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.features.feature_store import read_feature_store, write_feature_store  # noqa: E402
+
+
+def make_feature_base(n_items: int, n_stores: int, n_days: int, n_features: int, seed: int = 42) -> pd.DataFrame:
+    """Base ordenada por (id, date) con ``n_features`` columnas float64."""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2014-06-01", periods=n_days, freq="D")
+    items = np.array([f"FOODS_3_{i:04d}" for i in range(n_items)], dtype=object)
+    stores = np.array([f"ST_{s}" for s in range(n_stores)], dtype=object)
+
+    n_series = n_items * n_stores
+    item_idx = np.repeat(np.arange(n_items), n_stores)
+    store_idx = np.tile(np.arange(n_stores), n_items)
+    df = pd.DataFrame(
+        {
+            "id": np.repeat(items[item_idx] + "_" + stores[store_idx], n_days),
+            "item_id": np.repeat(items[item_idx], n_days),
+            "store_id": np.repeat(stores[store_idx], n_days),
+            "date": np.tile(dates.values, n_series),
+            "sales": rng.poisson(1.5, n_series * n_days),
+        }
+    )
+    for j in range(n_features):
+        df[f"feature_{j:02d}"] = rng.random(len(df))
+    return df
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark feature store particionado")
+    parser.add_argument("--n-items", type=int, default=300)
+    parser.add_argument("--n-stores", type=int, default=10)
+    parser.add_argument("--n-days", type=int, default=730)
+    parser.add_argument("--n-features", type=int, default=20)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    df = make_feature_base(args.n_items, args.n_stores, args.n_days, args.n_features)
+    last = df["date"].max()
+    print(f"Base sintética: {len(df):,} filas x {df.shape[1]} columnas")
+
+    slices = {
+        "API: 1 tienda, 28 días": dict(stores=["ST_0"], start_date=last - pd.Timedelta(days=27)),
+        "Monitoring: 90 días": dict(start_date=last - pd.Timedelta(days=117), end_date=last - pd.Timedelta(days=28)),
+        "Dashboard: id, sales": dict(columns=["id", "sales"], start_date=last - pd.Timedelta(days=27)),
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        monolithic = Path(tmp) / "sales_with_features.parquet"
+        df.to_parquet(monolithic, index=False)
+        store = write_feature_store(df, Path(tmp) / "feature_store")
+        del df
+
+        print("\n" + "=" * 78)
+        print(f"{'Corte':<26}{'filas':>12}{'monolítico (s)':>18}{'store (s)':>12}{'speedup':>10}")
+        print("-" * 78)
+        for name, kwargs in slices.items():
+            def full_read():
+                base = pd.read_parquet(monolithic, columns=kwargs.get("columns") and kwargs["columns"] + ["store_id", "date"])
+                mask = pd.Series(True, index=base.index)
+                if "stores" in kwargs:
+                    mask &= base["store_id"].isin(kwargs["stores"])
+                if "start_date" in kwargs:
+                    mask &= base["date"] >= kwargs["start_date"]
+                if "end_date" in kwargs:
+                    mask &= base["date"] <= kwargs["end_date"]
+                return base.loc[mask]
+
+            expected, mono_s = timed(full_read)
+            result, store_s = timed(lambda: read_feature_store(store, **kwargs))
+            assert len(result) == len(expected)
+            print(f"{name:<26}{len(result):>12,}{mono_s:>18.2f}{store_s:>12.2f}{mono_s / store_s:>9.1f}x")
+        print("=" * 78)
+
+
+if __name__ == "__main__":
+    main()
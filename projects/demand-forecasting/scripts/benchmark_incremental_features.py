@@ -0,0 +1,128 @@
+"""
+============================================================================
+benchmark_incremental_features.py - Features incrementales vs reconstrucción
+============================================================================
+Simula la llegada de días nuevos de ventas:
+- Reconstrucción completa: FeatureEngineeringPipeline.run sobre toda la historia
+- Incremental: IncrementalFeatureBuilder.update_dataset (cola de historia por
+  serie leída del dataset parquet + append de un archivo nuevo)
+
+y verifica con check_incremental_consistency que ambas salidas coinciden en
+las fechas nuevas.
+
+Uso:
+    python scripts/benchmark_incremental_features.py --n-series 3049 --n-days 730 --new-days 1
+
+Autor: Ing. Daniel Varela Perez
+Email: bedaniele0@gmail.com
+Metodología: DVP-PRO
+============================================================================
+"""
+
+import argparse
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.features.build_features import FeatureEngineeringPipeline  # noqa: E402
+from src.features.incremental import (  # noqa: E402
+    IncrementalFeatureBuilder,
+    append_to_dataset,
+    check_incremental_consistency,
+)
+
+
+def make_m5_like_inputs(n_series: int, n_days: int, seed: int = 42) -> tuple:
+    """Ventas (id, item_id, store_id, cat_id, wm_yr_wk, date, sales), calendario y precios."""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2011-01-29", periods=n_days, freq="D")
+    items = np.array([f"FOODS_3_{i:05d}" for i in range(n_series)], dtype=object)
+    weeks = 11101 + np.arange(n_days) // 7
+
+    sales = pd.DataFrame(
+        {
+            "id": np.repeat(np.array([f"{item}_CA_1_validation" for item in items], dtype=object), n_days),
+            "item_id": np.repeat(items, n_days),
+            "store_id": "CA_1",
+            "cat_id": np.repeat(rng.choice(["FOODS", "HOBBIES", "HOUSEHOLD"], n_series), n_days),
+            "wm_yr_wk": np.tile(weeks, n_series),
+            "date": np.tile(dates.values, n_series),
+            "sales": rng.poisson(rng.gamma(0.8, 2.0, n_series).repeat(n_days)),
+        }
+    )
+
+    prices = sales[["store_id", "item_id", "wm_yr_wk"]].drop_duplicates().reset_index(drop=True)
+    prices["sell_price"] = np.round(rng.uniform(0.5, 20.0, len(prices)), 2)
+
+    calendar = pd.DataFrame(
+        {
+            "date": dates,
+            "event_name_1": None,
+            "event_type_1": None,
+            "event_name_2": None,
+            "event_type_2": None,
+            "snap_CA": rng.integers(0, 2, n_days),
+            "snap_TX": rng.integers(0, 2, n_days),
+            "snap_WI": rng.integers(0, 2, n_days),
+        }
+    )
+    return sales, calendar, prices
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark features incrementales vs reconstrucción")
+    parser.add_argument("--n-series", type=int, default=3049, help="Series (M5 completo: 30490)")
+    parser.add_argument("--n-days", type=int, default=730, help="Días de historia")
+    parser.add_argument("--new-days", type=int, default=1, help="Días nuevos a añadir")
+    parser.add_argument("--config", type=str, default=str(PROJECT_ROOT / "config" / "config.yaml"))
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    print(f"Generando ventas sintéticas: {args.n_series:,} series x {args.n_days:,} días")
+    sales, calendar, prices = make_m5_like_inputs(args.n_series, args.n_days)
+    cutoff = sales["date"].max() - pd.Timedelta(days=args.new_days)
+    history_sales = sales[sales["date"] <= cutoff]
+    new_sales = sales[sales["date"] > cutoff].reset_index(drop=True)
+
+    pipeline = FeatureEngineeringPipeline(config_path=args.config)
+    builder = IncrementalFeatureBuilder(pipeline)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset = Path(tmp) / "sales_with_features"
+        append_to_dataset(pipeline.run(history_sales, calendar, prices), dataset)
+
+        start = time.perf_counter()
+        incremental = builder.update_dataset(dataset, new_sales, calendar, prices)
+        incremental_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    full = pipeline.run(sales, calendar, prices)
+    full_s = time.perf_counter() - start
+
+    report = check_incremental_consistency(incremental, full)
+
+    print("\n" + "=" * 70)
+    print(f"{'Ruta':<28}{'filas calculadas':>18}{'segundos':>12}")
+    print("-" * 70)
+    print(f"{'reconstrucción completa':<28}{len(full):>18,}{full_s:>12.1f}")
+    print(f"{'incremental (+ append)':<28}{len(incremental):>18,}{incremental_s:>12.1f}")
+    print("-" * 70)
+    print(f"Lookback por serie: {builder.lookback} filas")
+    print(f"Speedup: {full_s / incremental_s:,.1f}x")
+    print(f"Consistente con la reconstrucción: {report['consistent']}")
+    if not report["consistent"]:
+        print(f"  Diferencias: {report['mismatches']}")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
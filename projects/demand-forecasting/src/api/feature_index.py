@@ -0,0 +1,173 @@
+"""
+Índice (item_id, store_id, date) para la base de features de la API
+
+Responsable de:
+- Construir, una sola vez al cargar la base, rangos contiguos por (item, tienda)
+  con las fechas ordenadas en arrays de NumPy
+- Resolver cada request en O(log n) con ``searchsorted`` aplicando las mismas
+  reglas de fallback que el escaneo original (exacta -> anterior -> más antigua)
+"""
+
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Tipos de coincidencia devueltos por las búsquedas
+MATCH_EXACT = "exact"
+MATCH_PREVIOUS = "previous"
+MATCH_EARLIEST = "earliest"
+
+# NaT se ordena al final de cada serie (igual que sort_values con na_position="last")
+# y nunca cumple "== fecha" ni "< fecha".
+_NAT_SENTINEL = np.iinfo(np.int64).max
+
+
+def _dates_to_int64(dates: pd.Series) -> np.ndarray:
+    """Convierte una columna de fechas a int64 (ns) con NaT al final del orden."""
+    values = pd.to_datetime(dates).to_numpy(dtype="datetime64[ns]").view(np.int64).copy()
+    values[pd.isna(dates).to_numpy()] = _NAT_SENTINEL
+    return values
+
+
+class FeatureIndex:
+    """
+    Índice de solo lectura sobre ``feature_df``.
+
+    Las filas se reordenan (sort estable) por (item, tienda, fecha); cada par
+    (item, tienda) ocupa un rango contiguo ``[start, stop)`` de ``positions``
+    y ``dates``. ``positions`` guarda la posición original (``iloc``) de cada fila.
+
+    Ante fechas duplicadas dentro de una serie se conserva el orden original,
+    de modo que "exacta" y "anterior" devuelven la última fila del empate y
+    "más antigua" la primera.
+    """
+
+    def __init__(
+        self,
+        positions: np.ndarray,
+        dates: np.ndarray,
+        ranges: Dict[Tuple[str, str], Tuple[int, int]],
+    ) -> None:
+        self.positions = positions
+        self.dates = dates
+        self.ranges = ranges
+
+    @classmethod
+    def from_frame(
+        cls,
+        df: pd.DataFrame,
+        item_col: str = "item_id",
+        store_col: str = "store_id",
+        date_col: str = "date",
+    ) -> "FeatureIndex":
+        """
+        Construye el índice a partir de la base de features.
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            Base de features con columnas de item, tienda y fecha
+
+        Returns
+        -------
+        FeatureIndex
+            Índice listo para búsquedas
+        """
+        item_codes, item_uniques = pd.factorize(df[item_col], sort=False)
+        store_codes, store_uniques = pd.factorize(df[store_col], sort=False)
+        dates = _dates_to_int64(df[date_col])
+
+        # np.lexsort es estable: los empates conservan el orden original
+        order = np.lexsort((dates, store_codes, item_codes))
+        sorted_items = item_codes[order]
+        sorted_stores = store_codes[order]
+
+        n = len(order)
+        if n == 0:
+            return cls(order.astype(np.int64), dates[order], {})
+
+        change = np.flatnonzero(
+            (sorted_items[1:] != sorted_items[:-1]) | (sorted_stores[1:] != sorted_stores[:-1])
+        ) + 1
+        starts = np.concatenate(([0], change))
+        stops = np.concatenate((change, [n]))
+
+        ranges: Dict[Tuple[str, str], Tuple[int, int]] = {}
+        for start, stop in zip(starts.tolist(), stops.tolist()):
+            item_code = sorted_items[start]
+            store_code = sorted_stores[start]
+            # Filas con item o tienda nulos no son alcanzables por "==" en el escaneo
+            if item_code < 0 or store_code < 0:
+                continue
+            ranges[(item_uniques[item_code], store_uniques[store_code])] = (start, stop)
+
+        logger.info("Feature index built: rows=%d, series=%d", n, len(ranges))
+        return cls(order.astype(np.int64), dates[order], ranges)
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    @property
+    def n_series(self) -> int:
+        return len(self.ranges)
+
+    def lookup(self, item_id: str, store_id: str, date: Any) -> Optional[Tuple[int, str]]:
+        """
+        Resuelve la fila para un item/tienda/fecha.
+
+        Returns
+        -------
+        Optional[Tuple[int, str]]
+            (posición ``iloc`` en ``feature_df``, tipo de coincidencia) o ``None``
+            si no hay datos para ese item/tienda.
+        """
+        bounds = self.ranges.get((item_id, store_id))
+        if bounds is None:
+            return None
+        start, stop = bounds
+
+        target = pd.Timestamp(date).value
+        series_dates = self.dates[start:stop]
+
+        # Última fila con fecha <= target
+        right = int(np.searchsorted(series_dates, target, side="right")) - 1
+        if right >= 0 and series_dates[right] == target:
+            return int(self.positions[start + right]), MATCH_EXACT
+
+        # Última fila con fecha < target
+        left = int(np.searchsorted(series_dates, target, side="left")) - 1
+        if left >= 0:
+            return int(self.positions[start + left]), MATCH_PREVIOUS
+
+        return int(self.positions[start]), MATCH_EARLIEST
+
+
+def scan_lookup(
+    df: pd.DataFrame,
+    item_id: str,
+    store_id: str,
+    date: Any,
+) -> Optional[Tuple[pd.Series, str]]:
+    """
+    Implementación de referencia basada en máscaras booleanas (ruta previa al índice).
+
+    Se conserva para pruebas de paridad y para ``scripts/benchmark_feature_lookup.py``.
+    """
+    date_parsed = pd.to_datetime(date)
+    subset = df[(df["item_id"] == item_id) & (df["store_id"] == store_id)]
+    if subset.empty:
+        return None
+
+    exact_match = subset[subset["date"] == date_parsed]
+    if not exact_match.empty:
+        return exact_match.sort_values("date", kind="stable").iloc[-1], MATCH_EXACT
+
+    before = subset[subset["date"] < date_parsed]
+    if not before.empty:
+        return before.sort_values("date", kind="stable").iloc[-1], MATCH_PREVIOUS
+
+    return subset.sort_values("date", kind="stable").iloc[0], MATCH_EARLIEST
@@ -0,0 +1,354 @@
+"""
+Matriz densa de features para la API de Walmart Demand Forecasting
+
+Responsable de:
+- Materializar una sola vez las columnas ``feature_names`` de la base de features
+  en una matriz float32 C-contigua (una fila por fila de ``feature_df``)
+- Persistirla opcionalmente como sidecar ``.npy`` y abrirla con memory-map, de modo
+  que varios workers de uvicorn compartan una sola copia en page cache
+- Verificar contra los umbrales del booster qué columnas float64 admiten float32;
+  si alguna feature cambiaría de lado en un split, la matriz se construye en float64
+"""
+
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+MATRIX_DTYPE = np.float32
+
+# Modos soportados por ModelService (variable de entorno FEATURE_MATRIX)
+MODE_OFF = "off"
+MODE_MEMORY = "memory"
+MODE_MMAP = "mmap"
+MATRIX_MODES = (MODE_OFF, MODE_MEMORY, MODE_MMAP)
+
+# LightGBM trata |x| <= kZeroThreshold como cero con missing_type="Zero"
+_LGB_ZERO_THRESHOLD = 1e-35
+
+
+def build_feature_matrix(
+    df: pd.DataFrame,
+    feature_names: List[str],
+    dtype: Any = MATRIX_DTYPE,
+) -> np.ndarray:
+    """
+    Construye la matriz (n_filas x n_features) en el orden de ``feature_names``.
+
+    Los valores no convertibles a número se vuelven NaN, igual que
+    ``pd.to_numeric(errors="coerce")`` en la ruta por request.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Base de features
+    feature_names : List[str]
+        Columnas en el orden esperado por el modelo
+    dtype : Any
+        float32 por defecto; float64 si el cast cambiaría predicciones
+
+    Returns
+    -------
+    np.ndarray
+        Matriz C-contigua de tipo ``dtype``
+    """
+    missing = [c for c in feature_names if c not in df.columns]
+    if missing:
+        raise ValueError(
+            f"Missing features in base data (count={len(missing)}). "
+            f"First 5 missing: {missing[:5]}"
+        )
+
+    matrix = np.empty((len(df), len(feature_names)), dtype=dtype, order="C")
+    for j, col in enumerate(feature_names):
+        values = df[col]
+        if not pd.api.types.is_numeric_dtype(values):
+            values = pd.to_numeric(values, errors="coerce")
+        matrix[:, j] = values.to_numpy(dtype=np.float64, na_value=np.nan)
+    return matrix
+
+
+def sidecar_paths(source_path: Path) -> tuple:
+    """Rutas (.npy, .json) del sidecar asociado a un parquet de features."""
+    stem = source_path.stem
+    return (
+        source_path.with_name(f"{stem}.features.npy"),
+        source_path.with_name(f"{stem}.features.json"),
+    )
+
+
+def _source_signature(
+    source_path: Path,
+    feature_names: List[str],
+    n_rows: int,
+    fingerprint: Optional[str] = None,
+) -> dict:
+    stat = source_path.stat()
+    return {
+        "source": source_path.name,
+        "source_size": stat.st_size,
+        "source_mtime_ns": stat.st_mtime_ns,
+        "n_rows": n_rows,
+        "dtype": np.dtype(MATRIX_DTYPE).name,
+        "feature_names": list(feature_names),
+        "split_thresholds": fingerprint,
+    }
+
+
+def load_sidecar(
+    source_path: Path,
+    feature_names: List[str],
+    n_rows: int,
+    fingerprint: Optional[str] = None,
+) -> Optional[np.ndarray]:
+    """
+    Abre el sidecar con ``mmap_mode="r"`` si existe y corresponde al parquet actual.
+
+    El sidecar float32 solo se escribe si el cast es seguro para los umbrales
+    del booster; ``fingerprint`` (``thresholds_fingerprint``) lo ata a esos
+    umbrales, así que otro modelo lo trata como obsoleto.
+
+    Returns
+    -------
+    Optional[np.ndarray]
+        Matriz memory-mapped de solo lectura, o ``None`` si falta o está obsoleta
+    """
+    npy_path, meta_path = sidecar_paths(source_path)
+    if not npy_path.exists() or not meta_path.exists():
+        return None
+
+    try:
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+    except (OSError, ValueError) as exc:
+        logger.warning("Unreadable feature matrix metadata %s: %s", meta_path, exc)
+        return None
+
+    if meta != _source_signature(source_path, feature_names, n_rows, fingerprint):
+        logger.info("Feature matrix sidecar %s is stale; rebuilding", npy_path)
+        return None
+
+    matrix = np.load(npy_path, mmap_mode="r")
+    if matrix.shape != (n_rows, len(feature_names)):
+        logger.warning("Feature matrix sidecar %s has shape %s; rebuilding", npy_path, matrix.shape)
+        return None
+    return matrix
+
+
+def write_sidecar(
+    source_path: Path,
+    feature_names: List[str],
+    matrix: np.ndarray,
+    fingerprint: Optional[str] = None,
+) -> Path:
+    """
+    Escribe el sidecar de forma atómica (archivo temporal + ``os.replace``) para que
+    workers concurrentes nunca lean un ``.npy`` a medio escribir.
+    """
+    npy_path, meta_path = sidecar_paths(source_path)
+    suffix = f".tmp{os.getpid()}"
+
+    tmp_npy = npy_path.with_name(npy_path.name + suffix)
+    with open(tmp_npy, "wb") as f:
+        np.save(f, np.ascontiguousarray(matrix, dtype=MATRIX_DTYPE))
+    os.replace(tmp_npy, npy_path)
+
+    tmp_meta = meta_path.with_name(meta_path.name + suffix)
+    with open(tmp_meta, "w") as f:
+        json.dump(_source_signature(source_path, feature_names, len(matrix), fingerprint), f, indent=2)
+    os.replace(tmp_meta, meta_path)
+
+    logger.info("Feature matrix sidecar written: %s", npy_path)
+    return npy_path
+
+
+def load_or_build_feature_matrix(
+    df: pd.DataFrame,
+    feature_names: List[str],
+    source_path: Optional[Path] = None,
+    mode: str = MODE_MEMORY,
+    thresholds: Optional[Dict[str, np.ndarray]] = None,
+) -> np.ndarray:
+    """
+    Devuelve la matriz de features según el modo.
+
+    - ``memory``: se construye en memoria del proceso
+    - ``mmap``: se reutiliza (o se crea) el sidecar ``.npy`` junto al parquet y se
+      abre con memory-map de solo lectura
+
+    Antes de construirla se verifica el cast a float32 contra ``thresholds``
+    (``booster_split_thresholds``). Si alguna columna cambiaría de lado en un
+    split, la matriz se construye en float64 en memoria y no se escribe sidecar.
+    """
+    if mode not in MATRIX_MODES or mode == MODE_OFF:
+        raise ValueError(f"Unsupported feature matrix mode: {mode}")
+
+    fingerprint = thresholds_fingerprint(thresholds)
+    if mode == MODE_MMAP and source_path is not None:
+        matrix = load_sidecar(source_path, feature_names, len(df), fingerprint)
+        if matrix is not None:
+            logger.info("Feature matrix memory-mapped from sidecar (shape=%s)", matrix.shape)
+            return matrix
+
+    unsafe = float32_unsafe_columns(df, feature_names, thresholds)
+    if unsafe:
+        logger.warning(
+            "float32 would change booster splits for %d feature(s) (first 5: %s); "
+            "building a float64 in-memory feature matrix",
+            len(unsafe),
+            unsafe[:5],
+        )
+        return build_feature_matrix(df, feature_names, dtype=np.float64)
+
+    if mode == MODE_MMAP and source_path is not None:
+        matrix = build_feature_matrix(df, feature_names)
+        try:
+            write_sidecar(source_path, feature_names, matrix, fingerprint)
+        except OSError as exc:
+            # Ej. volumen de datos de solo lectura: seguimos con la matriz en memoria
+            logger.warning("Feature matrix sidecar not written (%s); using in-memory matrix", exc)
+            return matrix
+
+        mapped = load_sidecar(source_path, feature_names, len(df), fingerprint)
+        if mapped is not None:
+            return mapped
+        logger.warning("Feature matrix sidecar could not be reopened; using in-memory matrix")
+        return matrix
+
+    matrix = build_feature_matrix(df, feature_names)
+    logger.info(
+        "Feature matrix materialized in memory (shape=%s, %.1f MB)",
+        matrix.shape,
+        matrix.nbytes / 1024**2,
+    )
+    return matrix
+
+
+def booster_split_thresholds(model: Any) -> Optional[Dict[str, np.ndarray]]:
+    """
+    Umbrales numéricos de split por feature (ordenados) a partir de ``dump_model``.
+
+    Las features con splits categóricos se devuelven con ``None`` como marcador
+    de "no verificable". Devuelve ``None`` si el modelo no expone un booster.
+    """
+    booster = getattr(model, "booster_", None)
+    if booster is None:
+        return None
+
+    dump = booster.dump_model()
+    names = dump["feature_names"]
+    thresholds: Dict[str, list] = {name: [] for name in names}
+    categorical = set()
+
+    stack = [tree["tree_structure"] for tree in dump["tree_info"]]
+    while stack:
+        node = stack.pop()
+        if "split_feature" not in node:
+            continue
+        name = names[node["split_feature"]]
+        if node.get("decision_type") == "<=":
+            thresholds[name].append(float(node["threshold"]))
+        else:
+            categorical.add(name)
+        stack.append(node["left_child"])
+        stack.append(node["right_child"])
+
+    result: Dict[str, np.ndarray] = {}
+    for name, values in thresholds.items():
+        if name in categorical:
+            result[name] = None
+            continue
+        values.extend([-_LGB_ZERO_THRESHOLD, _LGB_ZERO_THRESHOLD])
+        result[name] = np.unique(np.asarray(values, dtype=np.float64))
+    return result
+
+
+def thresholds_fingerprint(thresholds: Optional[Dict[str, np.ndarray]]) -> Optional[str]:
+    """Hash de los umbrales de split (None sin booster) para validar el sidecar."""
+    if thresholds is None:
+        return None
+    digest = hashlib.sha256()
+    for name in sorted(thresholds):
+        values = thresholds[name]
+        digest.update(name.encode())
+        digest.update(b"categorical" if values is None else np.ascontiguousarray(values).tobytes())
+    return digest.hexdigest()
+
+
+def _float32_flips(x: np.ndarray, col_thresholds: Optional[np.ndarray]) -> bool:
+    """
+    True si el cast de ``x`` a float32 puede cambiar una decisión ``v <= t``.
+
+    Para cada valor ``x`` y su versión ``y = float32(x)``, la comparación
+    sólo cambia si existe un umbral ``t`` en ``[min(x, y), max(x, y))``.
+    Sin umbrales verificables, cualquier valor que cambie cuenta como riesgo.
+    """
+    with np.errstate(over="ignore"):
+        y = x.astype(np.float32).astype(np.float64)
+    changed = (x != y) & ~np.isnan(x)
+    if not changed.any():
+        return False
+    if col_thresholds is None:
+        return True
+
+    lo = np.minimum(x[changed], y[changed])
+    hi = np.maximum(x[changed], y[changed])
+    flips = np.searchsorted(col_thresholds, hi, side="left") > np.searchsorted(
+        col_thresholds, lo, side="left"
+    )
+    return bool(flips.any())
+
+
+def float32_safe_columns(
+    df: pd.DataFrame,
+    thresholds: Dict[str, np.ndarray],
+) -> List[str]:
+    """
+    Columnas float64 cuyo cast a float32 no cambia ninguna decisión del booster.
+
+    Basta revisar los valores que cambian con el cast (los enteros y la mayoría
+    de conteos de M5 son exactos en float32).
+    """
+    safe = []
+    for col, col_thresholds in thresholds.items():
+        if col not in df.columns or col_thresholds is None:
+            continue
+        if df[col].dtype != np.float64:
+            continue
+        if not _float32_flips(df[col].to_numpy(), col_thresholds):
+            safe.append(col)
+    return safe
+
+
+def float32_unsafe_columns(
+    df: pd.DataFrame,
+    feature_names: Sequence[str],
+    thresholds: Optional[Dict[str, np.ndarray]],
+) -> List[str]:
+    """
+    Features de ``df`` que no admiten la matriz float32.
+
+    Se revisan los mismos valores que ``build_feature_matrix`` (con coerción
+    numérica). Sin booster (``thresholds`` None) o con splits categóricos, una
+    columna es insegura si el cast cambia algún valor.
+    """
+    unsafe = []
+    for col in feature_names:
+        if col not in df.columns:
+            continue
+        values = df[col]
+        if not pd.api.types.is_numeric_dtype(values):
+            values = pd.to_numeric(values, errors="coerce")
+        if values.dtype == np.float32:
+            continue
+        col_thresholds = thresholds.get(col) if thresholds is not None else None
+        if _float32_flips(values.to_numpy(dtype=np.float64, na_value=np.nan), col_thresholds):
+            unsafe.append(col)
+    return unsafe
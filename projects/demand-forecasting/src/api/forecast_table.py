@@ -0,0 +1,246 @@
+"""
+Tabla de pronósticos precalculados para la API
+
+Responsable de:
+- Job batch: pronosticar los próximos días de todas las series de la base de
+  features con ``ModelService.forecast_horizon`` (una pasada vectorizada por
+  tienda) y escribir un parquet ordenado por (store_id, item_id, date)
+- Servir desde esa tabla: rangos contiguos por (item, tienda) con fechas
+  diarias, así que cada búsqueda es un dict + un offset de días (O(1))
+- Reportar frescura de la tabla (fecha de generación, fechas cubiertas)
+
+Uso:
+    python -m src.api.forecast_table --horizon 7
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TABLE_PATH = Path(__file__).resolve().parents[2] / "models" / "forecast_table.parquet"
+DAY_NS = pd.Timedelta(days=1).value
+INTERVAL_COLUMNS = ("lower", "median", "upper")
+METADATA_KEY = b"forecast_table"
+
+
+class ForecastTable:
+    """
+    Pronósticos precalculados de solo lectura.
+
+    Cada (item, tienda) ocupa un rango contiguo ``[start, stop)`` con fechas
+    consecutivas desde ``first_date``; la fila de una fecha es
+    ``start + (date - first_date) / 1 día``.
+    """
+
+    def __init__(
+        self,
+        predictions: np.ndarray,
+        intervals: Dict[str, np.ndarray],
+        ranges: Dict[Tuple[str, str], Tuple[int, int, int]],
+        metadata: Dict[str, Any],
+        dates: Tuple[Optional[pd.Timestamp], Optional[pd.Timestamp]] = (None, None),
+    ) -> None:
+        self.predictions = predictions
+        self.intervals = intervals
+        self.ranges = ranges
+        self.metadata = metadata
+        self.dates = dates
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, metadata: Optional[Dict[str, Any]] = None) -> "ForecastTable":
+        """
+        Construye la tabla desde un DataFrame (item_id, store_id, date,
+        predicted_sales[, lower, median, upper]).
+        """
+        df = df.sort_values(["store_id", "item_id", "date"], kind="stable", ignore_index=True)
+        dates = pd.to_datetime(df["date"]).to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+        ranges: Dict[Tuple[str, str], Tuple[int, int, int]] = {}
+        if len(df):
+            keys = df["store_id"].astype(str) + "\x00" + df["item_id"].astype(str)
+            change = np.flatnonzero(keys.to_numpy()[1:] != keys.to_numpy()[:-1]) + 1
+            starts = np.concatenate(([0], change))
+            stops = np.concatenate((change, [len(df)]))
+            items = df["item_id"].astype(str).to_numpy()
+            stores = df["store_id"].astype(str).to_numpy()
+            for start, stop in zip(starts.tolist(), stops.tolist()):
+                if np.any(np.diff(dates[start:stop]) != DAY_NS):
+                    raise ValueError(
+                        f"Forecast table dates must be consecutive days per series: "
+                        f"{items[start]}/{stores[start]}"
+                    )
+                ranges[(items[start], stores[start])] = (start, stop, int(dates[start]))
+
+        intervals = {
+            col: df[col].to_numpy(dtype=np.float64) for col in INTERVAL_COLUMNS if col in df.columns
+        }
+        span = (pd.Timestamp(dates.min()), pd.Timestamp(dates.max())) if len(dates) else (None, None)
+        return cls(df["predicted_sales"].to_numpy(dtype=np.float64), intervals, ranges, metadata or {}, span)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "ForecastTable":
+        """Carga una tabla escrita con ``write_forecast_table``."""
+        table = pq.read_table(path)
+        raw = (table.schema.metadata or {}).get(METADATA_KEY)
+        metadata = json.loads(raw) if raw else {}
+        return cls.from_frame(table.to_pandas(), metadata)
+
+    def __len__(self) -> int:
+        return len(self.predictions)
+
+    @property
+    def n_series(self) -> int:
+        return len(self.ranges)
+
+    def lookup(self, item_id: str, store_id: str, date: Any) -> Optional[Tuple[float, Optional[Dict[str, float]]]]:
+        """
+        Pronóstico precalculado de un item/tienda/fecha.
+
+        Returns
+        -------
+        Optional[Tuple[float, Optional[Dict[str, float]]]]
+            (predicción, intervalo o None), o None si la fecha no está en la tabla
+        """
+        bounds = self.ranges.get((item_id, store_id))
+        if bounds is None:
+            return None
+        start, stop, first_date = bounds
+        offset, remainder = divmod(pd.Timestamp(date).value - first_date, DAY_NS)
+        if remainder or offset < 0 or start + offset >= stop:
+            return None
+        row = start + offset
+        interval = {key: float(values[row]) for key, values in self.intervals.items()} or None
+        return float(self.predictions[row]), interval
+
+    def report(self) -> Dict[str, Any]:
+        """Tamaño, fechas cubiertas y antigüedad de la tabla."""
+        generated_at = self.metadata.get("generated_at")
+        age_hours = None
+        if generated_at:
+            age_hours = round((datetime.utcnow() - datetime.fromisoformat(generated_at)).total_seconds() / 3600, 2)
+        return {
+            "rows": len(self),
+            "series": self.n_series,
+            "first_date": str(self.dates[0].date()) if self.dates[0] is not None else None,
+            "last_date": str(self.dates[1].date()) if self.dates[1] is not None else None,
+            "generated_at": generated_at,
+            "age_hours": age_hours,
+            "horizon": self.metadata.get("horizon"),
+            "model_path": self.metadata.get("model_path"),
+            "model_version": self.metadata.get("model_version"),
+        }
+
+
+def write_forecast_table(df: pd.DataFrame, path: Union[str, Path], metadata: Dict[str, Any]) -> Path:
+    """Escribe el parquet ordenado (tmp + rename para que la API nunca lea a medias)."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    df = df.sort_values(["store_id", "item_id", "date"], kind="stable", ignore_index=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), METADATA_KEY: json.dumps(metadata)})
+    tmp = path.with_name(f"_{path.name}")
+    pq.write_table(table, tmp)
+    os.replace(tmp, path)
+    return path
+
+
+def build_forecast_table(
+    svc: Any,
+    horizon: int = 7,
+    stores: Optional[List[str]] = None,
+) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Pronostica ``horizon`` días después de la última fecha de cada serie.
+
+    Parameters
+    ----------
+    svc : ModelService
+        Servicio con modelo y base de features cargados
+    horizon : int
+        Días por serie (1 = mañana, 7 = próxima semana)
+    stores : List[str], optional
+        Tiendas a incluir (default: todas las de la base)
+
+    Returns
+    -------
+    Tuple[pd.DataFrame, Dict[str, Any]]
+        Tabla (item_id, store_id, date, predicted_sales[, intervalo]) y metadata
+    """
+    start = time.time()
+    if stores is None:
+        stores = sorted({store for _, store in svc.feature_index.ranges})
+
+    frames = []
+    n_errors = 0
+    for store_id in stores:
+        result = svc.forecast_horizon(store_id=store_id, horizon=horizon)
+        n_errors += len(result["errors"])
+        rows = [
+            {
+                "item_id": forecast["item_id"],
+                "store_id": store_id,
+                "date": pd.Timestamp(point["date"]),
+                "predicted_sales": point["predicted_sales"],
+                **(point["prediction_interval"] or {}),
+            }
+            for forecast in result["forecasts"]
+            for point in forecast["predictions"]
+        ]
+        frames.append(pd.DataFrame(rows))
+        logger.info("Forecast table: store=%s, series=%d", store_id, len(result["forecasts"]))
+
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(
+        columns=["item_id", "store_id", "date", "predicted_sales"]
+    )
+    metadata = {
+        "generated_at": datetime.utcnow().isoformat(),
+        "horizon": horizon,
+        "model_path": str(svc.model_path),
+        "model_version": svc.artifact_version,
+        "stores": stores,
+        "errors": n_errors,
+        "seconds": round(time.time() - start, 2),
+    }
+    return df, metadata
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Precalcular la tabla de pronósticos de la API")
+    parser.add_argument("--horizon", type=int, default=7, help="Días por serie (default: 7)")
+    parser.add_argument("--stores", nargs="+", default=None, help="Tiendas (default: todas)")
+    parser.add_argument(
+        "--output",
+        default=os.getenv("FORECAST_TABLE_PATH", str(DEFAULT_TABLE_PATH)),
+        help="Parquet de salida (default: FORECAST_TABLE_PATH o models/forecast_table.parquet)",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    from .model_service import get_model_service
+
+    svc = get_model_service()
+    df, metadata = build_forecast_table(svc, horizon=args.horizon, stores=args.stores)
+    path = write_forecast_table(df, args.output, metadata)
+    logger.info(
+        "Forecast table written: %s (rows=%d, horizon=%d, %.1fs)",
+        path,
+        len(df),
+        args.horizon,
+        metadata["seconds"],
+    )
+
+
+if __name__ == "__main__":
+    main()
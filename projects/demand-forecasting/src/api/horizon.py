@@ -0,0 +1,216 @@
+"""
+Estado recursivo para pronósticos multi-horizonte de la API
+
+Responsable de:
+- Identificar en ``feature_names`` las features que dependen de la historia de
+  ventas (``sales_lag_*`` de lag_features.py y ``sales_rolling_*`` de
+  rolling_features.py) y la historia que necesitan
+- Mantener por serie las últimas ventas (reales y luego pronosticadas) en una
+  matriz (n_series x lookback) y recalcular esas features para todas las
+  series del request con unas pocas reducciones de NumPy por paso
+- Recalcular las features de calendario de cada fecha pronosticada con
+  ``create_calendar_features``
+
+Convención: en el día pronosticado ``d`` la venta de ``d`` no se conoce, así que
+las features rolling usan la ventana que termina en ``d - 1`` (la última venta
+conocida o pronosticada). Los lags ``sales_lag_k`` (k >= 1) son exactos.
+"""
+
+import logging
+import re
+import warnings
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from ..features.calendar_features import create_calendar_features
+
+logger = logging.getLogger(__name__)
+
+TARGET_COLUMN = "sales"
+
+# Estadísticas rolling soportadas (mismos nombres que rolling_features.py)
+_ROLLING_PATTERN = re.compile(
+    r"^(?P<target>\w+?)_rolling_(?P<stat>mean|sum|std|var|min|max|median|q\d+|cv|trend)_(?P<window>\d+)$"
+)
+_LAG_PATTERN = re.compile(r"^(?P<target>\w+?)_lag_(?P<lag>\d+)$")
+
+# Suavizado de sales_rolling_cv_* en create_rolling_features_advanced
+CV_EPSILON = 1e-6
+
+
+class HistoryFeature(NamedTuple):
+    """Feature derivada de la historia de ventas: columna en ``feature_names``."""
+
+    column: int
+    name: str
+    stat: str  # 'lag' o estadística rolling
+    window: int
+    quantile: Optional[float] = None
+
+
+def history_features(
+    feature_names: Sequence[str],
+    target_col: str = TARGET_COLUMN,
+) -> List[HistoryFeature]:
+    """
+    Features de ``feature_names`` que se recalculan en cada paso recursivo.
+
+    Parameters
+    ----------
+    feature_names : Sequence[str]
+        Features del modelo
+    target_col : str
+        Columna objetivo de los lags/rolling (default: 'sales')
+
+    Returns
+    -------
+    List[HistoryFeature]
+        Lags y estadísticas rolling reconocidas, con su posición en ``feature_names``
+    """
+    specs: List[HistoryFeature] = []
+    for column, name in enumerate(feature_names):
+        lag = _LAG_PATTERN.match(name)
+        if lag and lag.group("target") == target_col:
+            specs.append(HistoryFeature(column, name, "lag", int(lag.group("lag"))))
+            continue
+        rolling = _ROLLING_PATTERN.match(name)
+        if rolling and rolling.group("target") == target_col:
+            stat = rolling.group("stat")
+            quantile = None
+            if stat.startswith("q"):
+                stat, quantile = "quantile", int(stat[1:]) / 100
+            specs.append(HistoryFeature(column, name, stat, int(rolling.group("window")), quantile))
+    return specs
+
+
+def required_history(specs: Sequence[HistoryFeature]) -> int:
+    """
+    Días de historia por serie: lag k necesita k días, rolling w necesita w y
+    el trend (``diff(w)`` sobre la media de w días) necesita 2w.
+    """
+    needed = [1]
+    for spec in specs:
+        needed.append(2 * spec.window if spec.stat == "trend" else spec.window)
+    return max(needed)
+
+
+def _sorted_quantile(sorted_window: np.ndarray, counts: np.ndarray, quantile: float) -> np.ndarray:
+    """
+    Cuantil por fila (interpolación lineal, como ``rolling().quantile``) sobre
+    filas ya ordenadas con los NaN al final. ``np.nanquantile`` con NaN cae a
+    un loop por fila; aquí es un ``take_along_axis``.
+    """
+    position = np.maximum(counts - 1, 0) * quantile
+    lower = np.floor(position).astype(np.int64)
+    upper = np.minimum(lower + 1, np.maximum(counts - 1, 0))
+    a = np.take_along_axis(sorted_window, lower[:, None], axis=1)[:, 0]
+    b = np.take_along_axis(sorted_window, upper[:, None], axis=1)[:, 0]
+    out = a + (b - a) * (position - lower)
+    out[counts == 0] = np.nan
+    return out
+
+
+def _window_stat(window: np.ndarray, stat: str, quantile: Optional[float]) -> np.ndarray:
+    """Estadística por fila ignorando NaN (como ``rolling(min_periods=1)``)."""
+    counts = (~np.isnan(window)).sum(axis=1)
+    if stat in ("median", "quantile"):
+        return _sorted_quantile(np.sort(window, axis=1), counts, 0.5 if stat == "median" else quantile)
+    with warnings.catch_warnings():
+        # Filas sin datos (series más cortas que la ventana) -> NaN
+        warnings.simplefilter("ignore", RuntimeWarning)
+        if stat == "mean":
+            out = np.nanmean(window, axis=1)
+        elif stat == "sum":
+            out = np.nansum(window, axis=1)
+            out[counts == 0] = np.nan
+        elif stat in ("std", "var"):
+            out = np.nanvar(window, axis=1, ddof=1)
+            out[counts < 2] = np.nan
+            if stat == "std":
+                out = np.sqrt(out)
+        elif stat == "min":
+            out = np.nanmin(window, axis=1)
+        elif stat == "max":
+            out = np.nanmax(window, axis=1)
+        else:
+            raise ValueError(f"Unsupported rolling stat: {stat}")
+    return out
+
+
+class HorizonState:
+    """
+    Últimas ventas de cada serie (n_series x lookback), la más reciente en la
+    última columna; NaN donde la serie no tiene historia.
+
+    Uso::
+
+        state = HorizonState(history, specs)
+        for step in range(steps):
+            X[:, cols] = state.features()
+            y_hat = predict(X)
+            state.push(y_hat)
+    """
+
+    def __init__(self, history: np.ndarray, specs: Sequence[HistoryFeature]) -> None:
+        self.specs = list(specs)
+        self.lookback = required_history(self.specs)
+        history = np.asarray(history, dtype=np.float64)
+        if history.shape[1] < self.lookback:
+            pad = np.full((history.shape[0], self.lookback - history.shape[1]), np.nan)
+            history = np.concatenate([pad, history], axis=1)
+        self.history = np.ascontiguousarray(history[:, -self.lookback:])
+
+    @property
+    def columns(self) -> np.ndarray:
+        """Posiciones en ``feature_names`` de las features recalculadas."""
+        return np.array([spec.column for spec in self.specs], dtype=np.int64)
+
+    def features(self) -> np.ndarray:
+        """Features de historia para el siguiente día, (n_series x len(specs))."""
+        h = self.history
+        out = np.empty((h.shape[0], len(self.specs)), dtype=np.float64)
+        cache: Dict[tuple, np.ndarray] = {}
+
+        def stat_of(window_slice: slice, stat: str, quantile: Optional[float] = None) -> np.ndarray:
+            key = (window_slice.start, window_slice.stop, stat, quantile)
+            if key not in cache:
+                if stat in ("median", "quantile"):
+                    # Un solo sort por ventana para mediana y cuantiles
+                    sorted_key = (window_slice.start, window_slice.stop, "sorted")
+                    if sorted_key not in cache:
+                        window = h[:, window_slice]
+                        cache[sorted_key] = (np.sort(window, axis=1), (~np.isnan(window)).sum(axis=1))
+                    sorted_window, counts = cache[sorted_key]
+                    cache[key] = _sorted_quantile(sorted_window, counts, 0.5 if stat == "median" else quantile)
+                else:
+                    cache[key] = _window_stat(h[:, window_slice], stat, quantile)
+            return cache[key]
+
+        for j, spec in enumerate(self.specs):
+            w = spec.window
+            if spec.stat == "lag":
+                out[:, j] = h[:, -w] if w <= h.shape[1] else np.nan
+            elif spec.stat == "cv":
+                recent = slice(-w, None)
+                out[:, j] = stat_of(recent, "std") / (stat_of(recent, "mean") + CV_EPSILON)
+            elif spec.stat == "trend":
+                out[:, j] = stat_of(slice(-w, None), "mean") - stat_of(slice(-2 * w, -w), "mean")
+            else:
+                out[:, j] = stat_of(slice(-w, None), spec.stat, spec.quantile)
+        return out
+
+    def push(self, values: np.ndarray) -> None:
+        """Agregar la venta (pronosticada) del día a cada serie."""
+        self.history = np.concatenate([self.history[:, 1:], np.asarray(values, dtype=np.float64)[:, None]], axis=1)
+
+
+def calendar_feature_table(dates: pd.DatetimeIndex, feature_names: Sequence[str]) -> pd.DataFrame:
+    """
+    Features de calendario (``create_calendar_features``) presentes en
+    ``feature_names``, una fila por fecha de ``dates``.
+    """
+    frame = create_calendar_features(pd.DataFrame({"date": dates}), include_cyclical=True, inplace=True)
+    columns = [c for c in frame.columns if c != "date" and c in set(feature_names)]
+    return frame.set_index("date")[columns].astype(np.float64)
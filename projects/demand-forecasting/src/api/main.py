@@ -5,24 +5,31 @@ Contrato alineado a DVP-PRO y a la suite de pruebas:
 - version 1.0.0
 - health con estado del modelo
 - endpoints /model/info, /model/features/importance y /predict/batch
+- /monitoring/drift/online con PSI de la ventana reciente de tráfico
+- /forecast/horizon: pronóstico recursivo de N días para items de una tienda
 """
 
 import logging
 import time
 from datetime import date as dt_date, datetime as dt_datetime
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel, Field
 
+from ..monitoring.online_drift import OnlineDriftMonitor
 from .model_service import get_model_service
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
 APP_VERSION = "1.0.0"
+MAX_HORIZON_DAYS = 90
 start_time = time.time()
 
+# Drift en línea (None si ONLINE_DRIFT_ENABLED=false)
+online_drift = OnlineDriftMonitor.from_env()
+
 app = FastAPI(
     title="Walmart Demand Forecasting API",
     version=APP_VERSION,
@@ -50,6 +57,10 @@ class PredictResponse(BaseModel):
     store_id: str
     date: dt_date
     predicted_sales: float
+    prediction_interval: Optional[Dict[str, float]] = Field(
+        None,
+        description="Intervalo P10-P90 (lower, median, upper) si hay boosters cuantílicos",
+    )
     model_version: str
     timestamp: dt_datetime
 
@@ -58,10 +69,61 @@ class BatchPredictRequest(BaseModel):
     items: List[PredictRequest] = Field(..., min_items=1)
 
 
+class BatchPredictError(BaseModel):
+    index: int
+    item_id: str
+    store_id: str
+    date: dt_date
+    detail: str
+
+
 class BatchPredictResponse(BaseModel):
     predictions: List[PredictResponse]
     total_items: int
     processing_time_ms: float
+    errors: List[BatchPredictError] = Field(default_factory=list)
+
+
+class HorizonForecastRequest(BaseModel):
+    store_id: str = Field(..., example="CA_1")
+    item_ids: Optional[List[str]] = Field(
+        None,
+        example=["FOODS_1_001", "FOODS_1_002"],
+        description="Items a pronosticar (default: todos los items de la tienda)",
+    )
+    horizon: int = Field(28, ge=1, le=MAX_HORIZON_DAYS, description="Días a pronosticar")
+    start_date: Optional[dt_date] = Field(
+        None,
+        description="Primer día del pronóstico (default: día siguiente a la última fecha de cada serie)",
+    )
+
+
+class HorizonPoint(BaseModel):
+    date: dt_date
+    predicted_sales: float
+    prediction_interval: Optional[Dict[str, float]] = None
+
+
+class HorizonSeriesForecast(BaseModel):
+    item_id: str
+    store_id: str
+    origin_date: dt_date
+    predictions: List[HorizonPoint]
+
+
+class HorizonForecastError(BaseModel):
+    item_id: str
+    detail: str
+
+
+class HorizonForecastResponse(BaseModel):
+    store_id: str
+    horizon: int
+    forecasts: List[HorizonSeriesForecast]
+    total_series: int
+    processing_time_ms: float
+    model_version: str
+    errors: List[HorizonForecastError] = Field(default_factory=list)
 
 
 class FeatureImportanceResponse(BaseModel):
@@ -85,6 +147,18 @@ def startup_event() -> None:
         logger.info("Model info: %s", info)
     except Exception as exc:  # noqa: BLE001
         logger.warning("Model could not be loaded on startup: %s", exc)
+        return
+
+    if online_drift is not None:
+        # La referencia se construye en el hilo del monitor: no retrasa el arranque
+        svc.online_drift = online_drift
+        online_drift.start(reference_factory=svc.online_drift_reference)
+
+
+@app.on_event("shutdown")
+def shutdown_event() -> None:
+    if online_drift is not None:
+        online_drift.stop()
 
 
 # ==============================
@@ -110,11 +184,17 @@ def health() -> Dict[str, Any]:
         model_info = svc.model_info()
         model_ready, detail = svc.is_ready()
         model_version = model_info.get("model_version", APP_VERSION)
+        memory = svc.memory_report()
+        forecast_table = svc.forecast_table_report()
+        prediction_cache = svc.prediction_cache_report()
     except Exception as exc:  # noqa: BLE001
         logger.warning("Health check: model not loaded (%s)", exc)
         model_ready = False
         model_version = APP_VERSION
         detail = str(exc)
+        memory = {}
+        forecast_table = {}
+        prediction_cache = {}
 
     return {
         "status": "healthy" if model_ready else "degraded",
@@ -123,6 +203,9 @@ def health() -> Dict[str, Any]:
         "uptime_seconds": round(time.time() - start_time, 2),
         "timestamp": dt_datetime.utcnow().isoformat(),
         "detail": detail if not model_ready else "ok",
+        "memory": memory,
+        "forecast_table": forecast_table,
+        "prediction_cache": prediction_cache,
     }
 
 
@@ -136,6 +219,17 @@ def model_info() -> Dict[str, Any]:
         raise HTTPException(status_code=503, detail="Model not available")
 
 
+@app.post("/model/reload")
+def reload_model() -> Dict[str, Any]:
+    """Recarga el modelo desde disco e invalida el cache de respuestas."""
+    svc = get_model_service()
+    try:
+        return svc.reload_model()
+    except Exception as exc:  # noqa: BLE001
+        logger.error("Model reload failed: %s", exc)
+        raise HTTPException(status_code=503, detail=f"Model reload failed: {exc}")
+
+
 @app.get("/model/features/importance", response_model=FeatureImportanceResponse)
 def feature_importance(top_n: int = 10) -> FeatureImportanceResponse:
     svc = get_model_service()
@@ -164,7 +258,7 @@ def predict(request: PredictRequest) -> PredictResponse:
     svc = get_model_service()
 
     try:
-        y_hat = svc.predict_from_request(
+        y_hat, interval = svc.predict_with_interval(
             item_id=request.item_id,
             store_id=request.store_id,
             date=request.date,
@@ -182,6 +276,7 @@ def predict(request: PredictRequest) -> PredictResponse:
         store_id=request.store_id,
         date=request.date,
         predicted_sales=y_hat,
+        prediction_interval=interval,
         model_version=APP_VERSION,
         timestamp=dt_datetime.utcnow(),
     )
@@ -189,34 +284,55 @@ def predict(request: PredictRequest) -> PredictResponse:
 
 @app.post("/predict/batch", response_model=BatchPredictResponse)
 def predict_batch(request: BatchPredictRequest) -> BatchPredictResponse:
-    """Predicción batch de múltiples items."""
+    """
+    Predicción batch de múltiples items.
+
+    Todas las filas se resuelven y evalúan con una sola llamada al modelo
+    (y una por booster cuantílico para los intervalos).
+    Los items que fallan se devuelven en ``errors`` sin invalidar el resto.
+    """
     svc = get_model_service()
     start = time.time()
-    predictions: List[PredictResponse] = []
 
-    for item in request.items:
-        try:
-            y_hat = svc.predict_from_request(
-                item_id=item.item_id,
-                store_id=item.store_id,
-                date=item.date,
-            )
-            predictions.append(
-                PredictResponse(
+    try:
+        results = svc.predict_batch_with_intervals(
+            [(item.item_id, item.store_id, item.date) for item in request.items]
+        )
+    except ValueError as exc:
+        logger.error("Batch prediction failed: %s", exc)
+        raise HTTPException(status_code=503, detail=str(exc))
+    except Exception as exc:  # noqa: BLE001
+        logger.exception("Batch prediction unexpected error")
+        raise HTTPException(status_code=500, detail=str(exc))
+
+    timestamp = dt_datetime.utcnow()
+    predictions: List[PredictResponse] = []
+    errors: List[BatchPredictError] = []
+
+    for idx, (item, (y_hat, interval, error)) in enumerate(zip(request.items, results)):
+        if error is not None:
+            logger.error("Batch prediction failed for %s: %s", item.item_id, error)
+            errors.append(
+                BatchPredictError(
+                    index=idx,
                     item_id=item.item_id,
                     store_id=item.store_id,
                     date=item.date,
-                    predicted_sales=y_hat,
-                    model_version=APP_VERSION,
-                    timestamp=dt_datetime.utcnow(),
+                    detail=error,
                 )
             )
-        except ValueError as exc:
-            logger.error("Batch prediction failed for %s: %s", item.item_id, exc)
-            raise HTTPException(status_code=503, detail=str(exc))
-        except Exception as exc:  # noqa: BLE001
-            logger.exception("Batch prediction unexpected error")
-            raise HTTPException(status_code=500, detail=str(exc))
+            continue
+        predictions.append(
+            PredictResponse(
+                item_id=item.item_id,
+                store_id=item.store_id,
+                date=item.date,
+                predicted_sales=y_hat,
+                prediction_interval=interval,
+                model_version=APP_VERSION,
+                timestamp=timestamp,
+            )
+        )
 
     elapsed = (time.time() - start) * 1000
 
@@ -224,9 +340,64 @@ def predict_batch(request: BatchPredictRequest) -> BatchPredictResponse:
         predictions=predictions,
         total_items=len(predictions),
         processing_time_ms=round(elapsed, 3),
+        errors=errors,
+    )
+
+
+@app.post("/forecast/horizon", response_model=HorizonForecastResponse)
+def forecast_horizon(request: HorizonForecastRequest) -> HorizonForecastResponse:
+    """
+    Pronóstico recursivo de ``horizon`` días para items de una tienda.
+
+    Cada día se predice para todas las series del request con una sola
+    llamada al modelo; lags y rolling se actualizan con las predicciones.
+    """
+    svc = get_model_service()
+    start = time.time()
+
+    try:
+        result = svc.forecast_horizon(
+            store_id=request.store_id,
+            item_ids=request.item_ids,
+            horizon=request.horizon,
+            start_date=request.start_date,
+        )
+    except ValueError as exc:
+        logger.error("Horizon forecast failed: %s", exc)
+        raise HTTPException(status_code=503, detail=str(exc))
+    except Exception as exc:  # noqa: BLE001
+        logger.exception("Horizon forecast unexpected error")
+        raise HTTPException(status_code=500, detail=str(exc))
+
+    elapsed = (time.time() - start) * 1000
+
+    return HorizonForecastResponse(
+        store_id=request.store_id,
+        horizon=request.horizon,
+        forecasts=result["forecasts"],
+        total_series=len(result["forecasts"]),
+        processing_time_ms=round(elapsed, 3),
+        model_version=APP_VERSION,
+        errors=[
+            HorizonForecastError(item_id=item_id, detail=detail)
+            for item_id, detail in result["errors"].items()
+        ],
     )
 
 
+@app.get("/monitoring/drift/online")
+def drift_online() -> Dict[str, Any]:
+    """
+    PSI de la ventana deslizante de tráfico contra la referencia congelada
+    (último recálculo del monitor en segundo plano). Cuenta toda respuesta
+    servida, también los hits del cache; las de la tabla precalculada solo
+    aportan la predicción (``n`` de las features menor que el de ``output``).
+    """
+    if online_drift is None:
+        return {"status": "disabled"}
+    return online_drift.latest
+
+
 @app.get("/info")
 def info() -> Dict[str, Any]:
     """Alias legacy del endpoint de información."""
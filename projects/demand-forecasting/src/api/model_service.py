@@ -5,58 +5,511 @@ Responsable de:
 - Cargar el modelo LightGBM entrenado
 - Cargar la tabla de features procesadas
 - Construir el vector de features correcto (93 cols) para inferencia
+- Indexar la base por (item_id, store_id, date) para búsquedas O(log n)
+- Materializar las features como matriz float32 (opcionalmente memory-mapped)
+- Cargar solo las columnas necesarias (claves + features) y reportar memoria
+- Leer solo el corte (tiendas, rango de fechas) del feature store particionado
+- Alimentar el monitor de drift en línea con las features y predicciones servidas
+- Cargar boosters cuantílicos opcionales (P10/P50/P90) y evaluarlos sobre la
+  misma matriz de features que el modelo puntual (intervalos de predicción)
+- Pronosticar N días hacia adelante de forma recursiva, actualizando lags y
+  rolling con cada predicción (ver horizon.py)
 """
 
+import hashlib
 import logging
 import os
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
-from functools import lru_cache
+from functools import lru_cache, wraps
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
 
 import joblib
 import numpy as np
 import pandas as pd
 
+from ..features.feature_store import is_feature_store, open_feature_store, read_feature_store
+from ..monitoring.online_drift import OnlineDriftMonitor, OnlineReference
+from .forecast_table import ForecastTable
+from .prediction_cache import PredictionCache
+from .feature_index import MATCH_EXACT, MATCH_PREVIOUS, FeatureIndex
+from .horizon import TARGET_COLUMN, HorizonState, calendar_feature_table, history_features, required_history
+from .feature_matrix import (
+    MATRIX_MODES,
+    MODE_MEMORY,
+    MODE_MMAP,
+    MODE_OFF,
+    booster_split_thresholds,
+    float32_safe_columns,
+    load_or_build_feature_matrix,
+    load_sidecar,
+    thresholds_fingerprint,
+)
+
 logger = logging.getLogger(__name__)
 
 PROJECT_ROOT = Path(__file__).resolve().parents[2]
 APP_VERSION = "1.0.0"
 
+# Columnas clave de la base de features (siempre se cargan)
+KEY_COLUMNS = ["item_id", "store_id", "date"]
+
+# Modos de carga de la base (variable de entorno FEATURE_LOAD_MODE)
+LOAD_FULL = "full"
+LOAD_PROJECTED = "projected"
+LOAD_MODES = (LOAD_FULL, LOAD_PROJECTED)
+
+# Pasos máximos de un pronóstico recursivo (hueco hasta start_date + horizonte)
+MAX_FORECAST_STEPS = 366
+DAY_NS = pd.Timedelta(days=1).value
+
+# Nombre de la serie de salida en el monitor de drift en línea
+PREDICTION_SERIES = "predicted_sales"
+
+# Boosters cuantílicos opcionales: models/lightgbm_quantile_<nombre>.pkl
+# (variable de entorno QUANTILE_MODELS: auto | off)
+QUANTILE_LEVELS = {"p10": 0.1, "p50": 0.5, "p90": 0.9}
+QUANTILE_INTERVAL_KEYS = {"p10": "lower", "p50": "median", "p90": "upper"}
+
+# Modo de servicio: live (modelo en cada request) | table (tabla precalculada
+# de forecast_table.py, con inferencia en vivo si la fecha no está)
+SERVING_LIVE = "live"
+SERVING_TABLE = "table"
+SERVING_MODES = (SERVING_LIVE, SERVING_TABLE)
+
+# Tipo de fila cuando el item/tienda no tiene historia (fila aleatoria)
+MATCH_FALLBACK = "fallback"
+
+
+def _feature_slice_from_env() -> Dict[str, Any]:
+    """
+    Corte del feature store a cargar en este proceso:
+    FEATURE_STORES (lista separada por comas), FEATURE_START_DATE y
+    FEATURE_END_DATE (inclusivas). Sin variables se carga todo.
+    """
+    stores = os.getenv("FEATURE_STORES", "").strip()
+    return {
+        "stores": [s.strip() for s in stores.split(",") if s.strip()] or None,
+        "start_date": os.getenv("FEATURE_START_DATE") or None,
+        "end_date": os.getenv("FEATURE_END_DATE") or None,
+    }
+
+
+def _file_digest(path: Path) -> str:
+    """SHA-256 del archivo del modelo (identifica el artefacto entre reinicios)."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _current_rss_mb() -> Optional[float]:
+    """Memoria residente actual del proceso en MB (None si no se puede medir)."""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+
+    try:
+        import resource
+        import sys
+
+        # ru_maxrss es el pico: KB en Linux, bytes en macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        divisor = 1024**2 if sys.platform == "darwin" else 1024
+        return round(peak / divisor, 1)
+    except (ImportError, OSError):
+        return None
+
+
+class _SwapLock:
+    """
+    Lock lectores/escritor para el cambio de modelo en ``reload_model``.
+
+    Las predicciones toman el lock de lectura y corren en paralelo; la recarga
+    toma el de escritura, que espera a que terminen las que están en curso y
+    bloquea las nuevas mientras se cambian los artefactos. Un escritor en
+    espera tiene prioridad sobre lectores nuevos. La lectura es reentrante
+    por hilo (un método con lock puede llamar a otro).
+    """
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+        self._local = threading.local()
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        depth = getattr(self._local, "depth", 0)
+        if depth == 0:
+            with self._cond:
+                while self._writer or self._writers_waiting:
+                    self._cond.wait()
+                self._readers += 1
+        self._local.depth = depth + 1
+        try:
+            yield
+        finally:
+            self._local.depth = depth
+            if depth == 0:
+                with self._cond:
+                    self._readers -= 1
+                    if not self._readers:
+                        self._cond.notify_all()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        with self._cond:
+            self._writers_waiting += 1
+            try:
+                while self._writer or self._readers:
+                    self._cond.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+def _reads_model(method: Callable) -> Callable:
+    """Ejecuta el método con el lock de lectura del modelo (ver ``_SwapLock``)."""
+
+    @wraps(method)
+    def wrapper(self: "ModelService", *args: Any, **kwargs: Any) -> Any:
+        with self._swap_lock.read():
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
 
 class ModelService:
-    def __init__(self, model_path: Optional[Path] = None) -> None:
+    def __init__(
+        self,
+        model_path: Optional[Path] = None,
+        feature_matrix_mode: Optional[str] = None,
+        feature_load_mode: Optional[str] = None,
+    ) -> None:
         self.project_root = PROJECT_ROOT
         self.model_path = model_path or self.project_root / "models" / "lightgbm_model.pkl"
 
-        logger.info("Loading model from %s", self.model_path)
-        self.model = joblib.load(self.model_path)
+        # off | memory | mmap (ver feature_matrix.py)
+        self.feature_matrix_mode = feature_matrix_mode or os.getenv("FEATURE_MATRIX", MODE_MEMORY)
+        if self.feature_matrix_mode not in MATRIX_MODES:
+            raise ValueError(
+                f"FEATURE_MATRIX must be one of {MATRIX_MODES}, got {self.feature_matrix_mode!r}"
+            )
 
-        # Cargar lista de features EXACTA usada en entrenamiento
-        self.feature_names = self._load_feature_names()
+        # full | projected: columnas leídas del parquet de features
+        self.feature_load_mode = feature_load_mode or os.getenv("FEATURE_LOAD_MODE", LOAD_PROJECTED)
+        if self.feature_load_mode not in LOAD_MODES:
+            raise ValueError(
+                f"FEATURE_LOAD_MODE must be one of {LOAD_MODES}, got {self.feature_load_mode!r}"
+            )
 
-        logger.info(
-            "Feature names loaded from model booster (count=%d)", len(self.feature_names)
+        # Feature store particionado (store_id/year_month) y corte a cargar
+        self.feature_store_path = Path(
+            os.getenv(
+                "FEATURE_STORE_PATH",
+                self.project_root / "data" / "processed" / "feature_store",
+            )
+        )
+        self.feature_slice = _feature_slice_from_env()
+
+        # Monitor de drift en línea (lo asigna la app al arrancar)
+        self.online_drift: Optional[OnlineDriftMonitor] = None
+        # Cache LRU/TTL de respuestas (None = desactivado); reload_model lo vacía
+        self.prediction_cache: Optional[PredictionCache] = None
+
+        # Modelo puntual, features y boosters cuantílicos (nombre -> modelo);
+        # reload_model los reemplaza juntos con el lock de escritura
+        self._swap_lock = _SwapLock()
+        self._apply_model_artifacts(self._read_model_artifacts())
+
+        # Cache de respuestas por (item, tienda, fecha, versión del modelo)
+        self.prediction_cache = PredictionCache.from_env()
+
+        # live | table: servir desde la tabla precalculada con fallback en vivo
+        self.serving_mode = os.getenv("SERVING_MODE", SERVING_LIVE)
+        if self.serving_mode not in SERVING_MODES:
+            raise ValueError(f"SERVING_MODE must be one of {SERVING_MODES}, got {self.serving_mode!r}")
+        self.forecast_table_path = Path(
+            os.getenv("FORECAST_TABLE_PATH", self.project_root / "models" / "forecast_table.parquet")
         )
-        logger.info("Loaded %d feature names for inference", len(self.feature_names))
+        self.forecast_table_check_seconds = float(os.getenv("FORECAST_TABLE_CHECK_SECONDS", "60"))
+        self.forecast_table: Optional[ForecastTable] = None
+        self._forecast_table_mtime: Optional[float] = None
+        self._forecast_table_checked = 0.0
+        # Contadores de la tabla: se actualizan desde varios hilos del servidor
+        self.table_hits = 0
+        self.table_misses = 0
+        self._table_stats_lock = threading.Lock()
+        if self.serving_mode == SERVING_TABLE:
+            self._refresh_forecast_table(force=True)
 
         # Lazy-load dataframe de features
         self._feature_df: Optional[pd.DataFrame] = None
+        self._feature_index: Optional[FeatureIndex] = None
+        self._feature_matrix: Optional[np.ndarray] = None
+        self._memory_report: Dict[str, Any] = {}
 
-        self.loaded_at = datetime.utcnow().isoformat()
         self.is_loaded = True
         logger.info("Model loaded successfully")
 
+    def _read_model_artifacts(self) -> Dict[str, Any]:
+        """
+        Lee de disco el modelo puntual, sus features y los boosters
+        cuantílicos, sin tocar el estado del servicio.
+
+        Returns
+        -------
+        Dict[str, Any]
+            Atributos del servicio a reemplazar (ver ``_apply_model_artifacts``)
+        """
+        logger.info("Loading model from %s", self.model_path)
+        model = joblib.load(self.model_path)
+        model_digest = _file_digest(self.model_path)
+
+        # Cargar lista de features EXACTA usada en entrenamiento
+        feature_names = self._load_feature_names(model)
+
+        logger.info(
+            "Feature names loaded from model booster (count=%d)", len(feature_names)
+        )
+        logger.info("Loaded %d feature names for inference", len(feature_names))
+
+        return {
+            "model": model,
+            "model_digest": model_digest,
+            "feature_names": feature_names,
+            # Umbrales de split: deciden qué features admiten float32
+            "split_thresholds": booster_split_thresholds(model),
+            "quantile_models": self._load_quantile_models(feature_names),
+            "loaded_at": datetime.utcnow().isoformat(),
+        }
+
+    def _apply_model_artifacts(self, artifacts: Dict[str, Any]) -> None:
+        """Asigna los atributos leídos por ``_read_model_artifacts``."""
+        for name, value in artifacts.items():
+            setattr(self, name, value)
+
+    def reload_model(self) -> Dict[str, Any]:
+        """
+        Recarga los artefactos del modelo desde disco e invalida el cache de
+        respuestas. Si cambian las features, la base de features se vuelve a
+        cargar (de forma lazy) en el nuevo orden; lo mismo si cambian los
+        umbrales del booster (la matriz float32 puede dejar de ser segura).
+
+        Los artefactos se leen antes de tomar el lock; el cambio (modelo,
+        features, boosters, base de features y cache) se hace con el lock de
+        escritura, así una predicción en curso termina con el modelo anterior
+        y ninguna mezcla artefactos de los dos modelos.
+        """
+        artifacts = self._read_model_artifacts()
+        with self._swap_lock.write():
+            if (
+                artifacts["feature_names"] != self.feature_names
+                or thresholds_fingerprint(artifacts["split_thresholds"])
+                != thresholds_fingerprint(self.split_thresholds)
+            ):
+                self._feature_df = None
+                self._feature_index = None
+                self._feature_matrix = None
+            self._apply_model_artifacts(artifacts)
+            # Después del cambio: ninguna predicción del modelo anterior queda en curso
+            if self.prediction_cache is not None:
+                self.prediction_cache.clear()
+        if self.online_drift is not None:
+            # La serie de predicciones de la referencia es propia de cada modelo
+            self.online_drift.freeze(self.online_drift_reference())
+        logger.info("Model reloaded (version=%s)", self.model_version)
+        return self.model_info()
+
+    @property
+    def model_version(self) -> str:
+        """Versión del modelo servido: MODEL_VERSION y momento de carga."""
+        return f"{os.getenv('MODEL_VERSION', APP_VERSION)}@{self.loaded_at}"
+
+    @property
+    def artifact_version(self) -> str:
+        """
+        MODEL_VERSION y hash del archivo del modelo: estable entre reinicios,
+        distinto para otro artefacto. Valida los artefactos derivados del
+        modelo que se guardan en disco.
+        """
+        return f"{os.getenv('MODEL_VERSION', APP_VERSION)}+{self.model_digest[:12]}"
+
+    # ------------------------------------------------------------------ #
+    # Boosters cuantílicos
+    # ------------------------------------------------------------------ #
+    def _load_quantile_models(self, feature_names: List[str]) -> Dict[str, Any]:
+        """
+        Carga los boosters cuantílicos disponibles junto al modelo puntual.
+
+        Solo se aceptan boosters entrenados con las mismas features (mismo
+        orden) que el modelo puntual, para evaluarlos sobre la misma matriz.
+        """
+        if os.getenv("QUANTILE_MODELS", "auto").lower() == "off":
+            return {}
+
+        models: Dict[str, Any] = {}
+        for name in QUANTILE_LEVELS:
+            path = self.model_path.parent / f"lightgbm_quantile_{name}.pkl"
+            if not path.exists():
+                continue
+            model = joblib.load(path)
+            booster = getattr(model, "booster_", None)
+            if booster is not None and list(booster.feature_name()) != feature_names:
+                logger.warning("Quantile model %s ignored: feature names differ from %s", path, self.model_path)
+                continue
+            models[name] = model
+
+        if models:
+            logger.info("Quantile models loaded: %s", sorted(models))
+        if models and not {"p10", "p90"} <= set(models):
+            logger.warning("Prediction intervals need p10 and p90 quantile models (loaded: %s)", sorted(models))
+        return models
+
+    @property
+    def has_intervals(self) -> bool:
+        """True si hay boosters P10 y P90 para construir intervalos."""
+        return {"p10", "p90"} <= set(self.quantile_models)
+
+    # ------------------------------------------------------------------ #
+    # Tabla de pronósticos precalculados
+    # ------------------------------------------------------------------ #
+    def _refresh_forecast_table(self, force: bool = False) -> None:
+        """
+        (Re)carga la tabla si el parquet cambió. El ``stat`` se hace como
+        mucho cada ``forecast_table_check_seconds`` para no tocar disco en
+        cada request; el job batch reemplaza el archivo de forma atómica.
+        """
+        now = time.time()
+        if not force and now - self._forecast_table_checked < self.forecast_table_check_seconds:
+            return
+        self._forecast_table_checked = now
+        try:
+            mtime = self.forecast_table_path.stat().st_mtime
+        except OSError:
+            if force:
+                logger.warning("Forecast table not found at %s; serving live only", self.forecast_table_path)
+            return
+        if mtime == self._forecast_table_mtime:
+            return
+        try:
+            table = ForecastTable.load(self.forecast_table_path)
+        except Exception as exc:  # noqa: BLE001
+            logger.error("Forecast table %s could not be loaded: %s", self.forecast_table_path, exc)
+            return
+        self.forecast_table = table
+        self._forecast_table_mtime = mtime
+        logger.info(
+            "Forecast table loaded from %s (rows=%d, series=%d)",
+            self.forecast_table_path,
+            len(table),
+            table.n_series,
+        )
+        if not self._forecast_table_matches_model(table):
+            logger.warning(
+                "Forecast table model_version=%s does not match served model %s; serving live",
+                table.metadata.get("model_version"),
+                self.artifact_version,
+            )
+
+    def _forecast_table_matches_model(self, table: ForecastTable) -> bool:
+        """True si la tabla fue generada por el modelo servido (``artifact_version``)."""
+        return table.metadata.get("model_version") == self.artifact_version
+
+    def _lookup_forecast(
+        self,
+        item_id: str,
+        store_id: str,
+        date: Any,
+    ) -> Optional[Tuple[float, Optional[Dict[str, float]]]]:
+        """
+        Pronóstico de la tabla precalculada, o None (modo live, tabla no
+        cargada, generada por otro modelo o fecha fuera de la tabla) para
+        resolverlo en vivo.
+        """
+        if self.serving_mode != SERVING_TABLE:
+            return None
+        self._refresh_forecast_table()
+        table = self.forecast_table
+        hit = None
+        if table is not None and self._forecast_table_matches_model(table):
+            try:
+                hit = table.lookup(self._normalize_item_id(item_id, store_id), store_id, date)
+            except (TypeError, ValueError):
+                hit = None
+        with self._table_stats_lock:
+            if hit is None:
+                self.table_misses += 1
+            else:
+                self.table_hits += 1
+        return hit
+
+    def forecast_table_report(self) -> Dict[str, Any]:
+        """Modo de servicio, hits/misses y frescura de la tabla precalculada."""
+        with self._table_stats_lock:
+            hits, misses = self.table_hits, self.table_misses
+        lookups = hits + misses
+        report: Dict[str, Any] = {
+            "mode": self.serving_mode,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else None,
+        }
+        if self.serving_mode == SERVING_TABLE:
+            report["path"] = str(self.forecast_table_path)
+            report["loaded"] = self.forecast_table is not None
+            if self.forecast_table is not None:
+                report.update(self.forecast_table.report())
+                report["served_model_version"] = self.artifact_version
+                report["model_version_match"] = self._forecast_table_matches_model(self.forecast_table)
+        return report
+
+    # ------------------------------------------------------------------ #
+    # Cache de respuestas
+    # ------------------------------------------------------------------ #
+    def _cache_key(self, item_id: str, store_id: str, date: Any, with_interval: bool) -> Optional[tuple]:
+        """
+        Clave (item normalizado, tienda, fecha, versión del modelo, intervalo);
+        None si la fecha no se puede normalizar (la request no se cachea).
+        """
+        try:
+            date_ns = pd.Timestamp(date).value
+        except (TypeError, ValueError):
+            return None
+        return (self._normalize_item_id(item_id, store_id), store_id, date_ns, self.model_version, with_interval)
+
+    def prediction_cache_report(self) -> Dict[str, Any]:
+        """Hit ratio, tamaño y expulsiones del cache de respuestas."""
+        if self.prediction_cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.prediction_cache.stats()}
+
     # ------------------------------------------------------------------ #
     # Carga de nombres de features
     # ------------------------------------------------------------------ #
-    def _load_feature_names(self) -> List[str]:
+    def _load_feature_names(self, model: Any) -> List[str]:
         """
-        Carga los nombres de features, PRIORIDAD:
+        Carga los nombres de features de ``model``, PRIORIDAD:
         1) Desde el booster de LightGBM (fuente más confiable)
         2) Como fallback, desde models/feature_importance_lgb.csv
         """
-        booster = getattr(self.model, "booster_", None)
+        booster = getattr(model, "booster_", None)
         if booster is not None:
             names = list(booster.feature_name())
             return names
@@ -85,15 +538,25 @@ class ModelService:
         """
         DataFrame base con todas las features ya construidas.
         Se carga una vez y se mantiene en memoria.
+
+        Si ``feature_matrix_mode`` no es ``off``, las columnas de ``feature_names``
+        se materializan en ``feature_matrix`` y se eliminan de este DataFrame,
+        que conserva las claves (item_id, store_id, date) y el resto de columnas.
+
+        Con ``feature_load_mode="projected"`` solo se leen las claves y
+        ``feature_names`` (ver ``_read_feature_base``). Si existe el feature
+        store particionado, solo se lee el corte de ``feature_slice``.
         """
         if self._feature_df is None:
-            # Preferimos sales_with_features.parquet
-            path = (
-                self.project_root
-                / "data"
-                / "processed"
-                / "sales_with_features.parquet"
-            )
+            # Preferimos el feature store, luego sales_with_features.parquet
+            path = self.feature_store_path
+            if not is_feature_store(path):
+                path = (
+                    self.project_root
+                    / "data"
+                    / "processed"
+                    / "sales_with_features.parquet"
+                )
             if not path.exists():
                 # Fallback a valid_data.parquet
                 path = (
@@ -103,50 +566,193 @@ class ModelService:
                     / "valid_data.parquet"
                 )
 
-            logger.info("Loading feature base from %s", path)
-            df = pd.read_parquet(path)
+            rss_before = _current_rss_mb()
+            logger.info("Loading feature base from %s (mode=%s)", path, self.feature_load_mode)
+            df = self._read_feature_base(path)
 
             # Asegurar que 'date' sea datetime
             if not np.issubdtype(df["date"].dtype, np.datetime64):
                 df["date"] = pd.to_datetime(df["date"])
 
-            self._feature_df = df
+            self._feature_index = FeatureIndex.from_frame(df)
+            # El sidecar .npy describe el parquet completo: con un corte del
+            # feature store la matriz se construye en memoria
+            source_path = None if is_feature_store(path) else path
+            self._feature_df = self._materialize_feature_matrix(df, source_path)
+            del df
+
+            matrix = self._feature_matrix
+            self._memory_report = {
+                "feature_source": str(path),
+                "feature_slice": self.feature_slice if source_path is None else None,
+                "feature_load_mode": self.feature_load_mode,
+                "feature_matrix_mode": self.feature_matrix_mode,
+                "rss_before_load_mb": rss_before,
+                "rss_after_load_mb": _current_rss_mb(),
+                "feature_df_mb": round(
+                    self._feature_df.memory_usage(deep=True).sum() / 1024**2, 1
+                ),
+                "feature_matrix_mb": (
+                    round(matrix.nbytes / 1024**2, 1) if matrix is not None else None
+                ),
+                "feature_matrix_mmap": isinstance(matrix, np.memmap),
+            }
+            logger.info("Feature base memory: %s", self._memory_report)
 
         return self._feature_df
 
+    def _read_feature_base(self, path: Path) -> pd.DataFrame:
+        """
+        Lee el parquet de features.
+
+        - ``full``: todas las columnas, tal cual
+        - ``projected``: solo ``KEY_COLUMNS`` + ``sales`` (historia para los
+          pronósticos recursivos) + ``feature_names``; item_id/store_id
+          se leen como diccionario (categorical con códigos int) en lugar de strings
+          de Python. Si el sidecar mmap es válido, las features no se leen.
+          Sin matriz, las columnas float64 se reducen a float32 cuando ningún
+          umbral del booster cambia de lado (``float32_safe_columns``).
+
+        Sobre el feature store particionado se aplica la misma proyección y el
+        corte ``feature_slice`` se empuja a pyarrow (particiones y row groups).
+        """
+        if is_feature_store(path):
+            return self._read_feature_store(path)
+
+        if self.feature_load_mode == LOAD_FULL:
+            return pd.read_parquet(path)
+
+        import pyarrow.parquet as pq
+
+        available = set(pq.read_schema(path).names)
+        key_cols = [c for c in KEY_COLUMNS + [TARGET_COLUMN] if c in available]
+        id_cols = [c for c in ("item_id", "store_id") if c in available]
+        feature_cols = [
+            c for c in self.feature_names if c in available and c not in KEY_COLUMNS
+        ]
+
+        if self.feature_matrix_mode == MODE_MMAP:
+            n_rows = pq.ParquetFile(path).metadata.num_rows
+            fingerprint = thresholds_fingerprint(self.split_thresholds)
+            if load_sidecar(path, self.feature_names, n_rows, fingerprint) is not None:
+                # Las features ya están en el sidecar compartido
+                feature_cols = []
+
+        df = pd.read_parquet(
+            path,
+            columns=key_cols + feature_cols,
+            engine="pyarrow",
+            read_dictionary=id_cols,
+        )
+        return self._downcast_features(df, feature_cols)
+
+    def _read_feature_store(self, path: Path) -> pd.DataFrame:
+        """Lee el corte ``feature_slice`` del feature store particionado."""
+        columns = None
+        feature_cols: List[str] = []
+        if self.feature_load_mode == LOAD_PROJECTED:
+            available = set(open_feature_store(path).schema.names)
+            key_cols = [c for c in KEY_COLUMNS + [TARGET_COLUMN] if c in available]
+            feature_cols = [
+                c for c in self.feature_names if c in available and c not in KEY_COLUMNS
+            ]
+            columns = key_cols + feature_cols
+
+        df = read_feature_store(path, columns=columns, **self.feature_slice)
+        return self._downcast_features(df, feature_cols)
+
+    def _downcast_features(self, df: pd.DataFrame, feature_cols: List[str]) -> pd.DataFrame:
+        """Sin matriz, reduce a float32 las features que el booster no distingue."""
+        if self.feature_matrix_mode == MODE_OFF and feature_cols:
+            if self.split_thresholds is not None:
+                safe_cols = float32_safe_columns(df, self.split_thresholds)
+                for col in safe_cols:
+                    df[col] = df[col].astype(np.float32)
+                logger.info("Downcast %d float64 feature columns to float32", len(safe_cols))
+
+        return df
+
+    def _materialize_feature_matrix(self, df: pd.DataFrame, source_path: Path) -> pd.DataFrame:
+        """
+        Construye (o abre desde el sidecar ``.npy``) la matriz de features y
+        devuelve la base sin las columnas ya materializadas. La matriz es float32
+        salvo que el cast cambie algún split del booster (entonces float64).
+        """
+        if self.feature_matrix_mode == MODE_OFF:
+            return df
+
+        try:
+            self._feature_matrix = load_or_build_feature_matrix(
+                df,
+                self.feature_names,
+                source_path=source_path,
+                mode=self.feature_matrix_mode,
+                thresholds=self.split_thresholds,
+            )
+        except ValueError as exc:
+            # Sin matriz se usa la ruta por DataFrame, que reporta el error por request
+            logger.error("Feature matrix unavailable, using DataFrame path: %s", exc)
+            return df
+
+        drop_cols = [c for c in self.feature_names if c in df.columns and c not in KEY_COLUMNS]
+        return df.drop(columns=drop_cols)
+
+    @property
+    def feature_matrix(self) -> Optional[np.ndarray]:
+        """
+        Matriz float32 (float64 si el cast no es seguro; una fila por fila de
+        ``feature_df``) en el orden de
+        ``feature_names``; ``None`` si el modo es ``off`` o no pudo construirse.
+        """
+        _ = self.feature_df
+        return self._feature_matrix
+
+    @property
+    def feature_index(self) -> FeatureIndex:
+        """
+        Índice (item_id, store_id, date) sobre ``feature_df``.
+        Se construye junto con la carga de la base de features.
+        """
+        if self._feature_index is None:
+            self._feature_index = FeatureIndex.from_frame(self.feature_df)
+        return self._feature_index
+
     # ------------------------------------------------------------------ #
     # Construcción de features para una request
     # ------------------------------------------------------------------ #
-    def _get_row_for_request(
+    @staticmethod
+    def _normalize_item_id(item_id: str, store_id: str) -> str:
+        """Quita el sufijo de tienda del item_id (ej. FOODS_1_001_CA_1)."""
+        suffix = f"_{store_id}"
+        if item_id.endswith(suffix):
+            return item_id[: -len(suffix)]
+        return item_id
+
+    def _locate_row_for_request(
         self,
         item_id: str,
         store_id: str,
         date: Any,
-    ) -> pd.Series:
+    ) -> Tuple[int, str, pd.Timestamp]:
         """
-        Devuelve una fila de la base de features para un item/tienda/fecha dada.
+        Resuelve la posición (``iloc``) en ``feature_df`` para un item/tienda/fecha.
 
-        Estrategia:
-        1) Buscar coincidencia exacta de fecha.
-        2) Si no hay exacta, usar la última fecha anterior disponible.
-        3) Si tampoco hay anterior, usar la primera fecha disponible.
-        4) Solo si no hay datos para ese item/tienda, levantar error.
-        """
-        df = self.feature_df
+        La búsqueda usa ``feature_index`` (O(log n) por serie) en lugar de
+        escanear ``feature_df`` con máscaras booleanas.
 
-        # Normalizar item_id cuando viene con sufijo de tienda (ej. FOODS_1_001_CA_1)
-        normalized_item_id = item_id
-        suffix = f"_{store_id}"
-        if item_id.endswith(suffix):
-            normalized_item_id = item_id[: -len(suffix)]
+        Returns
+        -------
+        Tuple[int, str, pd.Timestamp]
+            (posición, tipo de coincidencia, fecha normalizada)
+        """
+        normalized_item_id = self._normalize_item_id(item_id, store_id)
 
         # Normalizamos la fecha que viene en el request
         date_parsed = pd.to_datetime(date)
 
-        # Filtramos por item y tienda
-        subset = df[(df["item_id"] == normalized_item_id) & (df["store_id"] == store_id)]
+        match = self.feature_index.lookup(normalized_item_id, store_id, date_parsed)
 
-        if subset.empty:
+        if match is None:
             # Aquí sí es un error real: no hay datos históricos para ese item/tienda
             msg = (
                 f"No data found for item_id={item_id}, store_id={store_id}, date={date}. "
@@ -155,43 +761,163 @@ class ModelService:
             logger.warning(msg)
             raise ValueError(msg)
 
+        position, match_type = match
+        return position, match_type, date_parsed
+
+    def _resolve_position_for_request(
+        self,
+        item_id: str,
+        store_id: str,
+        date: Any,
+    ) -> int:
+        """
+        Devuelve la posición (``iloc``) de la fila base para un item/tienda/fecha dada.
+
+        Estrategia:
+        1) Buscar coincidencia exacta de fecha.
+        2) Si no hay exacta, usar la última fecha anterior disponible.
+        3) Si tampoco hay anterior, usar la primera fecha disponible.
+        4) Solo si no hay datos para ese item/tienda, levantar error.
+        """
+        position, match_type, date_parsed = self._locate_row_for_request(
+            item_id=item_id,
+            store_id=store_id,
+            date=date,
+        )
+
         # 1) Coincidencia exacta de fecha
-        exact_match = subset[subset["date"] == date_parsed]
-        if not exact_match.empty:
-            row = exact_match.sort_values("date").iloc[-1]
+        if match_type == MATCH_EXACT:
             logger.info(
                 "Using exact match for item_id=%s, store_id=%s, date=%s",
                 item_id,
                 store_id,
                 date_parsed.date(),
             )
-            return row
+            return position
+
+        row_date = self.feature_df["date"].iat[position]
 
         # 2) Última fecha anterior disponible
-        before = subset[subset["date"] < date_parsed]
-        if not before.empty:
-            row = before.sort_values("date").iloc[-1]
+        if match_type == MATCH_PREVIOUS:
             logger.warning(
                 "No exact date match for item_id=%s, store_id=%s, date=%s; "
                 "using previous available date %s",
                 item_id,
                 store_id,
                 date_parsed.date(),
-                row["date"].date(),
+                row_date.date(),
             )
-            return row
+            return position
 
         # 3) Si no hay anteriores, usamos la primera disponible (la más vieja)
-        row = subset.sort_values("date").iloc[0]
         logger.warning(
             "No data on or before date=%s for item_id=%s, store_id=%s; "
             "using earliest available date %s",
             date_parsed.date(),
             item_id,
             store_id,
-            row["date"].date(),
+            row_date.date(),
         )
-        return row
+        return position
+
+    def _get_row_for_request(
+        self,
+        item_id: str,
+        store_id: str,
+        date: Any,
+    ) -> pd.Series:
+        """
+        Devuelve una fila de la base de features para un item/tienda/fecha dada
+        (ver ``_resolve_position_for_request`` para la estrategia de fallback).
+        """
+        position = self._resolve_position_for_request(item_id, store_id, date)
+        return self.feature_df.iloc[position]
+
+    def _fallback_position(self) -> int:
+        """Fila aleatoria de la base cuando no hay historia para el item/tienda."""
+        return int(np.random.randint(len(self.feature_df)))
+
+    def _feature_vectors(self, positions: np.ndarray) -> np.ndarray:
+        """
+        Matriz (len(positions) x n_features) en el orden de ``feature_names``.
+
+        Con ``feature_matrix`` disponible es un simple ``take`` sobre la matriz
+        float32; si no, se extrae del DataFrame con coerción numérica.
+        """
+        matrix = self.feature_matrix
+        if matrix is not None:
+            return np.ascontiguousarray(matrix[positions])
+
+        df = self.feature_df
+        self._check_feature_columns(df.columns)
+        col_positions = df.columns.get_indexer(self.feature_names)
+        block = df.iloc[positions, col_positions]
+        return np.ascontiguousarray(
+            block.apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64)
+        )
+
+    def _check_feature_columns(self, columns: pd.Index) -> None:
+        """Valida que la base contenga todas las features del modelo."""
+        missing = [c for c in self.feature_names if c not in columns]
+        if missing:
+            msg = (
+                f"Missing features in base data (count={len(missing)}). "
+                f"First 5 missing: {missing[:5]}"
+            )
+            logger.error(msg)
+            raise ValueError(msg)
+
+    def _predict_matrix(self, X: np.ndarray, model: Any = None) -> np.ndarray:
+        """
+        Ejecuta ``model.predict`` (por defecto el modelo puntual) sobre una
+        matriz ya ordenada como ``feature_names``. Devuelve predicciones no negativas.
+        """
+        if X.shape[1] != len(self.feature_names):
+            msg = (
+                f"Feature vector has wrong size: {X.shape[1]} vs expected {len(self.feature_names)}"
+            )
+            logger.error(msg)
+            raise ValueError(msg)
+
+        # Desactivamos validate_features para evitar warnings de nombres
+        import warnings
+
+        with warnings.catch_warnings():
+            warnings.filterwarnings(
+                "ignore",
+                message=".*feature names.*",
+                category=UserWarning,
+            )
+            model = self.model if model is None else model
+            y_hat = np.asarray(model.predict(X, validate_features=False), dtype=float)
+        # Garantizar no-negatividad
+        return np.maximum(y_hat, 0.0)
+
+    def _predict_intervals(self, X: np.ndarray) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Evalúa los boosters cuantílicos sobre la misma matriz ``X`` del modelo
+        puntual (sin volver a resolver filas ni construir features).
+
+        Returns
+        -------
+        Optional[Dict[str, np.ndarray]]
+            ``lower``/``upper`` (P10/P90) y ``median`` (P50, si está cargado),
+            ordenados por fila para evitar cruces de cuantiles; None sin P10/P90.
+        """
+        if not self.has_intervals:
+            return None
+        names = [name for name in QUANTILE_LEVELS if name in self.quantile_models]
+        stacked = np.sort(
+            np.column_stack([self._predict_matrix(X, self.quantile_models[name]) for name in names]),
+            axis=1,
+        )
+        return {QUANTILE_INTERVAL_KEYS[name]: stacked[:, j] for j, name in enumerate(names)}
+
+    @staticmethod
+    def _interval_at(intervals: Optional[Dict[str, np.ndarray]], row: int) -> Optional[Dict[str, float]]:
+        if intervals is None:
+            return None
+        return {key: float(values[row]) for key, values in intervals.items()}
 
     def predict_from_request(self, item_id: str, store_id: str, date: str) -> float:
         """
@@ -201,72 +927,527 @@ class ModelService:
         3) Convierte a numpy numérico
         4) Ejecuta modelo.predict(X)
         """
+        return self.predict_with_interval(item_id, store_id, date, with_interval=False)[0]
+
+    @_reads_model
+    def predict_with_interval(
+        self,
+        item_id: str,
+        store_id: str,
+        date: str,
+        with_interval: bool = True,
+    ) -> Tuple[float, Optional[Dict[str, float]]]:
+        """
+        Predicción puntual e intervalo P10-P90 con una sola resolución de fila:
+        el vector de features se construye una vez y se evalúa con el modelo
+        puntual y con los boosters cuantílicos.
+
+        Returns
+        -------
+        Tuple[float, Optional[Dict[str, float]]]
+            (predicción, intervalo ``lower``/``median``/``upper`` o None si no
+            hay boosters cuantílicos cargados)
+        """
+        cache = self.prediction_cache
+        key = self._cache_key(item_id, store_id, date, with_interval) if cache is not None else None
+        if key is None:
+            result = self._predict_one(item_id, store_id, date, with_interval)
+        else:
+            # Single-flight: requests concurrentes con la misma clave calculan una vez.
+            # Las predicciones sobre la fila de fallback (aleatoria) no se guardan
+            result = cache.get_or_compute(
+                key,
+                lambda: self._predict_one(item_id, store_id, date, with_interval),
+                cacheable=lambda result: result[2],
+            )
+        y_hat, interval, _, features = result
+        # Toda respuesta servida alimenta el monitor, también los hits del cache
+        self._observe_served([features], [y_hat])
+        return y_hat, dict(interval) if interval is not None else None
+
+    def _predict_one(
+        self,
+        item_id: str,
+        store_id: str,
+        date: Any,
+        with_interval: bool,
+    ) -> Tuple[float, Optional[Dict[str, float]], bool, Optional[np.ndarray]]:
+        """
+        Predicción de una request sin pasar por el cache de respuestas.
+
+        Returns
+        -------
+        Tuple[float, Optional[Dict[str, float]], bool, Optional[np.ndarray]]
+            (predicción, intervalo, cacheable, vector de features); no es
+            cacheable si se usó la fila de fallback porque el item/tienda no
+            tiene historia. El vector es None si la predicción salió de la
+            tabla precalculada. Es la entrada que se guarda en el cache, así
+            los hits también alimentan el monitor de drift
+        """
+        # 0) Tabla precalculada (modo table): sin resolver fila ni llamar al modelo
+        cached = self._lookup_forecast(item_id, store_id, date)
+        if cached is not None:
+            y_hat, interval = cached
+            return y_hat, interval if with_interval else None, True, None
+
         # 1) Recuperar fila base (con fallback de fecha)
         try:
-            row = self._get_row_for_request(
+            position = self._resolve_position_for_request(
                 item_id=item_id,
                 store_id=store_id,
                 date=date,
             )
         except ValueError as exc:
             logger.warning("Using fallback row for inference: %s", exc)
-            row = self.feature_df.sample(1).iloc[0]
-            row["item_id"] = item_id
-            row["store_id"] = store_id
-            row["date"] = pd.to_datetime(date)
-
-        # 2) Validar que existan todas las columnas necesarias
-        missing = [c for c in self.feature_names if c not in row.index]
-        if missing:
-            msg = (
-                f"Missing features in base data (count={len(missing)}). "
-                f"First 5 missing: {missing[:5]}"
-            )
-            logger.error(msg)
-            raise ValueError(msg)
+            position = None
 
-        # 3) Extraer features en el orden correcto y convertir a numérico
-        feat_series = row[self.feature_names]
+        cacheable = position is not None
+        if position is None:
+            position = self._fallback_position()
 
-        # Convertimos a numérico; cualquier cosa no convertible se vuelve NaN
-        feat_numeric = pd.to_numeric(feat_series, errors="coerce")
+        # 2-3) Features en el orden correcto como matriz numérica 1 x n_features
+        X = self._feature_vectors(np.array([position]))
 
-        if feat_numeric.isna().any():
+        nan_mask = np.isnan(X[0])
+        if nan_mask.any():
             logger.warning(
                 "NaNs found in feature vector for item_id=%s, store_id=%s, date=%s. "
                 "NaNs will be passed to LightGBM (it can handle them). First 5 NaN cols: %s",
                 item_id,
                 store_id,
                 date,
-                feat_numeric[feat_numeric.isna()].index.tolist()[:5],
+                [name for name, is_nan in zip(self.feature_names, nan_mask) if is_nan][:5],
             )
 
-        # 4) Pasar a numpy manteniendo el orden exacto esperado por el modelo
-        X = feat_numeric.to_numpy(dtype=float).reshape(1, -1)
+        # 4) Predicción (y cuantiles sobre el mismo vector)
+        y_hat = self._predict_matrix(X)
+        intervals = self._predict_intervals(X) if with_interval else None
+        return float(y_hat[0]), self._interval_at(intervals, 0), cacheable, X[0]
 
-        if X.shape[1] != len(self.feature_names):
-            msg = (
-                f"Feature vector has wrong size: {X.shape[1]} vs expected {len(self.feature_names)}"
+    def predict_batch(
+        self,
+        requests: Sequence[Tuple[str, str, Any]],
+    ) -> List[Tuple[Optional[float], Optional[str]]]:
+        """
+        Predicción batch puntual (ver ``predict_batch_with_intervals``).
+
+        Returns
+        -------
+        List[Tuple[Optional[float], Optional[str]]]
+            Por cada request, (predicción, None) o (None, detalle del error).
+        """
+        return [
+            (y_hat, error)
+            for y_hat, _, error in self.predict_batch_with_intervals(requests, with_intervals=False)
+        ]
+
+    @_reads_model
+    def predict_batch_with_intervals(
+        self,
+        requests: Sequence[Tuple[str, str, Any]],
+        with_intervals: bool = True,
+    ) -> List[Tuple[Optional[float], Optional[Dict[str, float]], Optional[str]]]:
+        """
+        Predicción batch con una sola llamada a ``model.predict``.
+
+        1) Resuelve la fila de cada request con ``feature_index``
+           (mismo fallback que ``predict_from_request``)
+        2) Construye una matriz contigua (n_items x n_features) en el orden de
+           ``feature_names`` con un único ``take`` sobre ``feature_matrix``
+        3) Ejecuta el modelo una vez sobre todas las filas resueltas, y cada
+           booster cuantílico una vez sobre la misma matriz
+
+        Parameters
+        ----------
+        requests : Sequence[Tuple[str, str, Any]]
+            Tuplas (item_id, store_id, date)
+        with_intervals : bool
+            Evaluar los boosters cuantílicos (si están cargados)
+
+        Returns
+        -------
+        List[Tuple[Optional[float], Optional[Dict[str, float]], Optional[str]]]
+            Por cada request, (predicción, intervalo o None, None) o
+            (None, None, detalle del error). Un fallo en un item no invalida
+            el resto del batch.
+        """
+        cache = self.prediction_cache
+        if cache is None:
+            computed, _, computed_features = self._predict_batch(requests, with_intervals)
+            self._observe_served_batch(computed, computed_features)
+            return computed
+
+        # Solo las requests que no están en el cache pasan por el modelo
+        results: List[Tuple[Optional[float], Optional[Dict[str, float]], Optional[str]]] = [
+            (None, None, None)
+        ] * len(requests)
+        features: List[Optional[np.ndarray]] = [None] * len(requests)
+        keys = [self._cache_key(item_id, store_id, date, with_intervals) for item_id, store_id, date in requests]
+        pending: List[int] = []
+        for i, key in enumerate(keys):
+            found, value = cache.get(key) if key is not None else (False, None)
+            if found:
+                # Mismo formato que _predict_one: (predicción, intervalo, cacheable, features)
+                y_hat, interval, _, features[i] = value
+                results[i] = (y_hat, dict(interval) if interval is not None else None, None)
+            else:
+                pending.append(i)
+
+        if pending:
+            computed, cacheable, computed_features = self._predict_batch(
+                [requests[i] for i in pending], with_intervals
             )
-            logger.error(msg)
-            raise ValueError(msg)
+            for i, (y_hat, interval, error), store, row in zip(
+                pending, computed, cacheable, computed_features
+            ):
+                results[i] = (y_hat, interval, error)
+                features[i] = row
+                if error is None and store and keys[i] is not None:
+                    # Copia de la fila: no retener en el cache la matriz de todo el batch
+                    interval = dict(interval) if interval is not None else None
+                    cache.put(keys[i], (y_hat, interval, True, None if row is None else row.copy()))
+        self._observe_served_batch(results, features)
+        return results
 
-        # 5) Predicción (desactivamos validate_features para evitar warnings de nombres)
-        import warnings
+    def _predict_batch(
+        self,
+        requests: Sequence[Tuple[str, str, Any]],
+        with_intervals: bool,
+    ) -> Tuple[
+        List[Tuple[Optional[float], Optional[Dict[str, float]], Optional[str]]],
+        List[bool],
+        List[Optional[np.ndarray]],
+    ]:
+        """
+        Predicción batch sin pasar por el cache de respuestas.
 
-        with warnings.catch_warnings():
-            warnings.filterwarnings(
-                "ignore",
-                message=".*feature names.*",
-                category=UserWarning,
+        Returns
+        -------
+        Tuple[List[...], List[bool], List[Optional[np.ndarray]]]
+            Resultados como ``predict_batch_with_intervals`` y, por request, si
+            el resultado es cacheable (False con la fila de fallback) y el
+            vector de features (None con la tabla precalculada o con error)
+        """
+        n = len(requests)
+        positions = np.zeros(n, dtype=np.int64)
+        errors: List[Optional[str]] = [None] * n
+        cacheable = [True] * n
+        features: List[Optional[np.ndarray]] = [None] * n
+        match_counts: Dict[str, int] = {}
+        cached: Dict[int, Tuple[float, Optional[Dict[str, float]]]] = {}
+
+        # 1) Resolver filas (las que están en la tabla precalculada no se resuelven)
+        for i, (item_id, store_id, date) in enumerate(requests):
+            hit = self._lookup_forecast(item_id, store_id, date)
+            if hit is not None:
+                cached[i] = hit
+                continue
+            try:
+                position, match_type, _ = self._locate_row_for_request(
+                    item_id=item_id,
+                    store_id=store_id,
+                    date=date,
+                )
+            except ValueError as exc:
+                logger.warning("Using fallback row for inference: %s", exc)
+                position, match_type = self._fallback_position(), MATCH_FALLBACK
+                cacheable[i] = False
+            except Exception as exc:  # noqa: BLE001
+                logger.error("Batch row resolution failed for %s: %s", item_id, exc)
+                errors[i] = f"Row resolution failed: {exc}"
+                continue
+            positions[i] = position
+            match_counts[match_type] = match_counts.get(match_type, 0) + 1
+
+        ok = np.array([err is None and i not in cached for i, err in enumerate(errors)], dtype=bool)
+        results: List[Tuple[Optional[float], Optional[Dict[str, float]], Optional[str]]] = [
+            (None, None, err) for err in errors
+        ]
+        for i, (value, interval) in cached.items():
+            results[i] = (value, interval if with_intervals else None, None)
+        if cached:
+            match_counts["table"] = len(cached)
+        if not ok.any():
+            return results, cacheable, features
+
+        # 2) Matriz de features en el orden del modelo
+        if self.feature_matrix is None:
+            self._check_feature_columns(self.feature_df.columns)
+        X = self._feature_vectors(positions[ok])
+
+        nan_rows = int(np.isnan(X).any(axis=1).sum())
+        if nan_rows:
+            logger.warning(
+                "NaNs found in %d of %d batch feature vectors; "
+                "NaNs will be passed to LightGBM (it can handle them)",
+                nan_rows,
+                len(X),
             )
-            y_hat = float(self.model.predict(X, validate_features=False)[0])
-        # Garantizar no-negatividad
-        return max(y_hat, 0.0)
+
+        # 3) Una sola predicción para todo el batch
+        y_hat = self._predict_matrix(X)
+        intervals = self._predict_intervals(X) if with_intervals else None
+        for row, (i, value) in enumerate(zip(np.flatnonzero(ok).tolist(), y_hat.tolist())):
+            results[i] = (value, self._interval_at(intervals, row), None)
+            features[i] = X[row]
+
+        logger.info(
+            "Batch prediction: items=%d, predicted=%d, errors=%d, matches=%s",
+            n,
+            int(ok.sum()),
+            n - int(ok.sum()),
+            match_counts,
+        )
+        return results, cacheable, features
+
+    # ------------------------------------------------------------------ #
+    # Pronóstico multi-horizonte
+    # ------------------------------------------------------------------ #
+    @_reads_model
+    def forecast_horizon(
+        self,
+        store_id: str,
+        item_ids: Optional[Sequence[str]] = None,
+        horizon: int = 28,
+        start_date: Any = None,
+        with_intervals: bool = True,
+    ) -> Dict[str, Any]:
+        """
+        Pronóstico recursivo de ``horizon`` días para varios items de una tienda.
+
+        1) Por serie toma las ventas anteriores a ``start_date`` (default: el día
+           siguiente a la última fecha de cada serie) como estado inicial
+        2) En cada paso construye la matriz de todas las series: features
+           exógenas de la última fila disponible en la base, calendario de la
+           fecha pronosticada y lags/rolling desde el estado (``HorizonState``)
+        3) Una llamada al modelo por paso; la predicción se agrega al estado
+
+        Si la historia de una serie termina antes de ``start_date``, los días
+        intermedios también se pronostican (y no se devuelven).
+
+        Parameters
+        ----------
+        store_id : str
+            Tienda
+        item_ids : Sequence[str], optional
+            Items a pronosticar (default: todos los items de la tienda)
+        horizon : int
+            Días a pronosticar
+        start_date : date-like, optional
+            Primer día del pronóstico
+        with_intervals : bool
+            Agregar intervalos P10-P90 si hay boosters cuantílicos
+
+        Returns
+        -------
+        Dict[str, Any]
+            ``forecasts`` (por item: fecha de origen y predicciones por día) y
+            ``errors`` (item -> detalle) para items sin historia
+        """
+        if horizon < 1:
+            raise ValueError(f"horizon must be >= 1, got {horizon}")
+        df = self.feature_df
+        if TARGET_COLUMN not in df.columns:
+            raise ValueError(f"Sales history column '{TARGET_COLUMN}' not available in feature base")
+        index = self.feature_index
+
+        if item_ids is None:
+            item_ids = sorted(item for item, store in index.ranges if store == store_id)
+            if not item_ids:
+                raise ValueError(f"No data found for store_id={store_id}")
+        start = None if start_date is None else pd.Timestamp(start_date).value
+
+        specs = history_features(self.feature_names)
+        lookback = required_history(specs)
+        sales = df[TARGET_COLUMN].to_numpy(dtype=np.float64, na_value=np.nan)
+
+        # 1) Estado inicial y fechas de origen por serie
+        items: List[str] = []
+        errors: Dict[str, str] = {}
+        bounds: List[Tuple[int, int]] = []
+        histories = []
+        origins = []
+        for item_id in item_ids:
+            item = self._normalize_item_id(item_id, store_id)
+            series = index.ranges.get((item, store_id))
+            if series is None:
+                errors[item_id] = f"No data found for item_id={item_id}, store_id={store_id}"
+                continue
+            first, stop = series
+            cut = first + (
+                stop - first if start is None
+                else int(np.searchsorted(index.dates[first:stop], start, side="left"))
+            )
+            if cut == first:
+                errors[item_id] = f"No history before start_date for item_id={item_id}, store_id={store_id}"
+                continue
+            items.append(item_id)
+            bounds.append((first, stop))
+            histories.append(sales[index.positions[max(first, cut - lookback):cut]])
+            origins.append(index.dates[cut - 1])
+
+        if not items:
+            return {"forecasts": [], "errors": errors}
+
+        n = len(items)
+        origins_ns = np.array(origins, dtype=np.int64)
+        gaps = np.zeros(n, dtype=np.int64) if start is None else (start - origins_ns) // DAY_NS - 1
+        steps = int(gaps.max()) + horizon
+        if steps > MAX_FORECAST_STEPS:
+            raise ValueError(
+                f"Forecast needs {steps} recursive steps (history ends {int(gaps.max())} days "
+                f"before start_date); maximum is {MAX_FORECAST_STEPS}"
+            )
+
+        history = np.full((n, lookback), np.nan)
+        for i, values in enumerate(histories):
+            if len(values):
+                history[i, -len(values):] = values
+        state = HorizonState(history, specs)
+        state_cols = state.columns
+
+        # 2) Fechas pronosticadas, fila exógena (última fila <= fecha) y calendario
+        targets = origins_ns[:, None] + DAY_NS * np.arange(1, steps + 1)[None, :]
+        exogenous = np.empty((n, steps), dtype=np.int64)
+        for i, (first, stop) in enumerate(bounds):
+            last = np.searchsorted(index.dates[first:stop], targets[i], side="right") - 1
+            exogenous[i] = index.positions[first + last]
+        unique_dates, date_codes = np.unique(targets, return_inverse=True)
+        date_codes = date_codes.reshape(n, steps)
+        calendar = calendar_feature_table(pd.DatetimeIndex(unique_dates), self.feature_names)
+        calendar_cols = np.array([self.feature_names.index(c) for c in calendar.columns], dtype=np.int64)
+        calendar_values = calendar.to_numpy()
+
+        # 3) Un paso por día, todas las series juntas
+        predictions = np.empty((n, steps))
+        intervals: Dict[str, np.ndarray] = {}
+        for k in range(steps):
+            X = self._feature_vectors(exogenous[:, k]).astype(np.float64)
+            if len(calendar_cols):
+                X[:, calendar_cols] = calendar_values[date_codes[:, k]]
+            if len(state_cols):
+                X[:, state_cols] = state.features()
+            y_hat = self._predict_matrix(X)
+            step_intervals = self._predict_intervals(X) if with_intervals else None
+            for key, values in (step_intervals or {}).items():
+                if key not in intervals:
+                    intervals[key] = np.empty((n, steps))
+                intervals[key][:, k] = values
+            predictions[:, k] = y_hat
+            state.push(y_hat)
+
+        forecasts = []
+        for i, item_id in enumerate(items):
+            window = slice(int(gaps[i]), int(gaps[i]) + horizon)
+            dates = pd.DatetimeIndex(targets[i, window])
+            forecasts.append({
+                "item_id": item_id,
+                "store_id": store_id,
+                "origin_date": pd.Timestamp(origins_ns[i]).date(),
+                "predictions": [
+                    {
+                        "date": day.date(),
+                        "predicted_sales": float(value),
+                        "prediction_interval": (
+                            {key: float(values[i, window][j]) for key, values in intervals.items()}
+                            if intervals else None
+                        ),
+                    }
+                    for j, (day, value) in enumerate(zip(dates, predictions[i, window]))
+                ],
+            })
+
+        logger.info(
+            "Horizon forecast: store=%s, series=%d, horizon=%d, steps=%d, errors=%d",
+            store_id,
+            n,
+            horizon,
+            steps,
+            len(errors),
+        )
+        return {"forecasts": forecasts, "errors": errors}
+
+    # ------------------------------------------------------------------ #
+    # Drift en línea
+    # ------------------------------------------------------------------ #
+    def _observe_drift(self, X: np.ndarray, y_hat: np.ndarray) -> None:
+        """Agrega features y predicciones servidas al monitor (nunca falla la request)."""
+        monitor = self.online_drift
+        if monitor is None:
+            return
+        try:
+            monitor.observe(np.column_stack([X, y_hat]))
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Online drift observation skipped: %s", exc)
+
+    def _observe_served(self, features: Sequence[Optional[np.ndarray]], y_hat: Sequence[float]) -> None:
+        """
+        Observa respuestas servidas. Sin vector de features (tabla
+        precalculada) solo se observa la predicción: el ``n`` de cada feature
+        en ``/monitoring/drift/online`` puede quedar por debajo del de la salida.
+        """
+        if self.online_drift is None or not len(y_hat):
+            return
+        X = np.full((len(features), len(self.feature_names)), np.nan)
+        for row, values in enumerate(features):
+            if values is not None:
+                X[row] = values
+        self._observe_drift(X, np.asarray(y_hat, dtype=float))
+
+    def _observe_served_batch(
+        self,
+        results: Sequence[Tuple[Optional[float], Optional[Dict[str, float]], Optional[str]]],
+        features: Sequence[Optional[np.ndarray]],
+    ) -> None:
+        """Observa las requests del batch servidas sin error (una sola llamada al monitor)."""
+        served = [i for i, (_, _, error) in enumerate(results) if error is None]
+        self._observe_served([features[i] for i in served], [results[i][0] for i in served])
+
+    @_reads_model
+    def online_drift_reference(self, sample_size: int = 20000, seed: int = 42) -> OnlineReference:
+        """
+        Referencia congelada para el monitor de drift en línea.
+
+        Se carga de ONLINE_DRIFT_REFERENCE (.npz) si existe y fue generada con
+        las mismas features y el mismo modelo (``artifact_version``); si no, se
+        construye con una muestra de la base de features y las predicciones del
+        modelo sobre esa muestra, y se guarda en esa ruta.
+        """
+        path = Path(
+            os.getenv(
+                "ONLINE_DRIFT_REFERENCE",
+                self.project_root / "models" / "online_drift_reference.npz",
+            )
+        )
+        names = list(self.feature_names) + [PREDICTION_SERIES]
+        if path.exists():
+            reference = OnlineReference.load(path)
+            if reference.matches(names, self.artifact_version):
+                logger.info("Online drift reference loaded from %s", path)
+                return reference
+            logger.warning(
+                "Online drift reference %s does not match model features/version; rebuilding", path
+            )
+
+        n_rows = len(self.feature_df)
+        rng = np.random.default_rng(seed)
+        positions = np.sort(rng.choice(n_rows, size=min(sample_size, n_rows), replace=False))
+        X = self._feature_vectors(positions)
+        reference = OnlineReference.from_matrix(
+            np.column_stack([X, self._predict_matrix(X)]),
+            names,
+            model_version=self.artifact_version,
+        )
+        try:
+            reference.save(path)
+        except OSError as exc:
+            logger.warning("Online drift reference could not be saved to %s: %s", path, exc)
+        return reference
 
     # ------------------------------------------------------------------ #
     # Info del modelo
     # ------------------------------------------------------------------ #
+    @_reads_model
     def model_info(self) -> Dict[str, Any]:
         return {
             "model_name": "Walmart Demand Forecasting LightGBM",
@@ -274,6 +1455,7 @@ class ModelService:
             "model_type": self.model.__class__.__name__,
             "model_path": str(self.model_path),
             "features_count": len(self.feature_names),
+            "quantile_models": sorted(self.quantile_models),
             "loaded_at": self.loaded_at,
             "is_loaded": self.is_loaded,
             # Campos adicionales para contratos de API y reportes
@@ -281,6 +1463,15 @@ class ModelService:
             "performance_metrics": {},
         }
 
+    def memory_report(self) -> Dict[str, Any]:
+        """
+        Memoria residente antes/después de cargar la base de features y tamaño
+        de las estructuras en memoria. Vacío hasta que se carga la base.
+        """
+        if not self._memory_report:
+            return {}
+        return {**self._memory_report, "rss_current_mb": _current_rss_mb()}
+
     def is_ready(self) -> Tuple[bool, str]:
         """
         Verifica disponibilidad del modelo y de la base de features para servir predicciones.
@@ -300,6 +1491,7 @@ class ModelService:
     # ------------------------------------------------------------------ #
     # Feature importance
     # ------------------------------------------------------------------ #
+    @_reads_model
     def feature_importance(self, top_n: int = 10) -> List[Dict[str, Any]]:
         """
         Devuelve importancias de features ordenadas descendentemente.
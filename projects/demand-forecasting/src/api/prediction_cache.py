@@ -0,0 +1,175 @@
+"""
+Cache de respuestas de predicción para la API
+
+Responsable de:
+- Guardar predicciones ya calculadas por clave (item normalizado, tienda,
+  fecha, versión del modelo) con tamaño máximo y expulsión LRU
+- Expirar entradas con un TTL opcional
+- Single-flight: requests concurrentes con la misma clave que no está en el
+  cache esperan al primero en lugar de recalcular
+- Reportar hits, misses, hit ratio, tamaño y expulsiones
+
+Configuración por variables de entorno (ver PredictionCache.from_env).
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class _InFlight:
+    """Cálculo en curso de una clave: los demás hilos esperan su resultado."""
+
+    __slots__ = ("event", "value", "error")
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class PredictionCache:
+    """
+    Cache LRU acotado y thread-safe, con TTL opcional y single-flight.
+
+    Las entradas se guardan como (valor, instante de expiración); con
+    ``ttl_seconds=None`` no expiran.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 10000,
+        ttl_seconds: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if max_size < 1:
+            raise ValueError(f"max_size must be >= 1, got {max_size}")
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._in_flight: Dict[Hashable, _InFlight] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["PredictionCache"]:
+        """
+        Cache configurado con PREDICTION_CACHE_SIZE (default 10000; 0 lo
+        desactiva) y PREDICTION_CACHE_TTL_SECONDS (default 0 = sin TTL).
+        """
+        max_size = int(os.getenv("PREDICTION_CACHE_SIZE", "10000"))
+        if max_size <= 0:
+            return None
+        ttl = float(os.getenv("PREDICTION_CACHE_TTL_SECONDS", "0"))
+        return cls(max_size=max_size, ttl_seconds=ttl if ttl > 0 else None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _get_locked(self, key: Hashable) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        value, expires_at = entry
+        if expires_at < self.clock():
+            del self._entries[key]
+            self.expirations += 1
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def _put_locked(self, key: Hashable, value: Any) -> None:
+        expires_at = self.clock() + self.ttl_seconds if self.ttl_seconds else float("inf")
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """(encontrado, valor) y cuenta el hit o miss."""
+        with self._lock:
+            found, value = self._get_locked(key)
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return found, value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Guardar ``value`` (expulsa la entrada menos usada si se llena)."""
+        with self._lock:
+            self._put_locked(key, value)
+
+    def get_or_compute(
+        self,
+        key: Hashable,
+        compute: Callable[[], Any],
+        cacheable: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        """
+        Valor cacheado de ``key`` o ``compute()``. Si otro hilo ya está
+        calculando la misma clave, espera su resultado (o su excepción).
+        Si ``cacheable(valor)`` es False, el valor se entrega pero no se guarda.
+        """
+        with self._lock:
+            found, value = self._get_locked(key)
+            if found:
+                self.hits += 1
+                return value
+            self.misses += 1
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[key] = _InFlight()
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = compute()
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        else:
+            if cacheable is None or cacheable(flight.value):
+                with self._lock:
+                    self._put_locked(key, flight.value)
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            flight.event.set()
+        return flight.value
+
+    def clear(self) -> None:
+        """Vaciar el cache (ej. al recargar el modelo). Las métricas se conservan."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hits, misses, hit ratio, tamaño y expulsiones."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
@@ -80,7 +80,7 @@ class PredictionResponse(BaseModel):
     predicted_sales: float = Field(..., description="Predicted sales quantity")
     prediction_interval: Optional[Dict[str, float]] = Field(
         None,
-        description="95% prediction interval (lower, upper)"
+        description="P10-P90 prediction interval (lower, median, upper) from quantile boosters"
     )
     model_version: str = Field(..., description="Model version used")
     timestamp: str = Field(..., description="Prediction timestamp")
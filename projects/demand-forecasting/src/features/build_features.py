@@ -13,7 +13,7 @@ import numpy as np
 from pathlib import Path
 import yaml
 import logging
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import time
 
 # Import feature modules
@@ -22,6 +22,7 @@ from .rolling_features import create_rolling_features, create_rolling_features_a
 from .calendar_features import create_calendar_features, create_holiday_features
 from .price_features import create_price_features, create_price_category_features
 from .event_features import create_event_features, create_snap_features, create_event_snap_interactions
+from .frame_utils import left_join_inplace
 
 # Configure logging
 logging.basicConfig(
@@ -30,6 +31,47 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Modos de ejecución del pipeline
+MODE_COPY = 'copy'        # ruta original: cada paso copia/reordena el frame
+MODE_INPLACE = 'inplace'  # un solo sort por (id, date); los pasos añaden columnas en sitio
+PIPELINE_MODES = (MODE_COPY, MODE_INPLACE)
+
+# Ventanas de create_rolling_features_advanced (cuantiles, CV y trend)
+ADVANCED_ROLLING_WINDOWS = [7, 28]
+
+
+def _reset_peak_rss() -> bool:
+    """Reinicia el pico de RSS del proceso (VmHWM) vía /proc/self/clear_refs."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _rss_mb() -> Tuple[Optional[float], Optional[float]]:
+    """(RSS actual, pico de RSS) del proceso en MB."""
+    current = peak = None
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    current = int(line.split()[1]) / 1024
+                elif line.startswith('VmHWM:'):
+                    peak = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+
+    if peak is None:
+        try:
+            import resource
+            # ru_maxrss está en KB en Linux (pico de toda la vida del proceso)
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        except (ImportError, OSError):
+            pass
+    return current, peak
+
 
 class FeatureEngineeringPipeline:
     """
@@ -55,6 +97,7 @@ class FeatureEngineeringPipeline:
         """
         self.config = self._load_config(config_path)
         self.feature_catalog = []
+        self.step_report: List[Dict] = []
 
         logger.info("Feature Engineering Pipeline initialized")
 
@@ -73,12 +116,35 @@ class FeatureEngineeringPipeline:
                 }
             }
 
+    def _start_step(self) -> float:
+        """Marca el inicio de un paso y reinicia el pico de RSS."""
+        _reset_peak_rss()
+        return time.time()
+
+    def _finish_step(self, name: str, step_start: float, df: pd.DataFrame) -> None:
+        """Registra tiempo, forma y pico de memoria de un paso."""
+        step_time = time.time() - step_start
+        rss, peak = _rss_mb()
+        self.step_report.append({
+            'step': name,
+            'seconds': round(step_time, 3),
+            'rows': df.shape[0],
+            'columns': df.shape[1],
+            'rss_mb': round(rss, 1) if rss is not None else None,
+            'peak_rss_mb': round(peak, 1) if peak is not None else None,
+        })
+        logger.info(f"✓ {name} features completed in {step_time:.2f}s")
+        logger.info(f"  Shape: {df.shape}")
+        if peak is not None:
+            logger.info(f"  Peak RSS: {peak:,.1f} MB (current: {rss or 0:,.1f} MB)")
+
     def run(
         self,
         df_sales: pd.DataFrame,
         df_calendar: Optional[pd.DataFrame] = None,
         df_prices: Optional[pd.DataFrame] = None,
-        include_advanced: bool = True
+        include_advanced: bool = True,
+        mode: Optional[str] = None
     ) -> pd.DataFrame:
         """
         Ejecutar pipeline completo de feature engineering.
@@ -93,6 +159,11 @@ class FeatureEngineeringPipeline:
             DataFrame de precios
         include_advanced : bool
             Si incluir features avanzadas (más lentas)
+        mode : str, optional
+            'inplace' (default, o ``features.pipeline_mode`` del config): ordena
+            una sola vez por (id, date) y cada paso añade columnas sobre el mismo
+            frame; los joins con calendario/precios se resuelven por índice.
+            'copy': ruta original, cada paso copia (y algunos reordenan) el frame.
 
         Returns
         -------
@@ -107,13 +178,26 @@ class FeatureEngineeringPipeline:
         3. Event/SNAP features (del calendario)
         4. Lag features (usan pasado)
         5. Rolling features (ventanas históricas)
+
+        El pico de RSS de cada paso queda en ``self.step_report``.
         """
+        if mode is None:
+            mode = self.config.get('features', {}).get('pipeline_mode', MODE_INPLACE)
+        if mode not in PIPELINE_MODES:
+            raise ValueError(f"Unknown pipeline mode: {mode}. Expected one of {PIPELINE_MODES}")
+        inplace = mode == MODE_INPLACE
+
         logger.info("="*60)
-        logger.info("STARTING FEATURE ENGINEERING PIPELINE")
+        logger.info(f"STARTING FEATURE ENGINEERING PIPELINE (mode={mode})")
         logger.info("="*60)
 
         start_time = time.time()
-        df = df_sales.copy()
+        self.step_report = []
+        if inplace and {'id', 'date'}.issubset(df_sales.columns):
+            # Única copia del pipeline: orden por serie y fecha para todos los pasos
+            df = df_sales.sort_values(['id', 'date'], kind='stable', ignore_index=True)
+        else:
+            df = df_sales.copy()
         initial_shape = df.shape
 
         logger.info(f"Initial shape: {initial_shape}")
@@ -126,15 +210,21 @@ class FeatureEngineeringPipeline:
         logger.info("STEP 1: Creating Calendar Features")
         logger.info("="*60)
 
-        step_start = time.time()
-        df = create_calendar_features(df, include_cyclical=True)
+        step_start = self._start_step()
+        df = create_calendar_features(df, include_cyclical=True, inplace=inplace)
 
         if df_calendar is not None:
-            df = create_holiday_features(df, calendar_df=df_calendar)
-
-        step_time = time.time() - step_start
-        logger.info(f"✓ Calendar features completed in {step_time:.2f}s")
-        logger.info(f"  Shape: {df.shape}")
+            features_config = self.config.get('features', {})
+            df = create_holiday_features(
+                df,
+                calendar_df=df_calendar,
+                holiday_rules=features_config.get('holiday_rules'),
+                holiday_events=features_config.get('holiday_events'),
+                major_holidays=features_config.get('major_holidays'),
+                inplace=inplace
+            )
+
+        self._finish_step('Calendar', step_start, df)
 
         # =====================================================================
         # STEP 2: PRICE FEATURES
@@ -144,24 +234,25 @@ class FeatureEngineeringPipeline:
             logger.info("STEP 2: Creating Price Features")
             logger.info("="*60)
 
-            step_start = time.time()
+            step_start = self._start_step()
 
             # Merge prices
             logger.info("  Merging price data")
             if 'wm_yr_wk' in df.columns and 'wm_yr_wk' in df_prices.columns:
                 merge_cols = ['store_id', 'item_id', 'wm_yr_wk']
-                df = df.merge(df_prices, on=merge_cols, how='left')
+                if inplace:
+                    df = left_join_inplace(df, df_prices, merge_cols)
+                else:
+                    df = df.merge(df_prices, on=merge_cols, how='left')
 
             # Create price features
             if 'sell_price' in df.columns:
-                df = create_price_features(df)
+                df = create_price_features(df, inplace=inplace)
 
                 if 'cat_id' in df.columns:
-                    df = create_price_category_features(df)
+                    df = create_price_category_features(df, inplace=inplace)
 
-            step_time = time.time() - step_start
-            logger.info(f"✓ Price features completed in {step_time:.2f}s")
-            logger.info(f"  Shape: {df.shape}")
+            self._finish_step('Price', step_start, df)
 
         # =====================================================================
         # STEP 3: EVENT & SNAP FEATURES
@@ -171,15 +262,13 @@ class FeatureEngineeringPipeline:
             logger.info("STEP 3: Creating Event & SNAP Features")
             logger.info("="*60)
 
-            step_start = time.time()
+            step_start = self._start_step()
 
-            df = create_event_features(df, calendar_df=df_calendar)
-            df = create_snap_features(df, calendar_df=df_calendar)
-            df = create_event_snap_interactions(df)
+            df = create_event_features(df, calendar_df=df_calendar, inplace=inplace)
+            df = create_snap_features(df, calendar_df=df_calendar, inplace=inplace)
+            df = create_event_snap_interactions(df, inplace=inplace)
 
-            step_time = time.time() - step_start
-            logger.info(f"✓ Event/SNAP features completed in {step_time:.2f}s")
-            logger.info(f"  Shape: {df.shape}")
+            self._finish_step('Event/SNAP', step_start, df)
 
         # =====================================================================
         # STEP 4: LAG FEATURES
@@ -188,19 +277,18 @@ class FeatureEngineeringPipeline:
         logger.info("STEP 4: Creating Lag Features")
         logger.info("="*60)
 
-        step_start = time.time()
+        step_start = self._start_step()
 
         lag_days = self.config.get('features', {}).get('lags', [1, 7, 28])
         df = create_lag_features(
             df,
             target_col='sales',
             group_cols=['id'],
-            lag_days=lag_days
+            lag_days=lag_days,
+            inplace=inplace
         )
 
-        step_time = time.time() - step_start
-        logger.info(f"✓ Lag features completed in {step_time:.2f}s")
-        logger.info(f"  Shape: {df.shape}")
+        self._finish_step('Lag', step_start, df)
 
         # =====================================================================
         # STEP 5: ROLLING FEATURES
@@ -209,26 +297,32 @@ class FeatureEngineeringPipeline:
         logger.info("STEP 5: Creating Rolling Features")
         logger.info("="*60)
 
-        step_start = time.time()
+        step_start = self._start_step()
 
         windows = self.config.get('features', {}).get('rolling_windows', [7, 28])
         functions = self.config.get('features', {}).get('rolling_functions', ['mean', 'std'])
+        rolling_engine = self.config.get('features', {}).get('rolling_engine', 'numpy')
+        rolling_n_jobs = self.config.get('features', {}).get('rolling_n_jobs', -1)
 
         df = create_rolling_features(
             df,
             target_col='sales',
             group_cols=['id'],
             windows=windows,
-            functions=functions
+            functions=functions,
+            engine=rolling_engine,
+            n_jobs=rolling_n_jobs,
+            inplace=inplace
         )
 
         if include_advanced:
             logger.info("  Creating advanced rolling features")
-            df = create_rolling_features_advanced(df, windows=[7, 28])
+            df = create_rolling_features_advanced(
+                df, windows=ADVANCED_ROLLING_WINDOWS, engine=rolling_engine, n_jobs=rolling_n_jobs,
+                inplace=inplace
+            )
 
-        step_time = time.time() - step_start
-        logger.info(f"✓ Rolling features completed in {step_time:.2f}s")
-        logger.info(f"  Shape: {df.shape}")
+        self._finish_step('Rolling', step_start, df)
 
         # =====================================================================
         # SUMMARY
@@ -243,6 +337,9 @@ class FeatureEngineeringPipeline:
         logger.info(f"Features created: {df.shape[1] - initial_shape[1]}")
         logger.info(f"Total time: {total_time:.2f}s ({total_time/60:.2f} min)")
         logger.info(f"Memory usage: {df.memory_usage(deep=True).sum() / 1024**2:.2f} MB")
+        peaks = [s['peak_rss_mb'] for s in self.step_report if s['peak_rss_mb'] is not None]
+        if peaks:
+            logger.info(f"Peak RSS (max over steps): {max(peaks):,.1f} MB")
 
         # Catalog features
         self.feature_catalog = [col for col in df.columns if col not in df_sales.columns]
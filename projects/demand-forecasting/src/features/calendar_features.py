@@ -9,7 +9,7 @@ Tel: +52 55 4189 3428
 
 import pandas as pd
 import numpy as np
-from typing import List, Dict
+from typing import Dict, Iterable, List, Optional, Tuple
 import logging
 
 # Configure logging
@@ -21,6 +21,7 @@ def create_calendar_features(
     df: pd.DataFrame,
     date_col: str = 'date',
     include_cyclical: bool = True,
+    inplace: bool = False,
     **kwargs
 ) -> pd.DataFrame:
     """
@@ -34,6 +35,8 @@ def create_calendar_features(
         Nombre de la columna de fecha
     include_cyclical : bool
         Si incluir encoding cíclico (sin, cos) para variables circulares
+    inplace : bool
+        Si True, añade las columnas sobre ``df`` sin copiarlo (default: False)
 
     Returns
     -------
@@ -57,7 +60,8 @@ def create_calendar_features(
     """
     logger.info("Creating calendar features")
 
-    df_result = df.copy()
+    original_cols = set(df.columns)
+    df_result = df if inplace else df.copy()
 
     # Asegurar que date_col es datetime
     if not pd.api.types.is_datetime64_any_dtype(df_result[date_col]):
@@ -100,21 +104,155 @@ def create_calendar_features(
         df_result['dom_cos'] = np.cos(2 * np.pi * df_result['day_of_month'] / 31)
 
     # Contar features creadas
-    new_cols = [c for c in df_result.columns if c not in df.columns]
+    new_cols = [c for c in df_result.columns if c not in original_cols]
     logger.info(f"✓ Created {len(new_cols)} calendar features")
 
     return df_result
 
 
+# Reglas por defecto para days_to_* / near_* (configurables vía holiday_rules)
+# - month + day: fecha fija
+# - month + weekday (0=lunes) + nth: n-ésimo día de la semana del mes (nth=-1: último)
+DEFAULT_HOLIDAY_RULES = {
+    'christmas': {'month': 12, 'day': 25},
+    'thanksgiving': {'month': 11, 'weekday': 3, 'nth': 4},  # 4to jueves de noviembre
+}
+
+# Fechas fijas (MM-DD) que activan is_major_holiday
+DEFAULT_MAJOR_HOLIDAYS = [
+    '01-01',  # New Year
+    '07-04',  # Independence Day
+    '12-25',  # Christmas
+]
+
+_DAY_NS = 86_400_000_000_000
+
+
+def _holiday_date(year: int, rule: Dict) -> pd.Timestamp:
+    """Fecha de un holiday para un año según su regla."""
+    month = int(rule['month'])
+    if 'day' in rule:
+        return pd.Timestamp(year=year, month=month, day=int(rule['day']))
+
+    weekday = int(rule['weekday'])
+    nth = int(rule.get('nth', 1))
+    if nth > 0:
+        first = pd.Timestamp(year=year, month=month, day=1)
+        return first + pd.Timedelta(days=(weekday - first.dayofweek) % 7 + 7 * (nth - 1))
+
+    last = pd.Timestamp(year=year, month=month, day=1) + pd.offsets.MonthEnd(0)
+    return last - pd.Timedelta(days=(last.dayofweek - weekday) % 7 + 7 * (-nth - 1))
+
+
+def build_holiday_table(
+    years: Iterable[int],
+    holiday_rules: Optional[Dict[str, Dict]] = None
+) -> pd.DataFrame:
+    """
+    Construir la tabla de holidays (una fila por holiday y año).
+
+    Parameters
+    ----------
+    years : Iterable[int]
+        Años a cubrir (incluir el año siguiente al último para days_to_*)
+    holiday_rules : Dict[str, Dict], optional
+        Reglas por holiday (default: DEFAULT_HOLIDAY_RULES)
+
+    Returns
+    -------
+    pd.DataFrame
+        Columnas ['holiday', 'date']
+    """
+    rules = DEFAULT_HOLIDAY_RULES if holiday_rules is None else holiday_rules
+    rows = [
+        {'holiday': name, 'date': _holiday_date(year, rule)}
+        for name, rule in rules.items()
+        for year in sorted(set(int(y) for y in years))
+    ]
+    return pd.DataFrame(rows, columns=['holiday', 'date'])
+
+
+def holiday_table_from_calendar(
+    calendar_df: pd.DataFrame,
+    events: List[str],
+    date_col: str = 'date'
+) -> pd.DataFrame:
+    """
+    Tabla de holidays a partir de los eventos del calendario M5
+    (p. ej. ``['SuperBowl', 'Easter']`` -> days_to_superbowl, days_to_easter).
+    """
+    frames = []
+    for col in ['event_name_1', 'event_name_2']:
+        if col in calendar_df.columns:
+            rows = calendar_df.loc[calendar_df[col].isin(events), [col, date_col]]
+            frames.append(rows.rename(columns={col: 'holiday', date_col: 'date'}))
+    if not frames:
+        return pd.DataFrame(columns=['holiday', 'date'])
+
+    table = pd.concat(frames, ignore_index=True)
+    table['holiday'] = table['holiday'].str.lower()
+    table['date'] = pd.to_datetime(table['date'])
+    return table.drop_duplicates().reset_index(drop=True)
+
+
+def _unique_dates(dates: pd.Series) -> Tuple[pd.DatetimeIndex, np.ndarray]:
+    """
+    Fechas únicas y código de cada fila (-1 para NaT).
+
+    Si todas las fechas son medianoche (caso M5) el código es el número de días
+    desde la primera fecha: una resta y una división sobre int64, sin hashing.
+    """
+    values = dates.to_numpy(dtype='datetime64[ns]')
+    ints = values.view(np.int64)
+    nat = np.isnat(values)
+    has_nat = bool(nat.any())
+    observed = ints[~nat] if has_nat else ints
+
+    if len(observed):
+        lo = int(observed.min())
+        hi = int(observed.max())
+        if lo % _DAY_NS == 0 and (hi - lo) // _DAY_NS < 1_000_000:
+            remainder = ints - lo
+            codes = remainder // _DAY_NS
+            remainder -= codes * _DAY_NS
+            if has_nat:
+                remainder[nat] = 0
+                codes[nat] = -1
+            if not remainder.any():
+                uniques = pd.date_range(pd.Timestamp(lo), pd.Timestamp(hi), freq='D')
+                return uniques, codes
+
+    codes, uniques = pd.factorize(dates, sort=False)
+    return pd.DatetimeIndex(uniques), codes
+
+
+def _broadcast(per_date: np.ndarray, codes: np.ndarray, fill, has_missing: bool) -> np.ndarray:
+    """Lleva un valor por fecha única a cada fila (``fill`` para códigos -1)."""
+    if has_missing:
+        if isinstance(fill, float) and np.isnan(fill):
+            per_date = per_date.astype(np.float64)
+        per_date = np.append(per_date, fill)
+    return per_date.take(codes)
+
+
 def create_holiday_features(
     df: pd.DataFrame,
     calendar_df: pd.DataFrame = None,
     date_col: str = 'date',
+    holiday_table: Optional[pd.DataFrame] = None,
+    holiday_rules: Optional[Dict[str, Dict]] = None,
+    holiday_events: Optional[List[str]] = None,
+    major_holidays: Optional[List[str]] = None,
+    proximity_days: int = 7,
+    inplace: bool = False,
     **kwargs
 ) -> pd.DataFrame:
     """
     Crear features basadas en días festivos y eventos especiales.
 
+    Las features se calculan una sola vez por fecha única (~1,969 en M5) y se
+    propagan a cada fila con ``take``. days_to_* es int16 y las banderas int8.
+
     Parameters
     ----------
     df : pd.DataFrame
@@ -123,6 +261,20 @@ def create_holiday_features(
         DataFrame de calendario con eventos (M5 calendar.csv)
     date_col : str
         Columna de fecha
+    holiday_table : pd.DataFrame, optional
+        Tabla ['holiday', 'date'] con las ocurrencias de cada holiday
+        (ver ``build_holiday_table`` / ``holiday_table_from_calendar``).
+        Si se omite se construye con ``holiday_rules`` para los años de ``df``.
+    holiday_rules : Dict[str, Dict], optional
+        Reglas por holiday (default: DEFAULT_HOLIDAY_RULES)
+    holiday_events : List[str], optional
+        Eventos de ``calendar_df`` a añadir a la tabla (p. ej. ['SuperBowl'])
+    major_holidays : List[str], optional
+        Fechas 'MM-DD' de is_major_holiday (default: DEFAULT_MAJOR_HOLIDAYS)
+    proximity_days : int
+        Umbral en días para near_* (default: 7)
+    inplace : bool
+        Si True, añade las columnas sobre ``df`` sin copiarlo (default: False)
 
     Returns
     -------
@@ -131,76 +283,67 @@ def create_holiday_features(
 
     Features Creadas
     ----------------
-    - days_to_christmas: Días hasta navidad
-    - days_to_thanksgiving: Días hasta thanksgiving
-    - days_to_superbowl: Días hasta superbowl
+    - days_to_<holiday>: Días hasta la próxima ocurrencia (christmas, thanksgiving
+      por defecto; p. ej. days_to_superbowl con holiday_events=['SuperBowl'])
+    - near_<holiday>: Boolean, próxima ocurrencia a <= proximity_days
     - is_major_holiday: Boolean para fechas importantes
     """
     logger.info("Creating holiday features")
 
-    df_result = df.copy()
+    original_cols = set(df.columns)
+    df_result = df if inplace else df.copy()
 
     # Asegurar datetime
     if not pd.api.types.is_datetime64_any_dtype(df_result[date_col]):
         df_result[date_col] = pd.to_datetime(df_result[date_col])
 
-    # Definir holidays importantes
-    def days_to_christmas(date):
-        """Calcular días hasta próxima navidad"""
-        year = date.year
-        christmas = pd.Timestamp(f'{year}-12-25')
-
-        # Si ya pasó navidad este año, usar próximo año
-        if date > christmas:
-            christmas = pd.Timestamp(f'{year + 1}-12-25')
-
-        return (christmas - date).days
-
-    def days_to_thanksgiving(date):
-        """Días hasta próximo Thanksgiving (4to jueves de noviembre)"""
-        year = date.year
-
-        # Encontrar 4to jueves de noviembre
-        nov_first = pd.Timestamp(f'{year}-11-01')
-        # Primer jueves
-        days_to_thursday = (3 - nov_first.dayofweek) % 7
-        first_thursday = nov_first + pd.Timedelta(days=days_to_thursday)
-        # Cuarto jueves
-        thanksgiving = first_thursday + pd.Timedelta(weeks=3)
-
-        # Si ya pasó, usar próximo año
-        if date > thanksgiving:
-            year += 1
-            nov_first = pd.Timestamp(f'{year}-11-01')
-            days_to_thursday = (3 - nov_first.dayofweek) % 7
-            first_thursday = nov_first + pd.Timedelta(days=days_to_thursday)
-            thanksgiving = first_thursday + pd.Timedelta(weeks=3)
-
-        return (thanksgiving - date).days
-
-    # Aplicar funciones
-    logger.info("  Calculating days to major holidays")
-    df_result['days_to_christmas'] = df_result[date_col].apply(days_to_christmas)
-    df_result['days_to_thanksgiving'] = df_result[date_col].apply(days_to_thanksgiving)
+    uniques, codes = _unique_dates(df_result[date_col])
+    unique_ns = uniques.asi8
+    has_nat = bool(len(codes)) and int(codes.min()) < 0
+
+    if holiday_table is None:
+        years = uniques.year.dropna().unique() if len(uniques) else []
+        years = list(years) + [y + 1 for y in years]
+        holiday_table = build_holiday_table(years, holiday_rules)
+        if holiday_events and calendar_df is not None:
+            holiday_table = pd.concat(
+                [holiday_table, holiday_table_from_calendar(calendar_df, holiday_events)],
+                ignore_index=True
+            )
+
+    # Aplicar por fecha única: próxima ocurrencia >= fecha
+    logger.info(f"  Calculating days to holidays ({len(uniques):,} unique dates)")
+    holiday_names = list(dict.fromkeys(holiday_table['holiday']))
+    days_to = {}
+    for name in holiday_names:
+        occurrences = np.sort(
+            pd.to_datetime(holiday_table.loc[holiday_table['holiday'] == name, 'date']).to_numpy(
+                dtype='datetime64[ns]'
+            ).view(np.int64)
+        )
+        idx = np.searchsorted(occurrences, unique_ns, side='left')
+        found = idx < len(occurrences)
+        days = np.full(len(unique_ns), np.nan)
+        days[found] = (occurrences[idx[found]] - unique_ns[found]) // _DAY_NS
+        # Enteros compactos (<= 366 días); float sólo si falta alguna ocurrencia
+        days_to[name] = days.astype(np.int16) if found.all() else days
+
+    for name in holiday_names:
+        df_result[f'days_to_{name}'] = _broadcast(days_to[name], codes, np.nan, has_nat)
 
     # Proximity features (cercano a holiday = 1, lejos = 0)
-    df_result['near_christmas'] = (df_result['days_to_christmas'] <= 7).astype(int)
-    df_result['near_thanksgiving'] = (df_result['days_to_thanksgiving'] <= 7).astype(int)
-
-    # Major holidays (lista de fechas específicas)
-    major_holidays = [
-        '-01-01',  # New Year
-        '-07-04',  # Independence Day
-        '-12-25',  # Christmas
-    ]
-
-    df_result['is_major_holiday'] = 0
-    for holiday_suffix in major_holidays:
-        for year in df_result['year'].unique():
-            holiday_date = pd.Timestamp(f'{year}{holiday_suffix}')
-            df_result.loc[df_result[date_col] == holiday_date, 'is_major_holiday'] = 1
-
-    new_cols = [c for c in df_result.columns if c not in df.columns]
+    for name in holiday_names:
+        near = (days_to[name] <= proximity_days).astype(np.int8)
+        df_result[f'near_{name}'] = _broadcast(near, codes, 0, has_nat)
+
+    # Major holidays (lista de fechas MM-DD)
+    major = DEFAULT_MAJOR_HOLIDAYS if major_holidays is None else major_holidays
+    is_major = uniques.strftime('%m-%d').isin(major) & (uniques == uniques.normalize())
+    df_result['is_major_holiday'] = _broadcast(
+        np.asarray(is_major, dtype=np.int8), codes, 0, has_nat
+    )
+
+    new_cols = [c for c in df_result.columns if c not in original_cols]
     logger.info(f"✓ Created {len(new_cols)} holiday features")
 
     return df_result
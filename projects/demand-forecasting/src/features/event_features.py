@@ -12,6 +12,8 @@ import numpy as np
 from typing import List, Dict, Optional
 import logging
 
+from .frame_utils import left_join_inplace
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -21,6 +23,7 @@ def create_event_features(
     df: pd.DataFrame,
     calendar_df: Optional[pd.DataFrame] = None,
     date_col: str = 'date',
+    inplace: bool = False,
     **kwargs
 ) -> pd.DataFrame:
     """
@@ -34,6 +37,8 @@ def create_event_features(
         DataFrame del calendario M5 con eventos
     date_col : str
         Columna de fecha
+    inplace : bool
+        Si True, añade las columnas sobre ``df`` sin copiarlo (default: False)
 
     Returns
     -------
@@ -50,7 +55,8 @@ def create_event_features(
     """
     logger.info("Creating event features")
 
-    df_result = df.copy()
+    original_cols = set(df.columns)
+    df_result = df if inplace else df.copy()
 
     if calendar_df is not None:
         logger.info("  Merging with calendar data")
@@ -79,11 +85,14 @@ def create_event_features(
             calendar_events = calendar_df[event_cols].copy()
 
             # Merge
-            df_result = df_result.merge(
-                calendar_events,
-                on=merge_col,
-                how='left'
-            )
+            if inplace:
+                df_result = left_join_inplace(df_result, calendar_events, merge_col)
+            else:
+                df_result = df_result.merge(
+                    calendar_events,
+                    on=merge_col,
+                    how='left'
+                )
 
     # 1. Boolean: hay evento
     logger.info("  Creating is_event feature")
@@ -113,7 +122,7 @@ def create_event_features(
     else:
         df_result['num_events'] = df_result['is_event']
 
-    new_cols = [c for c in df_result.columns if c not in df.columns]
+    new_cols = [c for c in df_result.columns if c not in original_cols]
     logger.info(f"✓ Created {len(new_cols)} event features")
 
     return df_result
@@ -123,6 +132,7 @@ def create_snap_features(
     df: pd.DataFrame,
     calendar_df: Optional[pd.DataFrame] = None,
     state_col: str = 'state_id',
+    inplace: bool = False,
     **kwargs
 ) -> pd.DataFrame:
     """
@@ -139,6 +149,8 @@ def create_snap_features(
         DataFrame del calendario con SNAP info
     state_col : str
         Columna de estado
+    inplace : bool
+        Si True, añade las columnas sobre ``df`` sin copiarlo (default: False)
 
     Returns
     -------
@@ -153,7 +165,8 @@ def create_snap_features(
     """
     logger.info("Creating SNAP features")
 
-    df_result = df.copy()
+    original_cols = set(df.columns)
+    df_result = df if inplace else df.copy()
 
     if calendar_df is not None:
         logger.info("  Merging SNAP data from calendar")
@@ -178,11 +191,14 @@ def create_snap_features(
             calendar_snap = calendar_df[snap_cols].copy()
 
             # Merge
-            df_result = df_result.merge(
-                calendar_snap,
-                on=merge_col,
-                how='left'
-            )
+            if inplace:
+                df_result = left_join_inplace(df_result, calendar_snap, merge_col)
+            else:
+                df_result = df_result.merge(
+                    calendar_snap,
+                    on=merge_col,
+                    how='left'
+                )
 
             # Features agregadas
             logger.info("  Creating aggregated SNAP features")
@@ -208,7 +224,7 @@ def create_snap_features(
                     (df_result[state_col] == state) & (df_result[snap_col] == 1)
                 ).astype(int)
 
-    new_cols = [c for c in df_result.columns if c not in df.columns]
+    new_cols = [c for c in df_result.columns if c not in original_cols]
     logger.info(f"✓ Created {len(new_cols)} SNAP features")
 
     return df_result
@@ -217,6 +233,7 @@ def create_snap_features(
 def create_event_snap_interactions(
     df: pd.DataFrame,
     category_col: str = 'cat_id',
+    inplace: bool = False,
     **kwargs
 ) -> pd.DataFrame:
     """
@@ -230,6 +247,8 @@ def create_event_snap_interactions(
         DataFrame con event y SNAP features
     category_col : str
         Columna de categoría
+    inplace : bool
+        Si True, añade las columnas sobre ``df`` sin copiarlo (default: False)
 
     Returns
     -------
@@ -238,7 +257,8 @@ def create_event_snap_interactions(
     """
     logger.info("Creating event × category and SNAP × category interactions")
 
-    df_result = df.copy()
+    original_cols = set(df.columns)
+    df_result = df if inplace else df.copy()
 
     # Event × Category
     if 'is_event' in df_result.columns and category_col in df_result.columns:
@@ -258,7 +278,7 @@ def create_event_snap_interactions(
             (df_result['snap_any'] == 1) & (df_result[category_col] == 'FOODS')
         ).astype(int)
 
-    new_cols = [c for c in df_result.columns if c not in df.columns]
+    new_cols = [c for c in df_result.columns if c not in original_cols]
     logger.info(f"✓ Created {len(new_cols)} interaction features")
 
     return df_result
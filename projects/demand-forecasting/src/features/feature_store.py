@@ -0,0 +1,399 @@
+"""
+Feature Store Module
+Base de features particionada por tienda y mes sobre datasets de pyarrow
+
+- Escribe la base en un dataset parquet con particiones hive
+  ``store_id=<tienda>/year_month=<YYYY-MM>/part-*.parquet`` y estadísticas min/max
+  por row group
+- Lee cortes por (tiendas, items, rango de fechas) empujando los filtros a
+  pyarrow: las particiones descartadas no se abren y los row groups cuyo
+  min/max no cruza el filtro no se leen
+- La misma API de lectura acepta el parquet monolítico anterior
+  (``sales_with_features.parquet``) o un directorio sin particiones
+
+Autor: Ing. Daniel Varela Perez
+Email: bedaniele0@gmail.com
+Tel: +52 55 4189 3428
+"""
+
+import logging
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+STORE_COL = 'store_id'
+# 'month' ya es una feature de calendario (1-12): la partición usa 'year_month'
+MONTH_COL = 'year_month'
+PARTITION_COLS = [STORE_COL, MONTH_COL]
+
+# Filas máximas por row group: con la base ordenada por (id, date) cada row
+# group cubre pocos items, así que el filtro por item_id poda por min/max
+DEFAULT_ROW_GROUP_ROWS = 1 << 16
+
+# Filas por lote al convertir desde un DataFrame o un parquet monolítico
+DEFAULT_BATCH_ROWS = 1 << 20
+
+PathLike = Union[str, Path]
+
+
+def _partitioning() -> ds.Partitioning:
+    return ds.partitioning(
+        pa.schema([(STORE_COL, pa.string()), (MONTH_COL, pa.string())]),
+        flavor='hive'
+    )
+
+
+def is_feature_store(path: PathLike) -> bool:
+    """True si ``path`` es un directorio con particiones ``store_id=...``."""
+    path = Path(path)
+    return path.is_dir() and any(path.glob(f'{STORE_COL}=*'))
+
+
+def open_feature_store(path: PathLike) -> ds.Dataset:
+    """
+    Abrir la base de features como dataset de pyarrow.
+
+    Con particiones hive, ``store_id`` y ``year_month`` se leen de los directorios;
+    un parquet monolítico o un directorio plano se abren tal cual.
+    """
+    if is_feature_store(path):
+        return ds.dataset(str(path), format='parquet', partitioning=_partitioning())
+    return ds.dataset(str(path), format='parquet')
+
+
+def _stored_column_order(schema: pa.Schema) -> List[str]:
+    """Columnas en el orden original del DataFrame (la partición va al final en el dataset)."""
+    names = [c for c in schema.names if c != MONTH_COL]
+    written = [c['name'] for c in (schema.pandas_metadata or {}).get('columns', [])]
+    ordered = [c for c in written if c in names]
+    return ordered + [c for c in names if c not in ordered]
+
+
+def build_filter(
+    schema: pa.Schema,
+    stores: Optional[Sequence[str]] = None,
+    items: Optional[Sequence[str]] = None,
+    start_date=None,
+    end_date=None,
+    date_col: str = 'date'
+) -> Optional[ds.Expression]:
+    """
+    Expresión de filtro para ``Dataset.to_table``.
+
+    Las fechas son inclusivas. Si el dataset tiene la partición ``year_month``, el
+    rango de fechas también se aplica sobre ella para no abrir los archivos de
+    meses fuera del rango.
+    """
+    conditions = []
+    if stores is not None:
+        conditions.append(ds.field(STORE_COL).isin(list(stores)))
+    if items is not None:
+        conditions.append(ds.field('item_id').isin(list(items)))
+
+    date_type = schema.field(date_col).type if date_col in schema.names else None
+    has_month = MONTH_COL in schema.names
+    if start_date is not None:
+        start = pd.Timestamp(start_date)
+        conditions.append(ds.field(date_col) >= pa.scalar(start, type=date_type))
+        if has_month:
+            conditions.append(ds.field(MONTH_COL) >= f'{start:%Y-%m}')
+    if end_date is not None:
+        end = pd.Timestamp(end_date)
+        conditions.append(ds.field(date_col) <= pa.scalar(end, type=date_type))
+        if has_month:
+            conditions.append(ds.field(MONTH_COL) <= f'{end:%Y-%m}')
+
+    if not conditions:
+        return None
+    expression = conditions[0]
+    for condition in conditions[1:]:
+        expression = expression & condition
+    return expression
+
+
+def read_feature_store(
+    path: PathLike,
+    columns: Optional[List[str]] = None,
+    stores: Optional[Sequence[str]] = None,
+    items: Optional[Sequence[str]] = None,
+    start_date=None,
+    end_date=None,
+    date_col: str = 'date',
+    categorical: Sequence[str] = ('item_id', 'store_id')
+) -> pd.DataFrame:
+    """
+    Leer un corte de la base de features.
+
+    Parameters
+    ----------
+    path : str or Path
+        Feature store particionado, directorio plano o parquet monolítico
+    columns : List[str], optional
+        Columnas a leer (default: todas menos ``year_month``)
+    stores, items : Sequence[str], optional
+        Tiendas / items a incluir
+    start_date, end_date : optional
+        Rango de fechas inclusivo
+    categorical : Sequence[str]
+        Columnas de texto que se devuelven como categorical (códigos int)
+
+    Returns
+    -------
+    pd.DataFrame
+        Filas del corte, en el orden de ``columns``
+    """
+    dataset = open_feature_store(path)
+    if columns is None:
+        columns = _stored_column_order(dataset.schema)
+    missing = [c for c in columns if c not in dataset.schema.names]
+    if missing:
+        raise ValueError(f"Columns missing in feature store: {missing}")
+
+    expression = build_filter(dataset.schema, stores, items, start_date, end_date, date_col)
+    table = dataset.to_table(columns=list(columns), filter=expression)
+
+    for col in categorical:
+        if col in table.column_names and pa.types.is_string(table.schema.field(col).type):
+            index = table.column_names.index(col)
+            table = table.set_column(index, col, table.column(col).dictionary_encode())
+
+    logger.info(
+        f"Feature store slice: {table.num_rows:,} rows x {table.num_columns} columns "
+        f"(stores={stores}, items={None if items is None else len(items)}, "
+        f"dates={start_date}..{end_date})"
+    )
+    return table.to_pandas()
+
+
+def iter_feature_store(
+    path: PathLike,
+    columns: Optional[List[str]] = None,
+    stores: Optional[Sequence[str]] = None,
+    items: Optional[Sequence[str]] = None,
+    start_date=None,
+    end_date=None,
+    date_col: str = 'date',
+    batch_rows: int = DEFAULT_BATCH_ROWS
+) -> Iterator[pd.DataFrame]:
+    """
+    Recorrer un corte de la base de features en DataFrames de hasta
+    ``batch_rows`` filas (mismos filtros que ``read_feature_store``), para
+    consumidores que acumulan por chunks sin materializar el corte completo.
+    """
+    dataset = open_feature_store(path)
+    if columns is None:
+        columns = _stored_column_order(dataset.schema)
+    expression = build_filter(dataset.schema, stores, items, start_date, end_date, date_col)
+    scanner = dataset.scanner(columns=list(columns), filter=expression, batch_size=batch_rows)
+    for batch in scanner.to_batches():
+        if batch.num_rows:
+            yield batch.to_pandas()
+
+
+def _with_year_month(batch: pa.RecordBatch, date_col: str) -> pa.RecordBatch:
+    year_month = pc.strftime(batch.column(date_col), format='%Y-%m')
+    return pa.RecordBatch.from_arrays(
+        batch.columns + [year_month],
+        schema=batch.schema.append(pa.field(MONTH_COL, pa.string()))
+    )
+
+
+def _partition_order(stores, dates) -> np.ndarray:
+    """
+    Permutación estable que agrupa las filas por (store_id, year_month).
+
+    El writer de pyarrow parte la entrada en tramos de <=32k filas y escribe la
+    porción de cada partición como un row group propio: con la base ordenada
+    por (id, date) cada tramo toca todas las particiones y los row groups
+    quedan de ~100 filas. Agrupando antes por partición (estable, así que el
+    orden id, date se conserva dentro de cada una) los row groups salen llenos.
+    """
+    store_codes, _ = pd.factorize(np.asarray(stores), sort=True)
+    months = np.asarray(dates, dtype='datetime64[M]').astype(np.int64)
+    months = months - months.min() if len(months) else months
+    key = store_codes.astype(np.int64) * (int(months.max()) + 1 if len(months) else 1) + months
+    return np.argsort(key, kind='stable')
+
+
+def _frame_batches(df: pd.DataFrame, batch_rows: int, date_col: str) -> Iterator[pa.RecordBatch]:
+    """Convierte ``df`` a Arrow por tramos agrupados por partición sin duplicar el frame completo."""
+    order = _partition_order(df[STORE_COL].to_numpy(), df[date_col].to_numpy())
+    for start in range(0, len(df), batch_rows):
+        chunk = df.take(order[start:start + batch_rows])
+        yield from pa.Table.from_pandas(chunk, preserve_index=False).to_batches()
+
+
+def _partition_sorted(batch: pa.RecordBatch, date_col: str) -> pa.RecordBatch:
+    order = _partition_order(
+        batch.column(STORE_COL).to_numpy(zero_copy_only=False),
+        batch.column(date_col).to_numpy(zero_copy_only=False)
+    )
+    return batch.take(pa.array(order))
+
+
+def _write_batches(
+    batches: Iterable[pa.RecordBatch],
+    path: PathLike,
+    date_col: str,
+    row_group_rows: int,
+    existing_data_behavior: str,
+    basename_template: str,
+    schema: Optional[pa.Schema] = None
+) -> None:
+    iterator = iter(batches)
+    first = next(iterator, None)
+    if first is None:
+        return
+
+    first = _with_year_month(first, date_col)
+    if schema is None:
+        schema = first.schema
+
+    def cast(batch: pa.RecordBatch) -> Iterator[pa.RecordBatch]:
+        yield from pa.Table.from_batches([batch]).cast(schema).to_batches()
+
+    def cast_batches():
+        yield from cast(first)
+        for batch in iterator:
+            yield from cast(_with_year_month(batch, date_col))
+
+    ds.write_dataset(
+        cast_batches(),
+        str(path),
+        schema=schema,
+        format='parquet',
+        partitioning=_partitioning(),
+        basename_template=basename_template,
+        max_rows_per_group=row_group_rows,
+        file_options=ds.ParquetFileFormat().make_write_options(write_statistics=True),
+        existing_data_behavior=existing_data_behavior,
+    )
+
+
+def write_feature_store(
+    df: pd.DataFrame,
+    path: PathLike,
+    date_col: str = 'date',
+    row_group_rows: int = DEFAULT_ROW_GROUP_ROWS,
+    batch_rows: int = DEFAULT_BATCH_ROWS
+) -> Path:
+    """
+    Escribir la base de features particionada por ``store_id`` y mes.
+
+    Las particiones presentes en ``df`` se reemplazan (reconstrucción
+    completa); el resto del dataset se conserva. Dentro de cada partición se
+    respeta el orden de ``df``: la salida de ``FeatureEngineeringPipeline``
+    (ordenada por id, date) deja cada row group con un rango corto de items.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Base de features con ``store_id`` y ``date_col``
+    path : str or Path
+        Directorio del feature store
+    row_group_rows : int
+        Filas máximas por row group
+
+    Returns
+    -------
+    Path
+        Directorio del feature store
+    """
+    path = Path(path)
+    _write_batches(
+        _frame_batches(df, batch_rows, date_col), path, date_col, row_group_rows,
+        existing_data_behavior='delete_matching', basename_template='part-{i}.parquet'
+    )
+    logger.info(f"✓ Feature store written: {len(df):,} rows -> {path}")
+    return path
+
+
+def append_feature_store(
+    df: pd.DataFrame,
+    path: PathLike,
+    date_col: str = 'date',
+    row_group_rows: int = DEFAULT_ROW_GROUP_ROWS
+) -> Path:
+    """
+    Añadir filas nuevas (modo incremental) sin tocar los archivos existentes.
+
+    Los archivos nuevos se llaman ``part-<inicio>-<fin>-<i>.parquet`` dentro de
+    su partición y se castean al schema del store.
+    """
+    path = Path(path)
+    schema = open_feature_store(path).schema if is_feature_store(path) else None
+    if schema is not None:
+        data_cols = [c for c in schema.names if c != MONTH_COL]
+        missing = [c for c in data_cols if c not in df.columns]
+        if missing:
+            raise ValueError(f"New rows are missing feature store columns: {missing}")
+        df = df[data_cols]
+
+    first, last = df[date_col].min(), df[date_col].max()
+    _write_batches(
+        _frame_batches(df, DEFAULT_BATCH_ROWS, date_col), path, date_col, row_group_rows,
+        existing_data_behavior='overwrite_or_ignore',
+        basename_template=f'part-{first:%Y%m%d}-{last:%Y%m%d}-{{i}}.parquet',
+        schema=schema
+    )
+    logger.info(f"  Appended {len(df):,} rows to feature store {path}")
+    return path
+
+
+def convert_parquet_to_store(
+    source: PathLike,
+    path: PathLike,
+    date_col: str = 'date',
+    row_group_rows: int = DEFAULT_ROW_GROUP_ROWS,
+    batch_rows: int = DEFAULT_BATCH_ROWS
+) -> Path:
+    """
+    Convertir el parquet monolítico al feature store leyendo por lotes
+    (la base completa nunca está en memoria). Subir ``batch_rows`` da row
+    groups más grandes a cambio de más memoria por lote.
+    """
+    parquet_file = pq.ParquetFile(str(source))
+    logger.info(
+        f"Converting {source} ({parquet_file.metadata.num_rows:,} rows) to feature store {path}"
+    )
+    # Cada lote se agrupa por partición; con lotes grandes los row groups
+    # quedan de ~batch_rows / particiones filas
+    batches = (
+        _partition_sorted(batch, date_col)
+        for batch in parquet_file.iter_batches(batch_size=batch_rows)
+    )
+    _write_batches(
+        batches, path, date_col, row_group_rows,
+        existing_data_behavior='delete_matching', basename_template='part-{i}.parquet'
+    )
+    logger.info(f"✓ Feature store written: {path}")
+    return Path(path)
+
+
+def main():
+    """Convertir ``sales_with_features.parquet`` al feature store particionado."""
+    import argparse
+
+    project_root = Path(__file__).resolve().parents[2]
+    processed = project_root / 'data' / 'processed'
+
+    parser = argparse.ArgumentParser(description='Partitioned feature store')
+    parser.add_argument('--source', type=str, default=str(processed / 'sales_with_features.parquet'))
+    parser.add_argument('--dest', type=str, default=str(processed / 'feature_store'))
+    parser.add_argument('--row-group-rows', type=int, default=DEFAULT_ROW_GROUP_ROWS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    convert_parquet_to_store(args.source, args.dest, row_group_rows=args.row_group_rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Frame Utilities Module
+Operaciones sobre DataFrames grandes sin copiar el frame completo
+
+Autor: Ing. Daniel Varela Perez
+Email: bedaniele0@gmail.com
+Tel: +52 55 4189 3428
+"""
+
+import pandas as pd
+from typing import List, Union
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def left_join_inplace(
+    df: pd.DataFrame,
+    right: pd.DataFrame,
+    on: Union[str, List[str]]
+) -> pd.DataFrame:
+    """
+    Equivalente a ``df.merge(right, on=on, how='left')`` que añade las columnas
+    de ``right`` sobre ``df`` en sitio, sin reconstruir el frame.
+
+    Cada fila de ``df`` toma la fila de ``right`` con la misma llave (índice vía
+    ``get_indexer``); sin coincidencia se rellena con NaN y los dtypes se
+    promueven igual que en ``merge``.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Frame principal (se modifica)
+    right : pd.DataFrame
+        Tabla de consulta (calendario, precios)
+    on : str or List[str]
+        Columnas llave
+
+    Returns
+    -------
+    pd.DataFrame
+        ``df`` con las columnas añadidas. Si ``right`` tiene llaves duplicadas o
+        columnas que colisionan con ``df`` se usa ``merge`` y se devuelve un frame
+        nuevo (mismas filas y columnas que la ruta original).
+    """
+    keys = [on] if isinstance(on, str) else list(on)
+    value_cols = [c for c in right.columns if c not in keys]
+
+    if any(c in df.columns for c in value_cols) or right.duplicated(keys).any():
+        logger.info("  Lookup join not applicable (duplicated keys or overlapping columns); using merge")
+        return df.merge(right, on=keys, how='left')
+
+    if len(keys) == 1:
+        indexer = pd.Index(right[keys[0]]).get_indexer(df[keys[0]])
+    else:
+        indexer = pd.MultiIndex.from_frame(right[keys]).get_indexer(
+            pd.MultiIndex.from_frame(df[keys])
+        )
+
+    for col in value_cols:
+        df[col] = right[col].array.take(indexer, allow_fill=True)
+
+    return df
@@ -0,0 +1,425 @@
+"""
+Incremental Feature Module
+Cálculo append-only de features para días nuevos de ventas
+
+En lugar de reconstruir toda la historia con ``FeatureEngineeringPipeline.run``,
+se toma por serie solo la cola de historia que necesitan lags y rolling
+(``required_lookback``), se calculan las features de las fechas nuevas y se
+añaden como un archivo más al dataset parquet de features.
+
+Autor: Ing. Daniel Varela Perez
+Email: bedaniele0@gmail.com
+Tel: +52 55 4189 3428
+"""
+
+import os
+import time
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from .build_features import ADVANCED_ROLLING_WINDOWS, MODE_INPLACE, FeatureEngineeringPipeline
+from .feature_store import (
+    append_feature_store,
+    is_feature_store,
+    open_feature_store,
+    read_feature_store,
+)
+from .price_features import create_price_category_features
+
+logger = logging.getLogger(__name__)
+
+# create_price_features: shift(4) y rolling de hasta 12 filas por (store_id, item_id)
+PRICE_LOOKBACK_ROWS = 12
+
+# Features calculadas sobre todos los precios de la categoría (no sobre una ventana)
+CATEGORY_PRICE_FEATURES = [
+    'price_vs_category_avg',
+    'price_percentile_in_cat',
+    'is_expensive_in_cat',
+    'is_cheap_in_cat',
+]
+
+
+def required_lookback(features_config: Dict, include_advanced: bool = True) -> int:
+    """
+    Filas de historia por serie que necesita la fila más antigua a calcular.
+
+    Parameters
+    ----------
+    features_config : Dict
+        Sección ``features`` del config (lags, rolling_windows)
+    include_advanced : bool
+        Si se calculan las rolling features avanzadas
+
+    Returns
+    -------
+    int
+        Máximo entre lags (L filas), rolling (w - 1), trend avanzado
+        (``diff(w)`` sobre la media de w días: 2w - 1) y price features
+    """
+    lags = features_config.get('lags', [1, 7, 28])
+    windows = features_config.get('rolling_windows', [7, 28])
+
+    needed = [PRICE_LOOKBACK_ROWS]
+    needed += [int(lag) for lag in lags]
+    needed += [int(w) - 1 for w in windows]
+    if include_advanced:
+        needed += [2 * int(w) - 1 for w in ADVANCED_ROLLING_WINDOWS]
+    return max(needed)
+
+
+def history_tail(
+    df: pd.DataFrame,
+    lookback: int,
+    id_col: str = 'id',
+    date_col: str = 'date'
+) -> pd.DataFrame:
+    """Últimas ``lookback`` filas de cada serie, ordenadas por (id, date)."""
+    ordered = df.sort_values([id_col, date_col], kind='stable')
+    return ordered.groupby(id_col, sort=False, observed=True).tail(lookback)
+
+
+def read_history_tail(
+    dataset_path: Union[str, Path],
+    columns: List[str],
+    lookback: int,
+    id_col: str = 'id',
+    date_col: str = 'date',
+    lookback_days: Optional[int] = None
+) -> pd.DataFrame:
+    """
+    Leer del dataset de features solo la cola de historia de cada serie.
+
+    Se leen únicamente ``columns`` (columnas crudas de ventas) y las fechas
+    posteriores a ``max(date) - lookback_days``; el filtro se empuja a pyarrow,
+    así que los archivos (o particiones de mes) más antiguos no se leen.
+
+    Parameters
+    ----------
+    dataset_path : str or Path
+        Feature store particionado o directorio del dataset parquet de features
+    columns : List[str]
+        Columnas a leer
+    lookback : int
+        Filas por serie (ver ``required_lookback``)
+    lookback_days : int, optional
+        Días a leer (default: ``lookback``, series diarias como M5)
+
+    Returns
+    -------
+    pd.DataFrame
+        Cola de historia ordenada por (id, date)
+    """
+    import pyarrow.compute as pc
+
+    dataset = open_feature_store(dataset_path)
+    missing = [c for c in columns if c not in dataset.schema.names]
+    if missing:
+        raise ValueError(f"Columns missing in feature dataset: {missing}")
+
+    max_date = pc.max(dataset.to_table(columns=[date_col]).column(date_col)).as_py()
+    if max_date is None:
+        return pd.DataFrame(columns=columns)
+
+    days = lookback if lookback_days is None else lookback_days
+    start = pd.Timestamp(max_date) - pd.Timedelta(days=days - 1)
+    history = read_feature_store(
+        dataset_path, columns=columns, start_date=start, date_col=date_col, categorical=()
+    )
+    return history_tail(history, lookback, id_col, date_col)
+
+
+def append_to_dataset(
+    df: pd.DataFrame,
+    dataset_path: Union[str, Path],
+    date_col: str = 'date'
+) -> Path:
+    """
+    Añadir ``df`` como un archivo nuevo del dataset parquet.
+
+    Si el dataset ya tiene archivos, la tabla se proyecta y castea a su schema
+    (falla si faltan columnas). La escritura es atómica: archivo temporal
+    oculto + ``os.replace``, así los lectores nunca ven un parquet a medias.
+    Sobre un feature store particionado se delega en ``append_feature_store``.
+
+    Returns
+    -------
+    Path
+        Ruta del archivo escrito (``part-<inicio>-<fin>.parquet``) o del feature store
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+
+    path = Path(dataset_path)
+    if is_feature_store(path):
+        append_feature_store(df, path, date_col=date_col)
+        return path
+    if path.is_file():
+        raise ValueError(
+            f"{path} is a single parquet file; incremental appends need a dataset directory"
+        )
+    path.mkdir(parents=True, exist_ok=True)
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if any(path.glob('*.parquet')):
+        schema = ds.dataset(str(path), format='parquet').schema
+        missing = [c for c in schema.names if c not in table.column_names]
+        if missing:
+            raise ValueError(f"New rows are missing dataset columns: {missing}")
+        table = table.select(schema.names).cast(schema)
+
+    first, last = df[date_col].min(), df[date_col].max()
+    target = path / f"part-{first:%Y%m%d}-{last:%Y%m%d}.parquet"
+    if target.exists():
+        raise FileExistsError(f"Dataset part already exists: {target}")
+
+    # Prefijo '.': pyarrow ignora el temporal al descubrir archivos del dataset
+    tmp = path / f".{target.name}.tmp{os.getpid()}"
+    pq.write_table(table, tmp)
+    os.replace(tmp, target)
+
+    logger.info(f"  Appended {len(df):,} rows to {target}")
+    return target
+
+
+class IncrementalFeatureBuilder:
+    """
+    Features para días nuevos usando solo la cola de historia necesaria.
+
+    Examples
+    --------
+    >>> builder = IncrementalFeatureBuilder(FeatureEngineeringPipeline('config/config.yaml'))
+    >>> new_features = builder.update_dataset(
+    ...     'data/processed/features', df_new_sales, df_calendar, df_prices
+    ... )
+    """
+
+    def __init__(
+        self,
+        pipeline: Optional[FeatureEngineeringPipeline] = None,
+        include_advanced: bool = True,
+        id_col: str = 'id',
+        date_col: str = 'date'
+    ):
+        """
+        Parameters
+        ----------
+        pipeline : FeatureEngineeringPipeline, optional
+            Pipeline (y config) usado para la reconstrucción completa
+        include_advanced : bool
+            Debe coincidir con el usado al construir el dataset
+        """
+        self.pipeline = pipeline or FeatureEngineeringPipeline()
+        self.include_advanced = include_advanced
+        self.id_col = id_col
+        self.date_col = date_col
+
+    @property
+    def lookback(self) -> int:
+        """Filas de historia por serie (ver ``required_lookback``)."""
+        return required_lookback(self.pipeline.config.get('features', {}), self.include_advanced)
+
+    def compute(
+        self,
+        df_new_sales: pd.DataFrame,
+        df_history: pd.DataFrame,
+        df_calendar: Optional[pd.DataFrame] = None,
+        df_prices: Optional[pd.DataFrame] = None,
+        category_reference: Optional[pd.DataFrame] = None
+    ) -> pd.DataFrame:
+        """
+        Calcular features solo para las filas de ``df_new_sales``.
+
+        Parameters
+        ----------
+        df_new_sales : pd.DataFrame
+            Filas crudas nuevas (mismas columnas que las ventas originales)
+        df_history : pd.DataFrame
+            Historia con al menos las columnas de ``df_new_sales`` (la tabla de
+            features persistida o su cola); solo se usan ``lookback`` filas por serie
+        df_calendar, df_prices : pd.DataFrame, optional
+            Igual que en ``FeatureEngineeringPipeline.run``
+        category_reference : pd.DataFrame, optional
+            Precios históricos (cat_id, sell_price) para las features por
+            categoría (default: los de ``df_history``)
+
+        Returns
+        -------
+        pd.DataFrame
+            Features de las fechas nuevas, ordenadas por (id, date), con las
+            mismas columnas que la reconstrucción completa
+        """
+        raw_cols = list(df_new_sales.columns)
+        missing = [c for c in raw_cols if c not in df_history.columns]
+        if missing:
+            raise ValueError(f"History is missing raw columns: {missing}")
+
+        first_new = df_new_sales[self.date_col].min()
+        last_known = df_history[self.date_col].max()
+        if pd.notna(last_known) and first_new <= last_known:
+            raise ValueError(
+                f"Incremental mode is append-only: new rows start at {first_new}, "
+                f"history already ends at {last_known}"
+            )
+
+        start = time.time()
+        tail = history_tail(df_history[raw_cols], self.lookback, self.id_col, self.date_col)
+        if len(tail):
+            tail[self.date_col] = tail[self.date_col].astype(df_new_sales[self.date_col].dtype)
+        combined = pd.concat([tail, df_new_sales], ignore_index=True)
+        logger.info(
+            f"Incremental features: {len(df_new_sales):,} new rows + "
+            f"{len(tail):,} history rows (lookback={self.lookback})"
+        )
+
+        features = self.pipeline.run(
+            combined, df_calendar, df_prices,
+            include_advanced=self.include_advanced, mode=MODE_INPLACE
+        )
+        del combined
+        result = features.loc[features[self.date_col] >= first_new].reset_index(drop=True)
+        del features
+
+        if all(c in result.columns for c in CATEGORY_PRICE_FEATURES):
+            result = self._recompute_category_features(result, df_history, category_reference)
+
+        logger.info(f"✓ Incremental features for {len(result):,} rows in {time.time() - start:.2f}s")
+        return result
+
+    def _recompute_category_features(
+        self,
+        result: pd.DataFrame,
+        df_history: pd.DataFrame,
+        category_reference: Optional[pd.DataFrame]
+    ) -> pd.DataFrame:
+        """Promedio/percentil por categoría sobre historia completa + filas nuevas."""
+        ref_cols = ['cat_id', 'sell_price']
+        if category_reference is None:
+            if not all(c in df_history.columns for c in ref_cols):
+                logger.warning("  No price history for category features; using new rows only")
+                category_reference = result[ref_cols].iloc[:0]
+            else:
+                category_reference = df_history[ref_cols]
+
+        reference = pd.concat(
+            [category_reference[ref_cols], result[ref_cols]], ignore_index=True
+        )
+        column_order = list(result.columns)
+        result = result.drop(columns=CATEGORY_PRICE_FEATURES)
+        result = create_price_category_features(result, reference=reference, inplace=True)
+        return result[column_order]
+
+    def update_dataset(
+        self,
+        dataset_path: Union[str, Path],
+        df_new_sales: pd.DataFrame,
+        df_calendar: Optional[pd.DataFrame] = None,
+        df_prices: Optional[pd.DataFrame] = None,
+        lookback_days: Optional[int] = None
+    ) -> pd.DataFrame:
+        """
+        Leer la cola de historia del dataset, calcular las fechas nuevas y
+        añadirlas como un archivo más.
+
+        Returns
+        -------
+        pd.DataFrame
+            Features añadidas
+        """
+        raw_cols = list(df_new_sales.columns)
+        history = read_history_tail(
+            dataset_path, raw_cols, self.lookback,
+            id_col=self.id_col, date_col=self.date_col, lookback_days=lookback_days
+        )
+
+        category_reference = None
+        ref_cols = ['cat_id', 'sell_price']
+        if df_prices is not None and 'cat_id' in raw_cols:
+            dataset = open_feature_store(dataset_path)
+            if all(c in dataset.schema.names for c in ref_cols):
+                category_reference = dataset.to_table(columns=ref_cols).to_pandas()
+
+        result = self.compute(df_new_sales, history, df_calendar, df_prices, category_reference)
+        append_to_dataset(result, dataset_path, date_col=self.date_col)
+        return result
+
+
+def check_incremental_consistency(
+    incremental: pd.DataFrame,
+    full: pd.DataFrame,
+    keys: Sequence[str] = ('id', 'date'),
+    date_col: str = 'date',
+    rtol: float = 1e-6,
+    atol: float = 1e-9
+) -> Dict[str, any]:
+    """
+    Comparar la salida incremental contra una reconstrucción completa en las
+    fechas que ambas cubren.
+
+    Parameters
+    ----------
+    incremental : pd.DataFrame
+        Salida de ``IncrementalFeatureBuilder``
+    full : pd.DataFrame
+        Salida de ``FeatureEngineeringPipeline.run`` sobre toda la historia
+    rtol, atol : float
+        Tolerancia para columnas numéricas: el std rolling de pandas sobre
+        precios float acumula redondeo desde el inicio de la serie, así que
+        difiere ~1e-9 relativo según dónde empiece la historia
+
+    Returns
+    -------
+    Dict
+        Reporte con filas comparadas, columnas faltantes, conteo de diferencias
+        por columna y ``consistent``
+    """
+    keys = list(keys)
+    overlap = full.loc[full[date_col].isin(incremental[date_col].unique())]
+    left = incremental.sort_values(keys, kind='stable').reset_index(drop=True)
+    right = overlap.sort_values(keys, kind='stable').reset_index(drop=True)
+
+    report = {
+        'rows': len(left),
+        'rows_full': len(right),
+        'missing_columns': [c for c in right.columns if c not in left.columns],
+        'extra_columns': [c for c in left.columns if c not in right.columns],
+        'mismatches': {},
+        'max_abs_diff': {},
+    }
+
+    if len(left) == len(right):
+        for col in [c for c in right.columns if c in left.columns]:
+            a, b = left[col], right[col]
+            if pd.api.types.is_numeric_dtype(a) and pd.api.types.is_numeric_dtype(b):
+                x = a.to_numpy(dtype=np.float64, na_value=np.nan)
+                y = b.to_numpy(dtype=np.float64, na_value=np.nan)
+                bad = ~np.isclose(x, y, rtol=rtol, atol=atol, equal_nan=True)
+                both = ~(np.isnan(x) | np.isnan(y))
+                if both.any():
+                    report['max_abs_diff'][col] = float(np.max(np.abs(x[both] - y[both])))
+            else:
+                a, b = a.astype(object), b.astype(object)
+                bad = ~((a == b) | (a.isna() & b.isna())).to_numpy()
+            if bad.any():
+                report['mismatches'][col] = int(bad.sum())
+
+    report['consistent'] = (
+        len(left) == len(right)
+        and not report['missing_columns']
+        and not report['extra_columns']
+        and not report['mismatches']
+    )
+
+    if report['consistent']:
+        logger.info(f"✓ Incremental features match full rebuild on {len(left):,} rows")
+    else:
+        logger.warning(
+            f"Incremental features differ from full rebuild: rows {len(left)} vs {len(right)}, "
+            f"mismatches={report['mismatches']}, missing={report['missing_columns']}"
+        )
+    return report
@@ -22,6 +22,7 @@ def create_lag_features(
     target_col: str = 'sales',
     group_cols: List[str] = ['id'],
     lag_days: List[int] = [1, 2, 3, 7, 14, 28],
+    inplace: bool = False,
     **kwargs
 ) -> pd.DataFrame:
     """
@@ -40,6 +41,8 @@ def create_lag_features(
         Columnas para agrupar (default: ['id'])
     lag_days : List[int]
         Días de lag a crear (default: [1, 2, 3, 7, 14, 28])
+    inplace : bool
+        Si True, añade las columnas sobre ``df`` sin copiarlo (default: False)
 
     Returns
     -------
@@ -60,7 +63,7 @@ def create_lag_features(
     """
     logger.info(f"Creating lag features: {lag_days}")
 
-    df_result = df.copy()
+    df_result = df if inplace else df.copy()
 
     # Crear cada lag feature
     for lag in lag_days:
@@ -9,7 +9,7 @@ Tel: +52 55 4189 3428
 
 import pandas as pd
 import numpy as np
-from typing import List, Dict
+from typing import Dict, List, Optional
 import logging
 
 # Configure logging
@@ -21,6 +21,7 @@ def create_price_features(
     df: pd.DataFrame,
     price_col: str = 'sell_price',
     group_cols: List[str] = ['store_id', 'item_id'],
+    inplace: bool = False,
     **kwargs
 ) -> pd.DataFrame:
     """
@@ -34,6 +35,9 @@ def create_price_features(
         Columna de precio
     group_cols : List[str]
         Columnas de agrupación
+    inplace : bool
+        Si True, añade las columnas sobre ``df`` sin copiarlo ni reordenarlo
+        cuando ya está en orden cronológico por grupo (default: False)
 
     Returns
     -------
@@ -50,11 +54,16 @@ def create_price_features(
     """
     logger.info("Creating price features")
 
-    df_result = df.copy()
+    original_cols = set(df.columns)
+    sort_cols = group_cols + ['wm_yr_wk'] if 'wm_yr_wk' in df.columns else group_cols
 
     # 1. Cambio porcentual de precio
     logger.info("  Creating price_change_pct")
-    df_result = df_result.sort_values(group_cols + ['wm_yr_wk'] if 'wm_yr_wk' in df_result.columns else group_cols)
+    if inplace and _is_sorted_within_groups(df, group_cols, 'wm_yr_wk'):
+        # El orden por grupo ya es cronológico: no hace falta reordenar ni copiar
+        df_result = df
+    else:
+        df_result = df.sort_values(sort_cols)
 
     df_result['price_lag_1'] = df_result.groupby(group_cols)[price_col].shift(1)
     df_result['price_change_pct'] = (
@@ -98,9 +107,11 @@ def create_price_features(
 
     # Limpiar columnas temporales
     temp_cols = ['price_lag_1', 'price_lag_4']
-    df_result = df_result.drop(columns=[c for c in temp_cols if c in df_result.columns])
+    for col in temp_cols:
+        if col in df_result.columns:
+            del df_result[col]
 
-    new_cols = [c for c in df_result.columns if c not in df.columns]
+    new_cols = [c for c in df_result.columns if c not in original_cols]
     logger.info(f"✓ Created {len(new_cols)} price features")
 
     return df_result
@@ -110,6 +121,8 @@ def create_price_category_features(
     df: pd.DataFrame,
     price_col: str = 'sell_price',
     category_col: str = 'cat_id',
+    inplace: bool = False,
+    reference: Optional[pd.DataFrame] = None,
     **kwargs
 ) -> pd.DataFrame:
     """
@@ -123,6 +136,12 @@ def create_price_category_features(
         Columna de precio
     category_col : str
         Columna de categoría
+    inplace : bool
+        Si True, añade las columnas sobre ``df`` sin copiarlo (default: False)
+    reference : pd.DataFrame, optional
+        Precios (``category_col``, ``price_col``) sobre los que se calculan el
+        promedio y el percentil por categoría. Por default es el propio ``df``;
+        el modo incremental pasa la historia completa más las filas nuevas.
 
     Returns
     -------
@@ -131,30 +150,78 @@ def create_price_category_features(
     """
     logger.info("Creating price vs category features")
 
-    df_result = df.copy()
+    original_cols = set(df.columns)
+    df_result = df if inplace else df.copy()
 
     # Precio promedio por categoría
     logger.info("  Calculating category average prices")
-    cat_avg_price = df_result.groupby(category_col)[price_col].transform('mean')
+    if reference is None:
+        cat_avg_price = df_result.groupby(category_col)[price_col].transform('mean')
+    else:
+        cat_avg = reference.groupby(category_col, observed=True)[price_col].mean()
+        cat_avg_price = cat_avg.reindex(df_result[category_col]).to_numpy()
     df_result['price_vs_category_avg'] = df_result[price_col] / (cat_avg_price + 1e-6)
 
     # Percentil del precio dentro de la categoría
     logger.info("  Calculating price percentile in category")
-    df_result['price_percentile_in_cat'] = (
-        df_result.groupby(category_col)[price_col]
-        .transform(lambda x: x.rank(pct=True))
-    )
+    if reference is None:
+        df_result['price_percentile_in_cat'] = (
+            df_result.groupby(category_col)[price_col]
+            .transform(lambda x: x.rank(pct=True))
+        )
+    else:
+        df_result['price_percentile_in_cat'] = _percentile_in_reference(
+            df_result, reference, price_col, category_col
+        )
 
     # Es precio alto/bajo en categoría
     df_result['is_expensive_in_cat'] = (df_result['price_percentile_in_cat'] > 0.75).astype(int)
     df_result['is_cheap_in_cat'] = (df_result['price_percentile_in_cat'] < 0.25).astype(int)
 
-    new_cols = [c for c in df_result.columns if c not in df.columns]
+    new_cols = [c for c in df_result.columns if c not in original_cols]
     logger.info(f"✓ Created {len(new_cols)} category price features")
 
     return df_result
 
 
+def _percentile_in_reference(
+    df: pd.DataFrame,
+    reference: pd.DataFrame,
+    price_col: str,
+    category_col: str
+) -> np.ndarray:
+    """
+    Equivalente a ``rank(pct=True)`` (método 'average') de cada precio de ``df``
+    dentro de los precios de su categoría en ``reference``.
+    """
+    prices = df[price_col].to_numpy(dtype=np.float64, na_value=np.nan)
+    categories = df[category_col]
+    result = np.full(len(df), np.nan)
+
+    for category, ref_prices in reference.groupby(category_col, observed=True)[price_col]:
+        ordered = np.sort(ref_prices.dropna().to_numpy(dtype=np.float64))
+        mask = (categories == category).to_numpy() & ~np.isnan(prices)
+        if not len(ordered) or not mask.any():
+            continue
+        below = np.searchsorted(ordered, prices[mask], side='left')
+        upto = np.searchsorted(ordered, prices[mask], side='right')
+        result[mask] = (below + (upto - below + 1) / 2) / len(ordered)
+
+    return result
+
+
+def _is_sorted_within_groups(
+    df: pd.DataFrame,
+    group_cols: List[str],
+    order_col: str
+) -> bool:
+    """True si ``order_col`` no decrece dentro de cada grupo (orden actual de filas)."""
+    if order_col not in df.columns:
+        return True
+    step = df.groupby(group_cols, sort=False)[order_col].diff()
+    return not (step < 0).any()
+
+
 def get_price_feature_info() -> Dict[str, any]:
     """
     Información sobre price features.
@@ -0,0 +1,419 @@
+"""
+Rolling Engine Module
+Motor vectorizado (sin Numba) para estadísticas móviles por serie
+
+Responsable de:
+- Ordenar una sola vez las filas por serie (y fecha) y exponer arrays de NumPy
+  contiguos por serie (``SeriesLayout``)
+- Calcular todas las ventanas y estadísticas (mean/sum/std/var/min/max/median/
+  cuantiles) en pasadas vectorizadas sobre esos arrays:
+    * mean/sum con sumas acumuladas; std/var con sumas acumuladas int64 (exactas)
+      si la serie es entera, o con dos pasadas por ventana en otro caso
+    * min/max con el algoritmo de van Herk/Gil-Werman (máximos por bloque)
+    * cuantiles ordenando una vista ``sliding_window_view`` de cada ventana
+- Procesar bloques de series en paralelo con hilos (NumPy libera el GIL)
+
+La semántica replica ``groupby(...).transform(lambda x: x.rolling(w, min_periods=1).agg(f))``:
+los NaN no cuentan como observación, una ventana sin observaciones devuelve NaN
+y std/var usan ``ddof=1``.
+
+Autor: Ing. Daniel Varela Perez
+Email: bedaniele0@gmail.com
+Tel: +52 55 4189 3428
+"""
+
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+logger = logging.getLogger(__name__)
+
+# Estadísticas soportadas por el motor; el resto usa la ruta de pandas
+SUPPORTED_FUNCTIONS = ('mean', 'sum', 'std', 'var', 'min', 'max', 'median')
+
+# Filas por bloque de trabajo: acota memoria temporal y el error de redondeo
+# de las sumas acumuladas (que se reinician en cada bloque)
+DEFAULT_CHUNK_ROWS = 1 << 18
+
+# Filas por lote al ordenar ventanas para cuantiles (filas x ventana elementos)
+_QUANTILE_BATCH_ELEMENTS = 1 << 22
+
+# Cota de |x| * ventana para calcular n * sum(x^2) - sum(x)^2 sin desbordar int64
+_INT_EXACT_LIMIT = 3.0e9
+
+_NAT_SENTINEL = np.iinfo(np.int64).max
+
+
+class RollingSpec(NamedTuple):
+    """Feature a calcular: nombre de columna, ventana, estadística y cuantil."""
+    name: str
+    window: int
+    stat: str
+    quantile: Optional[float] = None
+
+
+def resolve_n_jobs(n_jobs: Optional[int]) -> int:
+    """Convierte ``n_jobs`` (-1/None = todos los núcleos) a un número de hilos."""
+    if n_jobs is None or n_jobs < 1:
+        return os.cpu_count() or 1
+    return int(n_jobs)
+
+
+class SeriesLayout:
+    """
+    Permutación que deja cada serie en un rango contiguo.
+
+    ``order`` son las posiciones originales (``iloc``) en orden de serie; el
+    orden coincide con ``sort_values(group_cols + [date_col])`` (sort estable,
+    NaN/NaT al final). Sin ``date_col`` se conserva el orden original dentro de
+    cada serie, igual que ``groupby(...).transform``.
+    """
+
+    def __init__(self, order: np.ndarray, lengths: np.ndarray, valid: np.ndarray) -> None:
+        self.order = order
+        self.lengths = lengths
+        self.valid = valid
+
+    @classmethod
+    def from_frame(
+        cls,
+        df: pd.DataFrame,
+        group_cols: List[str],
+        date_col: Optional[str] = None,
+    ) -> 'SeriesLayout':
+        """
+        Construye la permutación con un único ``np.lexsort``.
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            DataFrame con las series
+        group_cols : List[str]
+            Columnas que identifican la serie
+        date_col : Optional[str]
+            Columna de fecha para ordenar dentro de la serie (opcional)
+
+        Returns
+        -------
+        SeriesLayout
+            Layout listo para ``gather``/``scatter``
+        """
+        group_ids = (
+            df.groupby(group_cols, sort=True, dropna=True, observed=True)
+            .ngroup()
+            .to_numpy(dtype=np.float64, na_value=np.nan)
+        )
+        # Claves nulas: groupby las descarta (NaN); se agrupan al final como sort_values
+        invalid = np.isnan(group_ids)
+        invalid_code = int(np.nanmax(group_ids)) + 1 if (~invalid).any() else 0
+        codes = np.where(invalid, invalid_code, group_ids).astype(np.int64)
+
+        if date_col is not None:
+            dates = df[date_col]
+            keys = pd.to_datetime(dates).to_numpy(dtype='datetime64[ns]').view(np.int64).copy()
+            keys[pd.isna(dates).to_numpy()] = _NAT_SENTINEL
+            order = np.lexsort((keys, codes))
+        else:
+            order = np.argsort(codes, kind='stable')
+
+        sorted_codes = codes[order]
+        n = len(order)
+        if n == 0:
+            return cls(order, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=bool))
+
+        change = np.flatnonzero(sorted_codes[1:] != sorted_codes[:-1]) + 1
+        bounds = np.concatenate(([0], change, [n]))
+        lengths = np.diff(bounds).astype(np.int64)
+        return cls(order, lengths, sorted_codes != invalid_code)
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    @property
+    def n_series(self) -> int:
+        return len(self.lengths)
+
+    def is_identity(self) -> bool:
+        """True si las filas ya están en orden por serie (no hace falta reordenar)."""
+        return bool(np.array_equal(self.order, np.arange(len(self.order))))
+
+    def gather(self, values: np.ndarray) -> np.ndarray:
+        """Reordena un array (orden original) al orden por serie."""
+        return values[self.order]
+
+    def scatter(self, sorted_values: np.ndarray) -> np.ndarray:
+        """Devuelve un array en orden por serie a su orden original."""
+        result = np.empty_like(sorted_values)
+        result[self.order] = sorted_values
+        return result
+
+    def rank_in_series(self) -> np.ndarray:
+        """Posición de cada fila (orden por serie) dentro de su serie."""
+        starts = np.repeat(np.cumsum(self.lengths) - self.lengths, self.lengths)
+        return np.arange(len(self.order), dtype=np.int64) - starts
+
+    def diff(self, sorted_values: np.ndarray, periods: int) -> np.ndarray:
+        """Equivalente vectorizado de ``groupby(...).diff(periods)`` (orden por serie)."""
+        values = np.asarray(sorted_values, dtype=np.float64)
+        result = np.full(len(values), np.nan)
+        idx = np.flatnonzero(self.rank_in_series() >= periods)
+        result[idx] = values[idx] - values[idx - periods]
+        result[~self.valid] = np.nan
+        return result
+
+
+def _chunk_bounds(lengths: np.ndarray, chunk_rows: int) -> List[tuple]:
+    """Agrupa series consecutivas en bloques de ~``chunk_rows`` filas."""
+    if len(lengths) == 0:
+        return []
+    row_starts = np.cumsum(lengths) - lengths
+    chunk_ids = row_starts // max(1, chunk_rows)
+    series_breaks = np.flatnonzero(np.diff(chunk_ids)) + 1
+    series_bounds = np.concatenate(([0], series_breaks, [len(lengths)]))
+
+    bounds = []
+    for s0, s1 in zip(series_bounds[:-1].tolist(), series_bounds[1:].tolist()):
+        r0 = int(row_starts[s0])
+        r1 = int(row_starts[s1 - 1] + lengths[s1 - 1])
+        bounds.append((s0, s1, r0, r1))
+    return bounds
+
+
+def _window_sums(values: np.ndarray, positions: np.ndarray, window: int) -> np.ndarray:
+    """Suma de ``values[p - window + 1 : p + 1]`` para cada ``p`` vía sumas acumuladas."""
+    cumulative = np.empty(len(values) + 1, dtype=values.dtype)
+    cumulative[0] = 0
+    np.cumsum(values, out=cumulative[1:])
+    return cumulative[positions + 1] - cumulative[positions + 1 - window]
+
+
+def _window_extreme(values: np.ndarray, positions: np.ndarray, window: int, ufunc) -> np.ndarray:
+    """
+    Mínimo/máximo de ventana (van Herk/Gil-Werman): prefijo y sufijo acumulados por
+    bloques de tamaño ``window``; cada ventana cruza a lo sumo dos bloques.
+    """
+    fill = np.inf if ufunc is np.minimum else -np.inf
+    n_blocks = -(-len(values) // window)
+    blocks = np.full(n_blocks * window, fill)
+    blocks[:len(values)] = values
+    blocks = blocks.reshape(n_blocks, window)
+
+    prefix = ufunc.accumulate(blocks, axis=1).ravel()
+    suffix = ufunc.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+    return ufunc(suffix[positions - (window - 1)], prefix[positions])
+
+
+def _window_var(
+    padded: np.ndarray,
+    observed: np.ndarray,
+    positions: np.ndarray,
+    counts: np.ndarray,
+    window: int,
+    integer_exact: bool,
+) -> np.ndarray:
+    """
+    Varianza muestral (ddof=1) por ventana.
+
+    - Valores enteros: ``(n * S2 - S1^2) / (n * (n - 1))`` con sumas acumuladas
+      int64, exacto hasta el redondeo final.
+    - Resto: dos pasadas sobre ``sliding_window_view`` centrando en la media de la
+      ventana (evita la cancelación de ``S2 - S1^2 / n``).
+    """
+    if integer_exact:
+        as_int = np.where(observed, padded, 0.0).astype(np.int64)
+        s1 = _window_sums(as_int, positions, window)
+        s2 = _window_sums(as_int * as_int, positions, window)
+        numerator = counts * s2 - s1 * s1
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return numerator / (counts * (counts - 1)).astype(np.float64)
+
+    windows = sliding_window_view(padded, window)
+    result = np.empty(len(positions), dtype=np.float64)
+    batch = max(1, _QUANTILE_BATCH_ELEMENTS // window)
+    for a in range(0, len(positions), batch):
+        b = min(a + batch, len(positions))
+        rows = windows[positions[a:b] - (window - 1)]
+        mask = ~np.isnan(rows)
+        n = counts[a:b]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(mask, rows, 0.0).sum(axis=1) / np.maximum(n, 1)
+            deviations = np.where(mask, rows - mean[:, None], 0.0)
+            s1 = deviations.sum(axis=1)
+            s2 = (deviations * deviations).sum(axis=1)
+            result[a:b] = (s2 - s1 * s1 / np.maximum(n, 1)) / (n - 1)
+    return np.maximum(result, 0.0)
+
+
+def _window_quantiles(
+    padded: np.ndarray,
+    positions: np.ndarray,
+    counts: np.ndarray,
+    window: int,
+    specs: List[RollingSpec],
+    out: Dict[str, np.ndarray],
+    row_offset: int,
+) -> None:
+    """Cuantiles (interpolación lineal, como pandas) y mediana por ventana."""
+    windows = sliding_window_view(padded, window)
+    batch = max(1, _QUANTILE_BATCH_ELEMENTS // window)
+
+    for a in range(0, len(positions), batch):
+        b = min(a + batch, len(positions))
+        # NaN queda al final de cada fila ordenada
+        ordered = np.sort(windows[positions[a:b] - (window - 1)], axis=1)
+        n = counts[a:b]
+        empty = n == 0
+        last = np.maximum(n - 1, 0)
+
+        for spec in specs:
+            if spec.stat == 'median':
+                lo_idx = last // 2
+                hi_idx = np.minimum(n // 2, window - 1)
+                lo = np.take_along_axis(ordered, lo_idx[:, None], axis=1)[:, 0]
+                hi = np.take_along_axis(ordered, hi_idx[:, None], axis=1)[:, 0]
+                result = np.where(n % 2 == 1, lo, (lo + hi) / 2)
+            else:
+                idx_with_fraction = spec.quantile * last
+                idx = idx_with_fraction.astype(np.int64)
+                fraction = idx_with_fraction - idx
+                hi_idx = np.minimum(idx + 1, window - 1)
+                lo = np.take_along_axis(ordered, idx[:, None], axis=1)[:, 0]
+                hi = np.take_along_axis(ordered, hi_idx[:, None], axis=1)[:, 0]
+                with np.errstate(invalid='ignore'):
+                    result = np.where(fraction == 0, lo, lo + (hi - lo) * fraction)
+            result[empty] = np.nan
+            out[spec.name][row_offset + a:row_offset + b] = result
+
+
+def _compute_chunk(
+    values: np.ndarray,
+    lengths: np.ndarray,
+    specs: List[RollingSpec],
+    out: Dict[str, np.ndarray],
+    row_offset: int,
+) -> None:
+    """Calcula todas las specs para un bloque de series contiguas."""
+    n_rows = len(values)
+    series_idx = np.repeat(np.arange(len(lengths)), lengths)
+    observed_values = ~np.isnan(values)
+
+    # Valores enteros (ventas): sumas acumuladas exactas en int64 para std/var
+    finite = values[observed_values]
+    max_abs = float(np.abs(finite).max()) if len(finite) else 0.0
+    integer_valued = bool(np.isfinite(max_abs) and np.all(finite == np.round(finite)))
+
+    by_window: Dict[int, List[RollingSpec]] = {}
+    for spec in specs:
+        by_window.setdefault(spec.window, []).append(spec)
+
+    for window, window_specs in by_window.items():
+        stats = {spec.stat for spec in window_specs}
+        gap = window - 1
+        # n * sum(x^2) debe caber en int64
+        integer_exact = integer_valued and max_abs * window < _INT_EXACT_LIMIT
+
+        # Cada serie va precedida de (window - 1) huecos NaN: ninguna ventana cruza series
+        positions = np.arange(n_rows, dtype=np.int64) + (series_idx + 1) * gap
+        padded = np.full(n_rows + len(lengths) * gap, np.nan)
+        padded[positions] = values
+        observed = ~np.isnan(padded)
+
+        counts = _window_sums(observed.astype(np.int64), positions, window)
+        empty = counts == 0
+        safe_counts = np.maximum(counts, 1).astype(np.float64)
+
+        results: Dict[str, np.ndarray] = {}
+        if stats & {'mean', 'sum'}:
+            sums = _window_sums(np.where(observed, padded, 0.0), positions, window)
+            results['sum'] = sums
+            results['mean'] = sums / safe_counts
+
+        if stats & {'min', 'max', 'std', 'var'}:
+            results['min'] = _window_extreme(
+                np.where(observed, padded, np.inf), positions, window, np.minimum
+            )
+            results['max'] = _window_extreme(
+                np.where(observed, padded, -np.inf), positions, window, np.maximum
+            )
+
+        if stats & {'std', 'var'}:
+            results['var'] = _window_var(padded, observed, positions, counts, window, integer_exact)
+            # Ventanas constantes: varianza exactamente cero (como pandas)
+            results['var'][results['min'] == results['max']] = 0.0
+            results['var'][counts <= 1] = np.nan
+            results['std'] = np.sqrt(results['var'])
+
+        for spec in window_specs:
+            if spec.stat in results:
+                result = results[spec.stat].copy() if spec.stat in ('min', 'max') else results[spec.stat]
+                result[empty] = np.nan
+                out[spec.name][row_offset:row_offset + n_rows] = result
+
+        quantile_specs = [s for s in window_specs if s.stat in ('quantile', 'median')]
+        if quantile_specs:
+            _window_quantiles(
+                padded, positions, counts, window, quantile_specs, out, row_offset
+            )
+
+
+def rolling_stats(
+    layout: SeriesLayout,
+    sorted_values: np.ndarray,
+    specs: List[RollingSpec],
+    n_jobs: Optional[int] = 1,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+) -> Dict[str, np.ndarray]:
+    """
+    Calcula todas las specs sobre valores en orden por serie.
+
+    Parameters
+    ----------
+    layout : SeriesLayout
+        Layout de las series
+    sorted_values : np.ndarray
+        Valores de la columna objetivo en orden ``layout.order``
+    specs : List[RollingSpec]
+        Features a calcular (estadística en ``SUPPORTED_FUNCTIONS`` o ``'quantile'``)
+    n_jobs : Optional[int]
+        Hilos de trabajo (-1/None = todos los núcleos)
+    chunk_rows : int
+        Filas aproximadas por bloque de trabajo
+
+    Returns
+    -------
+    Dict[str, np.ndarray]
+        Arrays float64 en orden por serie, indexados por ``spec.name``
+    """
+    for spec in specs:
+        if spec.window < 1:
+            raise ValueError(f"window must be >= 1 (got {spec.window} for {spec.name})")
+        if spec.stat not in SUPPORTED_FUNCTIONS + ('quantile',):
+            raise ValueError(f"Unsupported rolling statistic: {spec.stat}")
+
+    values = np.asarray(sorted_values, dtype=np.float64)
+    out = {spec.name: np.empty(len(values), dtype=np.float64) for spec in specs}
+    chunks = _chunk_bounds(layout.lengths, chunk_rows)
+
+    def run(bounds: tuple) -> None:
+        s0, s1, r0, r1 = bounds
+        _compute_chunk(values[r0:r1], layout.lengths[s0:s1], specs, out, r0)
+
+    workers = min(resolve_n_jobs(n_jobs), max(1, len(chunks)))
+    if workers == 1:
+        for bounds in chunks:
+            run(bounds)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(run, chunks))
+
+    # Filas con clave de serie nula: groupby(...).transform devuelve NaN
+    if not layout.valid.all():
+        for result in out.values():
+            result[~layout.valid] = np.nan
+
+    return out
@@ -9,9 +9,11 @@ Tel: +52 55 4189 3428
 
 import pandas as pd
 import numpy as np
-from typing import List, Dict, Callable
+from typing import List, Dict, Callable, Optional
 import logging
 
+from .rolling_engine import SUPPORTED_FUNCTIONS, RollingSpec, SeriesLayout, rolling_stats
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -23,6 +25,9 @@ def create_rolling_features(
     group_cols: List[str] = ['id'],
     windows: List[int] = [7, 14, 28, 90],
     functions: List[str] = ['mean', 'std', 'min', 'max'],
+    engine: str = 'numpy',
+    n_jobs: Optional[int] = -1,
+    inplace: bool = False,
     **kwargs
 ) -> pd.DataFrame:
     """
@@ -43,6 +48,15 @@ def create_rolling_features(
         Tamaños de ventana en días (default: [7, 14, 28, 90])
     functions : List[str]
         Funciones estadísticas a aplicar (default: ['mean', 'std', 'min', 'max'])
+    engine : str
+        'numpy' (motor vectorizado de ``rolling_engine``) o 'pandas'
+        (``groupby().transform`` por combinación). Funciones no soportadas por el
+        motor se calculan siempre con pandas.
+    n_jobs : Optional[int]
+        Hilos del motor numpy (-1 = todos los núcleos)
+    inplace : bool
+        Si True y ``df`` ya está ordenado por ``group_cols + ['date']``, añade
+        las columnas sobre ``df`` sin copiarlo (default: False)
 
     Returns
     -------
@@ -62,14 +76,41 @@ def create_rolling_features(
     - Window 7: última semana
     - Window 28: último mes
     - Window 90: último trimestre
+    - engine='numpy' ordena una sola vez y calcula todas las ventanas sobre
+      arrays contiguos por serie; el resultado coincide con engine='pandas'
     """
     logger.info(f"Creating rolling features: windows={windows}, functions={functions}")
 
-    df_result = df.copy()
-
-    # Asegurar que está ordenado por fecha
-    if 'date' in df_result.columns:
-        df_result = df_result.sort_values(group_cols + ['date'])
+    if engine not in ('numpy', 'pandas'):
+        raise ValueError(f"Unknown rolling engine: {engine}")
+
+    date_col = 'date' if 'date' in df.columns else None
+    engine_results: Dict[str, np.ndarray] = {}
+
+    if engine == 'numpy':
+        specs = [
+            RollingSpec(f'{target_col}_rolling_{func}_{window}', window, func)
+            for window in windows
+            for func in functions
+            if isinstance(func, str) and func in SUPPORTED_FUNCTIONS
+        ]
+        # Un solo sort (por serie y fecha) para todas las ventanas
+        layout = SeriesLayout.from_frame(df, group_cols, date_col)
+        if inplace and (not date_col or layout.is_identity()):
+            df_result = df
+        else:
+            df_result = df.take(layout.order) if date_col else df.copy()
+        if specs:
+            sorted_values = layout.gather(df[target_col].to_numpy(dtype=np.float64, na_value=np.nan))
+            engine_results = rolling_stats(layout, sorted_values, specs, n_jobs=n_jobs)
+            if not date_col:
+                engine_results = {k: layout.scatter(v) for k, v in engine_results.items()}
+    else:
+        df_result = df if inplace else df.copy()
+
+        # Asegurar que está ordenado por fecha
+        if date_col:
+            df_result = df_result.sort_values(group_cols + ['date'])
 
     # Crear cada combinación de ventana y función
     for window in windows:
@@ -78,11 +119,14 @@ def create_rolling_features(
 
             logger.info(f"  Creating {feature_name}")
 
-            # Calcular rolling statistic por grupo
-            df_result[feature_name] = (
-                df_result.groupby(group_cols)[target_col]
-                .transform(lambda x: x.rolling(window=window, min_periods=1).agg(func))
-            )
+            if feature_name in engine_results:
+                df_result[feature_name] = engine_results.pop(feature_name)
+            else:
+                # Calcular rolling statistic por grupo
+                df_result[feature_name] = (
+                    df_result.groupby(group_cols)[target_col]
+                    .transform(lambda x: x.rolling(window=window, min_periods=1).agg(func))
+                )
 
             # Contar NaNs
             nan_count = df_result[feature_name].isna().sum()
@@ -102,6 +146,9 @@ def create_rolling_features_advanced(
     target_col: str = 'sales',
     group_cols: List[str] = ['id'],
     windows: List[int] = [7, 28],
+    engine: str = 'numpy',
+    n_jobs: Optional[int] = -1,
+    inplace: bool = False,
     **kwargs
 ) -> pd.DataFrame:
     """
@@ -117,6 +164,12 @@ def create_rolling_features_advanced(
         Columnas de agrupación
     windows : List[int]
         Ventanas a usar
+    engine : str
+        'numpy' (motor vectorizado) o 'pandas'
+    n_jobs : Optional[int]
+        Hilos del motor numpy (-1 = todos los núcleos)
+    inplace : bool
+        Si True, añade las columnas sobre ``df`` sin copiarlo (default: False)
 
     Returns
     -------
@@ -125,7 +178,24 @@ def create_rolling_features_advanced(
     """
     logger.info("Creating advanced rolling features")
 
-    df_result = df.copy()
+    if engine not in ('numpy', 'pandas'):
+        raise ValueError(f"Unknown rolling engine: {engine}")
+
+    df_result = df if inplace else df.copy()
+
+    # Sin ordenar por fecha: se respeta el orden de filas dentro de cada serie
+    layout = SeriesLayout.from_frame(df_result, group_cols) if engine == 'numpy' else None
+    quantiles: Dict[str, np.ndarray] = {}
+    if layout is not None:
+        specs = [
+            RollingSpec(f'{target_col}_rolling_q{q}_{window}', window, 'quantile', q / 100)
+            for window in windows
+            for q in [25, 50, 75]
+        ]
+        sorted_values = layout.gather(
+            df_result[target_col].to_numpy(dtype=np.float64, na_value=np.nan)
+        )
+        quantiles = rolling_stats(layout, sorted_values, specs, n_jobs=n_jobs)
 
     for window in windows:
         logger.info(f"  Window {window} days")
@@ -133,10 +203,13 @@ def create_rolling_features_advanced(
         # Percentiles (25, 50, 75)
         for q in [25, 50, 75]:
             feature_name = f'{target_col}_rolling_q{q}_{window}'
-            df_result[feature_name] = (
-                df_result.groupby(group_cols)[target_col]
-                .transform(lambda x: x.rolling(window=window, min_periods=1).quantile(q/100))
-            )
+            if layout is not None:
+                df_result[feature_name] = layout.scatter(quantiles.pop(feature_name))
+            else:
+                df_result[feature_name] = (
+                    df_result.groupby(group_cols)[target_col]
+                    .transform(lambda x: x.rolling(window=window, min_periods=1).quantile(q/100))
+                )
             logger.info(f"    Created {feature_name}")
 
         # Coeficiente de variación (std/mean)
@@ -152,10 +225,16 @@ def create_rolling_features_advanced(
         current_mean = f'{target_col}_rolling_mean_{window}'
         if current_mean in df_result.columns:
             trend_col = f'{target_col}_rolling_trend_{window}'
-            df_result[trend_col] = (
-                df_result.groupby(group_cols)[current_mean]
-                .transform(lambda x: x.diff(window))
-            )
+            if layout is not None:
+                means = layout.gather(
+                    df_result[current_mean].to_numpy(dtype=np.float64, na_value=np.nan)
+                )
+                df_result[trend_col] = layout.scatter(layout.diff(means, window))
+            else:
+                df_result[trend_col] = (
+                    df_result.groupby(group_cols)[current_mean]
+                    .transform(lambda x: x.diff(window))
+                )
             logger.info(f"    Created {trend_col}")
 
     logger.info("✓ Created advanced rolling features")
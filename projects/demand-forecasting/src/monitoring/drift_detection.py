@@ -12,22 +12,66 @@ Metodología: DVP-PRO
 """
 
 import logging
-from typing import Dict, List, Tuple, Optional, Any
+import time
+from concurrent.futures import Executor
+from typing import Dict, Iterable, List, Tuple, Optional, Any, Union
 from datetime import datetime
 from pathlib import Path
 import warnings
 
 import numpy as np
 import pandas as pd
-from scipy import stats
-from scipy.spatial.distance import jensenshannon
 import json
 
+from .drift_sketches import (
+    DEFAULT_BINS,
+    DEFAULT_SKETCH_SIZE,
+    DriftProfile,
+    FeatureSketch,
+    FrameSource,
+    feature_drift_from_sketches,
+    profile_psi_js,
+)
+from .drift_history import DEFAULT_HISTORY_DIR, DriftHistoryStore
+from .drift_parallel import (
+    SharedColumns,
+    collect_shards,
+    process_executor,
+    resolve_n_jobs,
+    run_per_feature,
+    shard_indices,
+    with_columns,
+)
+
 warnings.filterwarnings('ignore')
 
 logger = logging.getLogger(__name__)
 
 
+def _accumulate_shard(spec, items, k: int):
+    """
+    Worker: acumular en sketches nuevos las columnas de un shard de features.
+
+    Args:
+        spec: SharedColumns.spec del chunk
+        items: Lista de (fila en la matriz compartida, feature, bordes)
+        k: Tamaño del sketch de cuantiles
+
+    Returns:
+        Tuple (sketches, segundos por feature, errores por feature)
+    """
+    def accumulate(columns):
+        def one(item):
+            j, feature, edges = item
+            window = DriftProfile({feature: edges}, k=k)
+            window.update_columns(columns[j:j + 1], [feature])
+            return window.sketches[feature]
+
+        return run_per_feature(((item[1], item) for item in items), one)
+
+    return with_columns(spec, accumulate)
+
+
 class DriftDetector:
     """
     Detector de data drift para modelos de forecasting.
@@ -37,100 +81,207 @@ class DriftDetector:
     - Population Stability Index (PSI)
     - Jensen-Shannon divergence
     - Statistical tests (mean, std, quantiles)
+
+    La referencia se resume en un DriftProfile (histogramas de bordes fijos +
+    sketches de cuantiles, ver drift_sketches.py): no se guarda el DataFrame
+    crudo y los datos actuales se acumulan por chunks en memoria acotada.
     """
 
     def __init__(self,
-                 reference_data: pd.DataFrame,
+                 reference_data: Optional[FrameSource] = None,
                  feature_columns: Optional[List[str]] = None,
-                 drift_threshold: float = 0.1):
+                 drift_threshold: float = 0.1,
+                 reference_profile: Optional[DriftProfile] = None,
+                 bins: int = DEFAULT_BINS,
+                 sketch_size: int = DEFAULT_SKETCH_SIZE,
+                 n_jobs: Optional[int] = 1):
         """
         Inicializa el detector de drift.
 
         Args:
-            reference_data: Datos de referencia (train/baseline)
+            reference_data: Datos de referencia (train/baseline): DataFrame o
+                función que devuelve un iterable de chunks
             feature_columns: Columnas de features a monitorear
             drift_threshold: Umbral de drift (PSI)
+            reference_profile: Perfil de referencia ya construido (p.ej.
+                DriftProfile.load); si se pasa, reference_data no se usa
+            bins: Bins del histograma de referencia
+            sketch_size: Tamaño k del sketch de cuantiles
+            n_jobs: Procesos para acumular los datos actuales (features
+                repartidas en shards, columnas en memoria compartida);
+                <= 0 usa todos los cores, None lee DRIFT_N_JOBS
         """
-        self.reference_data = reference_data
-        self.feature_columns = feature_columns or list(reference_data.columns)
+        if reference_profile is None:
+            if reference_data is None:
+                raise ValueError("reference_data or reference_profile is required")
+            if feature_columns is None and isinstance(reference_data, pd.DataFrame):
+                feature_columns = list(reference_data.columns)
+            reference_profile = DriftProfile.from_data(
+                reference_data, feature_columns, bins=bins, k=sketch_size
+            )
+
+        self.reference_profile = reference_profile
+        self.feature_columns = [
+            f for f in (feature_columns or reference_profile.features)
+            if f in reference_profile.sketches
+        ]
         self.drift_threshold = drift_threshold
+        self.n_jobs = resolve_n_jobs(n_jobs)
 
         # Calcular estadísticas de referencia
-        self.reference_stats = self._calculate_statistics(reference_data)
+        self.reference_stats = {
+            f: reference_profile.sketches[f].statistics()
+            for f in self.feature_columns
+            if reference_profile.sketches[f].count > 0
+        }
 
         logger.info(f"✅ DriftDetector inicializado con {len(self.feature_columns)} features")
 
-    def _calculate_statistics(self, df: pd.DataFrame) -> Dict[str, Dict[str, float]]:
+    def detect_drift(self, current_data: Union[pd.DataFrame, Iterable[pd.DataFrame]]) -> Dict[str, Any]:
         """
-        Calcula estadísticas de referencia.
+        Detecta drift entre datos de referencia y actuales.
 
         Args:
-            df: DataFrame con features
+            current_data: Datos actuales para comparar (DataFrame o iterable
+                de chunks, que se acumulan uno a uno)
 
         Returns:
-            Diccionario con estadísticas por feature
+            Diccionario con resultados de drift
         """
-        stats_dict = {}
-
-        for col in self.feature_columns:
-            if col not in df.columns:
-                continue
-
-            data = df[col].dropna()
-
-            if len(data) == 0:
-                continue
-
-            stats_dict[col] = {
-                'mean': float(data.mean()),
-                'std': float(data.std()),
-                'min': float(data.min()),
-                'max': float(data.max()),
-                'median': float(data.median()),
-                'q25': float(data.quantile(0.25)),
-                'q75': float(data.quantile(0.75)),
-                'q95': float(data.quantile(0.95)),
-            }
-
-        return stats_dict
+        chunks = [current_data] if isinstance(current_data, pd.DataFrame) else current_data
+
+        current_profile = self.reference_profile.new_window()
+        seen_columns = set()
+        feature_timings: Dict[str, float] = {}
+        feature_errors: Dict[str, str] = {}
+        if self.n_jobs > 1 and len(self.feature_columns) > 1:
+            with process_executor(self.n_jobs) as executor:
+                for chunk in chunks:
+                    self._update_parallel(current_profile, chunk, executor, feature_timings, feature_errors)
+                    seen_columns.update(chunk.columns)
+        else:
+            for chunk in chunks:
+                current_profile.update(chunk)
+                seen_columns.update(chunk.columns)
+
+        missing = [f for f in self.feature_columns if f not in seen_columns]
+        for feature in missing:
+            logger.warning(f"⚠️ Feature {feature} no encontrada en datos actuales")
+
+        return self.detect_drift_profile(
+            current_profile,
+            exclude=missing,
+            feature_timings=feature_timings,
+            feature_errors=feature_errors
+        )
+
+    def _update_parallel(self,
+                         current_profile: DriftProfile,
+                         chunk: pd.DataFrame,
+                         executor: Executor,
+                         feature_timings: Dict[str, float],
+                         feature_errors: Dict[str, str]) -> None:
+        """
+        Acumular un chunk repartiendo las features entre los procesos del pool.
 
-    def detect_drift(self, current_data: pd.DataFrame) -> Dict[str, Any]:
+        El chunk se copia una vez a memoria compartida; cada worker devuelve
+        sketches por feature (pocos KB) que se combinan en ``current_profile``.
         """
-        Detecta drift entre datos de referencia y actuales.
+        present = [f for f in self.feature_columns if f in chunk.columns and f not in feature_errors]
+        if not present or len(chunk) == 0:
+            return
+
+        with SharedColumns.from_frame(chunk, present) as shared:
+            futures = []
+            for idx in shard_indices(len(present), self.n_jobs):
+                items = [(j, present[j], current_profile.sketches[present[j]].edges) for j in idx]
+                shard = [present[j] for j in idx]
+                futures.append((shard, executor.submit(_accumulate_shard, shared.spec, items, current_profile.k)))
+
+            for sketches, timings, errors in collect_shards(futures):
+                for feature, sketch in sketches.items():
+                    current_profile.sketches[feature].merge(sketch)
+                for feature, seconds in timings.items():
+                    feature_timings[feature] = feature_timings.get(feature, 0.0) + seconds
+                for feature, error in errors.items():
+                    logger.warning(f"⚠️ Error acumulando {feature}: {error}")
+                    feature_errors[feature] = error
+
+    def detect_drift_profile(self,
+                             current_profile: DriftProfile,
+                             exclude: Optional[List[str]] = None,
+                             feature_timings: Optional[Dict[str, float]] = None,
+                             feature_errors: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """
+        Detecta drift a partir de un perfil actual ya acumulado.
+
+        Cada feature se evalúa aislada: si falla se registra en
+        ``feature_errors`` y no entra en el score global (en lugar de
+        reportarse como "sin drift").
 
         Args:
-            current_data: Datos actuales para comparar
+            current_profile: Perfil creado con reference_profile.new_window()
+            exclude: Features a omitir
+            feature_timings: Segundos por feature ya acumulados (workers)
+            feature_errors: Errores por feature ya registrados (workers)
 
         Returns:
-            Diccionario con resultados de drift
+            Diccionario con resultados de drift (incluye ``feature_timings``
+            y ``feature_errors``)
         """
-        logger.info(f"🔍 Detectando drift en {len(current_data)} registros...")
+        feature_timings = dict(feature_timings or {})
+        feature_errors = dict(feature_errors or {})
+        exclude = set(exclude or []) | set(feature_errors)
+        logger.info(f"🔍 Detectando drift en {current_profile.n_rows} registros...")
 
         drift_results = {
             'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
             'n_features': len(self.feature_columns),
-            'n_samples_reference': len(self.reference_data),
-            'n_samples_current': len(current_data),
+            'n_samples_reference': self.reference_profile.n_rows,
+            'n_samples_current': current_profile.n_rows,
             'feature_drifts': {},
             'overall_drift_score': 0.0,
             'features_with_drift': [],
+            'feature_timings': {},
+            'feature_errors': feature_errors,
+            'n_jobs': self.n_jobs,
             'summary': {}
         }
 
         feature_drift_scores = []
 
-        # Analizar cada feature
+        analyzed = []
         for feature in self.feature_columns:
-            if feature not in current_data.columns:
-                logger.warning(f"⚠️ Feature {feature} no encontrada en datos actuales")
+            if feature in exclude or feature not in current_profile.sketches:
+                continue
+            if current_profile.sketches[feature].count == 0:
+                logger.warning(f"⚠️ Feature {feature} sin valores en datos actuales")
                 continue
+            analyzed.append(feature)
 
+        # PSI / JS de todas las features con una llamada matricial
+        psi_scores, js_scores = (
+            profile_psi_js(self.reference_profile, current_profile, analyzed) if analyzed else ([], [])
+        )
+
+        # Analizar cada feature
+        for feature, psi_score, js_div in zip(analyzed, psi_scores, js_scores):
             # Calcular drift para la feature
-            feature_drift = self._calculate_feature_drift(
-                feature,
-                self.reference_data[feature].dropna(),
-                current_data[feature].dropna()
-            )
+            start = time.perf_counter()
+            try:
+                feature_drift = self._calculate_feature_drift(
+                    feature,
+                    self.reference_profile.sketches[feature],
+                    current_profile.sketches[feature],
+                    psi_score=float(psi_score),
+                    js_div=float(js_div)
+                )
+            except Exception as e:
+                logger.warning(f"⚠️ Error calculando drift para {feature}: {e}")
+                feature_errors[feature] = f"{type(e).__name__}: {e}"
+                continue
+            finally:
+                feature_timings[feature] = feature_timings.get(feature, 0.0) + time.perf_counter() - start
 
             drift_results['feature_drifts'][feature] = feature_drift
             feature_drift_scores.append(feature_drift['psi_score'])
@@ -143,6 +294,8 @@ class DriftDetector:
         if feature_drift_scores:
             drift_results['overall_drift_score'] = float(np.mean(feature_drift_scores))
 
+        drift_results['feature_timings'] = {f: round(t, 6) for f, t in feature_timings.items()}
+
         # Summary
         drift_results['summary'] = {
             'total_features_analyzed': len(drift_results['feature_drifts']),
@@ -151,157 +304,40 @@ class DriftDetector:
             'has_significant_drift': drift_results['overall_drift_score'] > self.drift_threshold,
             'max_drift_score': max(feature_drift_scores) if feature_drift_scores else 0.0,
             'min_drift_score': min(feature_drift_scores) if feature_drift_scores else 0.0,
+            'features_with_errors': len(feature_errors),
         }
 
         logger.info(f"✅ Drift detection completado")
         logger.info(f"   Overall drift score: {drift_results['overall_drift_score']:.4f}")
         logger.info(f"   Features con drift: {len(drift_results['features_with_drift'])} / {len(drift_results['feature_drifts'])}")
+        if feature_errors:
+            logger.warning(f"⚠️ Features con error: {sorted(feature_errors)}")
 
+        self.last_drift_results = drift_results
         return drift_results
 
     def _calculate_feature_drift(self,
                                   feature_name: str,
-                                  reference: pd.Series,
-                                  current: pd.Series) -> Dict[str, Any]:
+                                  reference: FeatureSketch,
+                                  current: FeatureSketch,
+                                  psi_score: Optional[float] = None,
+                                  js_div: Optional[float] = None) -> Dict[str, Any]:
         """
-        Calcula drift para una feature específica.
+        Calcula drift para una feature específica. Los errores se propagan:
+        detect_drift_profile los registra por feature.
 
         Args:
             feature_name: Nombre de la feature
-            reference: Serie de datos de referencia
-            current: Serie de datos actuales
+            reference: Sketch de referencia
+            current: Sketch de datos actuales
+            psi_score, js_div: Valores ya calculados por profile_psi_js
 
         Returns:
             Diccionario con métricas de drift
         """
-        drift_metrics = {
-            'feature': feature_name,
-            'psi_score': 0.0,
-            'ks_statistic': 0.0,
-            'ks_pvalue': 1.0,
-            'js_divergence': 0.0,
-            'mean_shift': 0.0,
-            'std_shift': 0.0,
-            'has_drift': False,
-            'drift_type': None
-        }
-
-        try:
-            # 1. Population Stability Index (PSI)
-            psi_score = self._calculate_psi(reference, current)
-            drift_metrics['psi_score'] = float(psi_score)
-
-            # 2. Kolmogorov-Smirnov test
-            ks_stat, ks_pval = stats.ks_2samp(reference, current)
-            drift_metrics['ks_statistic'] = float(ks_stat)
-            drift_metrics['ks_pvalue'] = float(ks_pval)
-
-            # 3. Jensen-Shannon divergence
-            js_div = self._calculate_js_divergence(reference, current)
-            drift_metrics['js_divergence'] = float(js_div)
-
-            # 4. Cambios en estadísticas
-            mean_shift = abs(current.mean() - reference.mean()) / (reference.std() + 1e-10)
-            std_shift = abs(current.std() - reference.std()) / (reference.std() + 1e-10)
-
-            drift_metrics['mean_shift'] = float(mean_shift)
-            drift_metrics['std_shift'] = float(std_shift)
-
-            # Determinar si hay drift
-            drift_metrics['has_drift'] = (
-                psi_score > self.drift_threshold or
-                ks_pval < 0.05 or
-                js_div > self.drift_threshold
-            )
-
-            # Clasificar tipo de drift
-            if drift_metrics['has_drift']:
-                if mean_shift > 1.0:
-                    drift_metrics['drift_type'] = 'mean_shift'
-                elif std_shift > 0.5:
-                    drift_metrics['drift_type'] = 'variance_change'
-                elif psi_score > self.drift_threshold * 2:
-                    drift_metrics['drift_type'] = 'distribution_change'
-                else:
-                    drift_metrics['drift_type'] = 'moderate_drift'
-
-        except Exception as e:
-            logger.warning(f"⚠️ Error calculando drift para {feature_name}: {e}")
-
-        return drift_metrics
-
-    def _calculate_psi(self, reference: pd.Series, current: pd.Series, bins: int = 10) -> float:
-        """
-        Calcula Population Stability Index (PSI).
-
-        Args:
-            reference: Serie de referencia
-            current: Serie actual
-            bins: Número de bins para histograma
-
-        Returns:
-            PSI score
-        """
-        try:
-            # Crear bins basados en datos de referencia
-            _, bin_edges = np.histogram(reference, bins=bins)
-
-            # Calcular distribuciones
-            ref_hist, _ = np.histogram(reference, bins=bin_edges)
-            curr_hist, _ = np.histogram(current, bins=bin_edges)
-
-            # Normalizar
-            ref_dist = ref_hist / (len(reference) + 1e-10)
-            curr_dist = curr_hist / (len(current) + 1e-10)
-
-            # Evitar divisiones por cero
-            ref_dist = np.where(ref_dist == 0, 0.0001, ref_dist)
-            curr_dist = np.where(curr_dist == 0, 0.0001, curr_dist)
-
-            # Calcular PSI
-            psi = np.sum((curr_dist - ref_dist) * np.log(curr_dist / ref_dist))
-
-            return float(psi)
-
-        except Exception as e:
-            logger.warning(f"⚠️ Error calculando PSI: {e}")
-            return 0.0
-
-    def _calculate_js_divergence(self, reference: pd.Series, current: pd.Series, bins: int = 10) -> float:
-        """
-        Calcula Jensen-Shannon divergence.
-
-        Args:
-            reference: Serie de referencia
-            current: Serie actual
-            bins: Número de bins
-
-        Returns:
-            JS divergence
-        """
-        try:
-            # Crear bins
-            _, bin_edges = np.histogram(
-                np.concatenate([reference, current]),
-                bins=bins
-            )
-
-            # Calcular distribuciones
-            ref_hist, _ = np.histogram(reference, bins=bin_edges)
-            curr_hist, _ = np.histogram(current, bins=bin_edges)
-
-            # Normalizar
-            ref_dist = ref_hist / (ref_hist.sum() + 1e-10)
-            curr_dist = curr_hist / (curr_hist.sum() + 1e-10)
-
-            # Calcular JS divergence
-            js_div = jensenshannon(ref_dist, curr_dist)
-
-            return float(js_div)
-
-        except Exception as e:
-            logger.warning(f"⚠️ Error calculando JS divergence: {e}")
-            return 0.0
+        return feature_drift_from_sketches(
+            feature_name, reference, current, self.drift_threshold, psi_score, js_div
+        )
 
     def get_top_drifted_features(self, n: int = 10) -> List[Tuple[str, float]]:
         """
@@ -349,39 +385,41 @@ class DriftDetector:
 class DriftMonitor:
     """
     Monitor de drift que almacena historial y permite tracking temporal.
+
+    El historial es un DriftHistoryStore (parquet particionado por día,
+    append-only) con el resumen de cada corrida y las métricas por feature.
     """
 
-    def __init__(self, drift_detector: DriftDetector, history_path: Optional[str] = None):
+    def __init__(self,
+                 drift_detector: DriftDetector,
+                 history_path: Optional[str] = None,
+                 save_reports: bool = False):
         """
         Inicializa monitor de drift.
 
         Args:
             drift_detector: Instancia de DriftDetector
-            history_path: Path para almacenar historial
+            history_path: Directorio del historial. Un ``drift_history.json``
+                anterior (o su ruta) se migra una vez al directorio
+                ``history`` a su lado
+            save_reports: Guardar además el reporte JSON completo de cada
+                corrida (las métricas por feature ya quedan en el historial)
         """
         self.detector = drift_detector
-        self.history_path = history_path or "reports/drift/drift_history.json"
-        self.history = self._load_history()
-
-    def _load_history(self) -> List[Dict[str, Any]]:
-        """Carga historial de drift."""
-        history_file = Path(self.history_path)
-        if history_file.exists():
-            with open(history_file, 'r') as f:
-                return json.load(f)
-        return []
+        self.save_reports = save_reports
 
-    def _save_history(self) -> None:
-        """Guarda historial de drift."""
-        history_file = Path(self.history_path)
-        history_file.parent.mkdir(parents=True, exist_ok=True)
-
-        with open(history_file, 'w') as f:
-            json.dump(self.history, f, indent=2)
+        history_dir = Path(history_path or DEFAULT_HISTORY_DIR)
+        legacy_file = history_dir.parent / "drift_history.json"
+        if history_dir.suffix == '.json':
+            legacy_file, history_dir = history_dir, history_dir.parent / "history"
+        self.history = DriftHistoryStore(history_dir)
+        if legacy_file.exists():
+            self.history.import_json(legacy_file)
+            legacy_file.rename(legacy_file.with_name(legacy_file.name + ".migrated"))
 
     def monitor(self, current_data: pd.DataFrame) -> Dict[str, Any]:
         """
-        Monitorea drift y actualiza historial.
+        Monitorea drift y agrega la corrida al historial.
 
         Args:
             current_data: Datos actuales
@@ -392,42 +430,54 @@ class DriftMonitor:
         # Detectar drift
         drift_results = self.detector.detect_drift(current_data)
 
-        # Agregar a historial
-        self.history.append({
-            'timestamp': drift_results['timestamp'],
-            'overall_drift_score': drift_results['overall_drift_score'],
-            'features_with_drift': len(drift_results['features_with_drift']),
-            'has_significant_drift': drift_results['summary']['has_significant_drift']
-        })
-
-        # Guardar historial
-        self._save_history()
+        # Agregar a historial (append de dos archivos, no reescribe nada)
+        self.history.append(drift_results)
 
-        # Guardar reporte completo
-        report_path = Path("reports/drift") / f"drift_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        self.detector.save_drift_report(drift_results, str(report_path))
+        if self.save_reports:
+            report_path = Path("reports/drift") / f"drift_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+            self.detector.save_drift_report(drift_results, str(report_path))
 
         return drift_results
 
-    def get_drift_trend(self, last_n: int = 10) -> pd.DataFrame:
+    def get_drift_trend(self,
+                        last_n: int = 10,
+                        start: Optional[str] = None,
+                        end: Optional[str] = None) -> pd.DataFrame:
         """
         Obtiene tendencia de drift en últimos N checkpoints.
 
         Args:
-            last_n: Número de checkpoints a analizar
+            last_n: Número de checkpoints a analizar (si no hay rango)
+            start: Fecha/hora inicial (inclusiva) para consultar un rango
+            end: Fecha/hora final (inclusiva)
 
         Returns:
-            DataFrame con tendencia
+            DataFrame con tendencia (una fila por corrida)
+        """
+        if start is not None or end is not None:
+            return self.history.read_runs(start, end)
+        return self.history.last_runs(last_n)
+
+    def get_feature_trend(self,
+                          features: Optional[List[str]] = None,
+                          start: Optional[str] = None,
+                          end: Optional[str] = None) -> pd.DataFrame:
         """
-        recent_history = self.history[-last_n:] if len(self.history) > last_n else self.history
+        Métricas por feature y corrida en un rango de fechas.
 
-        if not recent_history:
-            return pd.DataFrame()
+        Args:
+            features: Features a consultar (todas si None)
+            start: Fecha/hora inicial (inclusiva)
+            end: Fecha/hora final (inclusiva)
 
-        df = pd.DataFrame(recent_history)
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
+        Returns:
+            DataFrame con PSI / KS / JS por (timestamp, feature)
+        """
+        return self.history.read_features(start, end, features)
 
-        return df
+    def compact_history(self, retention_days: Optional[int] = None) -> Dict[str, int]:
+        """Compacta días cerrados y aplica la retención (ver DriftHistoryStore.compact)."""
+        return self.history.compact(retention_days)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,299 @@
+"""
+============================================================================
+drift_history.py - Historial de drift append-only en parquet particionado
+============================================================================
+Reemplaza ``drift_history.json`` (reescrito completo en cada corrida):
+
+- ``runs/date=YYYY-MM-DD/part-*.parquet``: una fila por corrida (score global,
+  features con drift, ...)
+- ``features/date=YYYY-MM-DD/part-*.parquet``: una fila por (corrida, feature)
+  con PSI / KS / JS, shifts, tiempo y error de la feature
+
+Cada corrida escribe dos archivos nuevos y no toca los existentes (append
+O(1)). Las consultas por rango podan por la partición ``date`` y las últimas
+N corridas leen solo los días más recientes. ``compact`` junta los archivos
+de cada día cerrado en uno y borra los días fuera de la retención.
+
+Autor: Ing. Daniel Varela Perez
+Email: bedaniele0@gmail.com
+Tel: +52 55 4189 3428
+Metodología: DVP-PRO
+============================================================================
+"""
+
+import json
+import logging
+import os
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HISTORY_DIR = "reports/drift/history"
+DATE_COL = 'date'
+
+RUNS_SCHEMA = pa.schema([
+    ('run_id', pa.string()),
+    ('timestamp', pa.timestamp('us')),
+    ('overall_drift_score', pa.float64()),
+    ('features_with_drift', pa.int32()),
+    ('features_analyzed', pa.int32()),
+    ('features_with_errors', pa.int32()),
+    ('has_significant_drift', pa.bool_()),
+    ('max_drift_score', pa.float64()),
+    ('n_samples_current', pa.int64()),
+])
+
+FEATURES_SCHEMA = pa.schema([
+    ('run_id', pa.string()),
+    ('timestamp', pa.timestamp('us')),
+    ('feature', pa.string()),
+    ('psi_score', pa.float64()),
+    ('ks_statistic', pa.float64()),
+    ('ks_pvalue', pa.float64()),
+    ('js_divergence', pa.float64()),
+    ('mean_shift', pa.float64()),
+    ('std_shift', pa.float64()),
+    ('has_drift', pa.bool_()),
+    ('drift_type', pa.string()),
+    ('seconds', pa.float64()),
+    ('error', pa.string()),
+])
+
+TABLES = {'runs': RUNS_SCHEMA, 'features': FEATURES_SCHEMA}
+METRIC_COLUMNS = ['psi_score', 'ks_statistic', 'ks_pvalue', 'js_divergence', 'mean_shift', 'std_shift']
+
+DateLike = Union[str, pd.Timestamp, None]
+
+
+def _partitioning() -> ds.Partitioning:
+    return ds.partitioning(pa.schema([(DATE_COL, pa.string())]), flavor='hive')
+
+
+class DriftHistoryStore:
+    """
+    Historial de corridas de drift (resumen + métricas por feature).
+
+    Uso::
+
+        store = DriftHistoryStore('reports/drift/history')
+        store.append(detector.detect_drift(current))
+        store.last_runs(10)
+        store.read_features(start='2025-01-01', features=['sell_price'])
+        store.compact(retention_days=90)
+    """
+
+    def __init__(self, root: Union[str, Path] = DEFAULT_HISTORY_DIR):
+        self.root = Path(root)
+
+    def _table_dir(self, table: str) -> Path:
+        return self.root / table
+
+    def _partitions(self, table: str) -> List[Path]:
+        """Directorios ``date=...`` ordenados por fecha."""
+        table_dir = self._table_dir(table)
+        if not table_dir.exists():
+            return []
+        return sorted(p for p in table_dir.glob(f'{DATE_COL}=*') if p.is_dir())
+
+    def _write(self, table: str, data: Union[pa.Table, Dict[str, list]], day: str, name: str) -> Path:
+        """Escribir un archivo nuevo en la partición del día (tmp + rename)."""
+        if isinstance(data, dict):
+            data = pa.Table.from_pydict(data, schema=TABLES[table])
+        partition = self._table_dir(table) / f'{DATE_COL}={day}'
+        partition.mkdir(parents=True, exist_ok=True)
+        path = partition / name
+        # Los archivos con prefijo '_' no los lee pyarrow.dataset
+        tmp = partition / f'_{name}'
+        pq.write_table(data, tmp)
+        os.replace(tmp, path)
+        return path
+
+    @staticmethod
+    def _new_run(timestamp: pd.Timestamp):
+        run_id = f"{timestamp:%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:8]}"
+        return run_id, f'{timestamp:%Y-%m-%d}', f'part-{run_id}.parquet'
+
+    # ------------------------------------------------------------------
+    # Escritura
+    # ------------------------------------------------------------------
+
+    def append(self, drift_results: Dict[str, Any]) -> str:
+        """
+        Agregar una corrida de ``DriftDetector.detect_drift``.
+
+        Args:
+            drift_results: Resultados de drift (timestamp, feature_drifts, summary, ...)
+
+        Returns:
+            run_id de la corrida
+        """
+        timestamp = pd.Timestamp(drift_results['timestamp'])
+        run_id, day, name = self._new_run(timestamp)
+        summary = drift_results.get('summary', {})
+        feature_drifts = drift_results.get('feature_drifts', {})
+        feature_errors = drift_results.get('feature_errors', {})
+        timings = drift_results.get('feature_timings', {})
+
+        self._write('runs', {
+            'run_id': [run_id],
+            'timestamp': [timestamp],
+            'overall_drift_score': [drift_results.get('overall_drift_score', 0.0)],
+            'features_with_drift': [len(drift_results.get('features_with_drift', []))],
+            'features_analyzed': [len(feature_drifts)],
+            'features_with_errors': [len(feature_errors)],
+            'has_significant_drift': [bool(summary.get('has_significant_drift', False))],
+            'max_drift_score': [summary.get('max_drift_score')],
+            'n_samples_current': [drift_results.get('n_samples_current')],
+        }, day, name)
+
+        features = list(feature_drifts) + [f for f in feature_errors if f not in feature_drifts]
+        if features:
+            rows = {col: [] for col in FEATURES_SCHEMA.names}
+            for feature in features:
+                metrics = feature_drifts.get(feature, {})
+                rows['run_id'].append(run_id)
+                rows['timestamp'].append(timestamp)
+                rows['feature'].append(feature)
+                for col in METRIC_COLUMNS:
+                    rows[col].append(metrics.get(col))
+                rows['has_drift'].append(metrics.get('has_drift'))
+                rows['drift_type'].append(metrics.get('drift_type'))
+                rows['seconds'].append(timings.get(feature))
+                rows['error'].append(feature_errors.get(feature))
+            self._write('features', rows, day, name)
+
+        return run_id
+
+    def import_json(self, path: Union[str, Path]) -> int:
+        """
+        Migrar un ``drift_history.json`` anterior (solo resumen por corrida).
+
+        Returns:
+            Corridas importadas
+        """
+        with open(path, 'r') as f:
+            history = json.load(f)
+        runs = pd.DataFrame(history)
+        if runs.empty:
+            return 0
+        runs['timestamp'] = pd.to_datetime(runs['timestamp'])
+        # Un archivo por día en lugar de uno por corrida
+        for day, group in runs.groupby(runs['timestamp'].dt.strftime('%Y-%m-%d')):
+            rows = {col: [None] * len(group) for col in RUNS_SCHEMA.names}
+            rows.update({
+                'run_id': [self._new_run(ts)[0] for ts in group['timestamp']],
+                'timestamp': list(group['timestamp']),
+                'overall_drift_score': group.get('overall_drift_score', 0.0).tolist(),
+                'features_with_drift': group.get('features_with_drift', 0).tolist(),
+                'has_significant_drift': group.get('has_significant_drift', False).astype(bool).tolist(),
+            })
+            self._write('runs', rows, day, f'part-{day.replace("-", "")}-imported.parquet')
+        logger.info(f"✅ {len(history)} corridas importadas desde {path}")
+        return len(history)
+
+    def compact(self,
+                retention_days: Optional[int] = None,
+                today: DateLike = None) -> Dict[str, int]:
+        """
+        Juntar los archivos de cada día cerrado en uno solo y borrar los días
+        con más de ``retention_days`` de antigüedad. El día en curso no se
+        toca (las corridas siguen agregando archivos).
+
+        Returns:
+            Diccionario con particiones compactadas y borradas
+        """
+        today = pd.Timestamp(today or pd.Timestamp.now()).normalize()
+        cutoff = None if retention_days is None else f'{today - pd.Timedelta(days=retention_days):%Y-%m-%d}'
+        compacted = dropped = 0
+        for table in TABLES:
+            for partition in self._partitions(table):
+                day = partition.name.split('=', 1)[1]
+                if cutoff is not None and day < cutoff:
+                    for file in partition.iterdir():
+                        file.unlink()
+                    partition.rmdir()
+                    dropped += 1
+                    continue
+                files = sorted(partition.glob('part-*.parquet'))
+                if day >= f'{today:%Y-%m-%d}' or len(files) < 2:
+                    continue
+                merged = pa.concat_tables([pq.read_table(f, schema=TABLES[table]) for f in files])
+                merged = merged.sort_by('timestamp')
+                name = f'part-{day.replace("-", "")}-compacted.parquet'
+                self._write(table, merged, day, name)
+                for file in files:
+                    if file.name != name:
+                        file.unlink()
+                compacted += 1
+        if compacted or dropped:
+            logger.info(f"✅ Historial de drift compactado: {compacted} particiones, {dropped} borradas")
+        return {'compacted': compacted, 'dropped': dropped}
+
+    # ------------------------------------------------------------------
+    # Lectura
+    # ------------------------------------------------------------------
+
+    def _read(self,
+              table: str,
+              start: DateLike = None,
+              end: DateLike = None,
+              features: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        schema = TABLES[table]
+        if not self._partitions(table):
+            return schema.empty_table().to_pandas()
+
+        dataset = ds.dataset(str(self._table_dir(table)), schema=schema.append(pa.field(DATE_COL, pa.string())),
+                             format='parquet', partitioning=_partitioning())
+        conditions = []
+        if start is not None:
+            start = pd.Timestamp(start)
+            conditions += [ds.field(DATE_COL) >= f'{start:%Y-%m-%d}', ds.field('timestamp') >= start]
+        if end is not None:
+            end = pd.Timestamp(end)
+            # Una fecha sin hora incluye el día completo
+            if end == end.normalize():
+                end = end + pd.Timedelta(days=1) - pd.Timedelta(microseconds=1)
+            conditions += [ds.field(DATE_COL) <= f'{end:%Y-%m-%d}', ds.field('timestamp') <= end]
+        if features is not None:
+            conditions.append(ds.field('feature').isin(list(features)))
+
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+        result = dataset.to_table(columns=schema.names, filter=expression).sort_by('timestamp')
+        return result.to_pandas()
+
+    def read_runs(self, start: DateLike = None, end: DateLike = None) -> pd.DataFrame:
+        """Corridas en [start, end] (fechas inclusivas), ordenadas por timestamp."""
+        return self._read('runs', start, end)
+
+    def read_features(self,
+                      start: DateLike = None,
+                      end: DateLike = None,
+                      features: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """Métricas por feature en [start, end], opcionalmente de algunas features."""
+        return self._read('features', start, end, features)
+
+    def last_runs(self, n: int = 10) -> pd.DataFrame:
+        """Últimas ``n`` corridas leyendo solo las particiones más recientes."""
+        tables, rows = [], 0
+        for partition in reversed(self._partitions('runs')):
+            files = sorted(partition.glob('part-*.parquet'))
+            if not files:
+                continue
+            table = pa.concat_tables([pq.read_table(f, schema=RUNS_SCHEMA) for f in files])
+            tables.append(table)
+            rows += table.num_rows
+            if rows >= n:
+                break
+        if not tables:
+            return RUNS_SCHEMA.empty_table().to_pandas()
+        runs = pa.concat_tables(tables).sort_by('timestamp').to_pandas()
+        return runs.tail(n).reset_index(drop=True)
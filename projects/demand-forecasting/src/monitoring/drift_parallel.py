@@ -0,0 +1,174 @@
+"""
+============================================================================
+drift_parallel.py - Ejecución paralela de drift por feature
+============================================================================
+Utilidades para repartir features entre un pool de procesos:
+
+- Las columnas se copian una vez a memoria compartida (matriz float64
+  n_features x n_filas, una fila contigua por feature); los workers se
+  adjuntan por nombre en lugar de recibir los datos serializados con pickle
+- Las features se reparten en shards contiguos, una tarea por shard
+- Cada feature se procesa aislada: su tiempo y su error (si lo hay) se
+  devuelven al proceso principal para incluirlos en el reporte
+
+Copia por proyecto: cada proyecto se instala y despliega por separado, sin
+paquete compartido, así que el mismo módulo vive también en ``credit-risk``.
+Las copias son idénticas fuera de este encabezado; un cambio aquí se replica
+en todas.
+
+Autor: Ing. Daniel Varela Perez
+Email: bedaniele0@gmail.com
+Metodología: DVP-PRO
+============================================================================
+"""
+
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Número de procesos por defecto (-1 = todos los cores)
+DRIFT_N_JOBS_ENV = "DRIFT_N_JOBS"
+
+ColumnsSpec = Tuple[str, Tuple[int, int]]
+
+
+def resolve_n_jobs(n_jobs: Optional[int] = None) -> int:
+    """
+    Número efectivo de procesos.
+
+    Args:
+        n_jobs: None lee DRIFT_N_JOBS (default 1); <= 0 usa todos los cores
+
+    Returns:
+        Entero >= 1
+    """
+    if n_jobs is None:
+        n_jobs = int(os.getenv(DRIFT_N_JOBS_ENV, "1"))
+    if n_jobs <= 0:
+        n_jobs = os.cpu_count() or 1
+    return n_jobs
+
+
+def shard_indices(n_items: int, n_shards: int) -> List[np.ndarray]:
+    """Índices 0..n_items-1 en hasta ``n_shards`` bloques contiguos no vacíos."""
+    n_shards = max(1, min(n_shards, n_items))
+    return [idx for idx in np.array_split(np.arange(n_items), n_shards) if len(idx)]
+
+
+def process_executor(n_jobs: int) -> Executor:
+    """Pool de procesos para los shards de features."""
+    return ProcessPoolExecutor(max_workers=n_jobs)
+
+
+class SharedColumns:
+    """
+    Matriz float64 (n_features x n_filas) en memoria compartida.
+
+    Uso::
+
+        with SharedColumns.from_frame(df, features) as shared:
+            executor.submit(worker, shared.spec, ...)
+    """
+
+    def __init__(self, n_features: int, n_rows: int):
+        shape = (n_features, n_rows)
+        self._shm = SharedMemory(create=True, size=max(n_features * n_rows * 8, 1))
+        self.array = np.ndarray(shape, dtype=np.float64, buffer=self._shm.buf)
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame, features: Sequence[str]) -> 'SharedColumns':
+        """Copiar las columnas ``features`` (no numéricos -> NaN)."""
+        shared = cls(len(features), len(frame))
+        for j, feature in enumerate(features):
+            shared.array[j] = pd.to_numeric(frame[feature], errors='coerce').to_numpy(
+                dtype=np.float64, na_value=np.nan
+            )
+        return shared
+
+    @classmethod
+    def from_array(cls, columns: np.ndarray) -> 'SharedColumns':
+        """Copiar una matriz (n_features x n_filas)."""
+        shared = cls(*columns.shape)
+        shared.array[:] = columns
+        return shared
+
+    @property
+    def spec(self) -> ColumnsSpec:
+        """Nombre y forma del segmento (lo único que viaja al worker)."""
+        return self._shm.name, self.array.shape
+
+    def close(self) -> None:
+        """Liberar y eliminar el segmento."""
+        del self.array
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self) -> 'SharedColumns':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def with_columns(spec: ColumnsSpec, fn: Callable[..., Any], *args) -> Any:
+    """
+    Adjuntar el segmento ``spec`` en el worker y llamar ``fn(columns, *args)``.
+
+    ``fn`` no debe devolver vistas de ``columns``: el segmento se cierra al
+    terminar.
+    """
+    name, shape = spec
+    shm = SharedMemory(name=name)
+    try:
+        return fn(np.ndarray(shape, dtype=np.float64, buffer=shm.buf), *args)
+    finally:
+        try:
+            shm.close()
+        except BufferError:
+            # Alguna vista sigue viva (traceback de una excepción): se libera
+            # cuando el worker la suelte
+            pass
+
+
+def run_per_feature(items: Iterable[Tuple[str, Any]],
+                    fn: Callable[[Any], Any]) -> Tuple[Dict[str, Any], Dict[str, float], Dict[str, str]]:
+    """
+    Ejecutar ``fn(arg)`` para cada (feature, arg) aislando errores.
+
+    Returns:
+        Tuple (resultados, segundos por feature, errores por feature)
+    """
+    results: Dict[str, Any] = {}
+    timings: Dict[str, float] = {}
+    errors: Dict[str, str] = {}
+    for feature, arg in items:
+        start = time.perf_counter()
+        try:
+            results[feature] = fn(arg)
+        except Exception as e:
+            errors[feature] = f"{type(e).__name__}: {e}"
+        timings[feature] = time.perf_counter() - start
+    return results, timings, errors
+
+
+def collect_shards(futures: Iterable[Tuple[Sequence[str], Any]]):
+    """
+    Resultados de los shards enviados al pool. Si un shard completo falla
+    (p.ej. un worker muere), todas sus features quedan con ese error.
+
+    Args:
+        futures: Pares (features del shard, future de run_per_feature)
+
+    Yields:
+        Tuple (resultados, segundos por feature, errores por feature)
+    """
+    for features, future in futures:
+        try:
+            yield future.result()
+        except Exception as e:
+            yield {}, {}, {feature: f"{type(e).__name__}: {e}" for feature in features}
@@ -0,0 +1,518 @@
+"""
+============================================================================
+drift_sketches.py - Perfiles de drift con sketches mergeables
+============================================================================
+Resumen acotado en memoria de la distribución de cada feature:
+
+- Histograma de bordes fijos (tomados de la referencia) con cubetas de
+  underflow / overflow para valores fuera del rango de referencia
+- Sketch de cuantiles KLL (~k items retenidos por feature)
+- Conteo, media y varianza exactos (fórmula de Chan para combinar)
+
+Un perfil de referencia se construye una vez y se persiste (.npz); las
+ventanas actuales se acumulan chunk por chunk con ``update`` o ``merge`` y
+PSI / KS / JS salen de los sketches sin mantener datos crudos.
+
+Autor: Ing. Daniel Varela Perez
+Email: bedaniele0@gmail.com
+Tel: +52 55 4189 3428
+Metodología: DVP-PRO
+============================================================================
+"""
+
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+from scipy.spatial.distance import jensenshannon
+
+from .drift_kernel import histogram_counts, js_from_counts, psi_from_counts, sort_columns
+
+logger = logging.getLogger(__name__)
+
+# Tamaño por defecto del sketch KLL (~32 KB por feature). El error de rango
+# es del orden de unas pocas unidades / k (ver QuantileSketch.rank_error);
+# ks_from_sketches lo descuenta de D antes del p-value. Con menos de k
+# valores el sketch es exacto.
+DEFAULT_SKETCH_SIZE = 4096
+DEFAULT_BINS = 10
+
+# Piso de probabilidad por cubeta para PSI (mismo valor que DriftDetector)
+PSI_EPSILON = 0.0001
+
+FrameSource = Union[pd.DataFrame, Callable[[], Iterable[pd.DataFrame]]]
+
+
+class QuantileSketch:
+    """
+    Sketch de cuantiles KLL mergeable.
+
+    Cada nivel h guarda items con peso 2^h; cuando un nivel excede su
+    capacidad se ordena y se promueve uno de cada dos items (offset aleatorio)
+    al nivel siguiente. El peso total se conserva exactamente.
+    """
+
+    def __init__(self, k: int = DEFAULT_SKETCH_SIZE, seed: int = 0):
+        self.k = k
+        self.levels: List[np.ndarray] = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    @property
+    def n(self) -> int:
+        return int(sum(len(level) << h for h, level in enumerate(self.levels)))
+
+    @property
+    def rank_error(self) -> float:
+        """
+        Cota del error de rango normalizado (~99%, fórmula empírica de KLL de
+        DataSketches: 2.296 / k^0.9723). Cero si nunca se compactó.
+        """
+        if len(self.levels) == 1:
+            return 0.0
+        return 2.296 / self.k ** 0.9723
+
+    def _capacity(self, h: int) -> int:
+        depth = len(self.levels) - 1 - h
+        return max(2, int(np.ceil(self.k * (2.0 / 3.0) ** depth)))
+
+    def _compress(self) -> None:
+        h = 0
+        while h < len(self.levels):
+            level = self.levels[h]
+            if len(level) > self._capacity(h):
+                level = np.sort(level)
+                # Con longitud impar un item se queda en el nivel
+                keep = level[-1:] if len(level) % 2 else level[:0]
+                pairs = level[:len(level) - len(keep)]
+                promoted = pairs[self._rng.integers(2)::2]
+                self.levels[h] = keep
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+            h += 1
+
+    def update(self, values: np.ndarray) -> 'QuantileSketch':
+        """Agregar valores (los NaN se ignoran)."""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values):
+            self.levels[0] = np.concatenate([self.levels[0], values])
+            self._compress()
+        return self
+
+    def merge(self, other: 'QuantileSketch') -> 'QuantileSketch':
+        """Combinar otro sketch en éste."""
+        for h, level in enumerate(other.levels):
+            if h == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[h] = np.concatenate([self.levels[h], level])
+        self._compress()
+        return self
+
+    def _weighted_items(self):
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 1 << h, dtype=np.int64)
+                                  for h, level in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        return items[order], np.cumsum(weights[order])
+
+    def cdf(self, x: np.ndarray) -> np.ndarray:
+        """Fracción estimada de valores <= x."""
+        x = np.asarray(x, dtype=np.float64)
+        total = self.n
+        if total == 0:
+            return np.zeros_like(x)
+        items, cum_weights = self._weighted_items()
+        idx = np.searchsorted(items, x, side='right')
+        cum = np.concatenate([[0], cum_weights])
+        return cum[idx] / total
+
+    def quantile(self, q: Union[float, np.ndarray]) -> np.ndarray:
+        """Cuantiles estimados (q en [0, 1])."""
+        total = self.n
+        if total == 0:
+            return np.full(np.shape(q), np.nan)
+        items, cum_weights = self._weighted_items()
+        ranks = np.asarray(q, dtype=np.float64) * total
+        idx = np.searchsorted(cum_weights, np.maximum(ranks, 1), side='left')
+        return items[np.minimum(idx, len(items) - 1)]
+
+
+class FeatureSketch:
+    """
+    Resumen de una feature: histograma de bordes fijos, momentos y cuantiles.
+
+    ``counts`` tiene ``len(edges) + 1`` cubetas:
+    [< edges[0]], [edges[0], edges[1]), ..., [edges[-2], edges[-1]], [> edges[-1]]
+    (el último bin interior es cerrado, como np.histogram).
+    """
+
+    def __init__(self, edges: np.ndarray, k: int = DEFAULT_SKETCH_SIZE, seed: int = 0):
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.counts = np.zeros(len(self.edges) + 1, dtype=np.int64)
+        self.count = 0
+        self.n_missing = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self.quantiles = QuantileSketch(k=k, seed=seed)
+
+    def _bucket(self, values: np.ndarray) -> np.ndarray:
+        bucket = np.searchsorted(self.edges, values, side='right')
+        # El borde superior pertenece al último bin interior
+        bucket[values == self.edges[-1]] = len(self.edges) - 1
+        return bucket
+
+    def _merge_moments(self, count: int, mean: float, m2: float) -> None:
+        total = self.count + count
+        if total == 0:
+            return
+        delta = mean - self.mean
+        self.m2 += m2 + delta ** 2 * self.count * count / total
+        self.mean += delta * count / total
+        self.count = total
+
+    def update(self, values) -> 'FeatureSketch':
+        """Acumular un chunk de valores."""
+        values = np.asarray(values, dtype=np.float64)
+        missing = np.isnan(values)
+        self.n_missing += int(missing.sum())
+        values = values[~missing]
+        if len(values) == 0:
+            return self
+
+        self.counts += np.bincount(self._bucket(values), minlength=len(self.counts))
+        mean = float(values.mean())
+        self._merge_moments(len(values), mean, float(((values - mean) ** 2).sum()))
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.quantiles.update(values)
+        return self
+
+    def add_sorted(self,
+                   sorted_values: np.ndarray,
+                   counts: np.ndarray,
+                   mean: float,
+                   m2: float,
+                   n_missing: int = 0) -> 'FeatureSketch':
+        """
+        Acumular un chunk ya resumido por DriftProfile.update: valores no nulos
+        ordenados, conteos por cubeta (histogram_counts con ``outer=True``) y
+        momentos del chunk.
+        """
+        self.n_missing += int(n_missing)
+        if len(sorted_values) == 0:
+            return self
+        self.counts += counts
+        self._merge_moments(len(sorted_values), float(mean), float(m2))
+        self.min = min(self.min, float(sorted_values[0]))
+        self.max = max(self.max, float(sorted_values[-1]))
+        self.quantiles.update(sorted_values)
+        return self
+
+    def merge(self, other: 'FeatureSketch') -> 'FeatureSketch':
+        """Combinar otro sketch con los mismos bordes."""
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError("Cannot merge feature sketches with different bin edges")
+        self.counts += other.counts
+        self.n_missing += other.n_missing
+        self._merge_moments(other.count, other.mean, other.m2)
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.quantiles.merge(other.quantiles)
+        return self
+
+    @property
+    def std(self) -> float:
+        """Desviación estándar muestral (ddof=1, como pandas)."""
+        return float(np.sqrt(self.m2 / (self.count - 1))) if self.count > 1 else float('nan')
+
+    def distribution(self) -> np.ndarray:
+        """Proporción por cubeta (incluye underflow / overflow)."""
+        return self.counts / max(self.count, 1)
+
+    def statistics(self) -> Dict[str, float]:
+        """Mismas estadísticas que DriftDetector._calculate_statistics."""
+        median, q25, q75, q95 = self.quantiles.quantile(np.array([0.5, 0.25, 0.75, 0.95]))
+        return {
+            'mean': float(self.mean),
+            'std': self.std,
+            'min': float(self.min),
+            'max': float(self.max),
+            'median': float(median),
+            'q25': float(q25),
+            'q75': float(q75),
+            'q95': float(q95),
+        }
+
+
+def reference_edges(minimum: float, maximum: float, bins: int = DEFAULT_BINS) -> np.ndarray:
+    """Bordes equiespaciados sobre [min, max], como ``np.histogram(x, bins)``."""
+    if minimum == maximum:
+        minimum, maximum = minimum - 0.5, maximum + 0.5
+    return np.linspace(minimum, maximum, bins + 1)
+
+
+class DriftProfile:
+    """
+    Conjunto de FeatureSketch con los mismos bordes que la referencia.
+
+    Uso típico::
+
+        reference = DriftProfile.from_data(train_df, features)
+        reference.save('reports/drift/reference_profile.npz')
+
+        window = reference.new_window()
+        for chunk in chunks:
+            window.update(chunk)
+        compare_profiles(reference, window)
+    """
+
+    def __init__(self, edges: Dict[str, np.ndarray], k: int = DEFAULT_SKETCH_SIZE):
+        self.k = k
+        self.sketches: Dict[str, FeatureSketch] = {
+            feature: FeatureSketch(feature_edges, k=k, seed=i)
+            for i, (feature, feature_edges) in enumerate(edges.items())
+        }
+
+    @property
+    def features(self) -> List[str]:
+        return list(self.sketches)
+
+    @property
+    def n_rows(self) -> int:
+        """Filas observadas (máximo de valores no nulos + nulos entre features)."""
+        return max((s.count + s.n_missing for s in self.sketches.values()), default=0)
+
+    @classmethod
+    def from_data(cls,
+                  data: FrameSource,
+                  feature_columns: Optional[List[str]] = None,
+                  bins: int = DEFAULT_BINS,
+                  k: int = DEFAULT_SKETCH_SIZE) -> 'DriftProfile':
+        """
+        Construir un perfil de referencia.
+
+        Args:
+            data: DataFrame, o función que devuelve un iterable de chunks
+                (se recorre dos veces: rango por feature y luego acumulación)
+            feature_columns: Features a perfilar (default: columnas numéricas)
+            bins: Número de bins del histograma
+            k: Tamaño del sketch de cuantiles
+
+        Returns:
+            DriftProfile con los bordes fijados por el rango de la referencia
+        """
+        chunks = (lambda: [data]) if isinstance(data, pd.DataFrame) else data
+
+        minimum: Dict[str, float] = {}
+        maximum: Dict[str, float] = {}
+        for chunk in chunks():
+            columns = feature_columns or chunk.select_dtypes(include=[np.number]).columns
+            for col in columns:
+                if col not in chunk.columns:
+                    continue
+                values = pd.to_numeric(chunk[col], errors='coerce')
+                if values.notna().any():
+                    minimum[col] = min(minimum.get(col, np.inf), float(values.min()))
+                    maximum[col] = max(maximum.get(col, -np.inf), float(values.max()))
+
+        order = feature_columns or list(minimum)
+        edges = {
+            col: reference_edges(minimum[col], maximum[col], bins)
+            for col in order if col in minimum
+        }
+        profile = cls(edges, k=k)
+        for chunk in chunks():
+            profile.update(chunk)
+        return profile
+
+    def new_window(self) -> 'DriftProfile':
+        """Perfil vacío con los mismos bordes (para datos actuales)."""
+        return DriftProfile({f: s.edges for f, s in self.sketches.items()}, k=self.k)
+
+    def update(self, chunk: pd.DataFrame) -> 'DriftProfile':
+        """
+        Acumular un chunk; las features ausentes en el chunk se ignoran.
+
+        El chunk se ordena una vez por columna y los conteos por cubeta y los
+        momentos de todas las features salen de llamadas matriciales
+        (drift_kernel); solo el sketch de cuantiles se actualiza por feature.
+        """
+        present = [f for f in self.sketches if f in chunk.columns]
+        if not present or len(chunk) == 0:
+            return self
+
+        columns = np.vstack([
+            pd.to_numeric(chunk[f], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+            for f in present
+        ])
+        return self.update_columns(columns, present)
+
+    def update_columns(self, columns: np.ndarray, features: List[str]) -> 'DriftProfile':
+        """
+        Acumular una matriz float64 (n_features x n_filas) cuyas filas son
+        las columnas ``features`` de un chunk (NaN = faltante).
+        """
+        sorted_t, n_valid = sort_columns(columns.T)
+        edges = np.vstack([self.sketches[f].edges for f in features])
+        counts = histogram_counts(sorted_t, n_valid, edges, outer=True)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.nansum(sorted_t, axis=1) / n_valid
+            m2 = np.nansum((sorted_t - means[:, None]) ** 2, axis=1)
+
+        n_rows = columns.shape[1]
+        for j, feature in enumerate(features):
+            self.sketches[feature].add_sorted(
+                sorted_t[j, :n_valid[j]], counts[j], means[j], m2[j], n_rows - n_valid[j]
+            )
+        return self
+
+    def merge(self, other: 'DriftProfile') -> 'DriftProfile':
+        """Combinar otro perfil (p.ej. de otro worker u otra hora)."""
+        for feature, sketch in other.sketches.items():
+            if feature in self.sketches:
+                self.sketches[feature].merge(sketch)
+        return self
+
+    def save(self, path: Union[str, Path]) -> Path:
+        """
+        Persistir el perfil en un .npz (bordes, conteos, momentos y niveles KLL).
+        Se escribe en un temporal y se reemplaza con ``os.replace`` para que un
+        lector concurrente nunca vea un archivo a medio escribir.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        arrays = {}
+        meta = {'k': self.k, 'features': {}}
+        for i, (feature, sketch) in enumerate(self.sketches.items()):
+            arrays[f'{i}_edges'] = sketch.edges
+            arrays[f'{i}_counts'] = sketch.counts
+            for h, level in enumerate(sketch.quantiles.levels):
+                arrays[f'{i}_level_{h}'] = level
+            meta['features'][feature] = {
+                'index': i,
+                'levels': len(sketch.quantiles.levels),
+                'count': sketch.count,
+                'n_missing': sketch.n_missing,
+                'mean': sketch.mean,
+                'm2': sketch.m2,
+                'min': sketch.min,
+                'max': sketch.max,
+            }
+        arrays['meta'] = np.array(json.dumps(meta))
+        tmp_path = path.with_name(f"{path.name}.tmp{os.getpid()}")
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(tmp_path, path)
+        logger.info(f"✅ Perfil de drift guardado: {path} ({len(self.sketches)} features)")
+        return path
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> 'DriftProfile':
+        """Cargar un perfil guardado con ``save``."""
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            features = meta['features']
+            profile = cls({f: data[f"{m['index']}_edges"] for f, m in features.items()}, k=meta['k'])
+            for feature, m in features.items():
+                sketch = profile.sketches[feature]
+                i = m['index']
+                sketch.counts = data[f'{i}_counts'].astype(np.int64)
+                sketch.quantiles.levels = [data[f'{i}_level_{h}'] for h in range(m['levels'])]
+                for attr in ('count', 'n_missing', 'mean', 'm2', 'min', 'max'):
+                    setattr(sketch, attr, m[attr])
+        return profile
+
+
+def psi_from_sketches(reference: FeatureSketch, current: FeatureSketch) -> float:
+    """PSI sobre los bins fijos de la referencia (más underflow / overflow)."""
+    ref_dist = np.where(reference.counts == 0, PSI_EPSILON, reference.distribution())
+    curr_dist = np.where(current.counts == 0, PSI_EPSILON, current.distribution())
+    return float(np.sum((curr_dist - ref_dist) * np.log(curr_dist / ref_dist)))
+
+
+def profile_psi_js(reference: DriftProfile, current: DriftProfile, features: List[str]):
+    """PSI y JS de todas las features con una llamada matricial sobre los conteos."""
+    ref_counts = np.vstack([reference.sketches[f].counts for f in features])
+    cur_counts = np.vstack([current.sketches[f].counts for f in features])
+    return (psi_from_counts(ref_counts, cur_counts, PSI_EPSILON, smoothing='floor'),
+            js_from_counts(ref_counts, cur_counts))
+
+
+def js_from_sketches(reference: FeatureSketch, current: FeatureSketch) -> float:
+    """Distancia de Jensen-Shannon entre los histogramas de bordes fijos."""
+    return float(jensenshannon(reference.distribution(), current.distribution()))
+
+
+def ks_from_sketches(reference: FeatureSketch, current: FeatureSketch):
+    """
+    Estadístico KS aproximado: máxima diferencia entre las CDFs de los
+    sketches evaluada en los items retenidos por ambos. p-value asintótico
+    (el modo 'asymp' de ks_2samp).
+
+    El p-value se calcula sobre D menos el error de rango de ambos sketches:
+    con n grande el umbral de KS (D ~ 1/sqrt(n)) queda por debajo del error
+    del sketch (~1/k) y, sin descontarlo, toda feature saldría con drift.
+    El estadístico devuelto es el D estimado, sin descuento.
+    """
+    grid = np.union1d(np.concatenate(reference.quantiles.levels),
+                      np.concatenate(current.quantiles.levels))
+    if len(grid) == 0:
+        return 0.0, 1.0
+    statistic = float(np.max(np.abs(reference.quantiles.cdf(grid) - current.quantiles.cdf(grid))))
+    n, m = reference.count, current.count
+    excess = max(statistic - reference.quantiles.rank_error - current.quantiles.rank_error, 0.0)
+    pvalue = float(stats.kstwo.sf(excess, np.round(n * m / (n + m)))) if n and m else 1.0
+    return statistic, min(max(pvalue, 0.0), 1.0)
+
+
+def feature_drift_from_sketches(feature_name: str,
+                                reference: FeatureSketch,
+                                current: FeatureSketch,
+                                drift_threshold: float = 0.1,
+                                psi_score: Optional[float] = None,
+                                js_div: Optional[float] = None) -> Dict:
+    """
+    Métricas de drift con el mismo formato que DriftDetector._calculate_feature_drift.
+
+    ``psi_score`` / ``js_div`` pueden venir ya calculados para todas las
+    features a la vez (ver profile_psi_js).
+    """
+    if psi_score is None:
+        psi_score = psi_from_sketches(reference, current)
+    if js_div is None:
+        js_div = js_from_sketches(reference, current)
+    ks_stat, ks_pval = ks_from_sketches(reference, current)
+    mean_shift = abs(current.mean - reference.mean) / (reference.std + 1e-10)
+    std_shift = abs(current.std - reference.std) / (reference.std + 1e-10)
+
+    has_drift = bool(psi_score > drift_threshold or ks_pval < 0.05 or js_div > drift_threshold)
+    drift_type = None
+    if has_drift:
+        if mean_shift > 1.0:
+            drift_type = 'mean_shift'
+        elif std_shift > 0.5:
+            drift_type = 'variance_change'
+        elif psi_score > drift_threshold * 2:
+            drift_type = 'distribution_change'
+        else:
+            drift_type = 'moderate_drift'
+
+    return {
+        'feature': feature_name,
+        'psi_score': psi_score,
+        'ks_statistic': ks_stat,
+        'ks_pvalue': ks_pval,
+        'js_divergence': js_div,
+        'mean_shift': float(mean_shift),
+        'std_shift': float(std_shift),
+        'has_drift': has_drift,
+        'drift_type': drift_type
+    }
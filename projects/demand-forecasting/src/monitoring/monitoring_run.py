@@ -16,7 +16,7 @@ import sys
 import logging
 import argparse
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterator, List, Optional, Union
 from datetime import datetime
 import warnings
 
@@ -30,10 +30,16 @@ PROJECT_ROOT = Path(__file__).resolve().parents[2]
 sys.path.insert(0, str(PROJECT_ROOT))
 
 from src.monitoring.drift_detection import DriftDetector, DriftMonitor
+from src.monitoring.drift_history import DEFAULT_HISTORY_DIR, DriftHistoryStore
+from src.monitoring.drift_sketches import DriftProfile
+from src.features.feature_store import is_feature_store, iter_feature_store, open_feature_store
 from src.monitoring.alerts import get_alert_manager, AlertLevel
 
 warnings.filterwarnings('ignore')
 
+# Perfil de referencia persistido (histogramas + sketches por feature)
+REFERENCE_PROFILE_PATH = PROJECT_ROOT / "reports" / "drift" / "reference_profile.npz"
+
 
 def setup_logging(log_level: str = "INFO") -> None:
     """Configura logging del sistema."""
@@ -85,34 +91,114 @@ def load_config(config_path: str = "config/alerts_config.yaml") -> Dict[str, Any
         }
 
 
-def load_reference_data() -> pd.DataFrame:
+def _training_end_date() -> Optional[str]:
+    """Último día de entrenamiento (día previo a data.validation_start de config.yaml)."""
+    try:
+        with open(PROJECT_ROOT / "config" / "config.yaml", 'r') as f:
+            validation_start = yaml.safe_load(f)['data']['validation_start']
+    except (OSError, KeyError, TypeError):
+        return None
+    return str((pd.Timestamp(validation_start) - pd.Timedelta(days=1)).date())
+
+
+def iter_reference_chunks(columns: Optional[List[str]] = None,
+                          stores: Optional[List[str]] = None,
+                          start_date: Optional[str] = None,
+                          end_date: Optional[str] = None,
+                          batch_rows: int = 1 << 20) -> Iterator[pd.DataFrame]:
     """
-    Carga datos de referencia para drift detection.
+    Recorre los datos de referencia por chunks (sin muestreo).
 
-    Returns:
-        DataFrame con datos de referencia
+    Si existe el feature store particionado (data/processed/feature_store) solo
+    se lee el corte pedido; los filtros de tienda y fecha se empujan a pyarrow.
+    Si no, se lee train_data.parquet por lotes.
+
+    Args:
+        columns: Columnas a leer (default: todas)
+        stores: Tiendas a incluir (default: todas)
+        start_date: Fecha inicial inclusiva del periodo de referencia
+        end_date: Fecha final inclusiva (default en el feature store: último
+            día antes de data.validation_start)
+        batch_rows: Filas máximas por chunk
+
+    Yields:
+        DataFrames con datos de referencia
     """
-    try:
-        # Intentar cargar datos de training
-        train_path = PROJECT_ROOT / "data" / "processed" / "train_data.parquet"
+    store_path = PROJECT_ROOT / "data" / "processed" / "feature_store"
+    train_path = PROJECT_ROOT / "data" / "processed" / "train_data.parquet"
+
+    if is_feature_store(store_path):
+        logger.info(f"📊 Leyendo referencia del feature store: {store_path}")
+        if end_date is None:
+            # El store incluye validación: la referencia termina antes
+            end_date = _training_end_date()
+        if columns is not None:
+            available = set(open_feature_store(store_path).schema.names)
+            columns = [c for c in columns if c in available]
+        yield from iter_feature_store(store_path, columns=columns, stores=stores,
+                                      start_date=start_date, end_date=end_date,
+                                      batch_rows=batch_rows)
+    elif train_path.exists():
+        import pyarrow.parquet as pq
+        logger.info(f"📊 Leyendo datos de referencia: {train_path}")
+        parquet_file = pq.ParquetFile(train_path)
+        if columns is not None:
+            available = set(parquet_file.schema_arrow.names)
+            columns = [c for c in columns if c in available]
+        for batch in parquet_file.iter_batches(batch_size=batch_rows, columns=columns):
+            yield batch.to_pandas()
+    else:
+        logger.warning("⚠️ Datos de referencia no encontrados")
+
+
+def load_reference_profile(feature_columns: List[str],
+                           profile_path: Optional[Path] = None,
+                           rebuild: bool = False,
+                           stores: Optional[List[str]] = None,
+                           start_date: Optional[str] = None,
+                           end_date: Optional[str] = None) -> Optional[DriftProfile]:
+    """
+    Carga (o construye y persiste) el perfil de referencia para drift detection.
 
-        if train_path.exists():
-            logger.info(f"📊 Cargando datos de referencia: {train_path}")
-            df = pd.read_parquet(train_path)
+    El perfil guarda histogramas de bordes fijos y sketches de cuantiles por
+    feature; se construye una vez recorriendo toda la referencia por chunks
+    (dos pasadas: rango y acumulación) en memoria acotada.
 
-            # Tomar muestra si es muy grande
-            if len(df) > 10000:
-                df = df.sample(10000, random_state=42)
-                logger.info(f"   Muestra reducida a {len(df):,} registros")
+    Args:
+        feature_columns: Features que el perfil debe cubrir
+        profile_path: Archivo .npz del perfil (default: reports/drift/reference_profile.npz)
+        rebuild: Reconstruir aunque exista el archivo
+        stores, start_date, end_date: Corte de referencia (ver iter_reference_chunks)
 
-            return df
-        else:
+    Returns:
+        DriftProfile, o None si no hay datos de referencia
+    """
+    profile_path = Path(profile_path or REFERENCE_PROFILE_PATH)
+    try:
+        if profile_path.exists() and not rebuild:
+            profile = DriftProfile.load(profile_path)
+            missing = [f for f in feature_columns if f not in profile.sketches]
+            if not missing:
+                logger.info(f"✅ Perfil de referencia cargado: {profile_path}")
+                return profile
+            logger.info(f"   Perfil sin {len(missing)} features, reconstruyendo...")
+
+        logger.info("📊 Construyendo perfil de referencia (sin muestreo)...")
+        profile = DriftProfile.from_data(
+            lambda: iter_reference_chunks(feature_columns, stores, start_date, end_date),
+            feature_columns
+        )
+        if not profile.sketches or profile.n_rows == 0:
             logger.warning("⚠️ Datos de referencia no encontrados")
-            return pd.DataFrame()
+            return None
+
+        logger.info(f"   Referencia: {profile.n_rows:,} registros, {len(profile.features)} features")
+        profile.save(profile_path)
+        return profile
 
     except Exception as e:
-        logger.error(f"❌ Error cargando datos de referencia: {e}")
-        return pd.DataFrame()
+        logger.error(f"❌ Error cargando perfil de referencia: {e}")
+        return None
 
 
 def load_current_data() -> pd.DataFrame:
@@ -232,14 +318,21 @@ def check_model_performance(config: Dict[str, Any]) -> Dict[str, Any]:
         return {'status': 'error', 'violations': []}
 
 
-def run_drift_detection(reference_data: pd.DataFrame,
+def drift_feature_columns(current_data: pd.DataFrame) -> List[str]:
+    """Features numéricas de los datos actuales, sin columnas de identificación."""
+    exclude_cols = ['id', 'sales', 'prediction', 'd']
+    numeric_features = current_data.select_dtypes(include=[np.number]).columns.tolist()
+    return [f for f in numeric_features if f not in exclude_cols]
+
+
+def run_drift_detection(reference: Union[pd.DataFrame, DriftProfile],
                        current_data: pd.DataFrame,
                        config: Dict[str, Any]) -> Dict[str, Any]:
     """
     Ejecuta detección de drift.
 
     Args:
-        reference_data: Datos de referencia
+        reference: Perfil de referencia (DriftProfile) o datos de referencia
         current_data: Datos actuales
         config: Configuración
 
@@ -250,12 +343,12 @@ def run_drift_detection(reference_data: pd.DataFrame,
         logger.info("🔍 Ejecutando drift detection...")
 
         # Obtener features numéricas comunes
-        common_features = list(set(reference_data.columns) & set(current_data.columns))
-        numeric_features = reference_data[common_features].select_dtypes(include=[np.number]).columns.tolist()
-
-        # Excluir columnas de identificación
-        exclude_cols = ['id', 'sales', 'prediction', 'd']
-        numeric_features = [f for f in numeric_features if f not in exclude_cols]
+        reference_features = (
+            reference.features if isinstance(reference, DriftProfile) else list(reference.columns)
+        )
+        numeric_features = [
+            f for f in drift_feature_columns(current_data) if f in set(reference_features)
+        ]
 
         if not numeric_features:
             logger.warning("⚠️ No hay features numéricas comunes para drift detection")
@@ -265,12 +358,22 @@ def run_drift_detection(reference_data: pd.DataFrame,
 
         # Inicializar detector
         drift_threshold = config.get('drift_thresholds', {}).get('global_drift_score', {}).get('warning', 0.1)
-
-        detector = DriftDetector(
-            reference_data=reference_data[numeric_features],
-            feature_columns=numeric_features,
-            drift_threshold=drift_threshold
-        )
+        n_jobs = config.get('drift_executor', {}).get('n_jobs', 1)
+
+        if isinstance(reference, DriftProfile):
+            detector = DriftDetector(
+                reference_profile=reference,
+                feature_columns=numeric_features,
+                drift_threshold=drift_threshold,
+                n_jobs=n_jobs
+            )
+        else:
+            detector = DriftDetector(
+                reference_data=reference[numeric_features],
+                feature_columns=numeric_features,
+                drift_threshold=drift_threshold,
+                n_jobs=n_jobs
+            )
 
         # Detectar drift
         drift_results = detector.detect_drift(current_data[numeric_features])
@@ -284,9 +387,17 @@ def run_drift_detection(reference_data: pd.DataFrame,
 
         detector.save_drift_report(drift_results, str(report_path))
 
+        # Historial append-only (resumen + métricas por feature)
+        history_config = config.get('drift_history', {})
+        history = DriftHistoryStore(PROJECT_ROOT / history_config.get('path', DEFAULT_HISTORY_DIR))
+        history.append(drift_results)
+        history.compact(history_config.get('retention_days'))
+
         logger.info(f"✅ Drift detection completado")
         logger.info(f"   Overall drift score: {drift_results['overall_drift_score']:.4f}")
         logger.info(f"   Features con drift: {len(drift_results['features_with_drift'])}")
+        if drift_results['feature_errors']:
+            logger.warning(f"⚠️ Features con error: {len(drift_results['feature_errors'])}")
 
         return drift_results
 
@@ -406,6 +517,18 @@ def main():
     parser.add_argument('--log-level', type=str, default='INFO',
                        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
                        help='Nivel de logging')
+    parser.add_argument('--stores', type=str, default=None,
+                       help='Tiendas de referencia separadas por comas (feature store)')
+    parser.add_argument('--reference-start', type=str, default=None,
+                       help='Fecha inicial del periodo de referencia (YYYY-MM-DD)')
+    parser.add_argument('--reference-end', type=str, default=None,
+                       help='Fecha final del periodo de referencia (YYYY-MM-DD)')
+    parser.add_argument('--reference-profile', type=str, default=str(REFERENCE_PROFILE_PATH),
+                       help='Perfil de referencia persistido (.npz)')
+    parser.add_argument('--rebuild-reference', action='store_true',
+                       help='Reconstruir el perfil de referencia')
+    parser.add_argument('--n-jobs', type=int, default=None,
+                       help='Procesos para drift detection (-1 = todos los cores)')
 
     args = parser.parse_args()
 
@@ -416,6 +539,8 @@ def main():
     try:
         # 1. Cargar configuración
         config = load_config(args.config)
+        if args.n_jobs is not None:
+            config.setdefault('drift_executor', {})['n_jobs'] = args.n_jobs
 
         # 2. Check de performance del modelo
         performance_results = check_model_performance(config)
@@ -423,11 +548,21 @@ def main():
         # 3. Drift detection (si no se omite)
         drift_results = {}
         if not args.skip_drift:
-            reference_data = load_reference_data()
             current_data = load_current_data()
-
-            if not reference_data.empty and not current_data.empty:
-                drift_results = run_drift_detection(reference_data, current_data, config)
+            # Solo las features comparables con los datos actuales
+            reference_profile = None
+            if not current_data.empty:
+                reference_profile = load_reference_profile(
+                    drift_feature_columns(current_data),
+                    profile_path=args.reference_profile,
+                    rebuild=args.rebuild_reference,
+                    stores=args.stores.split(',') if args.stores else None,
+                    start_date=args.reference_start,
+                    end_date=args.reference_end
+                )
+
+            if reference_profile is not None:
+                drift_results = run_drift_detection(reference_profile, current_data, config)
             else:
                 logger.warning("⚠️ Datos insuficientes para drift detection")
                 drift_results = {'status': 'no_data'}
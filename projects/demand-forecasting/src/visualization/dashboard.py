@@ -31,6 +31,12 @@ from mlflow.tracking import MlflowClient
 PROJECT_ROOT = Path(__file__).resolve().parents[2]
 sys.path.insert(0, str(PROJECT_ROOT))
 
+from src.features.feature_store import is_feature_store, read_feature_store
+from src.monitoring.drift_history import DriftHistoryStore
+
+FEATURE_STORE_PATH = PROJECT_ROOT / "data" / "processed" / "feature_store"
+DRIFT_HISTORY_PATH = PROJECT_ROOT / "reports" / "drift" / "history"
+
 warnings.filterwarnings('ignore')
 
 # ============================================================================
@@ -58,6 +64,42 @@ def load_data(file_path: str) -> pd.DataFrame:
     return pd.DataFrame()
 
 
+@st.cache_data(ttl=300)
+def load_feature_slice(
+    columns: Tuple[str, ...],
+    stores: Optional[Tuple[str, ...]] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None
+) -> pd.DataFrame:
+    """Carga con cache solo un corte (columnas, tiendas, fechas) del feature store."""
+    return read_feature_store(
+        FEATURE_STORE_PATH,
+        columns=list(columns),
+        stores=list(stores) if stores else None,
+        start_date=start_date,
+        end_date=end_date,
+    )
+
+
+def prediction_slice(predictions_df: pd.DataFrame) -> Dict:
+    """Tiendas y rango de fechas que cubren las predicciones (default: periodo de validación)."""
+    stores = None
+    if 'store_id' in predictions_df.columns:
+        stores = tuple(sorted(predictions_df['store_id'].dropna().astype(str).unique()))
+
+    if 'date' in predictions_df.columns:
+        dates = pd.to_datetime(predictions_df['date'])
+        return {'stores': stores, 'start_date': str(dates.min().date()), 'end_date': str(dates.max().date())}
+
+    start_date = None
+    config_path = PROJECT_ROOT / "config" / "config.yaml"
+    if config_path.exists():
+        import yaml
+        with open(config_path, 'r') as f:
+            start_date = (yaml.safe_load(f) or {}).get('data', {}).get('validation_start')
+    return {'stores': stores, 'start_date': start_date, 'end_date': None}
+
+
 @st.cache_data(ttl=300)
 def load_predictions() -> pd.DataFrame:
     """Carga últimas predicciones."""
@@ -80,6 +122,24 @@ def load_metrics() -> Dict:
     return {}
 
 
+@st.cache_data(ttl=300)
+def load_drift_runs(start_date: Optional[str], end_date: Optional[str]) -> pd.DataFrame:
+    """Corridas de drift en el rango (solo se leen las particiones de esos días)."""
+    return DriftHistoryStore(DRIFT_HISTORY_PATH).read_runs(start_date, end_date)
+
+
+@st.cache_data(ttl=300)
+def load_feature_drift(
+    start_date: Optional[str],
+    end_date: Optional[str],
+    features: Optional[Tuple[str, ...]] = None
+) -> pd.DataFrame:
+    """Métricas de drift por feature en el rango."""
+    return DriftHistoryStore(DRIFT_HISTORY_PATH).read_features(
+        start_date, end_date, list(features) if features else None
+    )
+
+
 @st.cache_resource
 def get_mlflow_client():
     """Obtiene cliente de MLflow."""
@@ -245,11 +305,17 @@ def page_forecasting():
     # Cargar datos
     predictions_df = load_predictions()
 
-    # Intentar cargar datos de validación
+    # Intentar cargar datos de validación: del feature store solo (id, sales)
+    # de las tiendas y fechas de las predicciones
     valid_path = PROJECT_ROOT / "data" / "processed" / "valid_data.parquet"
-    if valid_path.exists():
+    valid_df = None
+    if is_feature_store(FEATURE_STORE_PATH) and not predictions_df.empty:
+        valid_df = load_feature_slice(('id', 'sales'), **prediction_slice(predictions_df))
+    elif valid_path.exists():
         valid_df = load_data(str(valid_path))
 
+    if valid_df is not None:
+
         # Merge predictions con actuals
         if not predictions_df.empty and 'id' in predictions_df.columns and 'sales' in valid_df.columns:
             merged_df = predictions_df.merge(
@@ -583,7 +649,94 @@ def page_mlflow():
 
 
 # ============================================================================
-# PÁGINA 5: CONFIGURACIÓN Y AYUDA
+# PÁGINA 5: DATA DRIFT
+# ============================================================================
+
+def page_drift():
+    """Página de historial de data drift."""
+
+    st.title("🔍 Data Drift")
+    st.markdown("### Historial de Drift por Corrida y por Feature")
+
+    today = datetime.now().date()
+    col1, col2 = st.columns(2)
+    with col1:
+        start_date = st.date_input("Desde", value=today - timedelta(days=30))
+    with col2:
+        end_date = st.date_input("Hasta", value=today)
+
+    runs_df = load_drift_runs(str(start_date), str(end_date))
+    if runs_df.empty:
+        st.info("📭 No hay corridas de drift en el rango (ejecuta src/monitoring/monitoring_run.py)")
+        return
+
+    # KPIs de la última corrida
+    st.markdown("---")
+    last = runs_df.iloc[-1]
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Corridas", len(runs_df))
+    with col2:
+        st.metric("Drift Score (última)", safe_metric(last['overall_drift_score'], 4))
+    with col3:
+        st.metric("Features con Drift", int(last['features_with_drift']))
+    with col4:
+        st.metric("Corridas con Drift Significativo", int(runs_df['has_significant_drift'].sum()))
+
+    # Tendencia del score global
+    st.markdown("---")
+    st.subheader("📈 Tendencia del Drift Score")
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=runs_df['timestamp'],
+        y=runs_df['overall_drift_score'],
+        mode='lines+markers',
+        name='Drift Score',
+        line=dict(color='red')
+    ))
+    fig.update_layout(
+        xaxis_title="Fecha",
+        yaxis_title="Drift Score (PSI medio)",
+        hovermode='x unified'
+    )
+    st.plotly_chart(fig, width='stretch')
+
+    # Drift por feature
+    st.markdown("---")
+    st.subheader("📊 Drift por Feature")
+    features_df = load_feature_drift(str(start_date), str(end_date))
+    if features_df.empty:
+        st.info("📭 Sin métricas por feature en el rango")
+        return
+
+    latest = features_df[features_df['run_id'] == features_df['run_id'].iloc[-1]]
+    top_features = latest.sort_values('psi_score', ascending=False)['feature'].head(5).tolist()
+    selected = st.multiselect(
+        "Features",
+        sorted(features_df['feature'].unique()),
+        default=top_features
+    )
+    if selected:
+        fig = px.line(
+            features_df[features_df['feature'].isin(selected)],
+            x='timestamp',
+            y='psi_score',
+            color='feature',
+            markers=True,
+            labels={'timestamp': 'Fecha', 'psi_score': 'PSI'}
+        )
+        st.plotly_chart(fig, width='stretch')
+
+    st.dataframe(
+        latest.sort_values('psi_score', ascending=False)[
+            ['feature', 'psi_score', 'ks_statistic', 'ks_pvalue', 'js_divergence', 'drift_type', 'seconds', 'error']
+        ],
+        width='stretch'
+    )
+
+
+# ============================================================================
+# PÁGINA 6: CONFIGURACIÓN Y AYUDA
 # ============================================================================
 
 def page_settings():
@@ -719,6 +872,7 @@ def main():
             "🔮 Análisis de Forecasting",
             "🏬 Productos y Tiendas",
             "🧪 MLflow Experiments",
+            "🔍 Data Drift",
             "⚙️ Configuración"
         ]
     )
@@ -743,6 +897,8 @@ def main():
         page_products_stores()
     elif page == "🧪 MLflow Experiments":
         page_mlflow()
+    elif page == "🔍 Data Drift":
+        page_drift()
     elif page == "⚙️ Configuración":
         page_settings()
 
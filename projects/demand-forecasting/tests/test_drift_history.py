@@ -0,0 +1,108 @@
+"""
+Tests for the append-only parquet drift history used by DriftMonitor.
+
+Autor: Ing. Daniel Varela Perez
+Email: bedaniele0@gmail.com
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.monitoring.drift_detection import DriftDetector, DriftMonitor
+from src.monitoring.drift_history import DriftHistoryStore
+
+
+def _results(timestamp, score, drifted=('sell_price',)):
+    metrics = {
+        feature: {
+            'psi_score': score, 'ks_statistic': 0.1, 'ks_pvalue': 0.2, 'js_divergence': 0.05,
+            'mean_shift': 0.0, 'std_shift': 0.0, 'has_drift': feature in drifted,
+            'drift_type': 'moderate_drift' if feature in drifted else None,
+        }
+        for feature in ('sell_price', 'sales_lag_7')
+    }
+    return {
+        'timestamp': timestamp,
+        'n_samples_current': 100,
+        'overall_drift_score': score,
+        'feature_drifts': metrics,
+        'features_with_drift': list(drifted),
+        'feature_errors': {'snap': 'ValueError: sketch inválido'},
+        'feature_timings': {'sell_price': 0.01},
+        'summary': {'has_significant_drift': score > 0.1, 'max_drift_score': score},
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = DriftHistoryStore(tmp_path / 'history')
+    for i, ts in enumerate(pd.date_range('2025-03-01', periods=24, freq='6h')):
+        store.append(_results(ts.strftime('%Y-%m-%d %H:%M:%S'), i / 100))
+    return store
+
+
+class TestDriftHistoryStore:
+    def test_append_writes_new_files_only(self, store):
+        runs_day = store.root / 'runs' / 'date=2025-03-01'
+        before = {p: p.stat().st_mtime_ns for p in runs_day.iterdir()}
+
+        store.append(_results('2025-03-01 23:00:00', 0.5))
+
+        after = {p: p.stat().st_mtime_ns for p in runs_day.iterdir()}
+        assert len(after) == len(before) + 1
+        assert all(after[p] == mtime for p, mtime in before.items())
+
+    def test_range_and_last_runs(self, store):
+        runs = store.read_runs('2025-03-02', '2025-03-03')
+        last = store.last_runs(3)
+
+        assert len(runs) == 8
+        assert runs['timestamp'].is_monotonic_increasing
+        assert last['overall_drift_score'].tolist() == pytest.approx([0.21, 0.22, 0.23])
+        assert store.read_runs('2025-03-02 06:00', '2025-03-02 12:00')['timestamp'].dt.hour.tolist() == [6, 12]
+
+    def test_feature_metrics_and_errors(self, store):
+        features = store.read_features('2025-03-06', features=['sell_price', 'snap'])
+
+        assert set(features['feature']) == {'sell_price', 'snap'}
+        snap = features[features['feature'] == 'snap']
+        assert snap['psi_score'].isna().all()
+        assert (snap['error'] == 'ValueError: sketch inválido').all()
+        assert features.loc[features['feature'] == 'sell_price', 'seconds'].eq(0.01).all()
+
+    def test_compact_and_retention(self, store):
+        before = store.read_runs('2025-03-03')
+
+        stats = store.compact(retention_days=3, today='2025-03-06')
+
+        assert stats == {'compacted': 6, 'dropped': 4}
+        assert store.read_runs()['timestamp'].min() == pd.Timestamp('2025-03-03')
+        for table in ('runs', 'features'):
+            day = store.root / table / 'date=2025-03-04'
+            assert [p.name for p in day.iterdir()] == ['part-20250304-compacted.parquet']
+        pd.testing.assert_frame_equal(store.read_runs('2025-03-03'), before)
+
+
+class TestDriftMonitorHistory:
+    def test_monitor_appends_and_migrates_legacy_json(self, tmp_path):
+        legacy = tmp_path / 'drift_history.json'
+        legacy.write_text(json.dumps([{
+            'timestamp': '2025-01-01 10:00:00',
+            'overall_drift_score': 0.3,
+            'features_with_drift': 2,
+            'has_significant_drift': True,
+        }]))
+        rng = np.random.default_rng(0)
+        reference = pd.DataFrame({'sell_price': rng.gamma(2.0, 2.0, 2000)})
+        monitor = DriftMonitor(DriftDetector(reference), history_path=str(legacy))
+
+        monitor.monitor(pd.DataFrame({'sell_price': rng.gamma(2.0, 2.5, 500)}))
+
+        trend = monitor.get_drift_trend(last_n=10)
+        assert len(trend) == 2 and trend['has_significant_drift'].iloc[0]
+        assert not legacy.exists()
+        assert set(monitor.get_feature_trend(['sell_price'])['feature']) == {'sell_price'}
+        assert not list(tmp_path.glob('**/drift_report_*.json'))
@@ -0,0 +1,230 @@
+"""
+Tests for the sketch-based drift profiles used by DriftDetector.
+
+Autor: Ing. Daniel Varela Perez
+Email: bedaniele0@gmail.com
+"""
+
+import multiprocessing
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+
+from src.monitoring import drift_detection
+from src.monitoring.drift_detection import DriftDetector
+from src.monitoring.drift_sketches import (
+    DriftProfile,
+    FeatureSketch,
+    QuantileSketch,
+    feature_drift_from_sketches,
+    ks_from_sketches,
+)
+
+
+@pytest.fixture
+def reference_df():
+    rng = np.random.default_rng(7)
+    n = 20_000
+    df = pd.DataFrame({
+        'sales_lag_7': rng.poisson(1.5, n).astype(float),
+        'sell_price': rng.gamma(2.0, 2.0, n),
+        'snap': rng.integers(0, 2, n),
+    })
+    df.loc[df.index[::97], 'sell_price'] = np.nan
+    return df
+
+
+def _raw_psi(reference, current, bins=10):
+    """PSI sobre arrays crudos (bins de la referencia, piso 1e-4 por bin)."""
+    _, edges = np.histogram(reference, bins=bins)
+    ref_dist = np.histogram(reference, bins=edges)[0] / (len(reference) + 1e-10)
+    curr_dist = np.histogram(current, bins=edges)[0] / (len(current) + 1e-10)
+    ref_dist = np.where(ref_dist == 0, 0.0001, ref_dist)
+    curr_dist = np.where(curr_dist == 0, 0.0001, curr_dist)
+    return float(np.sum((curr_dist - ref_dist) * np.log(curr_dist / ref_dist)))
+
+
+def _chunks(df, size):
+    return [df.iloc[i:i + size] for i in range(0, len(df), size)]
+
+
+class TestQuantileSketch:
+    def test_exact_below_capacity(self):
+        values = np.random.default_rng(0).normal(size=500)
+        sketch = QuantileSketch(k=1024).update(values)
+
+        grid = np.sort(values)
+        np.testing.assert_allclose(sketch.cdf(grid), np.arange(1, 501) / 500)
+
+    def test_rank_error_bounded_and_weight_preserved(self):
+        values = np.random.default_rng(1).normal(size=300_000)
+        sketch = QuantileSketch(k=1024)
+        for chunk in np.array_split(values, 7):
+            sketch.update(chunk)
+
+        assert sketch.n == len(values)
+        grid = np.quantile(values, np.linspace(0.01, 0.99, 50))
+        exact = np.searchsorted(np.sort(values), grid, side='right') / len(values)
+        assert np.max(np.abs(sketch.cdf(grid) - exact)) < 0.01
+
+
+    def test_large_n_without_drift_is_not_flagged_by_ks(self):
+        # n >> k: el error del sketch (~1/k) supera el umbral de KS (~1/sqrt(n))
+        rng = np.random.default_rng(4)
+        edges = np.linspace(-3, 3, 11)
+        reference = FeatureSketch(edges, k=64, seed=1).update(rng.normal(size=200_000))
+        current = FeatureSketch(edges, k=64, seed=2).update(rng.normal(size=200_000))
+        shifted = FeatureSketch(edges, k=64, seed=3).update(rng.normal(0.5, 1.0, size=200_000))
+
+        statistic, pvalue = ks_from_sketches(reference, current)
+        metrics = feature_drift_from_sketches('x', reference, current)
+
+        assert statistic > stats.kstwo.isf(0.05, 100_000)
+        assert pvalue > 0.05
+        assert not metrics['has_drift']
+        assert ks_from_sketches(reference, shifted)[1] < 1e-6
+
+
+class TestDriftProfile:
+    def test_chunked_and_merged_profiles_match_single_pass(self, reference_df):
+        single = DriftProfile.from_data(reference_df)
+        chunked = DriftProfile.from_data(lambda: iter(_chunks(reference_df, 3000)))
+        left, right = single.new_window(), single.new_window()
+        left.update(reference_df.iloc[:7000])
+        right.update(reference_df.iloc[7000:])
+        merged = left.merge(right)
+
+        for other in (chunked, merged):
+            for feature, sketch in single.sketches.items():
+                np.testing.assert_array_equal(other.sketches[feature].counts, sketch.counts)
+                assert other.sketches[feature].count == sketch.count
+                assert other.sketches[feature].mean == pytest.approx(sketch.mean)
+                assert other.sketches[feature].std == pytest.approx(sketch.std)
+
+    def test_statistics_match_pandas(self, reference_df):
+        stats_dict = DriftProfile.from_data(reference_df).sketches['sell_price'].statistics()
+        data = reference_df['sell_price'].dropna()
+
+        assert stats_dict['mean'] == pytest.approx(data.mean())
+        assert stats_dict['std'] == pytest.approx(data.std())
+        assert stats_dict['min'] == data.min() and stats_dict['max'] == data.max()
+        assert stats_dict['median'] == pytest.approx(data.median(), rel=0.02)
+
+    def test_save_and_load_round_trip(self, reference_df, tmp_path):
+        profile = DriftProfile.from_data(reference_df)
+        path = profile.save(tmp_path / 'reference_profile.npz')
+        # Escritura atómica: no queda el temporal junto al .npz
+        assert [p.name for p in tmp_path.iterdir()] == ['reference_profile.npz']
+
+        loaded = DriftProfile.load(path)
+
+        assert loaded.features == profile.features
+        for feature, sketch in profile.sketches.items():
+            other = loaded.sketches[feature]
+            np.testing.assert_array_equal(other.edges, sketch.edges)
+            np.testing.assert_array_equal(other.counts, sketch.counts)
+            np.testing.assert_array_equal(other.quantiles.cdf(sketch.edges), sketch.quantiles.cdf(sketch.edges))
+            assert (other.count, other.mean, other.m2) == (sketch.count, sketch.mean, sketch.m2)
+
+    def test_merge_rejects_different_edges(self):
+        with pytest.raises(ValueError):
+            FeatureSketch(np.linspace(0, 1, 11)).merge(FeatureSketch(np.linspace(0, 2, 11)))
+
+
+class TestSketchDriftDetector:
+    def test_metrics_match_raw_arrays(self, reference_df):
+        rng = np.random.default_rng(3)
+        current = pd.DataFrame({
+            'sales_lag_7': rng.poisson(1.8, 5000).astype(float),
+            'sell_price': rng.gamma(2.0, 2.0, 5000).clip(max=reference_df['sell_price'].max()),
+            'snap': rng.integers(0, 2, 5000),
+        })
+        detector = DriftDetector(reference_df)
+
+        results = detector.detect_drift(_chunks(current, 1000))
+
+        assert results['n_samples_reference'] == len(reference_df)
+        assert results['n_samples_current'] == len(current)
+        for feature in reference_df.columns:
+            metrics = results['feature_drifts'][feature]
+            ref, cur = reference_df[feature].dropna(), current[feature].dropna()
+            # Datos actuales dentro del rango de referencia: PSI idéntico al cálculo crudo
+            assert metrics['psi_score'] == pytest.approx(_raw_psi(ref, cur), rel=1e-9)
+            assert metrics['ks_statistic'] == pytest.approx(stats.ks_2samp(ref, cur).statistic, abs=0.01)
+        assert 'sales_lag_7' in results['features_with_drift']
+        assert detector.get_top_drifted_features(1)[0][0] == 'sales_lag_7'
+
+    def test_out_of_range_values_raise_psi(self, reference_df):
+        detector = DriftDetector(reference_df[['sell_price']])
+        shifted = reference_df[['sell_price']] + reference_df['sell_price'].max()
+
+        results = detector.detect_drift(shifted)
+
+        assert results['feature_drifts']['sell_price']['psi_score'] > 1.0
+        assert results['feature_drifts']['sell_price']['drift_type'] == 'mean_shift'
+
+    def test_persisted_profile_and_missing_features(self, reference_df, tmp_path):
+        path = DriftProfile.from_data(reference_df).save(tmp_path / 'profile.npz')
+        detector = DriftDetector(reference_profile=DriftProfile.load(path), drift_threshold=0.1)
+
+        results = detector.detect_drift(reference_df.drop(columns='snap'))
+
+        assert set(results['feature_drifts']) == {'sales_lag_7', 'sell_price'}
+        assert results['features_with_drift'] == []
+
+
+class TestParallelDriftDetector:
+    @pytest.fixture
+    def current_df(self, reference_df):
+        rng = np.random.default_rng(11)
+        return pd.DataFrame({
+            'sales_lag_7': rng.poisson(1.8, 6000).astype(float),
+            'sell_price': rng.gamma(2.0, 2.1, 6000),
+            'snap': rng.integers(0, 2, 6000),
+        })
+
+    def test_process_pool_matches_sequential(self, reference_df, current_df):
+        sequential = DriftDetector(reference_df).detect_drift(_chunks(current_df, 2000))
+        parallel = DriftDetector(reference_df, n_jobs=2).detect_drift(_chunks(current_df, 2000))
+
+        assert parallel['n_jobs'] == 2 and parallel['feature_errors'] == {}
+        assert set(parallel['feature_timings']) == set(reference_df.columns)
+        for feature, metrics in sequential['feature_drifts'].items():
+            other = parallel['feature_drifts'][feature]
+            assert other['psi_score'] == metrics['psi_score']
+            assert other['mean_shift'] == pytest.approx(metrics['mean_shift'])
+            assert other['ks_statistic'] == pytest.approx(metrics['ks_statistic'], abs=0.01)
+
+    @pytest.mark.skipif(multiprocessing.get_start_method() != 'fork',
+                        reason="el parche debe heredarse en los workers")
+    def test_failing_feature_is_isolated(self, reference_df, current_df, monkeypatch):
+        original = DriftProfile.update_columns
+
+        def update_columns(self, columns, features):
+            if features == ['sell_price']:
+                raise RuntimeError("columna corrupta")
+            return original(self, columns, features)
+
+        monkeypatch.setattr(DriftProfile, 'update_columns', update_columns)
+        results = DriftDetector(reference_df, n_jobs=2).detect_drift(current_df)
+
+        assert set(results['feature_drifts']) == {'sales_lag_7', 'snap'}
+        assert 'columna corrupta' in results['feature_errors']['sell_price']
+        assert results['summary']['features_with_errors'] == 1
+
+    def test_metric_errors_are_reported_not_zeroed(self, reference_df, current_df, monkeypatch):
+        original = drift_detection.feature_drift_from_sketches
+
+        def feature_drift(name, *args):
+            if name == 'snap':
+                raise ValueError("sketch inválido")
+            return original(name, *args)
+
+        monkeypatch.setattr(drift_detection, 'feature_drift_from_sketches', feature_drift)
+        results = DriftDetector(reference_df).detect_drift(current_df)
+
+        assert 'snap' not in results['feature_drifts']
+        assert results['feature_errors'] == {'snap': 'ValueError: sketch inválido'}
+        assert set(results['feature_timings']) == set(reference_df.columns)
@@ -0,0 +1,84 @@
+"""
+Tests for the (item_id, store_id, date) FeatureIndex used by ModelService.
+
+Autor: Ing. Daniel Varela Perez
+Email: bedaniele0@gmail.com
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.api.feature_index import (
+    MATCH_EARLIEST,
+    MATCH_EXACT,
+    MATCH_PREVIOUS,
+    FeatureIndex,
+    scan_lookup,
+)
+
+
+@pytest.fixture
+def feature_base():
+    """Base de features desordenada con huecos y fechas duplicadas."""
+    rng = np.random.default_rng(7)
+    frames = []
+    for item in ["FOODS_1_001", "FOODS_1_002", "HOBBIES_1_001"]:
+        for store in ["CA_1", "TX_2"]:
+            dates = pd.date_range("2016-01-01", periods=30, freq="2D")
+            frames.append(
+                pd.DataFrame(
+                    {
+                        "item_id": item,
+                        "store_id": store,
+                        "date": dates,
+                        "sales_lag_1": rng.random(len(dates)),
+                    }
+                )
+            )
+    df = pd.concat(frames, ignore_index=True)
+    # Fecha duplicada para una serie
+    dup = df[(df["item_id"] == "FOODS_1_001") & (df["store_id"] == "CA_1")].iloc[[3]].copy()
+    dup["sales_lag_1"] = -1.0
+    df = pd.concat([df, dup], ignore_index=True)
+    return df.sample(frac=1.0, random_state=0).reset_index(drop=True)
+
+
+class TestFeatureIndex:
+    """Paridad del índice contra el escaneo con máscaras"""
+
+    def test_index_covers_all_series(self, feature_base):
+        index = FeatureIndex.from_frame(feature_base)
+        assert len(index) == len(feature_base)
+        assert index.n_series == 6
+
+    @pytest.mark.parametrize(
+        "date,expected",
+        [
+            ("2016-01-07", MATCH_EXACT),
+            ("2016-01-08", MATCH_PREVIOUS),
+            ("2015-06-01", MATCH_EARLIEST),
+            ("2017-01-01", MATCH_PREVIOUS),
+        ],
+    )
+    def test_matches_scan_semantics(self, feature_base, date, expected):
+        index = FeatureIndex.from_frame(feature_base)
+        for item, store in index.ranges:
+            position, match_type = index.lookup(item, store, date)
+            ref_row, ref_type = scan_lookup(feature_base, item, store, date)
+
+            assert match_type == expected == ref_type
+            pd.testing.assert_series_equal(feature_base.iloc[position], ref_row)
+
+    def test_duplicate_date_returns_last_row(self, feature_base):
+        index = FeatureIndex.from_frame(feature_base)
+        position, match_type = index.lookup("FOODS_1_001", "CA_1", "2016-01-07")
+        ref_row, _ = scan_lookup(feature_base, "FOODS_1_001", "CA_1", "2016-01-07")
+
+        assert match_type == MATCH_EXACT
+        assert feature_base.iloc[position]["sales_lag_1"] == ref_row["sales_lag_1"]
+
+    def test_unknown_series_returns_none(self, feature_base):
+        index = FeatureIndex.from_frame(feature_base)
+        assert index.lookup("FOODS_9_999", "CA_1", "2016-01-07") is None
+        assert scan_lookup(feature_base, "FOODS_9_999", "CA_1", "2016-01-07") is None
@@ -10,9 +10,17 @@ Email: bedaniele0@gmail.com
 Fecha: December 13, 2024
 """
 
+import numpy as np
 import pandas as pd
+import pytest
 
 from src.features.build_features import FeatureEngineeringPipeline
+from src.features.frame_utils import left_join_inplace
+from src.features.incremental import (
+    IncrementalFeatureBuilder,
+    append_to_dataset,
+    check_incremental_consistency,
+)
 
 
 def _sample_sales_df():
@@ -87,3 +95,180 @@ def test_feature_pipeline_generates_key_columns():
     event_day = features.loc[features["event_name_1"].notna()]
     if not event_day.empty:
         assert (event_day["is_event"] == 1).all()
+
+
+def _multi_series_sales_df():
+    frames = []
+    for item, store, state in [("FOODS_1_001", "CA_1", "CA"), ("FOODS_1_002", "TX_1", "TX")]:
+        df = _sample_sales_df()
+        df["id"] = f"{item}_{store}"
+        df["item_id"] = item
+        df["store_id"] = store
+        df["state_id"] = state
+        df["wm_yr_wk"] = 11101 + df.index // 7
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True)
+
+
+def _multi_series_prices_df():
+    prices = _multi_series_sales_df()[["store_id", "item_id", "wm_yr_wk"]].drop_duplicates()
+    prices = prices.iloc[:-1].reset_index(drop=True)  # un precio faltante
+    prices["sell_price"] = [1.0, 1.2, 2.0][: len(prices)]
+    return prices
+
+
+def test_inplace_mode_matches_copy_mode():
+    df_sales = _multi_series_sales_df()
+    df_calendar = _sample_calendar_df()
+    df_prices = _multi_series_prices_df()
+
+    pipeline = FeatureEngineeringPipeline()
+    expected = pipeline.run(df_sales, df_calendar, df_prices, mode="copy")
+    result = pipeline.run(df_sales, df_calendar, df_prices, mode="inplace")
+
+    pd.testing.assert_frame_equal(result, expected.reset_index(drop=True))
+    # La entrada no se modifica
+    pd.testing.assert_frame_equal(df_sales, _multi_series_sales_df())
+
+
+def test_step_report_records_peak_memory():
+    pipeline = FeatureEngineeringPipeline()
+    pipeline.run(_sample_sales_df(), _sample_calendar_df(), _sample_prices_df(), include_advanced=False)
+
+    steps = [s["step"] for s in pipeline.step_report]
+    assert steps == ["Calendar", "Price", "Event/SNAP", "Lag", "Rolling"]
+    for step in pipeline.step_report:
+        assert step["seconds"] >= 0
+        assert step["peak_rss_mb"] is None or step["peak_rss_mb"] > 0
+
+
+def test_unknown_pipeline_mode_raises():
+    with pytest.raises(ValueError):
+        FeatureEngineeringPipeline().run(_sample_sales_df(), mode="fast")
+
+
+def test_left_join_inplace_matches_merge():
+    left = pd.DataFrame({"k": [3, 1, 2, 9, 1], "v": range(5)})
+    right = pd.DataFrame({"k": [1, 2, 3], "flag": [0, 1, 1], "name": ["a", None, "c"]})
+
+    expected = left.merge(right, on="k", how="left")
+    result = left_join_inplace(left.copy(), right, "k")
+
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def _long_history(n_series=4, n_days=90):
+    """Ventas, calendario y precios suficientes para que la cola < historia."""
+    rng = np.random.default_rng(7)
+    dates = pd.date_range("2016-01-01", periods=n_days, freq="D")
+    sales = pd.concat(
+        [
+            pd.DataFrame(
+                {
+                    "id": f"ITEM_{i}_CA_1",
+                    "item_id": f"ITEM_{i}",
+                    "store_id": "CA_1",
+                    "cat_id": ["FOODS", "HOBBIES"][i % 2],
+                    "wm_yr_wk": 11101 + np.arange(n_days) // 7,
+                    "date": dates,
+                    "sales": rng.poisson(2.0, n_days),
+                }
+            )
+            for i in range(n_series)
+        ],
+        ignore_index=True,
+    )
+    prices = sales[["store_id", "item_id", "wm_yr_wk"]].drop_duplicates().reset_index(drop=True)
+    prices["sell_price"] = np.round(rng.uniform(1.0, 5.0, len(prices)), 2)
+    calendar = pd.DataFrame(
+        {
+            "date": dates,
+            "event_name_1": [None] * n_days,
+            "event_type_1": [None] * n_days,
+            "event_name_2": [None] * n_days,
+            "event_type_2": [None] * n_days,
+            "snap_CA": rng.integers(0, 2, n_days),
+            "snap_TX": 0,
+            "snap_WI": 0,
+        }
+    )
+    return sales, calendar, prices
+
+
+def _incremental_pipeline():
+    pipeline = FeatureEngineeringPipeline()
+    pipeline.config["features"] = {
+        "lags": [1, 7, 14],
+        "rolling_windows": [7, 14],
+        "rolling_functions": ["mean", "std", "min"],
+    }
+    return pipeline
+
+
+def test_incremental_features_match_full_rebuild():
+    sales, calendar, prices = _long_history()
+    pipeline = _incremental_pipeline()
+    cutoff = pd.Timestamp("2016-03-20")
+
+    full = pipeline.run(sales, calendar, prices)
+    history = pipeline.run(sales[sales["date"] <= cutoff], calendar, prices)
+
+    builder = IncrementalFeatureBuilder(pipeline)
+    assert builder.lookback == 55  # trend de 28 días: 2 * 28 - 1
+    result = builder.compute(sales[sales["date"] > cutoff], history, calendar, prices)
+
+    assert list(result.columns) == list(full.columns)
+    assert (result["date"] > cutoff).all()
+    report = check_incremental_consistency(result, full)
+    assert report["consistent"], report
+
+
+def test_incremental_update_appends_to_dataset(tmp_path):
+    sales, calendar, prices = _long_history()
+    pipeline = _incremental_pipeline()
+    cutoff = pd.Timestamp("2016-03-20")
+    dataset = tmp_path / "sales_features"
+
+    append_to_dataset(pipeline.run(sales[sales["date"] <= cutoff], calendar, prices), dataset)
+    builder = IncrementalFeatureBuilder(pipeline)
+    added = builder.update_dataset(dataset, sales[sales["date"] > cutoff], calendar, prices)
+
+    stored = pd.read_parquet(dataset)
+    assert len(stored) == len(sales)
+    assert len(list(dataset.glob("part-*.parquet"))) == 2
+    assert check_incremental_consistency(added, pipeline.run(sales, calendar, prices))["consistent"]
+
+    # Append-only: volver a añadir las mismas fechas falla
+    with pytest.raises(ValueError):
+        builder.update_dataset(dataset, sales[sales["date"] > cutoff], calendar, prices)
+
+
+def test_consistency_check_reports_mismatches():
+    sales, calendar, prices = _long_history(n_series=2, n_days=30)
+    full = _incremental_pipeline().run(sales, calendar, prices, include_advanced=False)
+    tampered = full.loc[full["date"] > "2016-01-25"].copy()
+    tampered["sales_lag_1"] += 1
+
+    report = check_incremental_consistency(tampered, full)
+
+    assert not report["consistent"]
+    assert report["mismatches"] == {"sales_lag_1": len(tampered)}
+
+
+def test_incremental_update_on_partitioned_feature_store(tmp_path):
+    from src.features.feature_store import read_feature_store, write_feature_store
+
+    sales, calendar, prices = _long_history()
+    pipeline = _incremental_pipeline()
+    cutoff = pd.Timestamp("2016-03-20")
+    store = write_feature_store(
+        pipeline.run(sales[sales["date"] <= cutoff], calendar, prices), tmp_path / "feature_store"
+    )
+
+    added = IncrementalFeatureBuilder(pipeline).update_dataset(
+        store, sales[sales["date"] > cutoff], calendar, prices
+    )
+
+    full = pipeline.run(sales, calendar, prices)
+    assert check_incremental_consistency(added, full)["consistent"]
+    assert len(read_feature_store(store, columns=["id", "date"])) == len(full)
@@ -0,0 +1,150 @@
+"""
+Tests for the partitioned (store_id / year_month) feature store.
+
+Autor: Ing. Daniel Varela Perez
+Email: bedaniele0@gmail.com
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from src.features.feature_store import (
+    append_feature_store,
+    build_filter,
+    convert_parquet_to_store,
+    is_feature_store,
+    open_feature_store,
+    read_feature_store,
+    write_feature_store,
+)
+
+
+@pytest.fixture
+def feature_base():
+    """Base ordenada por (id, date) como la salida del pipeline: 3 items x 2 tiendas x 75 días."""
+    rng = np.random.default_rng(5)
+    dates = pd.date_range("2016-02-15", periods=75, freq="D")
+    frames = []
+    for item in ["FOODS_1_001", "FOODS_1_002", "HOBBIES_1_001"]:
+        for store in ["CA_1", "TX_2"]:
+            frames.append(
+                pd.DataFrame(
+                    {
+                        "id": f"{item}_{store}",
+                        "item_id": item,
+                        "store_id": store,
+                        "date": dates,
+                        "month": dates.month,
+                        "sales": rng.poisson(2.0, len(dates)),
+                        "sales_lag_7": rng.random(len(dates)),
+                    }
+                )
+            )
+    return pd.concat(frames, ignore_index=True)
+
+
+def _expected_slice(df, stores=None, items=None, start=None, end=None):
+    mask = pd.Series(True, index=df.index)
+    if stores is not None:
+        mask &= df["store_id"].isin(stores)
+    if items is not None:
+        mask &= df["item_id"].isin(items)
+    if start is not None:
+        mask &= df["date"] >= start
+    if end is not None:
+        mask &= df["date"] <= end
+    return df.loc[mask]
+
+
+def _sorted(df):
+    out = df.sort_values(["id", "date"]).reset_index(drop=True)
+    for col in ["item_id", "store_id"]:
+        out[col] = out[col].astype(str)
+    return out
+
+
+class TestFeatureStore:
+    def test_write_partitions_by_store_and_month(self, feature_base, tmp_path):
+        path = write_feature_store(feature_base, tmp_path / "store", row_group_rows=20)
+
+        assert is_feature_store(path)
+        partitions = sorted(p.relative_to(path).parent.as_posix() for p in path.rglob("*.parquet"))
+        assert partitions[0] == "store_id=CA_1/year_month=2016-02"
+        assert len(partitions) == 2 * 3  # 2 tiendas x (feb, mar, abr)
+
+        # Row groups acotados y con estadísticas min/max
+        meta = pq.ParquetFile(next(path.rglob("*.parquet"))).metadata
+        assert meta.num_row_groups > 1
+        assert meta.row_group(0).column(0).statistics.has_min_max
+
+    def test_round_trip_preserves_rows_and_column_order(self, feature_base, tmp_path):
+        path = write_feature_store(feature_base, tmp_path / "store")
+
+        result = read_feature_store(path)
+
+        assert list(result.columns) == list(feature_base.columns)
+        assert isinstance(result["store_id"].dtype, pd.CategoricalDtype)
+        pd.testing.assert_frame_equal(_sorted(result), _sorted(feature_base))
+
+    @pytest.mark.parametrize(
+        "stores,items,start,end",
+        [
+            (["TX_2"], None, None, None),
+            (None, ["FOODS_1_002"], "2016-03-10", None),
+            (["CA_1"], ["HOBBIES_1_001", "FOODS_1_001"], "2016-03-31", "2016-04-01"),
+        ],
+    )
+    def test_slice_matches_pandas_filter(self, feature_base, tmp_path, stores, items, start, end):
+        path = write_feature_store(feature_base, tmp_path / "store", row_group_rows=20)
+
+        result = read_feature_store(
+            path, columns=["id", "item_id", "store_id", "date", "sales"],
+            stores=stores, items=items, start_date=start, end_date=end,
+        )
+        expected = _expected_slice(feature_base, stores, items, start, end)
+
+        assert len(result) > 0
+        pd.testing.assert_frame_equal(_sorted(result), _sorted(expected[result.columns]))
+
+    def test_date_filter_prunes_month_partitions(self, feature_base, tmp_path):
+        path = write_feature_store(feature_base, tmp_path / "store")
+        dataset = open_feature_store(path)
+
+        expression = build_filter(
+            dataset.schema, stores=["CA_1"], start_date="2016-04-05", end_date="2016-04-20"
+        )
+        fragments = list(dataset.get_fragments(filter=expression))
+
+        assert [Path(f.path).parent.relative_to(path).as_posix() for f in fragments] == [
+            "store_id=CA_1/year_month=2016-04"
+        ]
+
+    def test_append_adds_files_without_rewriting(self, feature_base, tmp_path):
+        history = feature_base[feature_base["date"] < "2016-04-20"]
+        new_rows = feature_base[feature_base["date"] >= "2016-04-20"]
+        path = write_feature_store(history, tmp_path / "store")
+        before = {p: p.stat().st_mtime_ns for p in path.rglob("*.parquet")}
+
+        append_feature_store(new_rows, path)
+
+        for p, mtime in before.items():
+            assert p.stat().st_mtime_ns == mtime
+        assert any(p.name.startswith("part-20160420-20160429") for p in path.rglob("*.parquet"))
+        pd.testing.assert_frame_equal(_sorted(read_feature_store(path)), _sorted(feature_base))
+
+    def test_monolithic_parquet_and_conversion(self, feature_base, tmp_path):
+        source = tmp_path / "sales_with_features.parquet"
+        feature_base.to_parquet(source, index=False)
+
+        # La API de lectura también sirve sobre el parquet monolítico
+        direct = read_feature_store(source, stores=["CA_1"], end_date="2016-02-20")
+        pd.testing.assert_frame_equal(
+            _sorted(direct), _sorted(_expected_slice(feature_base, ["CA_1"], end="2016-02-20"))
+        )
+
+        path = convert_parquet_to_store(source, tmp_path / "store", batch_rows=100)
+        pd.testing.assert_frame_equal(_sorted(read_feature_store(path)), _sorted(feature_base))
@@ -47,6 +47,78 @@ class TestCalendarFeatures:
         assert df['is_weekend'].sum() == 2  # Saturday and Sunday
 
 
+class TestHolidayFeatures:
+    """Test vectorized holiday features (computed once per unique date)"""
+
+    @staticmethod
+    def _reference_days_to_thanksgiving(date):
+        """Reference: per-row implementation replaced by the vectorized one"""
+        def thanksgiving(year):
+            nov_first = pd.Timestamp(f'{year}-11-01')
+            return nov_first + pd.Timedelta(days=(3 - nov_first.dayofweek) % 7) + pd.Timedelta(weeks=3)
+
+        target = thanksgiving(date.year)
+        if date > target:
+            target = thanksgiving(date.year + 1)
+        return (target - date).days
+
+    def test_matches_per_row_reference(self):
+        """days_to_* / near_* / is_major_holiday match the per-row logic"""
+        from src.features.calendar_features import create_holiday_features
+
+        dates = pd.date_range('2014-10-01', '2016-01-10', freq='D')
+        df = pd.DataFrame({'date': np.tile(dates.values, 2)}).sample(frac=1.0, random_state=0)
+        result = create_holiday_features(df)
+
+        christmas = df['date'].apply(
+            lambda d: (pd.Timestamp(d.year + (d > pd.Timestamp(d.year, 12, 25)), 12, 25) - d).days
+        )
+        thanksgiving = df['date'].apply(self._reference_days_to_thanksgiving)
+
+        np.testing.assert_array_equal(result['days_to_christmas'], christmas)
+        np.testing.assert_array_equal(result['days_to_thanksgiving'], thanksgiving)
+        np.testing.assert_array_equal(result['near_christmas'], (christmas <= 7).astype(int))
+        major = df['date'].dt.strftime('%m-%d').isin(['01-01', '07-04', '12-25']).astype(int)
+        np.testing.assert_array_equal(result['is_major_holiday'], major)
+        assert result.loc[df['date'] == '2015-11-26', 'days_to_thanksgiving'].eq(0).all()
+
+    def test_non_midnight_and_missing_dates(self):
+        """Timestamps with time use the generic path; NaT yields NaN/0"""
+        from src.features.calendar_features import create_holiday_features
+
+        df = pd.DataFrame({'date': pd.to_datetime(['2015-12-25 12:00', '2015-12-24 06:00', None])})
+        result = create_holiday_features(df)
+
+        assert result['days_to_christmas'].iloc[0] == 365  # después de medianoche -> 2016-12-25 (bisiesto)
+        assert result['days_to_christmas'].iloc[1] == 0
+        assert pd.isna(result['days_to_christmas'].iloc[2])
+        assert result['is_major_holiday'].tolist() == [0, 0, 0]
+
+    def test_configurable_holiday_table(self):
+        """Custom rules and calendar events add their own days_to_* columns"""
+        from src.features.calendar_features import create_holiday_features
+
+        dates = pd.date_range('2016-01-25', periods=14, freq='D')
+        calendar = pd.DataFrame({
+            'date': dates,
+            'event_name_1': [None] * 13 + ['SuperBowl'],
+        })
+        rules = {'memorial_day': {'month': 5, 'weekday': 0, 'nth': -1}}
+
+        result = create_holiday_features(
+            pd.DataFrame({'date': dates}),
+            calendar_df=calendar,
+            holiday_rules=rules,
+            holiday_events=['SuperBowl'],
+            major_holidays=['02-01'],
+        )
+
+        assert result['days_to_memorial_day'].iloc[0] == (pd.Timestamp('2016-05-30') - dates[0]).days
+        assert result['days_to_superbowl'].tolist() == list(range(13, -1, -1))
+        assert result['near_superbowl'].sum() == 8
+        assert result['is_major_holiday'].sum() == 1
+
+
 class TestLagFeatures:
     """Test lag feature generation"""
 
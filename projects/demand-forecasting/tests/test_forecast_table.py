@@ -0,0 +1,121 @@
+"""
+Tests for the precomputed forecast table and the table serving mode of ModelService.
+
+Autor: Ing. Daniel Varela Perez
+Email: bedaniele0@gmail.com
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.api.forecast_table import ForecastTable, build_forecast_table, write_forecast_table
+
+from .test_model_service import _stub_service
+
+
+@pytest.fixture
+def svc():
+    svc = _stub_service()
+    svc.model_path = 'lightgbm_model.pkl'
+    svc._feature_df['sales'] = svc._feature_df['sales_lag_1'] + 1.0
+    return svc
+
+
+def _serving(svc, table):
+    svc.serving_mode = 'table'
+    svc.forecast_table = table
+    svc.forecast_table_path = None
+    svc.forecast_table_check_seconds = float('inf')
+    svc._forecast_table_checked = float('inf')
+    svc.table_hits = svc.table_misses = 0
+    return svc
+
+
+class TestForecastTable:
+    def test_build_matches_forecast_horizon_and_roundtrips(self, svc, tmp_path):
+        df, metadata = build_forecast_table(svc, horizon=3)
+        expected = svc.forecast_horizon('CA_1', horizon=3)
+
+        assert len(df) == 6 and metadata['horizon'] == 3 and metadata['errors'] == 0
+        table = ForecastTable.load(write_forecast_table(df, tmp_path / 'table.parquet', metadata))
+        assert table.n_series == 2
+        assert table.report()['first_date'] == '2016-05-02'
+        assert table.report()['generated_at'] == metadata['generated_at']
+        for forecast in expected['forecasts']:
+            for point in forecast['predictions']:
+                value, interval = table.lookup(forecast['item_id'], 'CA_1', str(point['date']))
+                assert value == pytest.approx(point['predicted_sales'])
+                assert interval is None
+
+    def test_lookup_offsets_and_misses(self):
+        df = pd.DataFrame({
+            'item_id': ['B'] * 2 + ['A'] * 3,
+            'store_id': 'CA_1',
+            'date': pd.to_datetime(['2016-05-03', '2016-05-02', '2016-05-02', '2016-05-03', '2016-05-04']),
+            'predicted_sales': [11.0, 10.0, 1.0, 2.0, 3.0],
+            'lower': [0.0] * 5,
+            'upper': [20.0] * 5,
+        })
+        table = ForecastTable.from_frame(df)
+
+        assert table.lookup('A', 'CA_1', '2016-05-04') == (3.0, {'lower': 0.0, 'upper': 20.0})
+        assert table.lookup('B', 'CA_1', pd.Timestamp('2016-05-02'))[0] == 10.0
+        assert table.lookup('B', 'CA_1', '2016-05-04') is None
+        assert table.lookup('A', 'CA_1', '2016-05-01') is None
+        assert table.lookup('A', 'CA_1', '2016-05-02 12:00') is None
+        assert table.lookup('A', 'TX_1', '2016-05-02') is None
+
+        with pytest.raises(ValueError):
+            ForecastTable.from_frame(df.drop(index=3))
+
+
+class TestTableServing:
+    def test_hits_skip_the_model_and_misses_go_live(self, svc):
+        table = ForecastTable.from_frame(*build_forecast_table(svc, horizon=2))
+        _serving(svc, table)
+        live = svc.predict_from_request('FOODS_1_002', 'CA_1', '2016-04-28')
+        svc.model.calls = 0
+
+        assert svc.predict_from_request('FOODS_1_001_CA_1', 'CA_1', '2016-05-02') == \
+            table.lookup('FOODS_1_001', 'CA_1', '2016-05-02')[0]
+        assert svc.model.calls == 0
+
+        batch = svc.predict_batch([
+            ('FOODS_1_001', 'CA_1', '2016-05-03'),
+            ('FOODS_1_002', 'CA_1', '2016-04-28'),
+            ('FOODS_1_002', 'CA_1', object()),
+        ])
+        assert svc.model.calls == 1
+        assert batch[0] == (table.lookup('FOODS_1_001', 'CA_1', '2016-05-03')[0], None)
+        assert batch[1] == (pytest.approx(live), None)
+        assert 'Row resolution failed' in batch[2][1]
+
+        report = svc.forecast_table_report()
+        assert (report['hits'], report['misses']) == (2, 3)
+        assert report['hit_rate'] == pytest.approx(0.4)
+        assert report['loaded'] and report['rows'] == 4
+        assert report['model_version_match'] and report['model_version'] == svc.artifact_version
+
+    def test_table_from_another_model_is_a_miss(self, svc):
+        df, metadata = build_forecast_table(svc, horizon=1)
+        _serving(svc, ForecastTable.from_frame(df, {**metadata, 'model_version': '1.0.0+ffffffffffff'}))
+        svc.model.calls = 0
+
+        svc.predict_from_request('FOODS_1_001', 'CA_1', '2016-05-02')
+
+        assert svc.model.calls == 1
+        report = svc.forecast_table_report()
+        assert (report['hits'], report['misses']) == (0, 1)
+        assert report['model_version_match'] is False
+        assert report['served_model_version'] == svc.artifact_version
+
+    def test_live_mode_ignores_table(self, svc):
+        svc.forecast_table = ForecastTable.from_frame(build_forecast_table(svc, horizon=1)[0])
+        svc.model.calls = 0
+
+        svc.predict_from_request('FOODS_1_001', 'CA_1', '2016-05-02')
+
+        assert svc.model.calls == 1
+        assert svc.forecast_table_report() == {'mode': 'live', 'hits': 0, 'misses': 0, 'hit_rate': None}
+        assert np.isfinite(svc.predict_batch([('FOODS_1_001', 'CA_1', '2016-05-02')])[0][0])
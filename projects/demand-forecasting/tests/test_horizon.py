@@ -0,0 +1,111 @@
+"""
+Tests for the recursive multi-horizon forecast state and ModelService.forecast_horizon.
+
+Autor: Ing. Daniel Varela Perez
+Email: bedaniele0@gmail.com
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.api.horizon import HorizonState, history_features, required_history
+from src.features.lag_features import create_lag_features
+from src.features.rolling_features import create_rolling_features, create_rolling_features_advanced
+
+from .test_model_service import _stub_service
+
+
+def test_state_matches_lag_and_rolling_pipeline():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'id': np.repeat(['a', 'b'], 60),
+        'date': np.tile(pd.date_range('2016-01-01', periods=60), 2),
+        'sales': rng.poisson(3, 120).astype(float),
+    })
+    df = create_lag_features(df, lag_days=[1, 7, 28])
+    df = create_rolling_features(df, windows=[7, 28], functions=['mean', 'std', 'min', 'max', 'median'])
+    df = create_rolling_features_advanced(df, windows=[7])
+    names = [c for c in df.columns if c.startswith('sales_')]
+    specs = history_features(names)
+    assert len(specs) == len(names)
+    assert required_history(specs) == 28
+
+    # Día pronosticado d = 45: historia hasta d - 1
+    d = 45
+    history = np.stack([g['sales'].to_numpy()[:d] for _, g in df.groupby('id')])
+    features = HorizonState(history, specs).features()
+
+    for j, spec in enumerate(specs):
+        # Lags: fila del día d; rolling: ventana que termina en d - 1
+        row = d if spec.stat == 'lag' else d - 1
+        expected = [g[spec.name].to_numpy()[row] for _, g in df.groupby('id')]
+        np.testing.assert_allclose(features[:, j], expected, rtol=1e-9, err_msg=spec.name)
+
+
+def test_state_pads_short_history_and_pushes():
+    specs = history_features(['sales_lag_1', 'sales_lag_3', 'sales_rolling_std_3'])
+    state = HorizonState(np.array([[1.0, 2.0]]), specs)
+
+    first = state.features()
+    state.push(np.array([6.0]))
+    second = state.features()
+
+    assert first[0, 0] == 2.0 and np.isnan(first[0, 1])
+    np.testing.assert_allclose(second[0], [6.0, 1.0, np.std([1.0, 2.0, 6.0], ddof=1)])
+
+
+class TestForecastHorizon:
+    @pytest.fixture
+    def svc(self):
+        svc = _stub_service()
+        base = svc._feature_df
+        base['sales'] = base['sales_lag_1'] + 1.0
+        # Columna del modelo que solo se llena desde el estado recursivo
+        base['sales_lag_2'] = np.nan
+        return svc
+
+    def test_steps_are_batched_and_fed_back(self, svc):
+        svc._feature_df['snap_CA'] = '1'
+        svc.feature_names = ['sales_lag_1', 'sales_lag_2', 'snap_CA']
+        result = svc.forecast_horizon('CA_1', ['FOODS_1_001', 'FOODS_1_002_CA_1', 'FOODS_9_999'],
+                                      horizon=3, start_date='2016-04-29')
+
+        # Una llamada al modelo por día para todas las series
+        assert svc.model.calls == 3
+        assert [f['item_id'] for f in result['forecasts']] == ['FOODS_1_001', 'FOODS_1_002_CA_1']
+        assert 'FOODS_9_999' in result['errors']
+        forecast = result['forecasts'][0]
+        assert str(forecast['origin_date']) == '2016-04-28'
+        assert [str(p['date']) for p in forecast['predictions']] == ['2016-04-29', '2016-04-30', '2016-05-01']
+
+        # Modelo = lag_1 + 2 * lag_2 + 3 * snap: paso 1 con ventas reales, luego predicciones
+        base = svc._feature_df
+        s27, s28 = base.loc[base['item_id'] == 'FOODS_1_001', 'sales'].to_numpy()[2:4]
+        y1 = s28 + 2 * s27 + 3
+        y2 = y1 + 2 * s28 + 3
+        y3 = y2 + 2 * y1 + 3
+        assert [p['predicted_sales'] for p in forecast['predictions']] == pytest.approx([y1, y2, y3])
+        assert forecast['predictions'][0]['prediction_interval'] is None
+
+    def test_forecast_after_history_end(self, svc):
+        svc.feature_names = ['sales_lag_1', 'sales_lag_2']
+        result = svc.forecast_horizon('CA_1', ['FOODS_1_001'], horizon=2, start_date='2016-05-03')
+
+        (forecast,) = result['forecasts']
+        # Historia hasta 2016-05-01: el 2016-05-02 se pronostica y no se devuelve
+        assert svc.model.calls == 3
+        assert [str(p['date']) for p in forecast['predictions']] == ['2016-05-03', '2016-05-04']
+        sales = svc._feature_df.loc[svc._feature_df['item_id'] == 'FOODS_1_001', 'sales'].to_numpy()
+        y1 = sales[-1] + 2 * sales[-2]
+        y2 = y1 + 2 * sales[-1]
+        y3 = y2 + 2 * y1
+        assert [p['predicted_sales'] for p in forecast['predictions']] == pytest.approx([y2, y3])
+
+    def test_whole_store_and_limits(self, svc):
+        result = svc.forecast_horizon('CA_1', horizon=1)
+        assert len(result['forecasts']) == 2
+        with pytest.raises(ValueError):
+            svc.forecast_horizon('CA_1', horizon=2, start_date='2018-01-01')
+        with pytest.raises(ValueError):
+            svc.forecast_horizon('TX_9', horizon=2)
@@ -6,9 +6,15 @@ Email: bedaniele0@gmail.com
 Fecha: December 13, 2024
 """
 
+import threading
+import time
+
+import numpy as np
 import pandas as pd
 
-from src.api.model_service import ModelService, get_model_service
+from src.api.feature_matrix import MODE_MMAP, load_or_build_feature_matrix, sidecar_paths
+from src.api.model_service import ModelService, _SwapLock, get_model_service
+from src.api.prediction_cache import PredictionCache
 
 
 class TestModelService:
@@ -52,3 +58,371 @@ class TestModelService:
         ready, detail = svc.is_ready()
         assert isinstance(ready, bool)
         assert isinstance(detail, str)
+
+
+class _SumModel:
+    """Modelo mínimo: suma de features (permite verificar el orden de columnas)."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def predict(self, X, validate_features=False):
+        self.calls += 1
+        return np.asarray(X, dtype=float) @ np.arange(1, X.shape[1] + 1)
+
+
+class _ScaledModel(_SumModel):
+    """Booster cuantílico de prueba: la suma escalada por ``factor``."""
+
+    def __init__(self, factor):
+        super().__init__()
+        self.factor = factor
+
+    def predict(self, X, validate_features=False):
+        return super().predict(X) * self.factor
+
+
+def _stub_service(with_matrix=False):
+    """ModelService sin artefactos en disco, con una base de features sintética."""
+    dates = pd.date_range("2016-04-25", periods=7, freq="D")
+    frames = []
+    for k, item in enumerate(["FOODS_1_001", "FOODS_1_002"]):
+        frames.append(
+            pd.DataFrame(
+                {
+                    "item_id": item,
+                    "store_id": "CA_1",
+                    "date": dates,
+                    "sales_lag_7": np.arange(7, dtype=float) + k,
+                    "sales_lag_1": np.arange(7, dtype=float) * 2 + k,
+                    "snap_CA": ["1", "0", "x", "1", "0", "1", "0"],
+                }
+            )
+        )
+    svc = ModelService.__new__(ModelService)
+    svc.model = _SumModel()
+    svc.feature_names = ["sales_lag_1", "sales_lag_7", "snap_CA"]
+    svc.split_thresholds = None
+    svc.model_digest = "0" * 64
+    svc.feature_matrix_mode = "memory" if with_matrix else "off"
+    svc._feature_df = pd.concat(frames, ignore_index=True)
+    svc._feature_index = None
+    svc._feature_matrix = None
+    svc.quantile_models = {}
+    svc.online_drift = None
+    svc.prediction_cache = None
+    svc.serving_mode = "live"
+    svc.forecast_table = None
+    svc.table_hits = svc.table_misses = 0
+    svc._table_stats_lock = threading.Lock()
+    svc._swap_lock = _SwapLock()
+    if with_matrix:
+        svc._feature_df = svc._materialize_feature_matrix(svc._feature_df, None)
+    return svc
+
+
+def _artifacts(svc, **changes):
+    """Artefactos actuales del stub con ``changes`` (lo que devolvería _read_model_artifacts)."""
+    artifacts = {
+        name: getattr(svc, name, None)
+        for name in ("model", "model_digest", "feature_names", "split_thresholds", "quantile_models", "loaded_at")
+    }
+    return {**artifacts, **changes}
+
+
+class _BlockingModel(_SumModel):
+    """Modelo que se queda dentro de predict hasta que se libera ``release``."""
+
+    def __init__(self):
+        super().__init__()
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def predict(self, X, validate_features=False):
+        self.entered.set()
+        assert self.release.wait(5)
+        return super().predict(X)
+
+
+class _SlowModel(_ScaledModel):
+    """Modelo escalado que tarda en predecir (agranda la ventana de la recarga)."""
+
+    def predict(self, X, validate_features=False):
+        time.sleep(0.001)
+        return super().predict(X)
+
+
+class TestModelServiceReload:
+    def test_reload_waits_for_predictions_in_flight(self, monkeypatch):
+        svc = _stub_service(with_matrix=True)
+        svc.loaded_at = "2016-06-01T00:00:00"
+        svc.prediction_cache = PredictionCache(max_size=100)
+        expected = svc.predict_from_request("FOODS_1_001", "CA_1", "2016-04-28")
+        svc.prediction_cache.clear()
+        svc.model = _BlockingModel()
+        monkeypatch.setattr(
+            svc, "_read_model_artifacts",
+            lambda: _artifacts(svc, model=_ScaledModel(10.0), loaded_at="2016-06-02T00:00:00"),
+        )
+        monkeypatch.setattr(svc, "model_info", lambda: {})
+
+        results = {}
+        predict = threading.Thread(
+            target=lambda: results.update(old=svc.predict_from_request("FOODS_1_001", "CA_1", "2016-04-28"))
+        )
+        predict.start()
+        assert svc.model.entered.wait(5)
+        blocked_model = svc.model
+        reload = threading.Thread(target=svc.reload_model)
+        reload.start()
+        reload.join(0.2)
+
+        # La recarga espera a la predicción en curso, que termina con el modelo anterior
+        assert reload.is_alive() and svc.model is blocked_model
+        blocked_model.release.set()
+        predict.join(5)
+        reload.join(5)
+
+        assert results["old"] == expected
+        assert isinstance(svc.model, _ScaledModel)
+        assert len(svc.prediction_cache) == 0
+        assert svc.predict_from_request("FOODS_1_001", "CA_1", "2016-04-28") == expected * 10
+
+    def test_concurrent_reload_and_predict_never_mix_models(self, monkeypatch):
+        svc = _stub_service(with_matrix=True)
+        svc.loaded_at = "0"
+        request = ("FOODS_1_001", "CA_1", "2016-04-28")
+        base = svc.predict_from_request(*request)
+        svc.prediction_cache = PredictionCache(max_size=100)
+
+        def artifact_set(factor, loaded_at):
+            # Intervalo = [0.5, 2] x predicción, siempre que modelo y boosters sean del mismo set
+            return _artifacts(
+                svc,
+                model=_SlowModel(factor),
+                quantile_models={"p10": _ScaledModel(factor / 2), "p90": _ScaledModel(factor * 2)},
+                loaded_at=loaded_at,
+            )
+
+        svc._apply_model_artifacts(artifact_set(1.0, "0"))
+        versions = iter(range(1, 10_000))
+
+        def read_artifacts():
+            version = next(versions)
+            return artifact_set(10.0 if version % 2 else 1.0, str(version))
+
+        monkeypatch.setattr(svc, "_read_model_artifacts", read_artifacts)
+        monkeypatch.setattr(svc, "model_info", lambda: {})
+        stop = threading.Event()
+        served = []
+
+        def serve():
+            while not stop.is_set():
+                served.append(svc.predict_with_interval(*request))
+                served.extend((y, interval) for y, interval, _ in svc.predict_batch_with_intervals([request]))
+
+        workers = [threading.Thread(target=serve) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for _ in range(30):
+            svc.reload_model()
+            time.sleep(0.002)
+        stop.set()
+        for worker in workers:
+            worker.join(5)
+
+        assert served
+        for y_hat, interval in served:
+            assert y_hat in (base, 10 * base)
+            assert (interval["lower"], interval["upper"]) == (y_hat / 2, y_hat * 2)
+        # El cache no guarda respuestas del modelo anterior
+        assert svc.predict_with_interval(*request)[0] == svc.model.factor * base
+
+
+class TestModelServiceBatch:
+    def test_batch_matches_single_predictions(self):
+        svc = _stub_service()
+        requests = [
+            ("FOODS_1_001_CA_1", "CA_1", "2016-05-01"),
+            ("FOODS_1_002", "CA_1", "2016-04-27"),
+            ("FOODS_1_002", "CA_1", "2016-06-01"),
+        ]
+        single = [svc.predict_from_request(*req) for req in requests]
+
+        svc.model.calls = 0
+        batch = svc.predict_batch(requests)
+
+        assert svc.model.calls == 1
+        assert [err for _, err in batch] == [None, None, None]
+        np.testing.assert_allclose([y for y, _ in batch], single)
+
+    def test_batch_reports_per_item_errors(self):
+        svc = _stub_service()
+        batch = svc.predict_batch(
+            [
+                ("FOODS_1_001", "CA_1", "2016-05-01"),
+                ("FOODS_1_001", "CA_1", object()),
+            ]
+        )
+
+        assert batch[0][1] is None and batch[0][0] >= 0
+        assert batch[1][0] is None
+        assert "Row resolution failed" in batch[1][1]
+
+
+class TestModelServiceIntervals:
+    def test_intervals_share_the_feature_matrix(self):
+        svc = _stub_service(with_matrix=True)
+        svc.quantile_models = {"p10": _ScaledModel(0.5), "p50": _ScaledModel(1.0), "p90": _ScaledModel(1.5)}
+        requests = [
+            ("FOODS_1_001", "CA_1", "2016-04-26"),
+            ("FOODS_1_002", "CA_1", "2016-04-28"),
+            ("FOODS_1_002", "CA_1", object()),
+        ]
+
+        y_hat, interval = svc.predict_with_interval(*requests[0])
+        batch = svc.predict_batch_with_intervals(requests)
+
+        assert interval == {"lower": 0.5 * y_hat, "median": y_hat, "upper": 1.5 * y_hat}
+        assert batch[0][:2] == (y_hat, interval)
+        assert batch[1][1]["lower"] <= batch[1][0] <= batch[1][1]["upper"]
+        assert batch[2][:2] == (None, None)
+        # Una llamada por booster para el batch completo
+        assert [m.calls for m in svc.quantile_models.values()] == [2, 2, 2]
+        assert svc.predict_batch(requests[:2]) == [(y, None) for y, _, _ in batch[:2]]
+
+    def test_no_interval_without_p10_p90_and_crossing_is_sorted(self):
+        svc = _stub_service()
+        svc.quantile_models = {"p90": _ScaledModel(0.5)}
+        assert svc.predict_with_interval("FOODS_1_001", "CA_1", "2016-04-26")[1] is None
+
+        svc.quantile_models = {"p10": _ScaledModel(2.0), "p90": _ScaledModel(0.5)}
+        _, interval = svc.predict_with_interval("FOODS_1_001", "CA_1", "2016-04-26")
+        assert interval["lower"] <= interval["upper"]
+        assert set(interval) == {"lower", "upper"}
+
+
+class TestFeatureMatrix:
+    def test_matrix_path_matches_dataframe_path(self):
+        requests = [
+            ("FOODS_1_001", "CA_1", "2016-04-26"),
+            ("FOODS_1_002", "CA_1", "2016-04-27"),
+        ]
+        df_svc = _stub_service()
+        mx_svc = _stub_service(with_matrix=True)
+
+        assert mx_svc.feature_matrix.dtype == np.float32
+        assert mx_svc.feature_matrix.flags["C_CONTIGUOUS"]
+        assert "sales_lag_1" not in mx_svc.feature_df.columns
+
+        np.testing.assert_allclose(
+            [y for y, _ in mx_svc.predict_batch(requests)],
+            [y for y, _ in df_svc.predict_batch(requests)],
+            rtol=1e-6,
+        )
+        # Valores no numéricos se vuelven NaN como con pd.to_numeric(errors="coerce")
+        assert np.isnan(mx_svc.feature_matrix[2, 2])
+
+    def test_mmap_sidecar_is_reused(self, tmp_path):
+        df = _stub_service().feature_df
+        source = tmp_path / "sales_with_features.parquet"
+        df.to_parquet(source)
+        names = ["sales_lag_1", "sales_lag_7", "snap_CA"]
+
+        first = load_or_build_feature_matrix(df, names, source_path=source, mode=MODE_MMAP)
+        npy_path, meta_path = sidecar_paths(source)
+        assert npy_path.exists() and meta_path.exists()
+        mtime = npy_path.stat().st_mtime_ns
+
+        second = load_or_build_feature_matrix(df, names, source_path=source, mode=MODE_MMAP)
+        assert isinstance(second, np.memmap)
+        assert npy_path.stat().st_mtime_ns == mtime
+        np.testing.assert_array_equal(first, second)
+
+    def test_unsafe_float32_builds_float64_matrix_matching_model(self, tmp_path):
+        from lightgbm import LGBMRegressor
+
+        from src.api.feature_matrix import booster_split_thresholds
+
+        names = ["sales_lag_1", "sales_lag_7", "snap_CA"]
+        rng = np.random.default_rng(0)
+        X = pd.DataFrame(rng.normal(size=(400, 3)), columns=names)
+        y = X["sales_lag_1"] * 3 + np.sin(X["sales_lag_7"] * 5)
+        model = LGBMRegressor(n_estimators=20, num_leaves=15, verbose=-1).fit(X, y)
+        thresholds = booster_split_thresholds(model)
+
+        # Filas exactamente en los umbrales: float32(t) != t cae del otro lado
+        n = min(len(v) for v in thresholds.values())
+        df = pd.DataFrame({name: thresholds[name][:n] for name in names})
+        expected = model.predict(df)
+        naive = model.predict(df.astype(np.float32))
+        assert not np.array_equal(naive, expected)
+
+        source = tmp_path / "sales_with_features.parquet"
+        df.to_parquet(source)
+        matrix = load_or_build_feature_matrix(
+            df, names, source_path=source, mode=MODE_MMAP, thresholds=thresholds
+        )
+
+        assert matrix.dtype == np.float64
+        np.testing.assert_array_equal(model.predict(pd.DataFrame(matrix, columns=names)), expected)
+        # Una matriz float64 no se comparte vía sidecar float32
+        assert not any(path.exists() for path in sidecar_paths(source))
+
+
+class TestProjectedLoading:
+    def _write_base(self, tmp_path):
+        svc = _stub_service()
+        df = svc.feature_df.copy()
+        df["snap_CA"] = pd.to_numeric(df["snap_CA"], errors="coerce")
+        df["sell_price"] = 1.0  # columna que el modelo no usa
+        path = tmp_path / "sales_with_features.parquet"
+        df.to_parquet(path)
+        return svc, path
+
+    def test_projected_reads_keys_and_features_only(self, tmp_path):
+        svc, path = self._write_base(tmp_path)
+        svc.feature_load_mode = "projected"
+        svc.feature_matrix_mode = "memory"
+
+        df = svc._read_feature_base(path)
+
+        assert list(df.columns) == ["item_id", "store_id", "date", "sales_lag_1", "sales_lag_7", "snap_CA"]
+        assert isinstance(df["item_id"].dtype, pd.CategoricalDtype)
+        assert isinstance(df["store_id"].dtype, pd.CategoricalDtype)
+
+    def test_feature_store_slice_is_projected(self, tmp_path):
+        from src.features.feature_store import write_feature_store
+
+        svc, path = self._write_base(tmp_path)
+        df = pd.read_parquet(path)
+        store = write_feature_store(df, tmp_path / "feature_store")
+        svc.feature_load_mode = "projected"
+        svc.feature_matrix_mode = "memory"
+        svc.feature_slice = {"stores": ["CA_1"], "start_date": "2016-04-28", "end_date": None}
+
+        result = svc._read_feature_base(store)
+
+        assert set(result.columns) == {"item_id", "store_id", "date", "sales_lag_1", "sales_lag_7", "snap_CA"}
+        assert (result["date"] >= "2016-04-28").all()
+        assert len(result) == len(df[df["date"] >= "2016-04-28"])
+        assert isinstance(result["item_id"].dtype, pd.CategoricalDtype)
+
+    def test_float32_downcast_respects_booster_thresholds(self):
+        from src.api.feature_matrix import float32_safe_columns
+
+        df = pd.DataFrame(
+            {
+                "exact": np.arange(10, dtype=np.float64),
+                "rounded": np.full(10, 0.1),
+                "split_on_value": np.full(10, 0.1),
+            }
+        )
+        thresholds = {
+            "exact": np.array([4.5]),
+            "rounded": np.array([0.5]),
+            # float32(0.1) > 0.1: un umbral en 0.1 cambia de lado
+            "split_on_value": np.array([0.1]),
+        }
+
+        assert float32_safe_columns(df, thresholds) == ["exact", "rounded"]
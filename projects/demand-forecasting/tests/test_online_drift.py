@@ -0,0 +1,150 @@
+"""
+Tests for the rolling-window online drift monitor fed by the prediction API.
+
+Autor: Ing. Daniel Varela Perez
+Email: bedaniele0@gmail.com
+"""
+
+import numpy as np
+import pytest
+
+from src.api.prediction_cache import PredictionCache
+from src.monitoring.drift_kernel import psi_from_counts
+from src.monitoring.online_drift import OnlineDriftMonitor, OnlineReference
+
+from .test_model_service import _artifacts, _ScaledModel, _stub_service
+
+
+@pytest.fixture
+def reference():
+    rng = np.random.default_rng(0)
+    matrix = np.column_stack([
+        rng.normal(0.0, 1.0, 5000),
+        rng.poisson(1.5, 5000).astype(float),
+        rng.gamma(2.0, 2.0, 5000),
+    ])
+    return OnlineReference.from_matrix(matrix, ['price', 'sales_lag_7', 'predicted_sales'])
+
+
+def _traffic(rng, n, shift=0.0):
+    return np.column_stack([
+        rng.normal(shift, 1.0, n),
+        rng.poisson(1.5, n).astype(float),
+        rng.gamma(2.0, 2.0, n),
+    ])
+
+
+class TestOnlineDriftMonitor:
+    def test_bucket_counts_match_np_histogram(self, reference):
+        rng = np.random.default_rng(1)
+        traffic = _traffic(rng, 400)
+        traffic[::7, 0] = np.nan
+        monitor = OnlineDriftMonitor(bucket_seconds=60, n_buckets=5)
+        monitor.freeze(reference)
+
+        for chunk in np.array_split(traffic, 9):
+            monitor.observe(chunk, now=1000.0)
+
+        counts = monitor.window_counts(now=1000.0)
+        for j in range(traffic.shape[1]):
+            values = traffic[:, j][~np.isnan(traffic[:, j])]
+            np.testing.assert_array_equal(counts[j], np.histogram(values, bins=reference.edges[j])[0])
+
+    def test_window_expires_old_buckets(self, reference):
+        rng = np.random.default_rng(2)
+        monitor = OnlineDriftMonitor(bucket_seconds=60, n_buckets=3, min_samples=50)
+        monitor.freeze(reference)
+
+        monitor.observe(_traffic(rng, 300, shift=3.0), now=0.0)
+        shifted = monitor.refresh(now=100.0)
+        monitor.observe(_traffic(rng, 300), now=200.0)
+        monitor.observe(_traffic(rng, 300), now=230.0)
+        recovered = monitor.refresh(now=240.0)
+
+        assert shifted['status'] == 'critical'
+        assert shifted['top_features'][0]['feature'] == 'price'
+        assert recovered['status'] == 'ok'
+        assert recovered['features']['price']['n'] == 600
+        expected = psi_from_counts(reference.counts, monitor.window_counts(now=240.0))
+        assert recovered['output']['psi'] == pytest.approx(expected[2], abs=1e-4)
+
+    def test_insufficient_data_and_reference_roundtrip(self, reference, tmp_path):
+        monitor = OnlineDriftMonitor(min_samples=100)
+        assert monitor.refresh()['status'] == 'no_reference'
+
+        monitor.freeze(OnlineReference.load(reference.save(tmp_path / 'reference.npz')))
+        # Escritura atómica: no queda el temporal junto al .npz
+        assert [p.name for p in tmp_path.iterdir()] == ['reference.npz']
+        monitor.observe(_traffic(np.random.default_rng(3), 10))
+
+        result = monitor.refresh()
+        assert result['status'] == 'insufficient_data'
+        assert result['overall_psi'] is None
+        with pytest.raises(ValueError):
+            monitor.observe(np.zeros((1, 2)))
+
+
+class TestModelServiceOnlineDrift:
+    def test_predictions_feed_monitor(self, tmp_path, monkeypatch):
+        monkeypatch.setenv('ONLINE_DRIFT_REFERENCE', str(tmp_path / 'reference.npz'))
+        svc = _stub_service(with_matrix=True)
+        svc.project_root = tmp_path
+        monitor = OnlineDriftMonitor(min_samples=1)
+        svc.online_drift = monitor
+
+        monitor.freeze(svc.online_drift_reference())
+        svc.predict_from_request('FOODS_1_001', 'CA_1', '2016-04-27')
+        svc.predict_batch([('FOODS_1_002', 'CA_1', '2016-04-28'), ('FOODS_1_001', 'CA_1', '2016-04-29')])
+
+        result = monitor.refresh()
+        assert (tmp_path / 'reference.npz').exists()
+        assert result['output']['name'] == 'predicted_sales'
+        assert result['features']['sales_lag_1']['n'] == 3
+        assert set(result['features']) == set(svc.feature_names)
+
+    def test_cache_and_table_hits_are_observed(self, tmp_path, monkeypatch):
+        monkeypatch.setenv('ONLINE_DRIFT_REFERENCE', str(tmp_path / 'reference.npz'))
+        svc = _stub_service(with_matrix=True)
+        svc.project_root = tmp_path
+        svc.loaded_at = '2016-06-01T00:00:00'
+        svc.prediction_cache = PredictionCache(max_size=100)
+        monitor = OnlineDriftMonitor(min_samples=1)
+        svc.online_drift = monitor
+        monitor.freeze(svc.online_drift_reference())
+
+        first = svc.predict_from_request('FOODS_1_001', 'CA_1', '2016-04-25')
+        svc.predict_from_request('FOODS_1_001', 'CA_1', '2016-04-25')
+        svc.predict_batch([('FOODS_1_001', 'CA_1', '2016-04-25')])
+        assert svc.model.calls == 2
+        # Tabla precalculada: sin vector de features, solo se observa la predicción
+        monkeypatch.setattr(svc, '_lookup_forecast', lambda item_id, store_id, date: (first, None))
+        svc.predict_from_request('FOODS_1_002', 'CA_1', '2016-04-28')
+        svc.predict_batch([('FOODS_1_002', 'CA_1', '2016-04-29')])
+
+        result = monitor.refresh()
+        assert result['output']['n'] == 5
+        assert result['features']['sales_lag_1']['n'] == 3
+        counts = monitor.window_counts()
+        np.testing.assert_array_equal(counts[-1], np.histogram([first] * 5, bins=monitor.reference.edges[-1])[0])
+
+    def test_reference_is_tied_to_model_version(self, tmp_path, monkeypatch):
+        monkeypatch.setenv('ONLINE_DRIFT_REFERENCE', str(tmp_path / 'reference.npz'))
+        svc = _stub_service(with_matrix=True)
+        svc.project_root = tmp_path
+        svc.online_drift = OnlineDriftMonitor(min_samples=1)
+        first = svc.online_drift_reference()
+        assert OnlineReference.load(tmp_path / 'reference.npz').model_version == svc.artifact_version
+
+        def read_artifacts():
+            return _artifacts(svc, model=_ScaledModel(10.0), model_digest='1' * 64,
+                              loaded_at='2016-06-02T00:00:00')
+
+        monkeypatch.setattr(svc, '_read_model_artifacts', read_artifacts)
+        monkeypatch.setattr(svc, 'model_info', lambda: {})
+        svc.reload_model()
+
+        # Mismas features, otro modelo: la referencia se reconstruye y se vuelve a fijar
+        frozen = svc.online_drift.reference
+        assert frozen.model_version == svc.artifact_version != first.model_version
+        np.testing.assert_array_equal(frozen.edges[:-1], first.edges[:-1])
+        assert not np.array_equal(frozen.edges[-1], first.edges[-1])
@@ -0,0 +1,148 @@
+"""
+Tests for the LRU/TTL single-flight prediction cache and its use in ModelService.
+
+Autor: Ing. Daniel Varela Perez
+Email: bedaniele0@gmail.com
+"""
+
+import threading
+
+import pytest
+
+from src.api.prediction_cache import PredictionCache
+
+from .test_model_service import _artifacts, _stub_service
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestPredictionCache:
+    def test_lru_eviction_and_stats(self):
+        cache = PredictionCache(max_size=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        assert cache.get('a') == (True, 1)
+        cache.put('c', 3)
+
+        assert cache.get('b') == (False, None)
+        assert cache.get('a') == (True, 1) and cache.get('c') == (True, 3)
+        stats = cache.stats()
+        assert (stats['size'], stats['evictions'], stats['hits'], stats['misses']) == (2, 1, 3, 1)
+        assert stats['hit_ratio'] == pytest.approx(0.75)
+
+    def test_ttl_expires_entries(self):
+        clock = _Clock()
+        cache = PredictionCache(max_size=10, ttl_seconds=5, clock=clock)
+        cache.put('a', 1)
+        clock.now = 4.9
+        assert cache.get('a') == (True, 1)
+        clock.now = 5.1
+        assert cache.get('a') == (False, None)
+        assert cache.stats()['expirations'] == 1 and len(cache) == 0
+
+    def test_single_flight_computes_once(self):
+        cache = PredictionCache(max_size=10)
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 42
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(cache.get_or_compute('k', compute)))
+        leader.start()
+        started.wait(5)
+        followers = [
+            threading.Thread(target=lambda: results.append(cache.get_or_compute('k', compute))) for _ in range(4)
+        ]
+        for t in followers:
+            t.start()
+        release.set()
+        for t in [leader, *followers]:
+            t.join(5)
+
+        assert results == [42] * 5
+        assert len(calls) == 1
+        assert cache.get_or_compute('k', compute) == 42 and len(calls) == 1
+
+    def test_errors_are_not_cached(self):
+        cache = PredictionCache(max_size=10)
+
+        def fail():
+            raise ValueError('boom')
+
+        with pytest.raises(ValueError):
+            cache.get_or_compute('k', fail)
+        assert cache.get_or_compute('k', lambda: 7) == 7
+
+    def test_from_env(self, monkeypatch):
+        monkeypatch.setenv('PREDICTION_CACHE_SIZE', '0')
+        assert PredictionCache.from_env() is None
+        monkeypatch.setenv('PREDICTION_CACHE_SIZE', '50')
+        monkeypatch.setenv('PREDICTION_CACHE_TTL_SECONDS', '30')
+        cache = PredictionCache.from_env()
+        assert (cache.max_size, cache.ttl_seconds) == (50, 30.0)
+
+
+class TestModelServiceCache:
+    @pytest.fixture
+    def svc(self):
+        svc = _stub_service()
+        svc.loaded_at = '2016-06-01T00:00:00'
+        svc.prediction_cache = PredictionCache(max_size=100)
+        return svc
+
+    def test_repeated_requests_hit_the_cache(self, svc):
+        first = svc.predict_from_request('FOODS_1_001', 'CA_1', '2016-04-28')
+        again = svc.predict_from_request('FOODS_1_001_CA_1', 'CA_1', '2016-04-28')
+        assert first == again and svc.model.calls == 1
+
+        batch = svc.predict_batch([
+            ('FOODS_1_001', 'CA_1', '2016-04-28'),
+            ('FOODS_1_002', 'CA_1', '2016-04-28'),
+            ('FOODS_1_002', 'CA_1', object()),
+        ])
+        assert svc.model.calls == 2
+        assert batch[0] == (first, None)
+        assert 'Row resolution failed' in batch[2][1]
+        assert svc.predict_from_request('FOODS_1_002', 'CA_1', '2016-04-28') == batch[1][0]
+        assert svc.model.calls == 2
+
+        report = svc.prediction_cache_report()
+        assert report['enabled'] and report['size'] == 2
+        assert (report['hits'], report['misses']) == (3, 2)
+
+    def test_reload_invalidates(self, svc, monkeypatch):
+        svc.predict_from_request('FOODS_1_001', 'CA_1', '2016-04-28')
+
+        monkeypatch.setattr(
+            svc, '_read_model_artifacts', lambda: _artifacts(svc, loaded_at='2016-06-02T00:00:00')
+        )
+        monkeypatch.setattr(svc, 'model_info', lambda: {})
+        svc.reload_model()
+
+        assert len(svc.prediction_cache) == 0
+        svc.predict_from_request('FOODS_1_001', 'CA_1', '2016-04-28')
+        assert svc.model.calls == 2
+
+    def test_fallback_predictions_are_not_cached(self, svc):
+        # Item sin historia: fila aleatoria de la base, no debe quedar en el cache
+        svc.predict_from_request('FOODS_9_999', 'CA_1', '2016-04-28')
+        batch = svc.predict_batch([
+            ('FOODS_9_999', 'CA_1', '2016-04-28'),
+            ('FOODS_1_001', 'CA_1', '2016-04-28'),
+        ])
+        svc.predict_from_request('FOODS_9_999', 'CA_1', '2016-04-28')
+
+        assert batch[0][1] is None and batch[1][1] is None
+        assert svc.model.calls == 3
+        assert len(svc.prediction_cache) == 1
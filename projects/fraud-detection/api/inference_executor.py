@@ -0,0 +1,207 @@
+"""
+============================================================================
+inference_executor.py - Ejecutor acotado de inferencia para la API
+============================================================================
+Saca el trabajo CPU-bound (feature engineering + predict_proba) del event
+loop de FastAPI:
+
+- Pool de hilos dedicado de tamaño fijo (los predict de sklearn/numpy
+  liberan el GIL; el modelo se comparte sin serializarlo a otro proceso)
+- Cola acotada: con ``max_workers + max_queue`` trabajos admitidos, los
+  nuevos se rechazan con InferenceQueueFull (HTTP 429 + Retry-After)
+- Trabajos que esperaron en cola más de ``queue_timeout_seconds`` no se
+  ejecutan: InferenceTimeout (HTTP 503 + Retry-After)
+- Métricas: profundidad de cola, trabajos activos, tiempo de espera
+
+Configuración por variables de entorno (ver InferenceExecutor.from_env).
+
+Copia por proyecto: cada proyecto se instala y despliega por separado, sin
+paquete compartido, así que el mismo módulo vive también en ``credit-risk``.
+Las copias son idénticas salvo el ejemplo de uso de InferenceExecutor; un
+cambio aquí se replica en todas.
+
+Autor: Ing. Daniel Varela Perez
+Email: bedaniele0@gmail.com
+Tel: +52 55 4189 3428
+Metodología: DVP-PRO
+============================================================================
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+
+class InferenceRejected(Exception):
+    """Trabajo rechazado por saturación; ``status_code`` y ``retry_after`` para la respuesta HTTP."""
+
+    status_code = 503
+
+    def __init__(self, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class InferenceQueueFull(InferenceRejected):
+    """Cola llena al momento de enviar el trabajo."""
+
+    status_code = 429
+
+
+class InferenceTimeout(InferenceRejected):
+    """El trabajo esperó en cola más que ``queue_timeout_seconds``."""
+
+    status_code = 503
+
+
+class InferenceExecutor:
+    """
+    Pool de hilos acotado para inferencia, con control de admisión.
+
+    Uso desde un endpoint ``async``::
+
+        probabilities = await executor.run(predict_fraud_proba, matrix)
+    """
+
+    def __init__(self,
+                 max_workers: int = 2,
+                 max_queue: int = 32,
+                 queue_timeout_seconds: Optional[float] = None,
+                 retry_after_seconds: int = 1,
+                 on_wait: Optional[Callable[[float], None]] = None):
+        """
+        Args:
+            max_workers: Hilos de inferencia
+            max_queue: Trabajos en espera admitidos además de los activos
+            queue_timeout_seconds: Espera máxima en cola (None = sin límite)
+            retry_after_seconds: Valor del header Retry-After al rechazar
+            on_wait: Callback con el tiempo de espera en cola de cada trabajo
+        """
+        if max_workers < 1:
+            raise ValueError(f"max_workers must be >= 1, got {max_workers}")
+        if max_queue < 0:
+            raise ValueError(f"max_queue must be >= 0, got {max_queue}")
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self.retry_after_seconds = retry_after_seconds
+        self.on_wait = on_wait
+
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._active = 0
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.run_seconds_total = 0.0
+
+    @classmethod
+    def from_env(cls, **kwargs) -> 'InferenceExecutor':
+        """
+        Ejecutor configurado con INFERENCE_WORKERS (default 2),
+        INFERENCE_MAX_QUEUE (default 32), INFERENCE_QUEUE_TIMEOUT_SECONDS
+        (default 0 = sin límite) e INFERENCE_RETRY_AFTER_SECONDS (default 1).
+        """
+        timeout = float(os.getenv("INFERENCE_QUEUE_TIMEOUT_SECONDS", "0"))
+        return cls(
+            max_workers=int(os.getenv("INFERENCE_WORKERS", "2")),
+            max_queue=int(os.getenv("INFERENCE_MAX_QUEUE", "32")),
+            queue_timeout_seconds=timeout if timeout > 0 else None,
+            retry_after_seconds=int(os.getenv("INFERENCE_RETRY_AFTER_SECONDS", "1")),
+            **kwargs,
+        )
+
+    @property
+    def queue_depth(self) -> int:
+        """Trabajos admitidos que todavía no empiezan."""
+        return self._pending - self._active
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Ejecutar ``fn(*args, **kwargs)`` en el pool sin bloquear el event loop.
+
+        Raises:
+            InferenceQueueFull: Cola llena (no se encola)
+            InferenceTimeout: Esperó en cola más que ``queue_timeout_seconds``
+            InferenceRejected: Ejecutor detenido
+        """
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise InferenceQueueFull(
+                    f"Inference queue full ({self.max_queue} waiting)", self.retry_after_seconds
+                )
+            self._pending += 1
+            self.submitted += 1
+            if self._pool is None:
+                # Se crea al primer uso: tras shutdown() (fin del lifespan) vuelve a arrancar
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+            pool = self._pool
+
+        enqueued = time.perf_counter()
+
+        def job():
+            started = time.perf_counter()
+            wait = started - enqueued
+            with self._lock:
+                self._active += 1
+                self.wait_seconds_total += wait
+                self.wait_seconds_max = max(self.wait_seconds_max, wait)
+            try:
+                if self.on_wait is not None:
+                    self.on_wait(wait)
+                if self.queue_timeout_seconds is not None and wait > self.queue_timeout_seconds:
+                    with self._lock:
+                        self.timed_out += 1
+                    raise InferenceTimeout(
+                        f"Inference waited {wait:.2f}s in queue", self.retry_after_seconds
+                    )
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    self._pending -= 1
+                    self.completed += 1
+                    self.run_seconds_total += time.perf_counter() - started
+
+        try:
+            future = pool.submit(job)
+        except RuntimeError:
+            # Pool detenido (shutdown en curso)
+            with self._lock:
+                self._pending -= 1
+            raise InferenceRejected("Inference executor is shut down", self.retry_after_seconds)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> Dict[str, Any]:
+        """Profundidad de cola, trabajos activos, rechazos y tiempos de espera."""
+        with self._lock:
+            completed = self.completed
+            return {
+                "workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "queue_depth": self._pending - self._active,
+                "active": self._active,
+                "submitted": self.submitted,
+                "completed": completed,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "avg_wait_ms": round(1000 * self.wait_seconds_total / completed, 3) if completed else None,
+                "max_wait_ms": round(1000 * self.wait_seconds_max, 3),
+                "avg_run_ms": round(1000 * self.run_seconds_total / completed, 3) if completed else None,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Detener el pool (los trabajos ya encolados terminan si ``wait``)."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
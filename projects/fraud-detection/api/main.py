@@ -11,10 +11,13 @@ Metodología: DVP-PRO
 ============================================================================
 """
 
+import math
 import os
+import threading
 import time
 from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
+from operator import attrgetter
 from typing import Dict, List, Optional
 
 import joblib
@@ -22,8 +25,10 @@ import numpy as np
 import pandas as pd
 from fastapi import FastAPI, HTTPException, Depends, Header, Query
 from fastapi import status as http_status
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import BaseModel, Field, ConfigDict
 import uvicorn
@@ -39,6 +44,15 @@ from api.auth import (
     verify_api_key,
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
+from api.inference_executor import InferenceExecutor, InferenceRejected
+from api.compiled_forest import CompiledForest
+from api.metrics import FraudMetrics, MetricsMiddleware
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+try:
+    from src.streaming.velocity import VelocityEngine
+except ImportError:
+    from streaming.velocity import VelocityEngine
 
 # ============================================================================
 # APP CONFIGURATION
@@ -52,8 +66,11 @@ async def lifespan(app: FastAPI):
         print("✅ Model loaded successfully")
     else:
         print("❌ Failed to load model")
+    restore_velocity_state()
     yield
     print("👋 Shutting down Fraud Detection API...")
+    INFERENCE_EXECUTOR.shutdown()
+    save_velocity_state()
 
 
 app = FastAPI(
@@ -74,11 +91,56 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Latencia/status por plantilla de ruta (ver api/metrics.py)
+app.add_middleware(MetricsMiddleware, metrics=lambda: METRICS)
+
+
+@app.exception_handler(RequestValidationError)
+async def validation_exception_handler(request, exc: RequestValidationError):
+    """422 estándar; un input NaN/inf (p. ej. Time) se reporta como texto porque JSON no lo admite."""
+    errors = [
+        {**error, "input": str(error["input"])}
+        if isinstance(error.get("input"), float) and not math.isfinite(error["input"]) else error
+        for error in exc.errors()
+    ]
+    return JSONResponse(
+        status_code=422,
+        content={"detail": jsonable_encoder(errors)}
+    )
+
 # Global variables
 MODEL = None
 MODEL_VERSION = "1.0.0"
 OPTIMAL_THRESHOLD = 0.5
 
+# Diferencia máxima aceptada entre el modelo compilado y predict_proba
+COMPILE_TOLERANCE = 1e-9
+
+# Orden base de features del input (TransactionInput)
+FEATURE_COLUMNS = ['Time'] + [f'V{i}' for i in range(1, 29)] + ['Amount']
+
+# Niveles de riesgo: [0, 0.3) LOW, [0.3, 0.5) MEDIUM, [0.5, 0.7) HIGH, [0.7, 1] CRITICAL
+RISK_BINS = np.array([0.3, 0.5, 0.7])
+RISK_LABELS = np.array(["LOW", "MEDIUM", "HIGH", "CRITICAL"])
+
+# Pool acotado para predict_proba: el event loop queda libre para /health
+INFERENCE_EXECUTOR = InferenceExecutor.from_env()
+
+# Ventanas de velocidad (1h/6h/24h) sobre el Time de las transacciones recibidas;
+# con VELOCITY_STATE_PATH el estado sobrevive reinicios
+VELOCITY_ENGINE = VelocityEngine()
+VELOCITY_STATE_PATH = os.getenv("VELOCITY_STATE_PATH")
+# Las actualizaciones corren en los hilos del pool de inferencia
+VELOCITY_LOCK = threading.Lock()
+
+# Métricas Prometheus (GET /metrics); los gauges se evalúan en cada scrape
+METRICS = FraudMetrics(gauges={
+    "fraud_detection_model_loaded": ("Modelo cargado (1) o no (0)", lambda: MODEL is not None),
+    "fraud_detection_model_threshold": ("Threshold de clasificación vigente", lambda: OPTIMAL_THRESHOLD),
+    "fraud_detection_inference_queue_depth": (
+        "Trabajos en espera en el pool de inferencia", lambda: INFERENCE_EXECUTOR.queue_depth),
+})
+
 # ============================================================================
 # PYDANTIC MODELS
 # ============================================================================
@@ -119,7 +181,7 @@ class TransactionInput(BaseModel):
             "Amount": 149.62
         }
     })
-    Time: float = Field(..., description="Seconds elapsed from first transaction")
+    Time: float = Field(..., description="Seconds elapsed from first transaction", allow_inf_nan=False)
     V1: float
     V2: float
     V3: float
@@ -198,13 +260,44 @@ class ModelInfoResponse(BaseModel):
 # UTILITY FUNCTIONS
 # ============================================================================
 
-def load_model():
-    """Carga el modelo entrenado con fallback robusto para entorno de tests."""
+def compile_model(model, mode: Optional[str] = None):
+    """
+    Compila un RandomForest a arreglos NumPy (api/compiled_forest.py) si
+    ``mode`` (default env MODEL_COMPILE) es "auto" y el resultado coincide
+    con ``predict_proba`` a 1e-9; con "off" o si no aplica, devuelve el modelo.
+    Batches de más de MODEL_COMPILE_MAX_ROWS filas (default 128) siguen
+    usando el ``predict_proba`` original.
+    """
+    mode = (mode or os.getenv("MODEL_COMPILE", "auto")).lower()
+    if mode == "off" or not hasattr(model, "estimators_"):
+        return model
+    try:
+        compiled = CompiledForest.from_estimator(
+            model, max_rows=int(os.getenv("MODEL_COMPILE_MAX_ROWS", "128"))
+        )
+        max_diff = compiled.verify(model)
+    except Exception as e:
+        print(f"⚠️ Model compilation skipped: {e}")
+        return model
+    if max_diff > COMPILE_TOLERANCE:
+        print(f"⚠️ Compiled model differs from predict_proba (max diff {max_diff:.2e}); using original")
+        return model
+    print(f"✅ Model compiled: {compiled.n_estimators} trees, {compiled.n_nodes} nodes (max diff {max_diff:.1e})")
+    return compiled
+
+
+def load_model(compile_mode: Optional[str] = None):
+    """
+    Carga el modelo entrenado con fallback robusto para entorno de tests.
+
+    Args:
+        compile_mode: "auto" (compilar bosques) u "off"; default env MODEL_COMPILE
+    """
     global MODEL
     model_path = os.getenv("MODEL_PATH", "models/improved_recall_threshold_model.pkl")
 
     try:
-        MODEL = joblib.load(model_path)
+        MODEL = compile_model(joblib.load(model_path), compile_mode)
         return True
     except Exception as e:
         print(f"Error loading model ({model_path}): {e}")
@@ -212,7 +305,7 @@ def load_model():
     # Fallback a modelo simple
     try:
         fallback_path = "models/simple_fraud_model.pkl"
-        MODEL = joblib.load(fallback_path)
+        MODEL = compile_model(joblib.load(fallback_path), compile_mode)
         print(f"Loaded fallback model: {fallback_path}")
         return True
     except Exception as e:
@@ -235,6 +328,35 @@ def load_model():
     return True
 
 
+def restore_velocity_state() -> bool:
+    """Retoma las ventanas de velocidad desde VELOCITY_STATE_PATH si existe."""
+    global VELOCITY_ENGINE
+    if not VELOCITY_STATE_PATH or not os.path.exists(VELOCITY_STATE_PATH):
+        return False
+    try:
+        VELOCITY_ENGINE = VelocityEngine.load(VELOCITY_STATE_PATH)
+        return True
+    except Exception as e:
+        print(f"Error loading velocity state ({VELOCITY_STATE_PATH}): {e}")
+        return False
+
+
+def save_velocity_state() -> None:
+    """Guarda el snapshot de las ventanas de velocidad en VELOCITY_STATE_PATH."""
+    if VELOCITY_STATE_PATH:
+        try:
+            with VELOCITY_LOCK:
+                VELOCITY_ENGINE.save(VELOCITY_STATE_PATH)
+        except Exception as e:
+            print(f"Error saving velocity state ({VELOCITY_STATE_PATH}): {e}")
+
+
+def velocity_summary() -> Dict:
+    """Estadísticas y ventanas actuales del motor de velocidad."""
+    with VELOCITY_LOCK:
+        return {**VELOCITY_ENGINE.stats(), "current": VELOCITY_ENGINE.current()}
+
+
 def classify_risk_level(probability: float) -> str:
     """Clasifica el nivel de riesgo basado en la probabilidad."""
     if probability < 0.3:
@@ -247,11 +369,103 @@ def classify_risk_level(probability: float) -> str:
         return "CRITICAL"
 
 
+def classify_risk_levels(probabilities: np.ndarray) -> np.ndarray:
+    """Versión vectorizada de classify_risk_level (mismos cortes)."""
+    return RISK_LABELS[np.digitize(probabilities, RISK_BINS)]
+
+
 def generate_transaction_id() -> str:
     """Genera un ID único de transacción."""
     import uuid
     return f"TXN-{uuid.uuid4().hex[:12].upper()}"
 
+
+def generate_transaction_ids(n: int) -> List[str]:
+    """Genera ``n`` IDs únicos de transacción con una sola llamada a os.urandom."""
+    token = os.urandom(6 * n).hex().upper()
+    return [f"TXN-{token[i:i + 12]}" for i in range(0, 12 * n, 12)]
+
+
+def model_feature_columns() -> List[str]:
+    """Columnas en el orden que espera el modelo (feature_names_in_ si existe)."""
+    model_features = getattr(MODEL, "feature_names_in_", None)
+    if model_features is None:
+        return FEATURE_COLUMNS
+    return list(model_features)
+
+
+def build_feature_matrix(transactions: List["TransactionInput"]) -> np.ndarray:
+    """
+    Matriz float64 (n_transacciones x n_features) en el orden del modelo,
+    construida directamente desde los modelos pydantic. Las columnas que el
+    modelo espera y no vienen en el input se rellenan con 0 (como align_features).
+    """
+    columns = model_feature_columns()
+    matrix = np.zeros((len(transactions), len(columns)), dtype=np.float64)
+    present = [j for j, col in enumerate(columns) if col in TransactionInput.model_fields]
+    if present and transactions:
+        getter = attrgetter(*[columns[j] for j in present])
+        values = np.array([getter(t) for t in transactions], dtype=np.float64)
+        matrix[:, present] = values.reshape(len(transactions), len(present))
+    return matrix
+
+
+def predict_fraud_proba(matrix: np.ndarray) -> np.ndarray:
+    """Probabilidad de fraude para todas las filas con un solo predict_proba."""
+    X = matrix
+    if getattr(MODEL, "feature_names_in_", None) is not None:
+        # El modelo se entrenó con DataFrame: conservar nombres para sklearn
+        X = pd.DataFrame(matrix, columns=model_feature_columns(), copy=False)
+    return np.asarray(MODEL.predict_proba(X))[:, 1].astype(float)
+
+
+def record_velocity(times: List[float], amounts: List[float]) -> None:
+    """Registra transacciones servidas en las ventanas de velocidad."""
+    with VELOCITY_LOCK:
+        VELOCITY_ENGINE.update_batch(times, amounts)
+
+
+def score_transaction(features_dict: Dict[str, float]) -> float:
+    """Probabilidad de fraude de una transacción (ruta por DataFrame)."""
+    with METRICS.stage("feature_alignment", "single"):
+        features_df = align_features(pd.DataFrame([features_dict]))
+    with METRICS.stage("inference", "single"):
+        probability = float(MODEL.predict_proba(features_df)[0, 1])
+    record_velocity([features_dict["Time"]], [features_dict["Amount"]])
+    return probability
+
+
+def score_transactions(transactions: List["TransactionInput"]) -> np.ndarray:
+    """
+    Probabilidades de un batch: una matriz y un solo predict_proba. Las
+    ventanas de velocidad se actualizan aquí, en el hilo de inferencia, para
+    no recorrer el batch en el event loop.
+    """
+    if not transactions:
+        return np.empty(0)
+    with METRICS.stage("feature_alignment", "batch"):
+        matrix = build_feature_matrix(transactions)
+    with METRICS.stage("inference", "batch"):
+        probabilities = predict_fraud_proba(matrix)
+    record_velocity([t.Time for t in transactions], [t.Amount for t in transactions])
+    return probabilities
+
+
+async def run_inference(fn, *args):
+    """
+    Ejecuta ``fn`` en el pool de inferencia. Si está saturado responde 429
+    (cola llena) o 503 (demasiada espera) con Retry-After.
+    """
+    try:
+        return await INFERENCE_EXECUTOR.run(fn, *args)
+    except InferenceRejected as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.detail,
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+
 def align_features(df: pd.DataFrame) -> pd.DataFrame:
     """
     Alinea features al set que espera el modelo, rellenando faltantes con 0.
@@ -321,8 +535,9 @@ async def system_status():
         "model_loaded": MODEL is not None,
         "model_version": MODEL_VERSION,
         "optimal_threshold": OPTIMAL_THRESHOLD,
+        "inference_queue_depth": INFERENCE_EXECUTOR.queue_depth,
         "timestamp": datetime.now().isoformat(),
-        "uptime": "N/A"  # Implementar tracking de uptime
+        "uptime_seconds": round(time.time() - METRICS.start_time, 1)
     }
 
 
@@ -389,27 +604,26 @@ async def predict_single(
         )
 
     try:
-        # Preparar features
-        features_dict = transaction.model_dump()
-        features_df = pd.DataFrame([features_dict])
-        features_df = align_features(features_df)
-
-        # Predicción
-        fraud_probability = float(MODEL.predict_proba(features_df)[0, 1])
+        # Features + predicción fuera del event loop
+        fraud_probability = await run_inference(score_transaction, transaction.model_dump())
         is_fraud = bool(fraud_probability >= OPTIMAL_THRESHOLD)
         risk_level = classify_risk_level(fraud_probability)
+        METRICS.record_predictions("single", [risk_level], [is_fraud])
 
         # Response
-        return PredictionResponse(
-            transaction_id=generate_transaction_id(),
-            fraud_probability=fraud_probability,
-            is_fraud=is_fraud,
-            risk_level=risk_level,
-            threshold_used=OPTIMAL_THRESHOLD,
-            model_version=MODEL_VERSION,
-            prediction_timestamp=datetime.now().isoformat()
-        )
+        with METRICS.stage("serialization", "single"):
+            return PredictionResponse(
+                transaction_id=generate_transaction_id(),
+                fraud_probability=fraud_probability,
+                is_fraud=is_fraud,
+                risk_level=risk_level,
+                threshold_used=OPTIMAL_THRESHOLD,
+                model_version=MODEL_VERSION,
+                prediction_timestamp=datetime.now().isoformat()
+            )
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=http_status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -438,44 +652,51 @@ async def predict_batch(
     start_time = time.time()
 
     try:
-        predictions = []
-
-        for transaction in request.transactions:
-            # Preparar features
-            features_dict = transaction.model_dump()
-            features_df = pd.DataFrame([features_dict])
-            features_df = align_features(features_df)
-
-            # Predicción
-            fraud_probability = float(MODEL.predict_proba(features_df)[0, 1])
-            is_fraud = bool(fraud_probability >= OPTIMAL_THRESHOLD)
-            risk_level = classify_risk_level(fraud_probability)
-
-            predictions.append(
-                PredictionResponse(
-                    transaction_id=generate_transaction_id(),
-                    fraud_probability=fraud_probability,
-                    is_fraud=is_fraud,
+        transactions = request.transactions
+        n = len(transactions)
+
+        # Una sola matriz y una sola llamada al modelo para todo el batch
+        probabilities = await run_inference(score_transactions, transactions)
+        is_fraud = probabilities >= OPTIMAL_THRESHOLD
+        risk_levels = classify_risk_levels(probabilities)
+        METRICS.batch_size.observe(n)
+        METRICS.record_predictions("batch", risk_levels.tolist(), is_fraud.tolist())
+
+        with METRICS.stage("serialization", "batch"):
+            transaction_ids = generate_transaction_ids(n)
+            prediction_timestamp = datetime.now().isoformat()
+
+            # Valores ya validados: model_construct evita re-validar 1000 objetos
+            predictions = [
+                PredictionResponse.model_construct(
+                    transaction_id=transaction_id,
+                    fraud_probability=probability,
+                    is_fraud=flag,
                     risk_level=risk_level,
                     threshold_used=OPTIMAL_THRESHOLD,
                     model_version=MODEL_VERSION,
-                    prediction_timestamp=datetime.now().isoformat()
+                    prediction_timestamp=prediction_timestamp
                 )
-            )
+                for transaction_id, probability, flag, risk_level in zip(
+                    transaction_ids, probabilities.tolist(), is_fraud.tolist(), risk_levels.tolist()
+                )
+            ]
 
         # Calcular estadísticas
-        fraud_count = sum(1 for p in predictions if p.is_fraud)
-        fraud_rate = fraud_count / len(predictions) if predictions else 0
+        fraud_count = int(is_fraud.sum())
+        fraud_rate = fraud_count / n if n else 0.0
         processing_time = time.time() - start_time
 
         return BatchPredictionResponse(
             predictions=predictions,
-            total_transactions=len(predictions),
+            total_transactions=n,
             fraud_count=fraud_count,
             fraud_rate=fraud_rate,
             processing_time=processing_time
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=http_status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -540,12 +761,18 @@ async def get_metrics():
         "model_version": MODEL_VERSION,
         "threshold": OPTIMAL_THRESHOLD,
         "timestamp": datetime.now().isoformat(),
-        "predictions_total": "N/A",  # Implementar contador
-        "predictions_fraud": "N/A",
-        "avg_latency_ms": "N/A"
+        **METRICS.summary(),
+        "inference": INFERENCE_EXECUTOR.stats(),
+        "velocity": velocity_summary()
     }
 
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Exposición Prometheus (scrape de config/grafana/prometheus.yml)."""
+    return Response(generate_latest(METRICS.registry), media_type=CONTENT_TYPE_LATEST)
+
+
 # ============================================================================
 # MAIN
 # ============================================================================
@@ -0,0 +1,254 @@
+"""
+============================================================================
+metrics.py - Instrumentación Prometheus de la API de fraude
+============================================================================
+Métricas de la ruta caliente sin locks por request:
+
+- Cada hilo acumula en sus propios contadores/histogramas (shards por
+  ``threading.local``); solo el scrape de /metrics recorre todos los shards
+  y arma las familias Prometheus (_Collector)
+- Latencia y conteo de requests por plantilla de ruta (``/api/v1/predict``,
+  no la URL cruda) con un middleware ASGI puro (MetricsMiddleware)
+- Tiempos por etapa: alineación de features, inferencia y serialización
+- Predicciones y fraudes por nivel de riesgo, tamaño de batch
+
+Los nombres siguen config/grafana/dashboard.json y alert_rules.yml
+(prefijo ``fraud_detection_``).
+
+Autor: Ing. Daniel Varela Perez
+Email: bedaniele0@gmail.com
+Tel: +52 55 4189 3428
+Metodología: DVP-PRO
+============================================================================
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from prometheus_client import CollectorRegistry, ProcessCollector
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, HistogramMetricFamily
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 32, 64, 100, 250, 500, 1000)
+
+
+class _Sharded:
+    """
+    Valores por etiqueta con un shard por hilo: el hilo que escribe es el
+    único dueño de su dict, así que ``observe``/``inc`` no toman locks.
+    La lectura (scrape) suma los shards; puede ver una actualización a
+    medias, lo que en un scrape de contadores monótonos es aceptable.
+    """
+
+    def __init__(self, width: int):
+        self.width = width
+        self._local = threading.local()
+        self._shards: List[Dict[Tuple[str, ...], List[float]]] = []
+
+    def row(self, labels: Tuple[str, ...]) -> List[float]:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            self._shards.append(shard)  # list.append es atómico con el GIL
+        row = shard.get(labels)
+        if row is None:
+            row = shard[labels] = [0.0] * self.width
+        return row
+
+    def totals(self) -> Dict[Tuple[str, ...], List[float]]:
+        merged: Dict[Tuple[str, ...], List[float]] = {}
+        for shard in list(self._shards):
+            for labels, row in list(shard.items()):
+                acc = merged.setdefault(labels, [0.0] * self.width)
+                for i, value in enumerate(row):
+                    acc[i] += value
+        return merged
+
+
+class ShardedCounter:
+    """Contador con etiquetas, sin locks en ``inc``."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = list(labelnames)
+        self._values = _Sharded(1)
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values.row(labels)[0] += amount
+
+    def totals(self) -> Dict[Tuple[str, ...], float]:
+        return {labels: row[0] for labels, row in self._values.totals().items()}
+
+    def collect(self) -> CounterMetricFamily:
+        family = CounterMetricFamily(self.name, self.documentation, labels=self.labelnames)
+        for labels, value in sorted(self.totals().items()):
+            family.add_metric(list(labels), value)
+        return family
+
+
+class ShardedHistogram:
+    """Histograma con etiquetas, sin locks en ``observe``."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = list(labelnames)
+        self.buckets = tuple(float(b) for b in buckets)
+        # Conteo por bucket (+Inf al final) y suma
+        self._values = _Sharded(len(self.buckets) + 2)
+
+    def observe(self, value: float, *labels: str) -> None:
+        row = self._values.row(labels)
+        row[bisect_left(self.buckets, value)] += 1
+        row[-1] += value
+
+    def totals(self) -> Dict[Tuple[str, ...], Tuple[float, float]]:
+        """(conteo, suma) por etiqueta."""
+        return {labels: (sum(row[:-1]), row[-1]) for labels, row in self._values.totals().items()}
+
+    def collect(self) -> HistogramMetricFamily:
+        family = HistogramMetricFamily(self.name, self.documentation, labels=self.labelnames)
+        bounds = [str(b) for b in self.buckets] + ["+Inf"]
+        for labels, row in sorted(self._values.totals().items()):
+            cumulative, buckets = 0.0, []
+            for bound, count in zip(bounds, row[:-1]):
+                cumulative += count
+                buckets.append((bound, cumulative))
+            family.add_metric(list(labels), buckets, sum_value=row[-1])
+        return family
+
+
+class FraudMetrics:
+    """Métricas de la API de fraude y su exposición Prometheus."""
+
+    def __init__(self, gauges: Optional[Dict[str, Tuple[str, Callable[[], float]]]] = None):
+        """
+        Args:
+            gauges: nombre -> (documentación, función) evaluada en cada scrape
+        """
+        self.requests = ShardedCounter(
+            "fraud_detection_api_requests", "Requests HTTP por ruta, método y status",
+            ["route", "method", "status"])
+        self.errors = ShardedCounter(
+            "fraud_detection_api_errors", "Respuestas 5xx por ruta", ["route", "status"])
+        self.latency = ShardedHistogram(
+            "fraud_detection_api_latency_seconds", "Latencia de requests HTTP por ruta",
+            ["route", "method"])
+        self.stages = ShardedHistogram(
+            "fraud_detection_stage_latency_seconds",
+            "Tiempo por etapa de predicción (feature_alignment, inference, serialization)",
+            ["stage", "mode"])
+        self.predictions = ShardedCounter(
+            "fraud_detection_predictions", "Predicciones por modo y nivel de riesgo",
+            ["mode", "risk_level"])
+        self.frauds = ShardedCounter(
+            "fraud_detection_frauds", "Transacciones marcadas como fraude por nivel de riesgo",
+            ["risk_level"])
+        self.batch_size = ShardedHistogram(
+            "fraud_detection_batch_size", "Transacciones por request batch",
+            buckets=BATCH_SIZE_BUCKETS)
+        self.gauges = dict(gauges or {})
+        self.start_time = time.time()
+
+        self.registry = CollectorRegistry()
+        self.registry.register(_Collector(self))
+        ProcessCollector(registry=self.registry)
+
+    @contextmanager
+    def stage(self, name: str, mode: str) -> Iterator[None]:
+        """Medir una etapa de la predicción."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.observe(time.perf_counter() - start, name, mode)
+
+    def record_predictions(self, mode: str, risk_levels: Sequence[str], is_fraud: Sequence[bool]) -> None:
+        """Contar predicciones y fraudes (agrupados por nivel de riesgo)."""
+        counts: Dict[str, List[int]] = {}
+        for level, flag in zip(risk_levels, is_fraud):
+            entry = counts.setdefault(level, [0, 0])
+            entry[0] += 1
+            entry[1] += bool(flag)
+        for level, (n, frauds) in counts.items():
+            self.predictions.inc(mode, level, amount=n)
+            if frauds:
+                self.frauds.inc(level, amount=frauds)
+
+    def record_request(self, route: str, method: str, status: int, seconds: float) -> None:
+        status_label = str(status)
+        self.requests.inc(route, method, status_label)
+        self.latency.observe(seconds, route, method)
+        if status >= 500:
+            self.errors.inc(route, status_label)
+
+    def summary(self) -> Dict[str, float]:
+        """Totales para /api/v1/monitoring/metrics (JSON)."""
+        predictions = sum(self.predictions.totals().values())
+        frauds = sum(self.frauds.totals().values())
+        latency = [totals for labels, totals in self.latency.totals().items()
+                   if labels[0].startswith("/api/v1/predict")]
+        count = sum(n for n, _ in latency)
+        return {
+            "predictions_total": int(predictions),
+            "predictions_fraud": int(frauds),
+            "avg_latency_ms": round(1000 * sum(total for _, total in latency) / count, 3) if count else None,
+        }
+
+
+class _Collector:
+    """Arma las familias Prometheus a partir de los shards en cada scrape."""
+
+    def __init__(self, metrics: FraudMetrics):
+        self.metrics = metrics
+
+    def collect(self):
+        m = self.metrics
+        for metric in (m.requests, m.errors, m.latency, m.stages, m.predictions, m.frauds, m.batch_size):
+            yield metric.collect()
+
+        predictions = sum(m.predictions.totals().values())
+        frauds = sum(m.frauds.totals().values())
+        yield GaugeMetricFamily("fraud_detection_fraud_count", "Fraudes detectados desde el arranque", frauds)
+        yield GaugeMetricFamily(
+            "fraud_detection_fraud_rate", "Fraudes / predicciones desde el arranque",
+            frauds / predictions if predictions else 0.0)
+        yield GaugeMetricFamily("fraud_detection_start_time", "Epoch de arranque de la API", m.start_time)
+        for name, (documentation, fn) in m.gauges.items():
+            yield GaugeMetricFamily(name, documentation, float(fn()))
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI puro: latencia y status por plantilla de ruta
+    (``scope["route"]`` lo fija el router de Starlette al resolver la ruta).
+    """
+
+    def __init__(self, app, metrics: Callable[[], FraudMetrics]):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = getattr(scope.get("route"), "path", "unmatched")
+            self.metrics().record_request(route, scope["method"], status, time.perf_counter() - start)
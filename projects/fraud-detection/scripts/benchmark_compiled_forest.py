@@ -0,0 +1,105 @@
+"""
+============================================================================
+benchmark_compiled_forest.py - predict_proba vs RandomForest compilado
+============================================================================
+Compara, para batches de 1, 32 y 1000 transacciones:
+- ``RandomForestClassifier.predict_proba`` sobre un DataFrame (como la API)
+- CompiledForest (api/compiled_forest.py) sobre la misma matriz
+
+y verifica que las probabilidades coinciden (tolerancia 1e-9). Con árboles
+profundos el loop en Cython de sklearn vuelve a ganar en batches grandes;
+por eso la API delega los batches de más de MODEL_COMPILE_MAX_ROWS filas
+al estimador original.
+
+Con --model usa un modelo entrenado (.pkl); si no, entrena un bosque
+sintético con las 30 features de la API.
+
+Uso:
+    python scripts/benchmark_compiled_forest.py --n-estimators 100 --repeats 50
+    python scripts/benchmark_compiled_forest.py --model models/simple_fraud_model.pkl
+
+Autor: Ing. Daniel Varela Perez
+Email: bedaniele0@gmail.com
+Metodología: DVP-PRO
+============================================================================
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.datasets import make_classification
+from sklearn.ensemble import RandomForestClassifier
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from api.compiled_forest import CompiledForest  # noqa: E402
+
+FEATURE_COLUMNS = ['Time'] + [f'V{i}' for i in range(1, 29)] + ['Amount']
+BATCH_SIZES = (1, 32, 1000)
+
+
+def make_model(n_estimators: int, max_depth, seed: int = 42):
+    """Bosque sintético desbalanceado (~2% positivos) con las features de la API."""
+    X, y = make_classification(
+        n_samples=20000, n_features=len(FEATURE_COLUMNS), n_informative=12,
+        weights=[0.98], random_state=seed,
+    )
+    frame = pd.DataFrame(X, columns=FEATURE_COLUMNS)
+    model = RandomForestClassifier(
+        n_estimators=n_estimators, max_depth=max_depth, n_jobs=-1, random_state=seed
+    ).fit(frame, y)
+    return model, X
+
+
+def median_ms(fn, repeats: int) -> float:
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return 1000 * float(np.median(times))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark RandomForest compilado")
+    parser.add_argument("--model", default=None, help="Modelo .pkl (default: bosque sintético)")
+    parser.add_argument("--n-estimators", type=int, default=100)
+    parser.add_argument("--max-depth", type=int, default=None)
+    parser.add_argument("--repeats", type=int, default=30)
+    args = parser.parse_args()
+
+    if args.model:
+        model = joblib.load(args.model)
+        rng = np.random.default_rng(0)
+        X = rng.normal(size=(max(BATCH_SIZES), model.n_features_in_))
+    else:
+        model, X = make_model(args.n_estimators, args.max_depth)
+
+    start = time.perf_counter()
+    compiled = CompiledForest.from_estimator(model)
+    compile_s = time.perf_counter() - start
+    columns = getattr(model, "feature_names_in_", None)
+
+    print(f"Bosque: {compiled.n_estimators} árboles, {compiled.n_nodes:,} nodos, "
+          f"profundidad máx. {compiled.max_depth} (compilado en {compile_s:.2f}s)")
+    print(f"Verificación (probe de umbrales): max |diff| = {compiled.verify(model):.2e}")
+    print(f"{'batch':>6} {'sklearn ms':>12} {'compilado ms':>13} {'speedup':>8} {'max |diff|':>11}")
+
+    for size in BATCH_SIZES:
+        batch = X[:size]
+        frame = pd.DataFrame(batch, columns=columns) if columns is not None else batch
+        diff = compiled.verify(model, batch)
+        sklearn_ms = median_ms(lambda: model.predict_proba(frame), args.repeats)
+        compiled_ms = median_ms(lambda: compiled.compiled_proba(batch), args.repeats)
+        print(f"{size:>6} {sklearn_ms:>12.3f} {compiled_ms:>13.3f} "
+              f"{sklearn_ms / compiled_ms:>7.1f}x {diff:>11.1e}")
+
+
+if __name__ == "__main__":
+    main()
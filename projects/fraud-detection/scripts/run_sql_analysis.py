@@ -22,6 +22,9 @@ import sys
 from pathlib import Path
 import json
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.streaming.velocity import VelocityEngine  # noqa: E402
+
 # Configuraciones
 warnings.filterwarnings('ignore')
 plt.style.use('default')
@@ -161,44 +164,30 @@ def analyze_temporal_patterns(conn):
     return temporal_analysis
 
 def feature_engineering_analysis(conn):
-    """Feature engineering con window functions"""
+    """Feature engineering: velocidad en ventanas deslizantes y frecuencia por rangos"""
     print("\n⚡ ANÁLISIS DE VELOCIDAD DE TRANSACCIONES:")
 
-    velocity_query = """
-    WITH transaction_velocity AS (
-        SELECT
-            *,
-            COUNT(*) OVER (
-                ORDER BY Time
-                RANGE BETWEEN 3600 PRECEDING AND CURRENT ROW
-            ) as transactions_last_hour,
-            COUNT(*) OVER (
-                ORDER BY Time
-                RANGE BETWEEN 21600 PRECEDING AND CURRENT ROW
-            ) as transactions_last_6hours,
-            Time - LAG(Time, 1, Time) OVER (ORDER BY Time) as time_since_last
-        FROM transactions
-        ORDER BY Time
-        LIMIT 10000
+    # Ventanas exactas sobre todo el dataset con el motor de ventanas deslizantes
+    # (la window function RANGE de SQLite solo era viable con LIMIT 10000)
+    transactions = pd.read_sql_query(
+        "SELECT Time, Amount, Class FROM transactions ORDER BY Time", conn
     )
-    SELECT
-        Class,
-        CASE WHEN Class = 0 THEN 'Normal' ELSE 'Fraud' END as type,
-        ROUND(AVG(transactions_last_hour), 2) as avg_velocity_1h,
-        ROUND(AVG(transactions_last_6hours), 2) as avg_velocity_6h,
-        ROUND(AVG(time_since_last), 2) as avg_time_between,
-        COUNT(*) as total_transactions
-    FROM transaction_velocity
-    GROUP BY Class
-    ORDER BY Class;
-    """
-
-    try:
-        velocity_analysis = pd.read_sql_query(velocity_query, conn)
-        print(velocity_analysis)
-    except Exception as e:
-        print(f"⚠️ Error en análisis de velocidad (SQLite limitaciones): {str(e)[:100]}...")
-        print("Continuando con análisis simplificado...")
+    velocity = VelocityEngine().update_batch(transactions['Time'], transactions['Amount'])
+    transactions = transactions.assign(
+        transactions_last_hour=velocity['tx_count_1h'],
+        transactions_last_6hours=velocity['tx_count_6h'],
+        amount_last_24hours=velocity['amount_sum_24h'],
+        time_since_last=velocity['time_since_last'],
+    )
+    velocity_analysis = transactions.groupby('Class').agg(
+        avg_velocity_1h=('transactions_last_hour', 'mean'),
+        avg_velocity_6h=('transactions_last_6hours', 'mean'),
+        avg_amount_24h=('amount_last_24hours', 'mean'),
+        avg_time_between=('time_since_last', 'mean'),
+        total_transactions=('Class', 'size'),
+    ).round(2).reset_index()
+    velocity_analysis.insert(1, 'type', velocity_analysis['Class'].map({0: 'Normal', 1: 'Fraud'}))
+    print(velocity_analysis)
 
     # Análisis de frecuencia por rangos
     print("\n💵 ANÁLISIS DE FRECUENCIA POR RANGOS DE MONTO:")
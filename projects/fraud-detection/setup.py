@@ -75,6 +75,7 @@ setup(
             "python-jose[cryptography]>=3.3.0",
             "passlib[bcrypt]>=1.7.4",
             "python-multipart>=0.0.6",
+            "prometheus-client>=0.18.0",
         ],
         "all": [
             # Dev
@@ -16,8 +16,14 @@ from scipy import stats
 from typing import Dict, List, Tuple
 import logging
 
+from .drift_kernel import drift_frame
+
 logger = logging.getLogger(__name__)
 
+# ks_2samp(method='auto') usa la distribución exacta hasta este tamaño de
+# muestra (MAX_AUTO_N de scipy); por encima, la asintótica del kernel coincide
+KS_EXACT_MAX_N = 10000
+
 
 class FraudDriftDetector:
     """Detector de drift para fraud detection."""
@@ -103,6 +109,12 @@ class FraudDriftDetector:
         """
         Detecta drift en múltiples features.
 
+        PSI y estadístico KS salen del kernel matricial en una pasada. El
+        p-value exacto de KS no: con hasta KS_EXACT_MAX_N filas se recalcula
+        con ks_2samp feature por feature (scipy no expone la distribución
+        exacta de dos muestras para evaluarla en bloque), así que con muestras
+        chicas la ganancia del kernel se limita a PSI y al estadístico.
+
         Args:
             reference_data: DataFrame de referencia
             current_data: DataFrame actual
@@ -113,26 +125,41 @@ class FraudDriftDetector:
         """
         drift_report = {}
 
+        present = []
         for feature in features:
             if feature not in reference_data.columns or feature not in current_data.columns:
                 logger.warning(f"Feature {feature} not found in data")
                 continue
+            present.append(feature)
 
-            ref_values = reference_data[feature].dropna().values
-            cur_values = current_data[feature].dropna().values
+        if not present:
+            return drift_report
 
-            # Calcular PSI
-            psi = self.calculate_psi(ref_values, cur_values)
+        # PSI y KS de todas las features en una sola pasada matricial (mismos
+        # bins por percentiles que calculate_psi). El p-value del kernel es el
+        # asintótico; en muestras chicas se recalcula con ks_2samp exacto, un
+        # loop por feature (ver docstring)
+        metrics = drift_frame(reference_data, current_data, present, bins=10, smoothing='floor')
+
+        for feature, row in metrics.iterrows():
+            if row['n_reference'] == 0 or row['n_current'] == 0:
+                logger.warning(f"Feature {feature} has no values to compare")
+                continue
 
-            # Calcular KS test
-            ks_stat, p_value = self.calculate_ks_test(ref_values, cur_values)
+            psi = float(row['psi'])
+            p_value = float(row['ks_pvalue'])
+            if max(row['n_reference'], row['n_current']) <= KS_EXACT_MAX_N:
+                _, p_value = self.calculate_ks_test(
+                    reference_data[feature].dropna().values,
+                    current_data[feature].dropna().values
+                )
 
             # Determinar si hay drift
             drift_detected = psi > self.threshold_psi or p_value < self.threshold_ks
 
             drift_report[feature] = {
                 'psi': psi,
-                'ks_statistic': ks_stat,
+                'ks_statistic': float(row['ks_statistic']),
                 'ks_p_value': p_value,
                 'drift_detected': drift_detected,
                 'drift_severity': self._classify_drift_severity(psi)
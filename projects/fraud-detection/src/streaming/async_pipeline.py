@@ -0,0 +1,246 @@
+"""
+============================================================================
+async_pipeline.py - Pipeline de streaming asyncio con backpressure
+============================================================================
+Etapas productor/consumidor conectadas por colas acotadas:
+
+    lector (chunks) -> features -> scoring -> sink
+
+- Cada etapa corre su función síncrona en un hilo (``asyncio.to_thread``):
+  mientras scoring procesa el batch N, features ya prepara el N+1
+- Colas de ``queue_size`` batches: si una etapa se atrasa, las anteriores
+  se bloquean en ``put`` (backpressure) en lugar de acumular memoria
+- Ritmo de replay por event time (``Time``): ``speed=1`` reproduce el
+  stream en tiempo real, ``speed=60`` una hora por minuto y ``speed=None``
+  lo más rápido posible; los delays usan ``asyncio.sleep`` (no bloquean)
+- Estadísticas por etapa: batches, transacciones, tiempo ocupado, espera de
+  entrada, bloqueo por backpressure, throughput y profundidad de cola
+
+``throughput_tps`` de una etapa es transacciones / tiempo ocupado: la
+capacidad sostenible de esa etapa (p. ej. del scoring) sin importar el
+ritmo al que llegan los datos.
+
+Autor: Ing. Daniel Varela Perez
+Email: bedaniele0@gmail.com
+Tel: +52 55 4189 3428
+Metodología: DVP-PRO
+============================================================================
+"""
+
+import asyncio
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+import pandas as pd
+
+# Fin del stream (se propaga por todas las colas)
+_END = object()
+
+
+class StageStats:
+    """Contadores de una etapa del pipeline."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.batches = 0
+        self.transactions = 0
+        self.busy_seconds = 0.0      # dentro de la función de la etapa
+        self.starved_seconds = 0.0   # esperando input
+        self.blocked_seconds = 0.0   # esperando lugar en la cola de salida
+        self.queue_samples = 0
+        self.queue_depth_total = 0
+        self.queue_depth_max = 0
+
+    def sample_queue(self, depth: int) -> None:
+        self.queue_samples += 1
+        self.queue_depth_total += depth
+        self.queue_depth_max = max(self.queue_depth_max, depth)
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        """
+        Args:
+            elapsed: Duración total del pipeline en segundos
+
+        Returns:
+            Dict: Contadores, throughput y profundidad de la cola de salida
+        """
+        return {
+            "batches": self.batches,
+            "transactions": self.transactions,
+            "busy_seconds": round(self.busy_seconds, 4),
+            "starved_seconds": round(self.starved_seconds, 4),
+            "blocked_seconds": round(self.blocked_seconds, 4),
+            "throughput_tps": round(self.transactions / self.busy_seconds, 1) if self.busy_seconds else None,
+            "utilization": round(self.busy_seconds / elapsed, 3) if elapsed else None,
+            "avg_output_queue_depth": (
+                round(self.queue_depth_total / self.queue_samples, 2) if self.queue_samples else 0.0
+            ),
+            "max_output_queue_depth": self.queue_depth_max,
+        }
+
+
+class AsyncStreamingPipeline:
+    """
+    Pipeline lector -> features -> scoring -> sink sobre colas acotadas.
+
+    Uso::
+
+        pipeline = AsyncStreamingPipeline(
+            source=pd.read_csv(path, chunksize=1000),
+            features=simulator.create_enhanced_batch,
+            score=score_batch,
+            sink=results.append,
+            speed=None,
+        )
+        report = asyncio.run(pipeline.run())
+    """
+
+    STAGES = ("reader", "features", "scoring", "sink")
+
+    def __init__(self,
+                 source: Iterable[pd.DataFrame],
+                 features: Callable[[pd.DataFrame], pd.DataFrame],
+                 score: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None,
+                 sink: Optional[Callable[[pd.DataFrame], Any]] = None,
+                 queue_size: int = 4,
+                 speed: Optional[float] = None,
+                 arrival_delay: Optional[Callable[[], float]] = None,
+                 time_column: str = "Time"):
+        """
+        Args:
+            source: Iterable de batches (DataFrame) en orden de ``time_column``
+            features: Feature engineering de un batch
+            score: Scoring de un batch (None = sin etapa de scoring)
+            sink: Consumidor final de cada batch (None = descartar)
+            queue_size: Batches máximos en cada cola entre etapas
+            speed: Segundos de event time por segundo real (None o 0 = lo más
+                rápido posible)
+            arrival_delay: Segundos extra por batch antes de entregarlo
+                (latencia de red simulada); se ignora con ``speed=None``
+            time_column: Columna de event time para el ritmo de replay
+        """
+        if queue_size < 1:
+            raise ValueError(f"queue_size must be >= 1, got {queue_size}")
+        if speed is not None and speed < 0:
+            raise ValueError(f"speed must be positive or None, got {speed}")
+        self.source = source
+        self.features = features
+        self.score = score
+        self.sink = sink
+        self.queue_size = queue_size
+        self.speed = speed or None
+        self.arrival_delay = arrival_delay
+        self.time_column = time_column
+        self.stats = {name: StageStats(name) for name in self.STAGES}
+        self.elapsed = 0.0
+
+    async def run(self, max_batches: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Ejecutar el pipeline hasta agotar ``source`` (o ``max_batches``).
+
+        Returns:
+            Dict: Reporte de ``report()``
+        """
+        features_in = asyncio.Queue(self.queue_size)
+        scoring_in = asyncio.Queue(self.queue_size)
+        sink_in = asyncio.Queue(self.queue_size)
+        if self.score is None:
+            scoring_in = sink_in
+
+        start = time.perf_counter()
+        tasks = [
+            asyncio.ensure_future(self._reader(features_in, start, max_batches)),
+            asyncio.ensure_future(self._stage("features", self.features, features_in, scoring_in)),
+            asyncio.ensure_future(self._stage("sink", self.sink, sink_in, None)),
+        ]
+        if self.score is not None:
+            tasks.append(asyncio.ensure_future(self._stage("scoring", self.score, scoring_in, sink_in)))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            # Si una etapa falla, las demás no deben quedar bloqueadas en una cola
+            for task in tasks:
+                task.cancel()
+            self.elapsed = time.perf_counter() - start
+        return self.report()
+
+    async def _put(self, stage: StageStats, queue: asyncio.Queue, item: Any) -> None:
+        started = time.perf_counter()
+        await queue.put(item)
+        stage.blocked_seconds += time.perf_counter() - started
+        if item is not _END:
+            stage.sample_queue(queue.qsize())
+
+    async def _reader(self, output: asyncio.Queue, start: float, max_batches: Optional[int]) -> None:
+        stats = self.stats["reader"]
+        iterator = iter(self.source)
+        first_time = None
+        reading = False
+        try:
+            while max_batches is None or stats.batches < max_batches:
+                started = time.perf_counter()
+                reading = True
+                batch = await asyncio.to_thread(next, iterator, _END)
+                reading = False
+                stats.busy_seconds += time.perf_counter() - started
+                if batch is _END:
+                    break
+
+                if self.speed is not None and len(batch):
+                    # Esperar a que el primer evento del batch "ocurra" en tiempo real
+                    batch_time = float(batch[self.time_column].iloc[0])
+                    first_time = batch_time if first_time is None else first_time
+                    delay = (batch_time - first_time) / self.speed - (time.perf_counter() - start)
+                    if self.arrival_delay is not None:
+                        delay = max(delay, 0.0) + self.arrival_delay()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+
+                stats.batches += 1
+                stats.transactions += len(batch)
+                await self._put(stats, output, batch)
+        finally:
+            # Liberar el source (p. ej. el memory map de ArrowBatchSource) al
+            # cortar en max_batches o ante un error; si la cancelación llegó
+            # durante un next() en curso, el generador sigue ejecutándose en
+            # su hilo y no se puede cerrar
+            close = getattr(iterator, "close", None)
+            if close is not None and not reading:
+                close()
+        await output.put(_END)
+
+    async def _stage(self,
+                     name: str,
+                     fn: Optional[Callable[[pd.DataFrame], Any]],
+                     source: asyncio.Queue,
+                     output: Optional[asyncio.Queue]) -> None:
+        stats = self.stats[name]
+        while True:
+            waited = time.perf_counter()
+            batch = await source.get()
+            stats.starved_seconds += time.perf_counter() - waited
+            if batch is _END:
+                break
+
+            started = time.perf_counter()
+            result = await asyncio.to_thread(fn, batch) if fn is not None else batch
+            stats.busy_seconds += time.perf_counter() - started
+            stats.batches += 1
+            stats.transactions += len(batch)
+            if output is not None:
+                await self._put(stats, output, result)
+        if output is not None:
+            await output.put(_END)
+
+    def report(self) -> Dict[str, Any]:
+        """Duración, throughput de punta a punta y estadísticas por etapa."""
+        delivered = self.stats["sink"].transactions
+        stages = [name for name in self.STAGES if name != "scoring" or self.score is not None]
+        return {
+            "elapsed_seconds": round(self.elapsed, 4),
+            "transactions": delivered,
+            "end_to_end_tps": round(delivered / self.elapsed, 1) if self.elapsed else None,
+            "speed": self.speed,
+            "queue_size": self.queue_size,
+            "stages": {name: self.stats[name].report(self.elapsed) for name in stages},
+        }
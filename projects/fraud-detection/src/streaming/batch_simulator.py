@@ -11,6 +11,7 @@ Tel: +52 55 4189 3428
 Fecha: 2025-09-24
 """
 
+import argparse
 import pandas as pd
 import dask.dataframe as dd
 import numpy as np
@@ -20,6 +21,7 @@ from datetime import datetime, timedelta
 from pathlib import Path
 import json
 import pickle
+import asyncio
 from typing import Generator, Dict, List, Tuple, Optional
 import logging
 import sys
@@ -28,6 +30,19 @@ import os
 # Agregar paths para imports
 sys.path.append(str(Path(__file__).parent.parent / 'utils'))
 
+try:
+    from .async_pipeline import AsyncStreamingPipeline
+    from .ingestion import open_transactions
+    from .velocity import VelocityEngine
+except ImportError:  # ejecutado como script (python batch_simulator.py)
+    from async_pipeline import AsyncStreamingPipeline
+    from ingestion import open_transactions
+    from velocity import VelocityEngine
+
+# Features que espera el modelo de la API (fallback si no trae feature_names_in_)
+MODEL_FEATURES = ['Time'] + [f'V{i}' for i in range(1, 29)] + ['Amount']
+
+
 class BatchSimulator:
     """
     Simulador de procesamiento en batches para detección de fraude
@@ -41,7 +56,9 @@ class BatchSimulator:
                  batch_size: int = 1000,
                  delay_seconds: float = 1.0,
                  random_delays: bool = True,
-                 fraud_boost_factor: float = 2.0):
+                 fraud_boost_factor: float = 2.0,
+                 velocity_state_path: Optional[str] = None,
+                 arrow_path: Optional[str] = None):
         """
         Inicializa el simulador de batches
 
@@ -51,6 +68,10 @@ class BatchSimulator:
             delay_seconds: Delay base entre batches
             random_delays: Si aplicar delays aleatorios
             fraud_boost_factor: Factor para aumentar fraudes en ciertos batches
+            velocity_state_path: Snapshot JSON del motor de velocidad; si existe se
+                retoma al iniciar y se actualiza al terminar la simulación
+            arrow_path: Destino del Arrow IPC convertido (default: data_path con
+                extensión .arrow)
         """
         self.data_path = data_path
         self.batch_size = batch_size
@@ -61,8 +82,9 @@ class BatchSimulator:
         # Configurar logging
         self.setup_logging()
 
-        # Cargar y preparar datos
-        self.df = None
+        # Cargar y preparar datos (batches por memory map, ver load_data)
+        self.arrow_path = arrow_path
+        self.source = None
         self.current_batch = 0
         self.total_batches = 0
         self.processed_transactions = 0
@@ -72,6 +94,14 @@ class BatchSimulator:
         self.batch_processing_times = []
         self.simulation_start_time = None
 
+        # Ventanas de velocidad en event time (persisten entre batches)
+        self.velocity_state_path = velocity_state_path
+        if velocity_state_path and Path(velocity_state_path).exists():
+            self.velocity = VelocityEngine.load(velocity_state_path)
+            self.logger.info(f"Estado de velocidad retomado: {self.velocity.events:,} eventos previos")
+        else:
+            self.velocity = VelocityEngine()
+
         # Cargar pipeline si existe
         self.scaler = None
         self.feature_columns = None
@@ -119,23 +149,24 @@ class BatchSimulator:
             self.logger.warning(f"No se pudieron cargar componentes del pipeline: {e}")
 
     def load_data(self):
-        """Carga y prepara el dataset para simulación"""
-        self.logger.info("Cargando dataset...")
+        """
+        Prepara el dataset para simulación: la primera vez convierte el CSV
+        a Arrow IPC ordenado por Time (ver ingestion.py); después los batches
+        se leen por memory map sin cargar el dataset completo
+        """
+        self.logger.info("Preparando dataset...")
 
         try:
-            self.df = pd.read_csv(self.data_path)
-            self.logger.info(f"Dataset cargado: {len(self.df):,} transacciones")
-
-            # Ordenar por tiempo para simulación realista
-            self.df = self.df.sort_values('Time').reset_index(drop=True)
+            self.source = open_transactions(self.data_path, self.batch_size, arrow_path=self.arrow_path)
+            self.logger.info(f"Dataset listo: {self.source.num_rows:,} transacciones ({self.source.path})")
 
             # Calcular batches
-            self.total_batches = (len(self.df) - 1) // self.batch_size + 1
+            self.total_batches = len(self.source)
             self.logger.info(f"Total batches a procesar: {self.total_batches}")
 
             # Estadísticas iniciales
-            fraud_count = self.df['Class'].sum()
-            fraud_rate = fraud_count / len(self.df) * 100
+            fraud_count = int(self.source.column_sum('Class'))
+            fraud_rate = fraud_count / self.source.num_rows * 100 if self.source.num_rows else 0
             self.logger.info(f"Fraudes en dataset: {fraud_count:,} ({fraud_rate:.4f}%)")
 
             return True
@@ -183,11 +214,14 @@ class BatchSimulator:
                 batch_enhanced['V_sum_first5'] = batch_enhanced[v_cols].sum(axis=1)
                 batch_enhanced['V_mean_first5'] = batch_enhanced[v_cols].mean(axis=1)
 
-            # Features de velocidad (aproximados dentro del batch)
-            batch_enhanced['time_since_last'] = batch_enhanced['Time'].diff().fillna(0)
-            batch_enhanced['transactions_in_hour'] = batch_enhanced.groupby(
-                batch_enhanced['hour_from_start'].astype(int)
-            ).transform('count')['Amount']
+            # Features de velocidad: ventanas 1h/6h/24h en event time, con estado
+            # entre batches (no se reinician en cada frontera de batch)
+            velocity = self.velocity.update_batch(
+                batch_enhanced['Time'].to_numpy(), batch_enhanced['Amount'].to_numpy()
+            )
+            for name, values in velocity.items():
+                batch_enhanced[name] = values
+            batch_enhanced['transactions_in_hour'] = batch_enhanced['tx_count_1h']
 
             # Agregar timestamp de procesamiento
             batch_enhanced['processing_timestamp'] = datetime.now().isoformat()
@@ -199,12 +233,15 @@ class BatchSimulator:
             self.logger.error(f"Error en feature engineering del batch: {e}")
             return batch_df
 
-    def simulate_real_time_variations(self, batch_df: pd.DataFrame) -> pd.DataFrame:
+    def simulate_real_time_variations(self, batch_df: pd.DataFrame,
+                                      simulate_latency: bool = True) -> pd.DataFrame:
         """
         Simula variaciones que podrían ocurrir en tiempo real
 
         Args:
             batch_df: Batch de datos
+            simulate_latency: Si dormir la latencia de red aquí (el pipeline
+                asyncio la aplica sin bloquear en su lector)
 
         Returns:
             pd.DataFrame: Batch con variaciones simuladas
@@ -223,9 +260,8 @@ class BatchSimulator:
                 self.logger.warning(f"Simulando datos faltantes en {missing_cols}")
 
             # Simular latencia de red (afecta timestamp)
-            if self.random_delays:
-                network_latency = random.uniform(0.1, 2.0)  # 0.1 a 2 segundos
-                time.sleep(network_latency)
+            if self.random_delays and simulate_latency:
+                time.sleep(self.network_latency())
 
             # Simular duplicados ocasionales (muy raro, 0.1%)
             if random.random() < 0.001:
@@ -240,6 +276,10 @@ class BatchSimulator:
             self.logger.error(f"Error simulando variaciones: {e}")
             return batch_df
 
+    def network_latency(self) -> float:
+        """Latencia de red simulada por batch (0.1 a 2 segundos)"""
+        return random.uniform(0.1, 2.0)
+
     def process_batch(self, batch_df: pd.DataFrame) -> Dict:
         """
         Procesa un batch de transacciones
@@ -259,56 +299,13 @@ class BatchSimulator:
             # Simular variaciones de tiempo real
             batch_final = self.simulate_real_time_variations(batch_enhanced)
 
-            # Estadísticas del batch
-            fraud_count = batch_final['Class'].sum()
-            normal_count = len(batch_final) - fraud_count
-            fraud_rate = fraud_count / len(batch_final) * 100 if len(batch_final) > 0 else 0
-
-            # Detectar anomalías simuladas
-            high_value_txns = (batch_final['Amount'] > 1000).sum()
-            zero_amount_txns = (batch_final['Amount'] == 0).sum()
-            extreme_values = (abs(batch_final.get('amount_zscore_global', 0)) > 3).sum()
-
-            # Aplicar normalización si está disponible
-            normalized_features = None
-            if self.scaler and self.feature_columns:
-                try:
-                    available_features = [col for col in self.feature_columns if col in batch_final.columns]
-                    if available_features:
-                        normalized_features = self.scaler.transform(batch_final[available_features])
-                except Exception as e:
-                    self.logger.warning(f"Error aplicando normalización: {e}")
-
-            # Calcular tiempo de procesamiento
-            processing_time = time.time() - batch_start_time
-            self.batch_processing_times.append(processing_time)
-
-            # Actualizar estadísticas globales
-            self.processed_transactions += len(batch_final)
-            self.processed_frauds += fraud_count
-
-            # Resultados del batch
-            results = {
-                'batch_id': self.current_batch,
-                'timestamp': datetime.now().isoformat(),
-                'transactions_processed': len(batch_final),
-                'fraud_count': fraud_count,
-                'normal_count': normal_count,
-                'fraud_rate_percent': fraud_rate,
-                'processing_time_seconds': processing_time,
-                'features_created': len(batch_enhanced.columns) - len(batch_df.columns),
-                'anomalies_detected': {
-                    'high_value': high_value_txns,
-                    'zero_amount': zero_amount_txns,
-                    'extreme_values': extreme_values
-                },
-                'data_quality': {
-                    'missing_values': batch_final.isnull().sum().sum(),
-                    'duplicates': len(batch_final) - len(batch_final.drop_duplicates())
-                }
-            }
-
-            return results
+            # Normalización/scoring y estadísticas del batch
+            batch_final = self.score_batch(batch_final)
+            return self.summarize_batch(
+                batch_final,
+                features_created=len(batch_enhanced.columns) - len(batch_df.columns),
+                processing_time=time.time() - batch_start_time
+            )
 
         except Exception as e:
             self.logger.error(f"Error procesando batch {self.current_batch}: {e}")
@@ -318,6 +315,86 @@ class BatchSimulator:
                 'timestamp': datetime.now().isoformat()
             }
 
+    def score_batch(self, batch_df: pd.DataFrame, model=None) -> pd.DataFrame:
+        """
+        Normaliza el batch con el scaler del pipeline y, si hay modelo, agrega
+        la probabilidad de fraude
+
+        Args:
+            batch_df: Batch con features
+            model: Clasificador con predict_proba (opcional)
+
+        Returns:
+            pd.DataFrame: Batch con 'fraud_probability' si se pasó modelo
+        """
+        # Aplicar normalización si está disponible
+        if self.scaler and self.feature_columns:
+            try:
+                available_features = [col for col in self.feature_columns if col in batch_df.columns]
+                if available_features:
+                    self.scaler.transform(batch_df[available_features])
+            except Exception as e:
+                self.logger.warning(f"Error aplicando normalización: {e}")
+
+        if model is not None and len(batch_df):
+            columns = list(getattr(model, 'feature_names_in_', MODEL_FEATURES))
+            batch_df = batch_df.copy()
+            batch_df['fraud_probability'] = model.predict_proba(batch_df[columns].fillna(0))[:, 1]
+        return batch_df
+
+    def summarize_batch(self, batch_final: pd.DataFrame, features_created: int,
+                        processing_time: float) -> Dict:
+        """
+        Estadísticas de un batch procesado (actualiza los contadores globales)
+
+        Args:
+            batch_final: Batch ya enriquecido (y opcionalmente con scoring)
+            features_created: Columnas agregadas por el feature engineering
+            processing_time: Segundos de procesamiento del batch
+
+        Returns:
+            Dict: Resultados del batch
+        """
+        fraud_count = batch_final['Class'].sum()
+        normal_count = len(batch_final) - fraud_count
+        fraud_rate = fraud_count / len(batch_final) * 100 if len(batch_final) > 0 else 0
+
+        # Detectar anomalías simuladas
+        high_value_txns = (batch_final['Amount'] > 1000).sum()
+        zero_amount_txns = (batch_final['Amount'] == 0).sum()
+        extreme_values = (abs(batch_final.get('amount_zscore_global', 0)) > 3).sum()
+
+        self.batch_processing_times.append(processing_time)
+
+        # Actualizar estadísticas globales
+        self.processed_transactions += len(batch_final)
+        self.processed_frauds += fraud_count
+
+        # Resultados del batch
+        results = {
+            'batch_id': batch_final.attrs.get('batch_id', self.current_batch),
+            'timestamp': datetime.now().isoformat(),
+            'transactions_processed': len(batch_final),
+            'fraud_count': fraud_count,
+            'normal_count': normal_count,
+            'fraud_rate_percent': fraud_rate,
+            'processing_time_seconds': processing_time,
+            'features_created': features_created,
+            'anomalies_detected': {
+                'high_value': high_value_txns,
+                'zero_amount': zero_amount_txns,
+                'extreme_values': extreme_values
+            },
+            'data_quality': {
+                'missing_values': batch_final.isnull().sum().sum(),
+                'duplicates': len(batch_final) - len(batch_final.drop_duplicates())
+            }
+        }
+        if 'fraud_probability' in batch_final.columns:
+            results['fraud_alerts'] = int((batch_final['fraud_probability'] >= 0.5).sum())
+
+        return results
+
     def run_simulation(self, max_batches: Optional[int] = None) -> Generator[Dict, None, None]:
         """
         Ejecuta la simulación de procesamiento en batches
@@ -328,7 +405,7 @@ class BatchSimulator:
         Yields:
             Dict: Resultados de cada batch procesado
         """
-        if self.df is None:
+        if self.source is None:
             if not self.load_data():
                 return
 
@@ -340,14 +417,11 @@ class BatchSimulator:
         batches_to_process = min(max_batches or float('inf'), self.total_batches)
 
         try:
-            for batch_idx in range(int(batches_to_process)):
+            for batch_idx, batch_df in enumerate(self.source):
+                if batch_idx >= batches_to_process:
+                    break
                 self.current_batch = batch_idx + 1
 
-                # Obtener batch actual
-                start_idx = batch_idx * self.batch_size
-                end_idx = min(start_idx + self.batch_size, len(self.df))
-                batch_df = self.df.iloc[start_idx:end_idx].copy()
-
                 # Procesar batch
                 batch_results = self.process_batch(batch_df)
 
@@ -376,8 +450,91 @@ class BatchSimulator:
         except Exception as e:
             self.logger.error(f"Error en simulación: {e}")
         finally:
+            if self.velocity_state_path:
+                self.velocity.save(self.velocity_state_path)
             self.generate_final_report()
 
+    async def run_pipeline(self,
+                           max_batches: Optional[int] = None,
+                           speed: Optional[float] = None,
+                           queue_size: int = 4,
+                           model=None,
+                           on_result=None) -> Dict:
+        """
+        Simulación como pipeline asyncio: lector por chunks -> features ->
+        scoring -> sink, conectados por colas acotadas (ver async_pipeline.py)
+
+        Los batches salen del Arrow IPC ordenado por Time (load_data) y los
+        delays no bloquean el procesamiento.
+
+        Args:
+            max_batches: Número máximo de batches (None para todos)
+            speed: Segundos de event time por segundo real (None = lo más rápido posible)
+            queue_size: Batches máximos en cada cola entre etapas
+            model: Clasificador con predict_proba para la etapa de scoring (opcional)
+            on_result: Callback con el Dict de resultados de cada batch
+
+        Returns:
+            Dict: Reporte del pipeline (throughput y colas por etapa) y 'results'
+        """
+        if self.source is None and not self.load_data():
+            return {'error': f"No se pudo cargar {self.data_path}"}
+        results = []
+
+        def features(batch_df: pd.DataFrame) -> pd.DataFrame:
+            self.current_batch += 1
+            batch_enhanced = self.create_enhanced_batch(batch_df)
+            batch_final = self.simulate_real_time_variations(batch_enhanced, simulate_latency=False)
+            batch_final.attrs.update(
+                batch_id=self.current_batch,
+                features_created=len(batch_enhanced.columns) - len(batch_df.columns),
+                started=time.perf_counter()
+            )
+            return batch_final
+
+        def sink(batch_final: pd.DataFrame) -> None:
+            result = self.summarize_batch(
+                batch_final,
+                features_created=batch_final.attrs['features_created'],
+                processing_time=time.perf_counter() - batch_final.attrs['started']
+            )
+            results.append(result)
+            if on_result is not None:
+                on_result(result)
+
+        pipeline = AsyncStreamingPipeline(
+            source=self.source,
+            features=features,
+            score=lambda batch_df: self.score_batch(batch_df, model),
+            sink=sink,
+            queue_size=queue_size,
+            speed=speed,
+            arrival_delay=self.network_latency if self.random_delays else None
+        )
+
+        self.simulation_start_time = time.time()
+        self.current_batch = 0
+        self.logger.info(f"Iniciando pipeline asyncio (speed={speed or 'max'}, queue_size={queue_size})...")
+        try:
+            report = await pipeline.run(max_batches)
+        finally:
+            if self.velocity_state_path:
+                self.velocity.save(self.velocity_state_path)
+            self.generate_final_report()
+
+        for name, stage in report['stages'].items():
+            self.logger.info(
+                f"Etapa {name}: {stage['transactions']:,} txns, "
+                f"{stage['throughput_tps']} txns/s ocupada, "
+                f"cola máx. {stage['max_output_queue_depth']}"
+            )
+        report['results'] = results
+        return report
+
+    def run_pipeline_simulation(self, **kwargs) -> Dict:
+        """Versión síncrona de run_pipeline (asyncio.run)"""
+        return asyncio.run(self.run_pipeline(**kwargs))
+
     def generate_final_report(self):
         """Genera reporte final de la simulación"""
         if self.simulation_start_time is None:
@@ -415,6 +572,13 @@ def main():
     print("📱 Tel: +52 55 4189 3428")
     print("=" * 60)
 
+    parser = argparse.ArgumentParser(description="Simulador de batches")
+    parser.add_argument("--pipeline", action="store_true", help="Pipeline asyncio con backpressure")
+    parser.add_argument("--speed", type=float, default=None,
+                        help="Segundos de event time por segundo real (default: lo más rápido posible)")
+    parser.add_argument("--max-batches", type=int, default=20)
+    args = parser.parse_args()
+
     # Configuración del simulador
     data_path = '../../data/raw/creditcard.csv'
 
@@ -433,6 +597,17 @@ def main():
     )
 
     print(f"✅ Simulador inicializado")
+
+    if args.pipeline:
+        print(f"🎯 Pipeline asyncio (speed={args.speed or 'max'}) con batches de 500 transacciones...")
+        report = simulator.run_pipeline_simulation(max_batches=args.max_batches, speed=args.speed)
+        print(f"📊 {report['transactions']:,} txns en {report['elapsed_seconds']:.2f}s "
+              f"({report['end_to_end_tps']} txns/s de punta a punta)")
+        for name, stage in report['stages'].items():
+            print(f"   {name:>8}: {stage['throughput_tps']} txns/s ocupada, "
+                  f"utilización {stage['utilization']}, cola máx. {stage['max_output_queue_depth']}")
+        return
+
     print(f"🎯 Ejecutando simulación con batches de 500 transacciones...")
 
     # Ejecutar simulación (máximo 20 batches para demo)
@@ -440,7 +615,7 @@ def main():
     fraud_alerts = 0
 
     try:
-        for result in simulator.run_simulation(max_batches=20):
+        for result in simulator.run_simulation(max_batches=args.max_batches):
             batch_count += 1
 
             if 'error' in result:
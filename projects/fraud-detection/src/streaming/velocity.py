@@ -0,0 +1,317 @@
+"""
+============================================================================
+velocity.py - Features de velocidad por ventanas deslizantes en event time
+============================================================================
+Conteo de transacciones y suma de montos en ventanas de 1h / 6h / 24h sobre
+el tiempo del evento (columna ``Time``), con estado que persiste entre
+batches en lugar de reiniciarse en cada uno:
+
+- Por llave (``"global"`` por default, o una tarjeta/cuenta) se guarda un
+  buffer con los eventos de la ventana más larga
+- Cada ventana tiene un puntero al evento más viejo que todavía cubre y una
+  suma acumulada: al llegar un evento el puntero solo avanza (two-pointer),
+  así que cada evento entra y sale una vez por ventana -> O(1) amortizado
+- Montos en centavos enteros: las sumas no acumulan error de punto flotante
+- ``snapshot`` / ``from_snapshot`` (y ``save`` / ``load`` en JSON) para
+  retomar tras un reinicio sin reprocesar la historia
+
+Semántica de cada ventana ``w``: eventos con ``t - w <= Time <= t``,
+incluyendo la transacción actual (igual que ``RANGE BETWEEN w PRECEDING AND
+CURRENT ROW`` en scripts/run_sql_analysis.py, salvo empates posteriores que
+en streaming todavía no llegaron). Un evento que llega con ``Time`` menor
+al último visto para su llave se cuenta con el último ``Time`` (se registra
+en ``late_events``). Un ``Time`` NaN o infinito se rechaza con ValueError
+antes de tocar el estado.
+
+Autor: Ing. Daniel Varela Perez
+Email: bedaniele0@gmail.com
+Tel: +52 55 4189 3428
+Metodología: DVP-PRO
+============================================================================
+"""
+
+import json
+import math
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+
+# Ventanas default: etiqueta -> segundos
+DEFAULT_WINDOWS = {"1h": 3600, "6h": 21600, "24h": 86400}
+GLOBAL_KEY = "global"
+SNAPSHOT_VERSION = 1
+
+
+class _KeyState:
+    """Buffer de eventos y punteros por ventana de una llave."""
+
+    __slots__ = ("times", "amounts", "base", "starts", "sums", "seen", "last_time")
+
+    def __init__(self, n_windows: int):
+        self.times: List[float] = []
+        self.amounts: List[int] = []
+        self.base = 0                     # número absoluto del evento en times[0]
+        self.starts = [0] * n_windows     # primer evento (absoluto) dentro de cada ventana
+        self.sums = [0] * n_windows       # centavos dentro de cada ventana
+        self.seen = 0                     # eventos totales de la llave
+        self.last_time: Optional[float] = None
+
+    def compact(self) -> None:
+        """Descartar los eventos que ya salieron de todas las ventanas."""
+        drop = min(self.starts) - self.base
+        if drop:
+            del self.times[:drop]
+            del self.amounts[:drop]
+            self.base += drop
+
+
+class VelocityEngine:
+    """
+    Motor de features de velocidad con estado entre batches.
+
+    Uso::
+
+        engine = VelocityEngine()
+        features = engine.update(time=406.0, amount=378.66)
+        features["tx_count_1h"], features["amount_sum_24h"]
+    """
+
+    def __init__(self, windows: Optional[Dict[str, float]] = None, amount_decimals: int = 2):
+        """
+        Args:
+            windows: etiqueta -> duración en segundos (default 1h, 6h y 24h)
+            amount_decimals: Decimales con que se acumulan los montos
+        """
+        windows = dict(DEFAULT_WINDOWS if windows is None else windows)
+        if not windows:
+            raise ValueError("At least one window is required")
+        if any(seconds <= 0 for seconds in windows.values()):
+            raise ValueError(f"Window lengths must be positive, got {windows}")
+        self.windows = windows
+        self.labels = list(windows)
+        self.lengths = [float(windows[label]) for label in self.labels]
+        self.amount_decimals = amount_decimals
+        self._scale = 10 ** amount_decimals
+        self._states: Dict[str, _KeyState] = {}
+        self.events = 0
+        self.late_events = 0
+
+    @property
+    def feature_names(self) -> List[str]:
+        """Columnas que producen ``update`` / ``update_batch``."""
+        return (["time_since_last"]
+                + [f"tx_count_{label}" for label in self.labels]
+                + [f"amount_sum_{label}" for label in self.labels])
+
+    @property
+    def n_keys(self) -> int:
+        return len(self._states)
+
+    def update(self, time: float, amount: float, key: str = GLOBAL_KEY) -> Dict[str, float]:
+        """
+        Registrar una transacción y devolver sus features de velocidad.
+
+        Args:
+            time: Tiempo del evento en segundos (``Time`` del dataset)
+            amount: Monto de la transacción
+            key: Llave de agregación (tarjeta, cuenta; default global)
+
+        Returns:
+            Dict: time_since_last, tx_count_<ventana> y amount_sum_<ventana>
+
+        Raises:
+            ValueError: Si ``time`` no es finito
+        """
+        time_since_last, counts, sums = self._push(key, float(time), float(amount))
+        features = {"time_since_last": time_since_last}
+        for label, count in zip(self.labels, counts):
+            features[f"tx_count_{label}"] = count
+        for label, total in zip(self.labels, sums):
+            features[f"amount_sum_{label}"] = total / self._scale
+        return features
+
+    def update_batch(self,
+                     times: Sequence[float],
+                     amounts: Sequence[float],
+                     keys: Optional[Iterable[str]] = None) -> Dict[str, np.ndarray]:
+        """
+        Registrar un batch en orden y devolver las features por columna.
+
+        Args:
+            times: Tiempos de los eventos (en el orden de llegada)
+            amounts: Montos
+            keys: Llave por evento (None = todas en la llave global)
+
+        Returns:
+            Dict: nombre de feature -> arreglo con un valor por evento
+
+        Raises:
+            ValueError: Si algún tiempo no es finito (no se registra ningún evento)
+        """
+        times = np.asarray(times, dtype=np.float64)
+        amounts = np.asarray(amounts, dtype=np.float64)
+        if not np.isfinite(times).all():
+            bad = int((~np.isfinite(times)).sum())
+            raise ValueError(f"Event times must be finite; got {bad} NaN/inf value(s)")
+        n = len(times)
+        n_windows = len(self.labels)
+        since = np.zeros(n)
+        counts = np.zeros((n, n_windows), dtype=np.int64)
+        sums = np.zeros((n, n_windows), dtype=np.int64)
+
+        key_iter = iter(keys) if keys is not None else None
+        push = self._push
+        for i, (t, amount) in enumerate(zip(times.tolist(), amounts.tolist())):
+            key = next(key_iter) if key_iter is not None else GLOBAL_KEY
+            since[i], counts[i], sums[i] = push(key, t, amount)
+
+        features = {"time_since_last": since}
+        for j, label in enumerate(self.labels):
+            features[f"tx_count_{label}"] = counts[:, j]
+        for j, label in enumerate(self.labels):
+            features[f"amount_sum_{label}"] = sums[:, j] / self._scale
+        return features
+
+    def _push(self, key: str, time: float, amount: float):
+        # NaN/inf romperían para siempre el orden de la llave (y los punteros)
+        if not math.isfinite(time):
+            raise ValueError(f"Event time must be finite, got {time}")
+        state = self._states.get(key)
+        if state is None:
+            state = self._states[key] = _KeyState(len(self.labels))
+
+        if state.last_time is None:
+            time_since_last = 0.0
+        elif time < state.last_time:
+            self.late_events += 1
+            time, time_since_last = state.last_time, 0.0
+        else:
+            time_since_last = time - state.last_time
+        state.last_time = time
+
+        cents = int(round(amount * self._scale)) if amount == amount else 0  # NaN -> 0
+        state.times.append(time)
+        state.amounts.append(cents)
+        end = state.base + len(state.times)
+        self.events += 1
+        state.seen += 1
+
+        times, amounts, base = state.times, state.amounts, state.base
+        counts, sums = [], []
+        for j, length in enumerate(self.lengths):
+            start, total = state.starts[j], state.sums[j] + cents
+            cutoff = time - length
+            while times[start - base] < cutoff:
+                total -= amounts[start - base]
+                start += 1
+            state.starts[j], state.sums[j] = start, total
+            counts.append(end - start)
+            sums.append(total)
+
+        # Compactar cuando la basura al inicio supera la mitad del buffer
+        if 2 * (min(state.starts) - base) > len(times):
+            state.compact()
+        return time_since_last, counts, sums
+
+    def current(self, now: Optional[float] = None, key: str = GLOBAL_KEY) -> Dict[str, float]:
+        """
+        Conteos y sumas de las ventanas que terminan en ``now`` (default el
+        último evento de la llave), sin registrar un evento.
+        """
+        state = self._states.get(key)
+        features: Dict[str, float] = {}
+        for j, (label, length) in enumerate(zip(self.labels, self.lengths)):
+            count, total = 0, 0
+            if state is not None and state.times:
+                start, total = state.starts[j], state.sums[j]
+                if now is not None:
+                    # Avanzar el puntero sin modificar el estado
+                    cutoff = now - length
+                    while start - state.base < len(state.times) and state.times[start - state.base] < cutoff:
+                        total -= state.amounts[start - state.base]
+                        start += 1
+                count = state.base + len(state.times) - start
+            features[f"tx_count_{label}"] = count
+            features[f"amount_sum_{label}"] = total / self._scale
+        return features
+
+    def reset(self) -> None:
+        self._states.clear()
+        self.events = 0
+        self.late_events = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Eventos procesados, llaves y eventos retenidos en buffers."""
+        return {
+            "windows": dict(self.windows),
+            "events": self.events,
+            "late_events": self.late_events,
+            "keys": len(self._states),
+            "buffered_events": sum(len(s.times) for s in self._states.values()),
+        }
+
+    # ------------------------------------------------------------------
+    # Snapshot
+    # ------------------------------------------------------------------
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Estado serializable a JSON (solo eventos dentro de la ventana más larga)."""
+        keys = {}
+        for key, state in self._states.items():
+            state.compact()
+            keys[key] = {
+                "times": list(state.times),
+                "amounts": list(state.amounts),
+                "starts": [start - state.base for start in state.starts],
+                "sums": list(state.sums),
+                "seen": state.seen,
+                "last_time": state.last_time,
+            }
+        return {
+            "version": SNAPSHOT_VERSION,
+            "windows": dict(self.windows),
+            "amount_decimals": self.amount_decimals,
+            "events": self.events,
+            "late_events": self.late_events,
+            "keys": keys,
+        }
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Dict[str, Any]) -> 'VelocityEngine':
+        """
+        Reconstruir un motor desde ``snapshot()``.
+
+        Raises:
+            ValueError: Si la versión del snapshot no es compatible
+        """
+        if snapshot.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported velocity snapshot version: {snapshot.get('version')}")
+        engine = cls(windows=snapshot["windows"], amount_decimals=snapshot["amount_decimals"])
+        engine.events = snapshot["events"]
+        engine.late_events = snapshot["late_events"]
+        for key, data in snapshot["keys"].items():
+            state = _KeyState(len(engine.labels))
+            state.times = [float(t) for t in data["times"]]
+            state.amounts = [int(a) for a in data["amounts"]]
+            state.starts = [int(s) for s in data["starts"]]
+            state.sums = [int(s) for s in data["sums"]]
+            state.seen = data["seen"]
+            state.last_time = data["last_time"]
+            engine._states[key] = state
+        return engine
+
+    def save(self, path: Union[str, Path]) -> None:
+        """Guardar el snapshot como JSON (escritura atómica)."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> 'VelocityEngine':
+        with open(path) as f:
+            return cls.from_snapshot(json.load(f))
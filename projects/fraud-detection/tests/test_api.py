@@ -11,6 +11,8 @@ Metodologia: DVP-PRO
 ============================================================================
 """
 
+import json
+
 import pytest
 from fastapi.testclient import TestClient
 from datetime import timedelta
@@ -227,6 +229,18 @@ def test_predict_single_negative_amount(client, auth_headers, sample_transaction
     assert response.status_code == 422
 
 
+def test_predict_single_non_finite_time(client, auth_headers, sample_transaction):
+    """Test prediction with NaN/inf Time (would corrupt the velocity windows)."""
+    for value in ("NaN", "Infinity"):
+        body = json.dumps({**sample_transaction, "Time": 0}).replace('"Time": 0', f'"Time": {value}')
+        response = client.post(
+            "/api/v1/predict",
+            content=body,
+            headers={**auth_headers, "Content-Type": "application/json"}
+        )
+        assert response.status_code == 422
+
+
 def test_predict_batch_success(client, auth_headers, sample_transaction):
     """Test successful batch prediction."""
     batch_request = {
@@ -513,3 +527,205 @@ def test_method_not_allowed(client):
 # Run with: pytest -m predictions
 
 pytestmark = pytest.mark.api
+
+
+# ============================================================================
+# VECTORIZED BATCH SCORING TESTS
+# ============================================================================
+
+class _CountingModel:
+    """Modelo determinista que depende de las features y cuenta llamadas."""
+
+    def __init__(self):
+        import api.main as main
+        self.feature_names_in_ = list(main.FEATURE_COLUMNS)
+        self.calls = 0
+
+    def predict_proba(self, X):
+        import numpy as np
+        self.calls += 1
+        values = np.asarray(X, dtype=float)
+        p = 1.0 / (1.0 + np.exp(-(values[:, 1] + values[:, -1] / 100.0)))
+        return np.column_stack([1 - p, p])
+
+
+def test_predict_batch_single_model_call_matches_single(client, auth_headers, sample_transaction, monkeypatch):
+    """Batch vectorizado: una llamada al modelo y mismo resultado que /predict."""
+    import api.main as main
+
+    model = _CountingModel()
+    monkeypatch.setattr(main, "MODEL", model)
+    transactions = [
+        {**sample_transaction, "V1": v1, "Amount": amount}
+        for v1, amount in [(-3.0, 10.0), (-0.5, 20.0), (0.2, 5.0), (2.5, 300.0), (0.0, 0.0)]
+    ]
+
+    response = client.post("/api/v1/predict/batch", json={"transactions": transactions}, headers=auth_headers)
+    assert response.status_code == 200
+    assert model.calls == 1
+    batch = response.json()["predictions"]
+
+    for transaction, prediction in zip(transactions, batch):
+        single = client.post("/api/v1/predict", json=transaction, headers=auth_headers).json()
+        assert prediction["fraud_probability"] == pytest.approx(single["fraud_probability"])
+        assert prediction["risk_level"] == single["risk_level"]
+        assert prediction["is_fraud"] == single["is_fraud"]
+
+    ids = [p["transaction_id"] for p in batch]
+    assert len(set(ids)) == len(ids)
+    assert all(i.startswith("TXN-") and len(i) == 16 for i in ids)
+    assert response.json()["fraud_count"] == sum(p["is_fraud"] for p in batch)
+
+
+def test_classify_risk_levels_matches_scalar():
+    """Los cortes de np.digitize coinciden con classify_risk_level."""
+    import numpy as np
+    from api.main import classify_risk_level, classify_risk_levels
+
+    probabilities = np.array([0.0, 0.29, 0.3, 0.49, 0.5, 0.69, 0.7, 1.0])
+    assert classify_risk_levels(probabilities).tolist() == [
+        classify_risk_level(p) for p in probabilities
+    ]
+
+
+def test_predict_returns_429_when_inference_queue_full(client, auth_headers, sample_transaction, monkeypatch):
+    """Con el pool saturado se responde 429 + Retry-After sin llamar al modelo."""
+    import api.main as main_module
+    from api.inference_executor import InferenceExecutor
+
+    executor = InferenceExecutor(max_workers=1, max_queue=0, retry_after_seconds=3)
+    executor._pending = 1  # un trabajo ocupando el único worker
+    monkeypatch.setattr(main_module, "INFERENCE_EXECUTOR", executor)
+
+    response = client.post("/api/v1/predict", json=sample_transaction, headers=auth_headers)
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "3"
+    assert executor.stats()["rejected"] == 1
+
+    executor._pending = 0
+    response = client.post("/api/v1/predict/batch", json={"transactions": [sample_transaction]}, headers=auth_headers)
+    assert response.status_code == 200
+    assert client.get("/api/v1/monitoring/metrics").json()["inference"]["completed"] == 1
+
+
+def test_inference_executor_offloads_and_times_out():
+    """El trabajo corre en los hilos del pool; si espera demasiado en cola, 503."""
+    import asyncio
+    import threading
+    from api.inference_executor import InferenceExecutor, InferenceTimeout
+
+    executor = InferenceExecutor(max_workers=1, max_queue=4, queue_timeout_seconds=0.05)
+    release = threading.Event()
+
+    async def scenario():
+        blocker = asyncio.ensure_future(executor.run(release.wait, 5))
+        waiting = asyncio.ensure_future(executor.run(threading.current_thread))
+        await asyncio.sleep(0.01)
+        assert executor.queue_depth == 1
+        await asyncio.sleep(0.1)
+        release.set()
+        await blocker
+        with pytest.raises(InferenceTimeout) as excinfo:
+            await waiting
+        assert excinfo.value.status_code == 503
+        return await executor.run(lambda: threading.current_thread().name)
+
+    try:
+        assert asyncio.run(scenario()).startswith("inference")
+    finally:
+        executor.shutdown()
+    stats = executor.stats()
+    assert (stats["timed_out"], stats["queue_depth"], stats["active"]) == (1, 0, 0)
+
+
+# ============================================================================
+# PROMETHEUS METRICS TESTS
+# ============================================================================
+
+def test_prometheus_metrics_by_route_stage_and_risk(client, auth_headers, sample_transaction, monkeypatch):
+    """/metrics expone latencia por plantilla de ruta, etapas, riesgo y tamaño de batch."""
+    import api.main as main
+    from api.metrics import FraudMetrics
+    from prometheus_client.parser import text_string_to_metric_families
+
+    metrics = FraudMetrics(gauges={"fraud_detection_model_threshold": ("threshold", lambda: 0.42)})
+    monkeypatch.setattr(main, "METRICS", metrics)
+    monkeypatch.setattr(main, "MODEL", _CountingModel())
+    transactions = [{**sample_transaction, "V1": v1} for v1 in (-3.0, 0.0, 3.0)]
+
+    assert client.post("/api/v1/predict", json=sample_transaction, headers=auth_headers).status_code == 200
+    assert client.post("/api/v1/predict/batch", json={"transactions": transactions},
+                       headers=auth_headers).status_code == 200
+    client.get("/api/v1/does-not-exist")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    samples = {}
+    for family in text_string_to_metric_families(response.text):
+        for sample in family.samples:
+            samples[(sample.name, tuple(sorted(sample.labels.items())))] = sample.value
+
+    def value(name, **labels):
+        return samples[(name, tuple(sorted(labels.items())))]
+
+    assert value("fraud_detection_api_requests_total",
+                 route="/api/v1/predict/batch", method="POST", status="200") == 1
+    assert value("fraud_detection_api_requests_total",
+                 route="unmatched", method="GET", status="404") == 1
+    assert value("fraud_detection_api_latency_seconds_count",
+                 route="/api/v1/predict", method="POST") == 1
+    for stage in ("feature_alignment", "inference", "serialization"):
+        for mode in ("single", "batch"):
+            assert value("fraud_detection_stage_latency_seconds_count", stage=stage, mode=mode) == 1
+    assert value("fraud_detection_batch_size_count") == 1
+    assert value("fraud_detection_batch_size_sum") == 3
+    assert sum(v for (name, _), v in samples.items() if name == "fraud_detection_predictions_total") == 4
+    assert value("fraud_detection_model_threshold") == 0.42
+
+    summary = client.get("/api/v1/monitoring/metrics").json()
+    assert summary["predictions_total"] == 4
+    assert summary["predictions_fraud"] == value("fraud_detection_fraud_count")
+    assert summary["avg_latency_ms"] > 0
+
+
+def test_sharded_metrics_merge_threads():
+    """Cada hilo escribe en su shard; el scrape suma todos."""
+    import threading
+    from api.metrics import ShardedCounter, ShardedHistogram
+
+    counter = ShardedCounter("c", "doc", ["route"])
+    histogram = ShardedHistogram("h", "doc", buckets=(0.1, 1.0))
+
+    def work():
+        for _ in range(1000):
+            counter.inc("/a")
+            histogram.observe(0.5)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert counter.totals() == {("/a",): 4000}
+    assert histogram.totals()[()] == (4000, 2000.0)
+    buckets = {s.labels["le"]: s.value for s in histogram.collect().samples if s.name == "h_bucket"}
+    assert buckets == {"0.1": 0, "1.0": 4000, "+Inf": 4000}
+
+
+def test_velocity_windows_span_requests(client, auth_headers, sample_transaction, monkeypatch):
+    """Las ventanas de velocidad acumulan entre /predict y /predict/batch."""
+    import api.main as main
+    from src.streaming.velocity import VelocityEngine
+
+    monkeypatch.setattr(main, "VELOCITY_ENGINE", VelocityEngine())
+    transactions = [{**sample_transaction, "Time": t, "Amount": 10.0} for t in (100, 2000, 4000)]
+
+    client.post("/api/v1/predict", json={**sample_transaction, "Time": 0, "Amount": 5.0}, headers=auth_headers)
+    client.post("/api/v1/predict/batch", json={"transactions": transactions}, headers=auth_headers)
+
+    velocity = client.get("/api/v1/monitoring/metrics").json()["velocity"]
+    assert velocity["events"] == 4
+    assert velocity["current"]["tx_count_1h"] == 2
+    assert velocity["current"]["amount_sum_24h"] == 35.0
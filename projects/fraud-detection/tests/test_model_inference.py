@@ -18,3 +18,62 @@ def test_model_can_predict():
         sample_input = pd.DataFrame(sample_input, columns=feature_names)
     pred = model.predict(sample_input)
     assert pred.shape == (1,), f"La predicción debe tener una forma de (1,), obtuvo {pred.shape}"
+
+
+def _fitted_forest(**kwargs):
+    from sklearn.datasets import make_classification
+    from sklearn.ensemble import RandomForestClassifier
+
+    X, y = make_classification(n_samples=600, n_features=30, random_state=0)
+    columns = ['Time'] + [f'V{i}' for i in range(1, 29)] + ['Amount']
+    model = RandomForestClassifier(n_estimators=15, random_state=0, **kwargs)
+    return model.fit(pd.DataFrame(X, columns=columns), y), X
+
+
+def test_compiled_forest_matches_predict_proba():
+    from api.compiled_forest import CompiledForest
+
+    model, X = _fitted_forest()
+    compiled = CompiledForest.from_estimator(model)
+
+    assert compiled.verify(model) <= 1e-9
+    assert compiled.verify(model, X) <= 1e-9
+    np.testing.assert_array_equal(
+        compiled.predict(X[:50]), model.predict(pd.DataFrame(X[:50], columns=model.feature_names_in_))
+    )
+    assert list(compiled.feature_names_in_) == list(model.feature_names_in_)
+
+
+def test_compiled_forest_missing_values_and_large_batches():
+    from api.compiled_forest import CompiledForest
+
+    model, X = _fitted_forest()
+    y = model.predict(pd.DataFrame(X, columns=model.feature_names_in_))
+    X_missing = X.copy()
+    X_missing[::4, 5] = np.nan
+    model.fit(pd.DataFrame(X_missing, columns=model.feature_names_in_), y)
+    compiled = CompiledForest.from_estimator(model, max_rows=10)
+
+    assert compiled.verify(model, X_missing) <= 1e-9
+    frame = pd.DataFrame(X_missing[:20], columns=model.feature_names_in_)
+    np.testing.assert_allclose(compiled.predict_proba(frame), model.predict_proba(frame), atol=1e-12)
+
+
+def test_load_model_compiles_forest(tmp_path, monkeypatch):
+    import api.main as main_module
+    from api.compiled_forest import CompiledForest
+
+    model, _ = _fitted_forest()
+    path = tmp_path / "forest.pkl"
+    joblib.dump(model, path)
+    monkeypatch.setenv("MODEL_PATH", str(path))
+    previous = main_module.MODEL
+    try:
+        assert main_module.load_model()
+        assert isinstance(main_module.MODEL, CompiledForest)
+        assert main_module.load_model(compile_mode="off")
+        assert not isinstance(main_module.MODEL, CompiledForest)
+        with pytest.raises(TypeError):
+            CompiledForest.from_estimator(object())
+    finally:
+        main_module.MODEL = previous
@@ -0,0 +1,88 @@
+"""
+Tests del pipeline asyncio de streaming (AsyncStreamingPipeline).
+
+Autor: Ing. Daniel Varela Perez
+Email: bedaniele0@gmail.com
+"""
+
+import asyncio
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from src.streaming.async_pipeline import AsyncStreamingPipeline
+
+
+def _chunks(n_batches, size=10, seconds_per_batch=100.0):
+    for i in range(n_batches):
+        yield pd.DataFrame({
+            'Time': [i * seconds_per_batch] * size,
+            'Amount': [float(i)] * size,
+        })
+
+
+def test_stages_overlap_preserve_order_and_apply_backpressure():
+    seen, threads = [], set()
+
+    def slow_sink(batch):
+        threads.add(threading.current_thread().name)
+        time.sleep(0.02)
+        seen.append(batch['Amount'].iloc[0])
+
+    pipeline = AsyncStreamingPipeline(
+        source=_chunks(12),
+        features=lambda batch: batch.assign(double=batch['Amount'] * 2),
+        score=lambda batch: batch.assign(score=batch['double'] + 1),
+        sink=slow_sink,
+        queue_size=1,
+    )
+    report = asyncio.run(pipeline.run())
+
+    assert seen == [float(i) for i in range(12)]
+    assert threading.main_thread().name not in threads
+    assert report['transactions'] == 120
+    stages = report['stages']
+    assert all(stage['batches'] == 12 for stage in stages.values())
+    # El sink lento frena a las etapas anteriores en vez de acumular batches
+    assert all(stages[name]['max_output_queue_depth'] <= 1 for name in ('reader', 'features', 'scoring'))
+    assert stages['scoring']['blocked_seconds'] > 0.1
+    assert stages['sink']['throughput_tps'] < stages['features']['throughput_tps']
+
+
+def test_replay_speed_and_max_batches():
+    # 4 batches separados 100s de event time a 1000x -> ~0.3s reales
+    pipeline = AsyncStreamingPipeline(source=_chunks(10), features=lambda batch: batch, speed=1000)
+    report = asyncio.run(pipeline.run(max_batches=4))
+    assert report['transactions'] == 40
+    assert 'scoring' not in report['stages']
+    assert 0.28 <= report['elapsed_seconds'] < 1.0
+
+    fast = asyncio.run(AsyncStreamingPipeline(source=_chunks(4), features=lambda batch: batch).run())
+    assert fast['elapsed_seconds'] < 0.25
+
+
+def test_max_batches_closes_the_source():
+    closed = []
+
+    def source():
+        try:
+            yield from _chunks(10)
+        finally:
+            closed.append(True)
+
+    report = asyncio.run(AsyncStreamingPipeline(source=source(), features=lambda batch: batch).run(max_batches=2))
+    assert report['transactions'] == 20
+    assert closed == [True]
+
+
+def test_stage_error_propagates_without_hanging():
+    def fail(batch):
+        if batch['Amount'].iloc[0] == 3:
+            raise ValueError('bad batch')
+        return batch
+
+    pipeline = AsyncStreamingPipeline(source=_chunks(50), features=lambda b: b, score=fail, queue_size=1)
+    with pytest.raises(ValueError, match='bad batch'):
+        asyncio.run(asyncio.wait_for(pipeline.run(), timeout=5))
@@ -0,0 +1,85 @@
+"""
+Tests del motor de velocidad por ventanas deslizantes (VelocityEngine).
+
+Autor: Ing. Daniel Varela Perez
+Email: bedaniele0@gmail.com
+"""
+
+import numpy as np
+import pytest
+
+from src.streaming.velocity import VelocityEngine
+
+
+@pytest.fixture
+def stream():
+    rng = np.random.default_rng(0)
+    times = np.sort(rng.integers(0, 3 * 86400, 5000)).astype(float)
+    amounts = rng.gamma(1.5, 60, 5000).round(2)
+    return times, amounts
+
+
+def _brute_force(times, amounts, seconds):
+    """Conteo y suma sobre [t - w, t] hasta la fila actual (orden de llegada)."""
+    cents = np.round(amounts * 100).astype(np.int64)
+    cumulative = np.concatenate([[0], np.cumsum(cents)])
+    rows = np.arange(len(times))
+    first = np.searchsorted(times, times - seconds, side='left')
+    return rows + 1 - first, (cumulative[rows + 1] - cumulative[first]) / 100
+
+
+def test_windows_are_exact_across_batches_and_snapshots(stream, tmp_path):
+    times, amounts = stream
+    engine = VelocityEngine()
+    parts = []
+    for start in range(0, len(times), 700):
+        parts.append(engine.update_batch(times[start:start + 700], amounts[start:start + 700]))
+        if start == 2800:
+            # Reinicio a mitad del stream: se retoma desde el snapshot
+            engine.save(tmp_path / 'velocity.json')
+            engine = VelocityEngine.load(tmp_path / 'velocity.json')
+    features = {name: np.concatenate([p[name] for p in parts]) for name in parts[0]}
+
+    for label, seconds in {'1h': 3600, '6h': 21600, '24h': 86400}.items():
+        counts, sums = _brute_force(times, amounts, seconds)
+        np.testing.assert_array_equal(features[f'tx_count_{label}'], counts)
+        np.testing.assert_array_equal(features[f'amount_sum_{label}'], sums)
+    np.testing.assert_array_equal(features['time_since_last'], np.diff(times, prepend=times[0]))
+    assert engine.stats()['events'] == len(times)
+    # Solo se retienen eventos de la ventana más larga (más basura acotada)
+    assert engine.stats()['buffered_events'] <= 2 * features['tx_count_24h'][-1]
+
+
+def test_keys_late_events_and_current():
+    engine = VelocityEngine(windows={'10s': 10})
+
+    assert engine.update(0, 5.0, key='a')['tx_count_10s'] == 1
+    assert engine.update(4, 1.0, key='b')['tx_count_10s'] == 1
+    assert engine.update(8, 2.5, key='a') == {
+        'time_since_last': 8.0, 'tx_count_10s': 2, 'amount_sum_10s': 7.5
+    }
+    # Evento atrasado: se cuenta con el último Time de su llave
+    assert engine.update(3, 1.0, key='a')['tx_count_10s'] == 3
+    assert engine.late_events == 1
+
+    assert engine.current(key='a') == {'tx_count_10s': 3, 'amount_sum_10s': 8.5}
+    assert engine.current(now=15, key='a') == {'tx_count_10s': 2, 'amount_sum_10s': 3.5}
+    assert engine.current(now=15, key='a') == engine.current(now=15, key='a')
+    assert engine.current(key='missing') == {'tx_count_10s': 0, 'amount_sum_10s': 0.0}
+
+    with pytest.raises(ValueError):
+        VelocityEngine.from_snapshot({**engine.snapshot(), 'version': 0})
+
+
+def test_non_finite_times_are_rejected_without_touching_state():
+    engine = VelocityEngine(windows={'10s': 10})
+    engine.update(0, 5.0)
+
+    for bad in (float('nan'), float('inf')):
+        with pytest.raises(ValueError):
+            engine.update(bad, 1.0)
+    with pytest.raises(ValueError):
+        engine.update_batch([1.0, float('nan'), 2.0], [1.0, 1.0, 1.0])
+
+    assert engine.events == 1
+    assert engine.update(5, 1.0) == {'time_since_last': 5.0, 'tx_count_10s': 2, 'amount_sum_10s': 6.0}